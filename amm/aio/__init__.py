@@ -0,0 +1,24 @@
+"""asyncio versions of the amm operations.
+
+Every function takes an AsyncAlgodClient instead of an AlgodClient and is a
+coroutine, so many operations can be in flight in one event loop.
+"""
+from .client import AsyncAlgodClient
+from .confirmation import AsyncConfirmationTracker
+from .util import (
+    waitForTransaction,
+    fullyCompileContract,
+    getAppGlobalState,
+    getBalances,
+)
+from .operations import (
+    getContracts,
+    createAmmApp,
+    setupAmmApp,
+    optInToPoolToken,
+    supply,
+    withdraw,
+    swap,
+    closeAmm,
+    readPoolState,
+)
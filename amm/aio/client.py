@@ -0,0 +1,302 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import asyncio
+import base64
+import json
+from urllib import parse
+
+from algosdk import constants, encoding, error
+from algosdk.future import transaction
+
+if TYPE_CHECKING:
+    from .confirmation import AsyncConfirmationTracker
+
+API_VERSION_PATH_PREFIX = "/v2"
+
+
+class _ConnectionPool:
+    """A bounded pool of keep-alive HTTP/1.1 connections to one host."""
+
+    def __init__(self, host: str, port: int, ssl: bool, maxConnections: int) -> None:
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.maxConnections = maxConnections
+
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        # created on first use so that it binds to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def request(
+        self, method: str, path: str, headers: Dict[str, str], body: bytes
+    ) -> Tuple[int, bytes]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.maxConnections)
+
+        async with self._semaphore:
+            # a reused connection may have been closed by the server while idle,
+            # so retry once on a fresh connection
+            for attempt in range(2):
+                reused = attempt == 0 and len(self._idle) > 0
+                if reused:
+                    reader, writer = self._idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(
+                        self.host, self.port, ssl=self.ssl or None
+                    )
+
+                # only a connection whose response was read to the end can be
+                # reused, so it is closed if the request fails or is cancelled
+                keepAlive = False
+                try:
+                    status, keepAlive, responseBody = await self._roundTrip(
+                        reader, writer, method, path, headers, body
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                finally:
+                    if not keepAlive:
+                        writer.close()
+
+                if keepAlive:
+                    self._idle.append((reader, writer))
+                return status, responseBody
+
+        raise AssertionError("unreachable")
+
+    async def _roundTrip(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: bytes,
+    ) -> Tuple[int, bool, bytes]:
+        lines = ["{} {} HTTP/1.1".format(method, path), "Host: {}".format(self.host)]
+        lines += ["{}: {}".format(name, value) for name, value in headers.items()]
+        lines.append("Content-Length: {}".format(len(body)))
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        statusLine = await reader.readuntil(b"\r\n")
+        status = int(statusLine.split(b" ", 2)[1])
+
+        responseHeaders: Dict[str, str] = dict()
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            responseHeaders[name.strip().lower()] = value.strip()
+
+        keepAlive = responseHeaders.get("connection", "").lower() != "close"
+
+        if responseHeaders.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    # skip trailers
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            responseBody = b"".join(chunks)
+        elif "content-length" in responseHeaders:
+            responseBody = await reader.readexactly(
+                int(responseHeaders["content-length"])
+            )
+        else:
+            responseBody = await reader.read()
+            keepAlive = False
+
+        return status, keepAlive, responseBody
+
+    def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class AsyncAlgodClient:
+    """An asyncio client for the algod endpoints used by the amm.
+
+    Method names, arguments and return values match
+    algosdk.v2client.algod.AlgodClient, but every request is a coroutine.
+    Requests share a bounded pool of keep-alive connections, so many
+    coroutines can have requests in flight at once.
+
+    Args:
+        algod_token: algod API token
+        algod_address: algod address, e.g. http://localhost:4001
+        headers (optional): extra header name/value for all requests
+        maxConnections (optional): the maximum number of open connections
+    """
+
+    def __init__(
+        self,
+        algod_token: str,
+        algod_address: str,
+        headers: Optional[Dict[str, str]] = None,
+        maxConnections: int = 64,
+    ) -> None:
+        self.algod_token = algod_token
+        self.algod_address = algod_address
+        self.headers = headers
+
+        url = parse.urlsplit(algod_address)
+        if url.scheme not in ("http", "https"):
+            raise ValueError("Unsupported algod address: {}".format(algod_address))
+        ssl = url.scheme == "https"
+        self._basePath = url.path.rstrip("/")
+        self._pool = _ConnectionPool(
+            url.hostname or "localhost",
+            url.port or (443 if ssl else 80),
+            ssl,
+            maxConnections,
+        )
+        self._tracker: Optional["AsyncConfirmationTracker"] = None
+
+    async def __aenter__(self) -> "AsyncAlgodClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def tracker(self) -> "AsyncConfirmationTracker":
+        """The confirmation tracker shared by all waits on this client."""
+        if self._tracker is None:
+            from .confirmation import AsyncConfirmationTracker
+
+            self._tracker = AsyncConfirmationTracker(self)
+        return self._tracker
+
+    def close(self) -> None:
+        """Stop the confirmation tracker and close idle connections."""
+        if self._tracker is not None:
+            self._tracker.close()
+            self._tracker = None
+        self._pool.close()
+
+    async def algod_request(
+        self,
+        method: str,
+        requrl: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        response_format: str = "json",
+    ) -> Any:
+        header: Dict[str, str] = {}
+
+        if self.headers:
+            header.update(self.headers)
+
+        if headers:
+            header.update(headers)
+
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+
+        if requrl not in constants.unversioned_paths:
+            requrl = API_VERSION_PATH_PREFIX + requrl
+        if params:
+            requrl = requrl + "?" + parse.urlencode(params)
+
+        status, body = await self._pool.request(
+            method, self._basePath + requrl, header, data or b""
+        )
+
+        if status >= 300:
+            message = body.decode("utf-8")
+            try:
+                message = json.loads(message)["message"]
+            finally:
+                raise error.AlgodHTTPError(message, status)
+
+        if response_format == "json":
+            try:
+                return json.loads(body)
+            except Exception as e:
+                raise error.AlgodResponseError(
+                    "Failed to parse JSON response from algod"
+                ) from e
+        return body
+
+    async def health(self) -> Any:
+        return await self.algod_request("GET", "/health")
+
+    async def status(self) -> Dict[str, Any]:
+        return await self.algod_request("GET", "/status")
+
+    async def status_after_block(self, block_num: int) -> Dict[str, Any]:
+        return await self.algod_request(
+            "GET", "/status/wait-for-block-after/{}".format(block_num)
+        )
+
+    async def account_info(self, address: str) -> Dict[str, Any]:
+        return await self.algod_request("GET", "/accounts/" + address)
+
+    async def application_info(self, application_id: int) -> Dict[str, Any]:
+        return await self.algod_request(
+            "GET", "/applications/{}".format(application_id)
+        )
+
+    async def pending_transaction_info(self, transaction_id: str) -> Dict[str, Any]:
+        return await self.algod_request(
+            "GET", "/transactions/pending/" + transaction_id, params={"format": "json"}
+        )
+
+    async def suggested_params(self) -> transaction.SuggestedParams:
+        res = await self.algod_request("GET", "/transactions/params")
+
+        return transaction.SuggestedParams(
+            res["fee"],
+            res["last-round"],
+            res["last-round"] + 1000,
+            res["genesis-hash"],
+            res["genesis-id"],
+            False,
+            res["consensus-version"],
+            res["min-fee"],
+        )
+
+    async def send_raw_transaction(self, txn: str) -> str:
+        """Broadcast base64 encoded signed transactions and return the first ID."""
+        response = await self.algod_request(
+            "POST",
+            "/transactions",
+            data=base64.b64decode(txn),
+            headers={"Content-Type": "application/x-binary"},
+        )
+        return response["txId"]
+
+    async def send_transaction(self, txn: Any) -> str:
+        assert not isinstance(
+            txn, transaction.Transaction
+        ), "Attempt to send UNSIGNED transaction {}".format(txn)
+        return await self.send_raw_transaction(encoding.msgpack_encode(txn))
+
+    async def send_transactions(self, txns: List[Any]) -> str:
+        serialized = []
+        for txn in txns:
+            assert not isinstance(
+                txn, transaction.Transaction
+            ), "Attempt to send UNSIGNED transaction {}".format(txn)
+            serialized.append(base64.b64decode(encoding.msgpack_encode(txn)))
+
+        return await self.send_raw_transaction(
+            base64.b64encode(b"".join(serialized)).decode()
+        )
+
+    async def compile(self, source: str) -> Dict[str, Any]:
+        return await self.algod_request(
+            "POST",
+            "/teal/compile",
+            data=source.encode("utf-8"),
+            headers={"Content-Type": "application/x-binary"},
+        )
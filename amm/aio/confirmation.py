@@ -0,0 +1,164 @@
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+import asyncio
+
+from algosdk.error import AlgodHTTPError
+
+from ..util import PendingTxnResponse
+
+if TYPE_CHECKING:
+    from .client import AsyncAlgodClient
+
+
+class _Tracked:
+    def __init__(self, future: "asyncio.Future[PendingTxnResponse]", timeout: int):
+        self.future = future
+        self.timeout = timeout
+        self.startRound: Optional[int] = None
+
+
+class AsyncConfirmationTracker:
+    """Waits for many transactions with a single block-following task.
+
+    The asyncio counterpart of amm.confirmation.ConfirmationTracker. One task
+    waits for each new block with status_after_block, then looks up the
+    tracked transactions concurrently, so however many coroutines are waiting
+    for confirmations only one pooled connection is held by a long poll.
+    The task only runs while transactions are tracked.
+
+    track() returns an asyncio future that resolves to a PendingTxnResponse
+    once the transaction is confirmed, or fails if the node reports a pool
+    error or the transaction is not confirmed within timeout rounds. Every
+    AsyncAlgodClient has one, see AsyncAlgodClient.tracker.
+    """
+
+    def __init__(self, client: "AsyncAlgodClient", timeout: int = 10) -> None:
+        """Create a tracker.
+
+        Args:
+            client: An asyncio algod client.
+            timeout (optional): The number of rounds after which a transaction
+                that is still unconfirmed fails.
+        """
+        self.client = client
+        self.timeout = timeout
+        self.lastRound: Optional[int] = None
+
+        self._tracked: Dict[str, _Tracked] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._closed = False
+
+    def track(
+        self, txID: str, timeout: Optional[int] = None
+    ) -> "asyncio.Future[PendingTxnResponse]":
+        """Start watching a submitted transaction.
+
+        Must be called from a running event loop.
+
+        Args:
+            txID: The ID of the transaction.
+            timeout (optional): The number of rounds to wait for it, if not the
+                timeout of the tracker.
+
+        Returns:
+            A future for the PendingTxnResponse of the transaction.
+        """
+        if self._closed:
+            raise RuntimeError("AsyncConfirmationTracker is closed")
+
+        tracked = self._tracked.get(txID)
+        if tracked is None or tracked.future.done():
+            tracked = _Tracked(
+                asyncio.get_running_loop().create_future(),
+                self.timeout if timeout is None else timeout,
+            )
+            tracked.startRound = self.lastRound
+            self._tracked[txID] = tracked
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return tracked.future
+
+    async def wait(self, txIDs: Iterable[str]) -> List[PendingTxnResponse]:
+        """Track the given transactions and wait for all of them to confirm.
+
+        Raises the error of the first transaction that fails.
+        """
+        return list(await asyncio.gather(*[self.track(txID) for txID in txIDs]))
+
+    def pending(self) -> List[str]:
+        """Get the IDs of the transactions that have not been resolved yet."""
+        return [txID for txID, t in self._tracked.items() if not t.future.done()]
+
+    def close(self) -> None:
+        """Stop the task. Transactions that are still tracked are cancelled."""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        tracked = list(self._tracked.values())
+        self._tracked.clear()
+        for t in tracked:
+            t.future.cancel()
+
+    async def _run(self) -> None:
+        try:
+            while self._tracked:
+                if self.lastRound is None:
+                    self.lastRound = (await self.client.status())["last-round"]
+                await self._scan(self.lastRound)
+                if not self._tracked:
+                    break
+                status = await self.client.status_after_block(self.lastRound)
+                self.lastRound = status["last-round"]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failed = list(self._tracked.values())
+            self._tracked.clear()
+            for t in failed:
+                if not t.future.done():
+                    t.future.set_exception(e)
+
+    async def _lookup(self, txID: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.client.pending_transaction_info(txID)
+        except AlgodHTTPError:
+            # not submitted yet, or dropped from the pool
+            return None
+
+    async def _scan(self, lastRound: int) -> None:
+        tracked = list(self._tracked.items())
+        infos = await asyncio.gather(*[self._lookup(txID) for txID, _ in tracked])
+
+        for (txID, t), info in zip(tracked, infos):
+            if t.future.done():
+                # the waiter was cancelled
+                self._forget(txID, t)
+                continue
+
+            if t.startRound is None:
+                t.startRound = lastRound
+
+            if info is not None and info.get("confirmed-round", 0) > 0:
+                self._forget(txID, t)
+                t.future.set_result(PendingTxnResponse(info))
+            elif info is not None and info["pool-error"]:
+                self._forget(txID, t)
+                t.future.set_exception(
+                    Exception("Pool error: {}".format(info["pool-error"]))
+                )
+            elif lastRound >= t.startRound + t.timeout:
+                self._forget(txID, t)
+                t.future.set_exception(
+                    Exception(
+                        "Transaction {} not confirmed after {} rounds".format(
+                            txID, t.timeout
+                        )
+                    )
+                )
+
+    def _forget(self, txID: str, t: _Tracked) -> None:
+        # the same ID may have been tracked again since the scan started
+        if self._tracked.get(txID) is t:
+            del self._tracked[txID]
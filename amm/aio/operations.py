@@ -0,0 +1,248 @@
+from typing import Dict, Optional, Tuple, Union
+from base64 import b64decode
+import asyncio
+
+from algosdk.logic import get_application_address
+from algosdk.future import transaction
+
+from .. import operations
+from ..account import Account
+from ..events import SupplyResult, SwapResult, WithdrawResult, getResult
+from ..operations import (
+    MIN_BALANCE_REQUIREMENT,
+    PoolState,
+    PoolTxnBuilder,
+    buildCreateAmmAppTxn,
+    buildSetupAmmAppTxns,
+    getPoolTokenId,
+)
+from ..programs import TEAL_VERSION, ProgramCache, compileContracts
+from ..util import PendingTxnResponse
+from .client import AsyncAlgodClient
+from .util import (
+    waitForTransaction,
+    getAppGlobalState,
+    getBalances,
+)
+
+
+async def _compileContracts(
+    client: AsyncAlgodClient, programCache: Optional[ProgramCache], version: int
+) -> Tuple[bytes, bytes]:
+    loop = asyncio.get_running_loop()
+
+    def compile(teal: str) -> bytes:
+        response = asyncio.run_coroutine_threadsafe(client.compile(teal), loop)
+        return b64decode(response.result()["result"])
+
+    # the cache is read, and programs assembled, off the event loop
+    return await loop.run_in_executor(
+        None, compileContracts, None, programCache, version, compile
+    )
+
+
+async def getContracts(
+    client: AsyncAlgodClient,
+    programCache: Optional[ProgramCache] = None,
+    version: int = TEAL_VERSION,
+) -> Tuple[bytes, bytes]:
+    """Get the compiled TEAL contracts for the amm.
+
+    See amm.programs.compileContracts. Programs compiled by either this
+    function or amm.operations.getContracts are shared between the two.
+    """
+    if version != TEAL_VERSION:
+        return await _compileContracts(client, programCache, version)
+
+    if len(operations.APPROVAL_PROGRAM) == 0:
+        programs = await _compileContracts(client, programCache, version)
+        operations.APPROVAL_PROGRAM, operations.CLEAR_STATE_PROGRAM = programs
+
+    return operations.APPROVAL_PROGRAM, operations.CLEAR_STATE_PROGRAM
+
+
+async def createAmmApp(
+    client: AsyncAlgodClient,
+    creator: Account,
+    tokenA: int,
+    tokenB: int,
+    feeBps: int,
+    minIncrement: int,
+    version: int = TEAL_VERSION,
+) -> int:
+    """Create a new amm. See amm.operations.createAmmApp."""
+    approval, clear = await getContracts(client, version=version)
+
+    txn = buildCreateAmmAppTxn(
+        creator.getAddress(),
+        approval,
+        clear,
+        tokenA,
+        tokenB,
+        feeBps,
+        minIncrement,
+        await client.suggested_params(),
+    )
+
+    signedTxn = txn.sign(creator.getPrivateKey())
+
+    await client.send_transaction(signedTxn)
+
+    response = await waitForTransaction(client, signedTxn.get_txid())
+    assert response.applicationIndex is not None and response.applicationIndex > 0
+    return response.applicationIndex
+
+
+async def setupAmmApp(
+    client: AsyncAlgodClient,
+    appID: int,
+    funder: Account,
+    tokenA: int,
+    tokenB: int,
+) -> int:
+    """Finish setting up an amm. See amm.operations.setupAmmApp.
+
+    Return: pool token id
+    """
+    fundAppTxn, setupTxn = buildSetupAmmAppTxns(
+        funder.getAddress(), appID, tokenA, tokenB, await client.suggested_params()
+    )
+
+    signedFundAppTxn = fundAppTxn.sign(funder.getPrivateKey())
+    signedSetupTxn = setupTxn.sign(funder.getPrivateKey())
+
+    await client.send_transactions([signedFundAppTxn, signedSetupTxn])
+
+    await waitForTransaction(client, signedFundAppTxn.get_txid())
+
+    appGlobalState = await getAppGlobalState(client, appID)
+    poolToken = appGlobalState[b"pool_token_key"]
+
+    return poolToken
+
+
+async def readPoolState(client: AsyncAlgodClient, appID: int) -> PoolState:
+    """Read the state and reserves of an amm with one application_info call.
+
+    See amm.operations.readPoolState.
+    """
+    return PoolState.fromGlobalState(appID, await getAppGlobalState(client, appID))
+
+
+async def getPoolState(
+    client: AsyncAlgodClient, appID: int
+) -> Tuple[Dict[bytes, Union[int, bytes]], transaction.SuggestedParams]:
+    """Check that the amm is set up and read what is needed to build a group.
+
+    The three reads are made concurrently.
+
+    Returns:
+        A tuple of the app global state and the suggested params.
+    """
+    _, appGlobalState, suggestedParams = await asyncio.gather(
+        assertSetup(client, appID),
+        getAppGlobalState(client, appID),
+        client.suggested_params(),
+    )
+    return appGlobalState, suggestedParams
+
+
+async def optInToPoolToken(
+    client: AsyncAlgodClient, appID: int, account: Account
+) -> None:
+    appGlobalState, suggestedParams = await getPoolState(client, appID)
+    poolToken = getPoolTokenId(appGlobalState)
+
+    optInTxn = transaction.AssetOptInTxn(
+        sender=account.getAddress(), index=poolToken, sp=suggestedParams
+    )
+
+    signedOptInTxn = optInTxn.sign(account.getPrivateKey())
+
+    await client.send_transaction(signedOptInTxn)
+    await waitForTransaction(client, signedOptInTxn.get_txid())
+
+
+async def _sendGroup(
+    client: AsyncAlgodClient, txns: list, signer: Account
+) -> PendingTxnResponse:
+    signedTxns = [txn.sign(signer.getPrivateKey()) for txn in txns]
+    await client.send_transactions(signedTxns)
+    return await waitForTransaction(client, signedTxns[-1].get_txid())
+
+
+async def supply(
+    client: AsyncAlgodClient,
+    appID: int,
+    qA: int,
+    qB: int,
+    supplier: Account,
+    pool: Optional[PoolTxnBuilder] = None,
+) -> SupplyResult:
+    """Supply liquidity to the pool. See amm.operations.supply.
+
+    A PoolTxnBuilder, or an AmmPool, can be given to reuse its transaction
+    templates.
+    """
+    appGlobalState, suggestedParams = await getPoolState(client, appID)
+    if pool is None:
+        pool = PoolTxnBuilder(appID, appGlobalState)
+
+    txns = pool.buildSupply(supplier.getAddress(), qA, qB, suggestedParams)
+    return getResult(await _sendGroup(client, txns, supplier), SupplyResult)
+
+
+async def withdraw(
+    client: AsyncAlgodClient,
+    appID: int,
+    poolTokenAmount: int,
+    withdrawAccount: Account,
+    pool: Optional[PoolTxnBuilder] = None,
+) -> WithdrawResult:
+    """Withdraw liquidity from the pool. See amm.operations.withdraw."""
+    appGlobalState, suggestedParams = await getPoolState(client, appID)
+    if pool is None:
+        pool = PoolTxnBuilder(appID, appGlobalState)
+
+    txns = pool.buildWithdraw(
+        withdrawAccount.getAddress(), poolTokenAmount, suggestedParams
+    )
+    return getResult(await _sendGroup(client, txns, withdrawAccount), WithdrawResult)
+
+
+async def swap(
+    client: AsyncAlgodClient,
+    appID: int,
+    tokenId: int,
+    amount: int,
+    trader: Account,
+    pool: Optional[PoolTxnBuilder] = None,
+) -> SwapResult:
+    """Swap tokenId token for the other token in the pool. See amm.operations.swap."""
+    appGlobalState, suggestedParams = await getPoolState(client, appID)
+    if pool is None:
+        pool = PoolTxnBuilder(appID, appGlobalState)
+
+    txns = pool.buildSwap(trader.getAddress(), tokenId, amount, suggestedParams)
+    return getResult(await _sendGroup(client, txns, trader), SwapResult)
+
+
+async def closeAmm(client: AsyncAlgodClient, appID: int, closer: Account) -> None:
+    """Close an amm. See amm.operations.closeAmm."""
+    deleteTxn = transaction.ApplicationDeleteTxn(
+        sender=closer.getAddress(),
+        index=appID,
+        sp=await client.suggested_params(),
+    )
+    signedDeleteTxn = deleteTxn.sign(closer.getPrivateKey())
+
+    await client.send_transaction(signedDeleteTxn)
+
+    await waitForTransaction(client, signedDeleteTxn.get_txid())
+
+
+async def assertSetup(client: AsyncAlgodClient, appID: int) -> None:
+    balances = await getBalances(client, get_application_address(appID))
+    assert (
+        balances[0] >= MIN_BALANCE_REQUIREMENT
+    ), "AMM must be set up and funded first. AMM balances: " + str(balances)
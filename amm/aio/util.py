@@ -0,0 +1,57 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Union
+from base64 import b64decode
+
+from ..teal import assemble, TealAssemblyError
+from ..util import PendingTxnResponse, decodeState
+from .client import AsyncAlgodClient
+
+if TYPE_CHECKING:
+    from pyteal import Expr
+
+
+async def waitForTransaction(
+    client: AsyncAlgodClient, txID: str, timeout: int = 10
+) -> PendingTxnResponse:
+    """Wait for a transaction with the block follower shared by the client.
+
+    See AsyncConfirmationTracker.track.
+    """
+    return await client.tracker.track(txID, timeout)
+
+
+async def fullyCompileContract(
+    client: AsyncAlgodClient, contract: "Expr", version: int = 5
+) -> bytes:
+    """Compile a contract to bytecode. See amm.util.fullyCompileContract."""
+    from ..programs import contractTeal
+
+    teal = contractTeal(contract, version)
+    try:
+        return assemble(teal)
+    except TealAssemblyError:
+        response = await client.compile(teal)
+        return b64decode(response["result"])
+
+
+async def getAppGlobalState(
+    client: AsyncAlgodClient, appID: int
+) -> Dict[bytes, Union[int, bytes]]:
+    appInfo = await client.application_info(appID)
+    return decodeState(appInfo["params"]["global-state"])
+
+
+async def getBalances(client: AsyncAlgodClient, account: str) -> Dict[int, int]:
+    balances: Dict[int, int] = dict()
+
+    accountInfo = await client.account_info(account)
+
+    # set key 0 to Algo balance
+    balances[0] = accountInfo["amount"]
+
+    assets: List[Dict[str, Any]] = accountInfo.get("assets", [])
+    for assetHolding in assets:
+        assetID = assetHolding["asset-id"]
+        amount = assetHolding["amount"]
+        balances[assetID] = amount
+
+    return balances
@@ -0,0 +1,103 @@
+from typing import Any, Dict, Optional, Union
+from collections import OrderedDict
+from threading import Lock
+
+from algosdk.v2client.algod import AlgodClient
+from algosdk.future.transaction import SuggestedParams
+from algosdk.logic import get_application_address
+
+from .util import getAppGlobalState, getBalances
+
+
+class PoolStateCache:
+    """Round-scoped cache of the algod reads made before building a group.
+
+    Global state, app account balances and suggested params only change when
+    a new block is added, so they are cached by (appID, round). Call refresh()
+    once before building a group: it makes a single status() call and drops
+    every cached value if the node reports a new round. Pools are evicted in
+    least recently used order once more than maxPools are cached.
+
+    The cache is safe to share between threads.
+    """
+
+    def __init__(self, client: AlgodClient, maxPools: int = 256) -> None:
+        if maxPools < 1:
+            raise ValueError("maxPools must be at least 1")
+
+        self.client = client
+        self.maxPools = maxPools
+        self.round: Optional[int] = None
+
+        self._lock = Lock()
+        self._suggestedParams: Optional[SuggestedParams] = None
+        self._pools: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+
+    def refresh(self) -> int:
+        """Check the node's last round and invalidate the cache if it changed.
+
+        Returns:
+            The current round.
+        """
+        lastRound = self.client.status()["last-round"]
+        self.advance(lastRound)
+        return lastRound
+
+    def advance(self, lastRound: int) -> None:
+        """Move the cache to lastRound, e.g. the confirmed round of a transaction,
+        without a status() call. Rounds older than the cached one are ignored.
+        """
+        with self._lock:
+            if self.round is not None and lastRound <= self.round:
+                return
+            self.round = lastRound
+            self._suggestedParams = None
+            self._pools.clear()
+
+    def invalidate(self, appID: Optional[int] = None) -> None:
+        """Drop cached values for one app, or everything if appID is None."""
+        with self._lock:
+            if appID is None:
+                self._suggestedParams = None
+                self._pools.clear()
+            else:
+                self._pools.pop((appID, self.round), None)
+
+    def _entry(self, appID: int) -> Dict[str, Any]:
+        if self.round is None:
+            self.refresh()
+
+        with self._lock:
+            key = (appID, self.round)
+            entry = self._pools.get(key)
+            if entry is None:
+                entry = dict()
+                self._pools[key] = entry
+                while len(self._pools) > self.maxPools:
+                    self._pools.popitem(last=False)
+            else:
+                self._pools.move_to_end(key)
+            return entry
+
+    def suggestedParams(self) -> SuggestedParams:
+        if self.round is None:
+            self.refresh()
+
+        params = self._suggestedParams
+        if params is None:
+            params = self.client.suggested_params()
+            with self._lock:
+                self._suggestedParams = params
+        return params
+
+    def getAppGlobalState(self, appID: int) -> Dict[bytes, Union[int, bytes]]:
+        entry = self._entry(appID)
+        if "globalState" not in entry:
+            entry["globalState"] = getAppGlobalState(self.client, appID)
+        return entry["globalState"]
+
+    def getAppBalances(self, appID: int) -> Dict[int, int]:
+        entry = self._entry(appID)
+        if "balances" not in entry:
+            entry["balances"] = getBalances(self.client, get_application_address(appID))
+        return entry["balances"]
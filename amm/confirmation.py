@@ -0,0 +1,338 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from base64 import b32encode
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import BoundedSemaphore, Condition, Lock, Thread
+import time
+
+import msgpack
+from algosdk.v2client.algod import AlgodClient
+from algosdk.error import AlgodHTTPError
+from algosdk.future import transaction
+from algosdk import constants, encoding
+
+from .util import PendingTxnResponse
+
+
+def _txID(signedTxn: Dict[str, Any]) -> str:
+    # algod returns canonically encoded transactions, so the ID can be computed
+    # from the raw msgpack without decoding it into an algosdk object
+    txn = msgpack.packb(signedTxn["txn"], use_bin_type=True)
+    digest = encoding.checksum(constants.txid_prefix + txn)
+    return b32encode(digest).decode().rstrip("=")
+
+
+class _Tracked:
+    def __init__(self, future: Future) -> None:
+        self.future = future
+        self.startRound: Optional[int] = None
+        self.startTime = time.monotonic()
+
+
+class ConfirmationTracker:
+    """Waits for many transactions with a single block-following loop.
+
+    A background thread waits for each new block with status_after_block, then
+    lists the transaction pool once. Tracked transactions that have left the
+    pool are looked up with pending_transaction_info, so each transaction
+    costs one lookup instead of one per round.
+
+    track() returns a concurrent.futures.Future that resolves to a
+    PendingTxnResponse once the transaction is confirmed, or fails if the node
+    reports a pool error or the transaction is not confirmed within timeout
+    rounds. The tracker is safe to share between threads, and the loop only
+    polls algod while transactions are being tracked.
+    """
+
+    def __init__(
+        self, client: AlgodClient, timeout: int = 10, maxHistory: int = 10_000
+    ) -> None:
+        """Create a tracker.
+
+        Args:
+            client: An algod client.
+            timeout (optional): The number of rounds after which a transaction
+                that is still unconfirmed fails.
+            maxHistory (optional): The number of latencies of confirmed
+                transactions to keep.
+        """
+        self.client = client
+        self.timeout = timeout
+        self.maxHistory = maxHistory
+        self.lastRound: Optional[int] = None
+
+        self._condition = Condition()
+        self._tracked: Dict[str, _Tracked] = {}
+        self._latencies: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._thread: Optional[Thread] = None
+        self._closed = False
+
+    def __enter__(self) -> "ConfirmationTracker":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def track(
+        self, txID: str, callback: Optional[Callable[[Future], None]] = None
+    ) -> Future:
+        """Start watching a submitted transaction.
+
+        Args:
+            txID: The ID of the transaction.
+            callback (optional): Called with the future once it is resolved.
+
+        Returns:
+            A future for the PendingTxnResponse of the transaction.
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("ConfirmationTracker is closed")
+
+            tracked = self._tracked.get(txID)
+            if tracked is None:
+                tracked = _Tracked(Future())
+                tracked.startRound = self.lastRound
+                self._tracked[txID] = tracked
+                self._condition.notify()
+
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._run, name="ConfirmationTracker", daemon=True
+                )
+                self._thread.start()
+
+        if callback is not None:
+            tracked.future.add_done_callback(callback)
+        return tracked.future
+
+    def wait(self, txIDs: Iterable[str]) -> List[PendingTxnResponse]:
+        """Track the given transactions and wait for all of them to confirm.
+
+        Raises the error of the first transaction that fails.
+        """
+        futures = [self.track(txID) for txID in txIDs]
+        return [future.result() for future in futures]
+
+    def latency(self, txID: str) -> Optional[Tuple[int, float]]:
+        """Get the confirmation latency of a transaction.
+
+        Returns:
+            The number of rounds and seconds between tracking the transaction
+            and seeing it confirmed, or None if it has not been confirmed.
+        """
+        with self._condition:
+            return self._latencies.get(txID)
+
+    def pending(self) -> Set[str]:
+        """Get the IDs of the transactions that have not been resolved yet."""
+        with self._condition:
+            return set(self._tracked)
+
+    def close(self) -> None:
+        """Stop the loop. Transactions that are still tracked are cancelled."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+
+        if thread is not None:
+            thread.join()
+
+        with self._condition:
+            tracked = list(self._tracked.values())
+            self._tracked.clear()
+        for t in tracked:
+            t.future.cancel()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and len(self._tracked) == 0:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+            try:
+                if self.lastRound is None:
+                    self.lastRound = self.client.status()["last-round"]
+                self._scan(self.lastRound)
+                with self._condition:
+                    if len(self._tracked) == 0:
+                        continue
+                status = self.client.status_after_block(self.lastRound)
+                self.lastRound = status["last-round"]
+            except Exception as e:
+                with self._condition:
+                    failed = list(self._tracked.values())
+                    self._tracked.clear()
+                for t in failed:
+                    if not t.future.cancelled():
+                        t.future.set_exception(e)
+
+    def _scan(self, lastRound: int) -> None:
+        with self._condition:
+            tracked = dict(self._tracked)
+
+        inPool = {
+            _txID(signedTxn)
+            for signedTxn in msgpack.unpackb(
+                self.client.pending_transactions(response_format="msgpack"),
+                raw=False,
+            ).get("top-transactions", [])
+        }
+
+        for txID, t in tracked.items():
+            if t.startRound is None:
+                t.startRound = lastRound
+
+            if txID not in inPool:
+                try:
+                    info = self.client.pending_transaction_info(txID)
+                except AlgodHTTPError:
+                    # not submitted yet, or dropped from the pool
+                    info = None
+
+                if info is not None and info.get("confirmed-round", 0) > 0:
+                    self._resolve(txID, t, PendingTxnResponse(info))
+                    continue
+
+                if info is not None and info["pool-error"]:
+                    self._fail(
+                        txID, Exception("Pool error: {}".format(info["pool-error"]))
+                    )
+                    continue
+
+            if lastRound >= t.startRound + self.timeout:
+                self._fail(
+                    txID,
+                    Exception(
+                        "Transaction {} not confirmed after {} rounds".format(
+                            txID, self.timeout
+                        )
+                    ),
+                )
+
+    def _resolve(self, txID: str, t: _Tracked, response: PendingTxnResponse) -> None:
+        assert response.confirmedRound is not None and t.startRound is not None
+        latency = (
+            response.confirmedRound - t.startRound,
+            time.monotonic() - t.startTime,
+        )
+        with self._condition:
+            self._tracked.pop(txID, None)
+            self._latencies[txID] = latency
+            while len(self._latencies) > self.maxHistory:
+                self._latencies.popitem(last=False)
+        if not t.future.cancelled():
+            t.future.set_result(response)
+
+    def _fail(self, txID: str, e: Exception) -> None:
+        with self._condition:
+            t = self._tracked.pop(txID, None)
+        if t is not None and not t.future.cancelled():
+            t.future.set_exception(e)
+
+
+class GroupSubmitter:
+    """Sends signed groups with at most maxInFlight of them unconfirmed.
+
+    Each submitted group is tracked by a ConfirmationTracker. Once the window
+    is full, submit() blocks until an earlier group is confirmed or fails, so
+    groups from independent accounts share blocks without overfilling the
+    transaction pool. Submitting a group whose last transaction is already in
+    flight raises ValueError, since the node would reject it as a duplicate.
+
+    The submitter is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        maxInFlight: int = 64,
+        tracker: Optional[ConfirmationTracker] = None,
+    ) -> None:
+        """Create a submitter.
+
+        Args:
+            client: An algod client.
+            maxInFlight (optional): The maximum number of unconfirmed groups.
+            tracker (optional): A confirmation tracker to share with other
+                submitters. If not given, the submitter creates one and closes
+                it in close().
+        """
+        if maxInFlight < 1:
+            raise ValueError("maxInFlight must be at least 1")
+
+        self.client = client
+        self.maxInFlight = maxInFlight
+        self.tracker = tracker or ConfirmationTracker(client)
+
+        self._ownsTracker = tracker is None
+        self._window = BoundedSemaphore(maxInFlight)
+        self._lock = Lock()
+        self._inFlight: Set[str] = set()
+
+    def __enter__(self) -> "GroupSubmitter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def submit(
+        self, signedTxns: List[transaction.SignedTransaction], trackAll: bool = False
+    ) -> List[Future]:
+        """Send a signed group.
+
+        Blocks while maxInFlight groups are unconfirmed.
+
+        Args:
+            signedTxns: The signed transactions of the group.
+            trackAll (optional): Whether to return a future for every
+                transaction rather than only the last one.
+
+        Returns:
+            Futures for the PendingTxnResponse of the last transaction, or of
+            every transaction in order if trackAll is set.
+        """
+        txID = signedTxns[-1].get_txid()
+
+        self._window.acquire()
+        with self._lock:
+            if txID in self._inFlight:
+                self._window.release()
+                raise ValueError("An identical group is already in flight")
+            self._inFlight.add(txID)
+
+        tracked = signedTxns if trackAll else signedTxns[-1:]
+        try:
+            self.client.send_transactions(signedTxns)
+            futures = [self.tracker.track(s.get_txid()) for s in tracked[:-1]]
+            # the group is confirmed or rejected as a whole
+            futures.append(
+                self.tracker.track(txID, callback=lambda _: self._done(txID))
+            )
+        except Exception as e:
+            futures = []
+            for _ in tracked:
+                future: Future = Future()
+                future.set_exception(e)
+                futures.append(future)
+            self._done(txID)
+
+        return futures
+
+    def _done(self, txID: str) -> None:
+        with self._lock:
+            self._inFlight.discard(txID)
+        self._window.release()
+
+    def inFlight(self) -> int:
+        """Get the number of submitted groups that have not been resolved."""
+        with self._lock:
+            return len(self._inFlight)
+
+    def close(self) -> None:
+        """Close the tracker if the submitter created it."""
+        if self._ownsTracker:
+            self.tracker.close()
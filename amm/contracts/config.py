@@ -9,3 +9,21 @@ MIN_INCREMENT_KEY = Bytes("min_increment_key")
 POOL_TOKENS_OUTSTANDING_KEY = Bytes("pool_tokens_outstanding_key")
 SCALING_FACTOR = Int(10 ** 13)
 POOL_TOKEN_DEFAULT_AMOUNT = Int(10 ** 13)
+# reserves of tokens A and B as of the last call that changed them, and the
+# round of that call, so a client can read the whole pool from global state
+RESERVE_A_KEY = Bytes("reserve_a_key")
+RESERVE_B_KEY = Bytes("reserve_b_key")
+LAST_UPDATE_ROUND_KEY = Bytes("last_update_round_key")
+# time-weighted price accumulators: the sum over time of the price of A in
+# B (reserve B / reserve A) and of B in A, in seconds times 64.64 fixed point
+# prices, kept as the high and low words of 128-bit numbers that wrap around,
+# and the block timestamp they were last updated at
+PRICE_A_CUMULATIVE_HI_KEY = Bytes("price_a_cumulative_hi_key")
+PRICE_A_CUMULATIVE_LO_KEY = Bytes("price_a_cumulative_lo_key")
+PRICE_B_CUMULATIVE_HI_KEY = Bytes("price_b_cumulative_hi_key")
+PRICE_B_CUMULATIVE_LO_KEY = Bytes("price_b_cumulative_lo_key")
+PRICE_TIMESTAMP_KEY = Bytes("price_timestamp_key")
+# the first byte of the record logged by each method
+SUPPLY_EVENT = Bytes("base16", "01")
+WITHDRAW_EVENT = Bytes("base16", "02")
+SWAP_EVENT = Bytes("base16", "03")
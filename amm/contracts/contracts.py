@@ -17,30 +17,54 @@ def get_setup_program():
         createPoolToken(POOL_TOKEN_DEFAULT_AMOUNT),
         optIn(TOKEN_A_KEY),
         optIn(TOKEN_B_KEY),
+        App.globalPut(RESERVE_A_KEY, Int(0)),
+        App.globalPut(RESERVE_B_KEY, Int(0)),
+        App.globalPut(LAST_UPDATE_ROUND_KEY, Global.round()),
+        App.globalPut(PRICE_TIMESTAMP_KEY, Global.latest_timestamp()),
         Approve(),
     )
 
 
-token_a_holding = AssetHolding.balance(
-    Global.current_application_address(), App.globalGet(TOKEN_A_KEY)
-)
-token_b_holding = AssetHolding.balance(
-    Global.current_application_address(), App.globalGet(TOKEN_B_KEY)
-)
-
+def get_supply_program(version: int = 5):
+    # from TEAL 6, the refund and the pool tokens are sent in one inner group
+    take_adjusted_amounts = (
+        takeAdjustedAmountsGrouped if version >= 6 else takeAdjustedAmounts
+    )
 
-def get_supply_program():
     token_a_txn_index = Txn.group_index() - Int(2)
     token_b_txn_index = Txn.group_index() - Int(1)
 
+    # globals and transaction fields used more than once are read once
+    token_a_id = ScratchVar(TealType.uint64)
+    token_b_id = ScratchVar(TealType.uint64)
+    token_a_txn_amt = ScratchVar(TealType.uint64)
+    token_b_txn_amt = ScratchVar(TealType.uint64)
+    min_increment = ScratchVar(TealType.uint64)
+
     pool_token_holding = AssetHolding.balance(
         Global.current_application_address(), App.globalGet(POOL_TOKEN_KEY)
     )
+    token_a_holding = AssetHolding.balance(
+        Global.current_application_address(), token_a_id.load()
+    )
+    token_b_holding = AssetHolding.balance(
+        Global.current_application_address(), token_b_id.load()
+    )
 
     token_a_before_txn: ScratchVar = ScratchVar(TealType.uint64)
     token_b_before_txn: ScratchVar = ScratchVar(TealType.uint64)
+    pool_tokens_outstanding = ScratchVar(TealType.uint64)
+
+    # the amounts kept by the pool
+    token_a_amount = ScratchVar(TealType.uint64)
+    token_b_amount = ScratchVar(TealType.uint64)
 
     on_supply = Seq(
+        token_a_id.store(App.globalGet(TOKEN_A_KEY)),
+        token_b_id.store(App.globalGet(TOKEN_B_KEY)),
+        token_a_txn_amt.store(Gtxn[token_a_txn_index].asset_amount()),
+        token_b_txn_amt.store(Gtxn[token_b_txn_index].asset_amount()),
+        min_increment.store(App.globalGet(MIN_INCREMENT_KEY)),
         pool_token_holding,
         token_a_holding,
         token_b_holding,
@@ -48,67 +72,164 @@ def get_supply_program():
             And(
                 pool_token_holding.hasValue(),
                 pool_token_holding.value() > Int(0),
-                validateTokenReceived(token_a_txn_index, TOKEN_A_KEY),
-                validateTokenReceived(token_b_txn_index, TOKEN_B_KEY),
-                Gtxn[token_a_txn_index].asset_amount()
-                >= App.globalGet(MIN_INCREMENT_KEY),
-                Gtxn[token_b_txn_index].asset_amount()
-                >= App.globalGet(MIN_INCREMENT_KEY),
+                validateTokenReceived(token_a_txn_index, token_a_id.load()),
+                validateTokenReceived(token_b_txn_index, token_b_id.load()),
+                token_a_txn_amt.load() >= min_increment.load(),
+                token_b_txn_amt.load() >= min_increment.load(),
             )
         ),
-        token_a_before_txn.store(
-            token_a_holding.value() - Gtxn[token_a_txn_index].asset_amount()
-        ),
-        token_b_before_txn.store(
-            token_b_holding.value() - Gtxn[token_b_txn_index].asset_amount()
-        ),
+        token_a_before_txn.store(token_a_holding.value() - token_a_txn_amt.load()),
+        token_b_before_txn.store(token_b_holding.value() - token_b_txn_amt.load()),
+        pool_tokens_outstanding.store(App.globalGet(POOL_TOKENS_OUTSTANDING_KEY)),
         If(
             Or(
                 token_a_before_txn.load() == Int(0),
                 token_b_before_txn.load() == Int(0),
             )
-        )
-        .Then(
+        ).Then(
             # no liquidity yet, take everything
             Seq(
+                token_a_amount.store(token_a_txn_amt.load()),
+                token_b_amount.store(token_b_txn_amt.load()),
                 mintAndSendPoolToken(
-                    Txn.sender(),
-                    Sqrt(
-                        Gtxn[token_a_txn_index].asset_amount()
-                        * Gtxn[token_b_txn_index].asset_amount()
-                    ),
+                    Sqrt(token_a_txn_amt.load() * token_b_txn_amt.load()),
                 ),
-                Approve(),
             ),
         )
+        # keep all of token A if the corresponding amount of token B was supplied,
+        # otherwise all of token B. Only one of the two is taken, so the worst
+        # case costs one take rather than two
         .ElseIf(
-            tryTakeAdjustedAmounts(
-                Gtxn[token_a_txn_index].asset_amount(),
-                token_a_before_txn.load(),
-                TOKEN_B_KEY,
-                Gtxn[token_b_txn_index].asset_amount(),
-                token_b_before_txn.load(),
+            Seq(
+                token_b_amount.store(
+                    xMulYDivZ(
+                        token_a_txn_amt.load(),
+                        token_b_before_txn.load(),
+                        token_a_before_txn.load(),
+                    )
+                ),
+                And(
+                    token_b_amount.load() > Int(0),
+                    token_b_txn_amt.load() >= token_b_amount.load(),
+                ),
+            )
+        )
+        .Then(
+            Seq(
+                token_a_amount.store(token_a_txn_amt.load()),
+                take_adjusted_amounts(
+                    token_a_txn_amt.load(),
+                    token_a_before_txn.load(),
+                    token_b_id.load(),
+                    token_b_txn_amt.load(),
+                    token_b_amount.load(),
+                ),
             )
         )
-        .Then(Approve())
         .ElseIf(
-            tryTakeAdjustedAmounts(
-                Gtxn[token_b_txn_index].asset_amount(),
-                token_b_before_txn.load(),
-                TOKEN_A_KEY,
-                Gtxn[token_a_txn_index].asset_amount(),
-                token_a_before_txn.load(),
-            ),
+            Seq(
+                token_a_amount.store(
+                    xMulYDivZ(
+                        token_b_txn_amt.load(),
+                        token_a_before_txn.load(),
+                        token_b_before_txn.load(),
+                    )
+                ),
+                And(
+                    token_a_amount.load() > Int(0),
+                    token_a_txn_amt.load() >= token_a_amount.load(),
+                ),
+            )
+        )
+        .Then(
+            Seq(
+                token_b_amount.store(token_b_txn_amt.load()),
+                take_adjusted_amounts(
+                    token_b_txn_amt.load(),
+                    token_b_before_txn.load(),
+                    token_a_id.load(),
+                    token_a_txn_amt.load(),
+                    token_a_amount.load(),
+                ),
+            )
         )
-        .Then(Approve())
         .Else(Reject()),
+        recordUpdate(
+            SUPPLY_EVENT,
+            token_a_amount.load(),
+            token_b_amount.load(),
+            App.globalGet(POOL_TOKENS_OUTSTANDING_KEY) - pool_tokens_outstanding.load(),
+        ),
+        Approve(),
     )
     return on_supply
 
 
-def get_withdraw_program():
+def get_withdraw_program(version: int = 5):
     pool_token_txn_index = Txn.group_index() - Int(1)
+
+    token_a_id = ScratchVar(TealType.uint64)
+    token_b_id = ScratchVar(TealType.uint64)
+    pool_token_txn_amt = ScratchVar(TealType.uint64)
+    pool_tokens_outstanding = ScratchVar(TealType.uint64)
+
+    token_a_holding = AssetHolding.balance(
+        Global.current_application_address(), token_a_id.load()
+    )
+    token_b_holding = AssetHolding.balance(
+        Global.current_application_address(), token_b_id.load()
+    )
+
+    # the amounts sent to the sender
+    token_a_amount = ScratchVar(TealType.uint64)
+    token_b_amount = ScratchVar(TealType.uint64)
+
+    if version >= 6:
+        # both amounts come from the reserves before either is sent, which only
+        # differs from sending them one by one for a pool of a token with itself
+        withdraw_tokens = Seq(
+            token_a_amount.store(
+                xMulYDivZ(
+                    token_a_holding.value(),
+                    pool_token_txn_amt.load(),
+                    pool_tokens_outstanding.load(),
+                )
+            ),
+            token_b_amount.store(
+                xMulYDivZ(
+                    token_b_holding.value(),
+                    pool_token_txn_amt.load(),
+                    pool_tokens_outstanding.load(),
+                )
+            ),
+            Assert(And(token_a_amount.load() > Int(0), token_b_amount.load() > Int(0))),
+            InnerTxnBuilder.Begin(),
+            sendTokenFields(token_a_id.load(), Txn.sender(), token_a_amount.load()),
+            InnerTxnNext(),
+            sendTokenFields(token_b_id.load(), Txn.sender(), token_b_amount.load()),
+            InnerTxnBuilder.Submit(),
+        )
+    else:
+        withdraw_tokens = Seq(
+            token_a_amount.store(
+                withdrawGivenPoolToken(
+                    token_a_id.load(),
+                    pool_token_txn_amt.load(),
+                    pool_tokens_outstanding.load(),
+                )
+            ),
+            token_b_amount.store(
+                withdrawGivenPoolToken(
+                    token_b_id.load(),
+                    pool_token_txn_amt.load(),
+                    pool_tokens_outstanding.load(),
+                )
+            ),
+        )
+
     on_withdraw = Seq(
+        token_a_id.store(App.globalGet(TOKEN_A_KEY)),
+        token_b_id.store(App.globalGet(TOKEN_B_KEY)),
         token_a_holding,
         token_b_holding,
         Assert(
@@ -117,32 +238,26 @@ def get_withdraw_program():
                 token_a_holding.value() > Int(0),
                 token_b_holding.hasValue(),
                 token_b_holding.value() > Int(0),
-                validateTokenReceived(pool_token_txn_index, POOL_TOKEN_KEY),
+                # also ensures the pool token amount is positive
+                validateTokenReceived(
+                    pool_token_txn_index, App.globalGet(POOL_TOKEN_KEY)
+                ),
             )
         ),
-        If(Gtxn[pool_token_txn_index].asset_amount() > Int(0)).Then(
-            Seq(
-                withdrawGivenPoolToken(
-                    Txn.sender(),
-                    TOKEN_A_KEY,
-                    Gtxn[pool_token_txn_index].asset_amount(),
-                    App.globalGet(POOL_TOKENS_OUTSTANDING_KEY),
-                ),
-                withdrawGivenPoolToken(
-                    Txn.sender(),
-                    TOKEN_B_KEY,
-                    Gtxn[pool_token_txn_index].asset_amount(),
-                    App.globalGet(POOL_TOKENS_OUTSTANDING_KEY),
-                ),
-                App.globalPut(
-                    POOL_TOKENS_OUTSTANDING_KEY,
-                    App.globalGet(POOL_TOKENS_OUTSTANDING_KEY)
-                    - Gtxn[pool_token_txn_index].asset_amount(),
-                ),
-                Approve(),
-            ),
+        pool_token_txn_amt.store(Gtxn[pool_token_txn_index].asset_amount()),
+        pool_tokens_outstanding.store(App.globalGet(POOL_TOKENS_OUTSTANDING_KEY)),
+        withdraw_tokens,
+        App.globalPut(
+            POOL_TOKENS_OUTSTANDING_KEY,
+            pool_tokens_outstanding.load() - pool_token_txn_amt.load(),
         ),
-        Reject(),
+        recordUpdate(
+            WITHDRAW_EVENT,
+            token_a_amount.load(),
+            token_b_amount.load(),
+            pool_token_txn_amt.load(),
+        ),
+        Approve(),
     )
 
     return on_withdraw
@@ -150,67 +265,63 @@ def get_withdraw_program():
 
 def get_swap_program():
     on_swap_txn_index = Txn.group_index() - Int(1)
-    given_token_amt_before_txn = ScratchVar(TealType.uint64)
-    other_token_amt_before_txn = ScratchVar(TealType.uint64)
+    given_token_id = ScratchVar(TealType.uint64)
+    other_token_id = ScratchVar(TealType.uint64)
+    given_token_txn_amt = ScratchVar(TealType.uint64)
+
+    given_token_holding = AssetHolding.balance(
+        Global.current_application_address(), given_token_id.load()
+    )
+    other_token_holding = AssetHolding.balance(
+        Global.current_application_address(), other_token_id.load()
+    )
 
-    to_send_key = ScratchVar(TealType.bytes)
     to_send_amount = ScratchVar(TealType.uint64)
 
     on_swap = Seq(
-        token_a_holding,
-        token_b_holding,
+        given_token_id.store(Gtxn[on_swap_txn_index].xfer_asset()),
+        If(given_token_id.load() == App.globalGet(TOKEN_A_KEY))
+        .Then(other_token_id.store(App.globalGet(TOKEN_B_KEY)))
+        .ElseIf(given_token_id.load() == App.globalGet(TOKEN_B_KEY))
+        .Then(other_token_id.store(App.globalGet(TOKEN_A_KEY)))
+        .Else(Reject()),
         Assert(
             And(
                 App.globalGet(POOL_TOKENS_OUTSTANDING_KEY) > Int(0),
-                Or(
-                    validateTokenReceived(on_swap_txn_index, TOKEN_A_KEY),
-                    validateTokenReceived(on_swap_txn_index, TOKEN_B_KEY),
-                ),
+                validateTokenReceived(on_swap_txn_index, given_token_id.load()),
             )
         ),
-        If(Gtxn[on_swap_txn_index].xfer_asset() == App.globalGet(TOKEN_A_KEY))
-        .Then(
-            Seq(
-                given_token_amt_before_txn.store(
-                    token_a_holding.value() - Gtxn[on_swap_txn_index].asset_amount()
-                ),
-                other_token_amt_before_txn.store(token_b_holding.value()),
-                to_send_key.store(TOKEN_B_KEY),
-            )
-        )
-        .ElseIf(Gtxn[on_swap_txn_index].xfer_asset() == App.globalGet(TOKEN_B_KEY))
-        .Then(
-            Seq(
-                given_token_amt_before_txn.store(
-                    token_b_holding.value() - Gtxn[on_swap_txn_index].asset_amount()
-                ),
-                other_token_amt_before_txn.store(token_a_holding.value()),
-                to_send_key.store(TOKEN_A_KEY),
-            )
-        )
-        .Else(Reject()),
+        given_token_txn_amt.store(Gtxn[on_swap_txn_index].asset_amount()),
+        given_token_holding,
+        other_token_holding,
         to_send_amount.store(
             computeOtherTokenOutputPerGivenTokenInput(
-                Gtxn[on_swap_txn_index].asset_amount(),
-                given_token_amt_before_txn.load(),
-                other_token_amt_before_txn.load(),
+                given_token_txn_amt.load(),
+                given_token_holding.value() - given_token_txn_amt.load(),
+                other_token_holding.value(),
                 App.globalGet(FEE_BPS_KEY),
             )
         ),
         Assert(
             And(
                 to_send_amount.load() > Int(0),
-                to_send_amount.load() < other_token_amt_before_txn.load(),
+                to_send_amount.load() < other_token_holding.value(),
             )
         ),
-        sendToken(to_send_key.load(), Txn.sender(), to_send_amount.load()),
+        sendToken(other_token_id.load(), Txn.sender(), to_send_amount.load()),
+        recordUpdate(
+            SWAP_EVENT,
+            given_token_id.load(),
+            given_token_txn_amt.load(),
+            to_send_amount.load(),
+        ),
         Approve(),
     )
 
     return on_swap
 
 
-def approval_program():
+def approval_program(version: int = 5):
     on_create = Seq(
         App.globalPut(CREATOR_KEY, Txn.application_args[0]),
         App.globalPut(TOKEN_A_KEY, Btoi(Txn.application_args[1])),
@@ -221,8 +332,8 @@ def approval_program():
     )
 
     on_setup = get_setup_program()
-    on_supply = get_supply_program()
-    on_withdraw = get_withdraw_program()
+    on_supply = get_supply_program(version)
+    on_withdraw = get_withdraw_program(version)
     on_swap = get_swap_program()
 
     on_call_method = Txn.application_args[0]
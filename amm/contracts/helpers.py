@@ -4,19 +4,163 @@ from amm.contracts.config import (
     SCALING_FACTOR,
     POOL_TOKENS_OUTSTANDING_KEY,
     POOL_TOKEN_KEY,
+    TOKEN_A_KEY,
+    TOKEN_B_KEY,
+    RESERVE_A_KEY,
+    RESERVE_B_KEY,
+    LAST_UPDATE_ROUND_KEY,
+    PRICE_A_CUMULATIVE_HI_KEY,
+    PRICE_A_CUMULATIVE_LO_KEY,
+    PRICE_B_CUMULATIVE_HI_KEY,
+    PRICE_B_CUMULATIVE_LO_KEY,
+    PRICE_TIMESTAMP_KEY,
 )
 
 
+class _NewOp:
+    """An application mode opcode that pyteal 0.9 does not know.
+
+    pyteal 0.9 compiles TEAL 5 at most, so programs for later versions are
+    compiled as TEAL 5 and their version raised afterwards (see
+    amm.programs.contractTeal). The op is therefore accepted at version 5.
+    """
+
+    mode = Mode.Application
+    min_version = 5
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __str__(self) -> str:
+        return self.name
+
+
+ITXN_NEXT = _NewOp("itxn_next")
+
+
+class InnerTxnNext(Expr):
+    """Submit the inner transaction being built as part of a group and begin the next one.
+
+    Requires TEAL version 6 or higher.
+    """
+
+    def __teal__(self, options: "CompileOptions"):
+        return TealBlock.FromOp(options, TealOp(self, ITXN_NEXT))
+
+    def __str__(self):
+        return "(InnerTxnNext)"
+
+    def type_of(self):
+        return TealType.none
+
+    def has_return(self):
+        return False
+
+
+class AccumulatePrice(Expr):
+    """Add price * elapsed to a 128-bit accumulator kept in two global uint64s.
+
+    price is numerator / denominator as a 64.64 fixed point number, so it is
+    exact to 2^-64 over the whole range of uint64 reserves. The accumulator
+    wraps around instead of overflowing; readers take differences of two
+    values modulo 2^128.
+    """
+
+    def __init__(
+        self,
+        hi_key: Expr,
+        lo_key: Expr,
+        numerator: Expr,
+        denominator: Expr,
+        elapsed: Expr,
+    ) -> None:
+        super().__init__()
+        self.hi_key = hi_key
+        self.lo_key = lo_key
+        self.numerator = numerator
+        self.denominator = denominator
+        self.elapsed = elapsed
+
+    def __teal__(self, options: "CompileOptions"):
+        def ops(*specs):
+            return TealSimpleBlock([TealOp(self, *spec) for spec in specs])
+
+        pieces = [
+            self.elapsed,
+            # price = numerator * 2^64 / denominator, as high and low words
+            self.numerator,
+            ops((Op.int, 0), (Op.int, 0)),
+            self.denominator,
+            ops(
+                (Op.divmodw,),
+                (Op.pop,),
+                (Op.pop,),
+                # price * elapsed modulo 2^128
+                (Op.dig, 2),
+                (Op.mulw,),
+                (Op.cover, 3),
+                (Op.cover, 2),
+                (Op.mulw,),
+                (Op.swap,),
+                (Op.pop,),
+                (Op.addw,),
+                (Op.swap,),
+                (Op.pop,),
+            ),
+            # add the low word, carrying into the high word
+            App.globalGet(self.lo_key),
+            ops(
+                (Op.uncover, 2),
+                (Op.addw,),
+                (Op.cover, 2),
+                (Op.addw,),
+                (Op.swap,),
+                (Op.pop,),
+            ),
+            App.globalGet(self.hi_key),
+            ops((Op.addw,), (Op.swap,), (Op.pop,)),
+            self.hi_key,
+            ops((Op.swap,), (Op.app_global_put,)),
+            self.lo_key,
+            ops((Op.swap,), (Op.app_global_put,)),
+        ]
+
+        start = None
+        end = None
+        for piece in pieces:
+            if isinstance(piece, Expr):
+                pieceStart, pieceEnd = piece.__teal__(options)
+            else:
+                pieceStart = pieceEnd = piece
+            if start is None:
+                start = pieceStart
+            else:
+                end.setNextBlock(pieceStart)
+            end = pieceEnd
+        return start, end
+
+    def __str__(self):
+        return "(AccumulatePrice {} {} {} {} {})".format(
+            self.hi_key, self.lo_key, self.numerator, self.denominator, self.elapsed
+        )
+
+    def type_of(self):
+        return TealType.none
+
+    def has_return(self):
+        return False
+
+
 @Subroutine(TealType.uint64)
 def validateTokenReceived(
-    transaction_index: TealType.uint64, token_key: TealType.bytes
+    transaction_index: TealType.uint64, token_id: TealType.uint64
 ) -> Expr:
     return And(
         Gtxn[transaction_index].type_enum() == TxnType.AssetTransfer,
         Gtxn[transaction_index].sender() == Txn.sender(),
         Gtxn[transaction_index].asset_receiver()
         == Global.current_application_address(),
-        Gtxn[transaction_index].xfer_asset() == App.globalGet(token_key),
+        Gtxn[transaction_index].xfer_asset() == token_id,
         Gtxn[transaction_index].asset_amount() > Int(0),
     )
 
@@ -26,20 +170,26 @@ def xMulYDivZ(x, y, z) -> Expr:
     return WideRatio([x, y, SCALING_FACTOR], [z, SCALING_FACTOR])
 
 
+def sendTokenFields(token_id: Expr, receiver: Expr, amount: Expr) -> Expr:
+    return InnerTxnBuilder.SetFields(
+        {
+            TxnField.type_enum: TxnType.AssetTransfer,
+            TxnField.xfer_asset: token_id,
+            TxnField.asset_receiver: receiver,
+            TxnField.asset_amount: amount,
+            # paid by the app call through fee pooling
+            TxnField.fee: Int(0),
+        }
+    )
+
+
 @Subroutine(TealType.none)
 def sendToken(
-    token_key: TealType.bytes, receiver: TealType.bytes, amount: TealType.uint64
+    token_id: TealType.uint64, receiver: TealType.bytes, amount: TealType.uint64
 ) -> Expr:
     return Seq(
         InnerTxnBuilder.Begin(),
-        InnerTxnBuilder.SetFields(
-            {
-                TxnField.type_enum: TxnType.AssetTransfer,
-                TxnField.xfer_asset: App.globalGet(token_key),
-                TxnField.asset_receiver: receiver,
-                TxnField.asset_amount: amount,
-            }
-        ),
+        sendTokenFields(token_id, receiver, amount),
         InnerTxnBuilder.Submit(),
     )
 
@@ -55,6 +205,7 @@ def createPoolToken(pool_token_amount: TealType.uint64) -> Expr:
                 TxnField.config_asset_default_frozen: Int(0),
                 TxnField.config_asset_decimals: Int(0),
                 TxnField.config_asset_reserve: Global.current_application_address(),
+                TxnField.fee: Int(0),
             }
         ),
         InnerTxnBuilder.Submit(),
@@ -63,127 +214,205 @@ def createPoolToken(pool_token_amount: TealType.uint64) -> Expr:
     )
 
 
-@Subroutine(TealType.none)
 def optIn(token_key: TealType.bytes) -> Expr:
-    return sendToken(token_key, Global.current_application_address(), Int(0))
+    return sendToken(
+        App.globalGet(token_key), Global.current_application_address(), Int(0)
+    )
+
+
+@Subroutine(TealType.none)
+def recordUpdate(
+    event: TealType.bytes,
+    x: TealType.uint64,
+    y: TealType.uint64,
+    z: TealType.uint64,
+) -> Expr:
+    """
+    Mirror the app's balances of tokens A and B, and the current round, in global state, and log
+    the event.
+
+    Before the reserves change, the price they gave since the last update is added to the price
+    accumulators. The log is a fixed layout record: the event byte, then x, y, z and the new
+    reserves of tokens A and B as 8 byte big-endian integers. See amm/events.py.
+    """
+    token_a_holding = AssetHolding.balance(
+        Global.current_application_address(), App.globalGet(TOKEN_A_KEY)
+    )
+    token_b_holding = AssetHolding.balance(
+        Global.current_application_address(), App.globalGet(TOKEN_B_KEY)
+    )
+    reserve_a = ScratchVar(TealType.uint64)
+    reserve_b = ScratchVar(TealType.uint64)
+    elapsed = ScratchVar(TealType.uint64)
+
+    return Seq(
+        reserve_a.store(App.globalGet(RESERVE_A_KEY)),
+        reserve_b.store(App.globalGet(RESERVE_B_KEY)),
+        # block timestamps never decrease
+        elapsed.store(Global.latest_timestamp() - App.globalGet(PRICE_TIMESTAMP_KEY)),
+        # there is no price before the first supply
+        If(And(elapsed.load(), reserve_a.load(), reserve_b.load())).Then(
+            Seq(
+                AccumulatePrice(
+                    PRICE_A_CUMULATIVE_HI_KEY,
+                    PRICE_A_CUMULATIVE_LO_KEY,
+                    reserve_b.load(),
+                    reserve_a.load(),
+                    elapsed.load(),
+                ),
+                AccumulatePrice(
+                    PRICE_B_CUMULATIVE_HI_KEY,
+                    PRICE_B_CUMULATIVE_LO_KEY,
+                    reserve_a.load(),
+                    reserve_b.load(),
+                    elapsed.load(),
+                ),
+            )
+        ),
+        App.globalPut(PRICE_TIMESTAMP_KEY, Global.latest_timestamp()),
+        token_a_holding,
+        token_b_holding,
+        App.globalPut(RESERVE_A_KEY, token_a_holding.value()),
+        App.globalPut(RESERVE_B_KEY, token_b_holding.value()),
+        App.globalPut(LAST_UPDATE_ROUND_KEY, Global.round()),
+        Log(
+            Concat(
+                event,
+                Itob(x),
+                Itob(y),
+                Itob(z),
+                Itob(token_a_holding.value()),
+                Itob(token_b_holding.value()),
+            )
+        ),
+    )
 
 
 @Subroutine(TealType.none)
-def returnRemainder(
-    token_key: TealType.bytes,
-    received_amount: TealType.uint64,
-    to_keep_amount: TealType.uint64,
+def takeAdjustedAmounts(
+    to_keep_token_txn_amt: TealType.uint64,
+    to_keep_token_before_txn_amt: TealType.uint64,
+    other_token_id: TealType.uint64,
+    other_token_txn_amt: TealType.uint64,
+    other_corresponding_amount: TealType.uint64,
 ) -> Expr:
-    remainder = received_amount - to_keep_amount
+    """
+    Keep all of one supplied token and the corresponding amount of the other token, as determined by
+    market price before transaction, and send the remainder of the other token back.
+    Mint and send pool tokens in proportion to new liquidity over old liquidity.
+    The caller checks that the corresponding amount is positive and no more than was supplied.
+    """
     return Seq(
-        If(remainder > Int(0)).Then(
+        # return the remainder of the other token
+        If(other_token_txn_amt > other_corresponding_amount).Then(
             sendToken(
-                token_key,
+                other_token_id,
                 Txn.sender(),
-                remainder,
+                other_token_txn_amt - other_corresponding_amount,
             )
         ),
+        mintAndSendPoolToken(
+            xMulYDivZ(
+                App.globalGet(POOL_TOKENS_OUTSTANDING_KEY),
+                to_keep_token_txn_amt,
+                to_keep_token_before_txn_amt,
+            ),
+        ),
     )
 
 
-@Subroutine(TealType.uint64)
-def tryTakeAdjustedAmounts(
+@Subroutine(TealType.none)
+def takeAdjustedAmountsGrouped(
     to_keep_token_txn_amt: TealType.uint64,
     to_keep_token_before_txn_amt: TealType.uint64,
-    other_token_key: TealType.bytes,
+    other_token_id: TealType.uint64,
     other_token_txn_amt: TealType.uint64,
-    other_token_before_txn_amt: TealType.uint64,
+    other_corresponding_amount: TealType.uint64,
 ) -> Expr:
     """
-    Given supplied token amounts, try to keep all of one token and the corresponding amount of other token
-    as determined by market price before transaction. If corresponding amount is less than supplied, send the remainder back.
-    If successful, mint and sent pool tokens in proportion to new liquidity over old liquidity.
+    takeAdjustedAmounts for TEAL 6 and later, which sends the remainder and the pool tokens in one
+    inner transaction group.
     """
-    other_corresponding_amount = ScratchVar(TealType.uint64)
+    pool_token_amount = ScratchVar(TealType.uint64)
 
     return Seq(
-        other_corresponding_amount.store(
+        pool_token_amount.store(
             xMulYDivZ(
+                App.globalGet(POOL_TOKENS_OUTSTANDING_KEY),
                 to_keep_token_txn_amt,
-                other_token_before_txn_amt,
                 to_keep_token_before_txn_amt,
             )
         ),
-        If(
-            And(
-                other_corresponding_amount.load() > Int(0),
-                other_token_txn_amt >= other_corresponding_amount.load(),
-            )
-        ).Then(
+        InnerTxnBuilder.Begin(),
+        # return the remainder of the other token
+        If(other_token_txn_amt > other_corresponding_amount).Then(
             Seq(
-                returnRemainder(
-                    other_token_key,
-                    other_token_txn_amt,
-                    other_corresponding_amount.load(),
-                ),
-                mintAndSendPoolToken(
+                sendTokenFields(
+                    other_token_id,
                     Txn.sender(),
-                    xMulYDivZ(
-                        App.globalGet(POOL_TOKENS_OUTSTANDING_KEY),
-                        to_keep_token_txn_amt,
-                        to_keep_token_before_txn_amt,
-                    ),
+                    other_token_txn_amt - other_corresponding_amount,
                 ),
-                Return(Int(1)),
+                InnerTxnNext(),
             )
         ),
-        Return(Int(0)),
+        sendTokenFields(
+            App.globalGet(POOL_TOKEN_KEY),
+            Txn.sender(),
+            pool_token_amount.load(),
+        ),
+        InnerTxnBuilder.Submit(),
+        App.globalPut(
+            POOL_TOKENS_OUTSTANDING_KEY,
+            App.globalGet(POOL_TOKENS_OUTSTANDING_KEY) + pool_token_amount.load(),
+        ),
     )
 
 
-@Subroutine(TealType.none)
+@Subroutine(TealType.uint64)
 def withdrawGivenPoolToken(
-    receiver: TealType.bytes,
-    to_withdraw_token_key: TealType.bytes,
+    to_withdraw_token_id: TealType.uint64,
     pool_token_amount: TealType.uint64,
     pool_tokens_outstanding: TealType.uint64,
 ) -> Expr:
+    """
+    Send the sender their share of a token. The caller checks that pool_token_amount is positive,
+    and fails the call if pool_tokens_outstanding is 0.
+    Returns the amount sent.
+    """
     token_holding = AssetHolding.balance(
-        Global.current_application_address(), App.globalGet(to_withdraw_token_key)
+        Global.current_application_address(), to_withdraw_token_id
     )
+    to_send_amount = ScratchVar(TealType.uint64)
+
     return Seq(
         token_holding,
-        If(
-            And(
-                pool_tokens_outstanding > Int(0),
-                pool_token_amount > Int(0),
-                token_holding.hasValue(),
-                token_holding.value() > Int(0),
-            )
-        ).Then(
+        If(token_holding.value() > Int(0)).Then(
             Seq(
-                Assert(
+                to_send_amount.store(
                     xMulYDivZ(
                         token_holding.value(),
                         pool_token_amount,
                         pool_tokens_outstanding,
                     )
-                    > Int(0)
-                ),
-                sendToken(
-                    to_withdraw_token_key,
-                    receiver,
-                    xMulYDivZ(
-                        token_holding.value(),
-                        pool_token_amount,
-                        pool_tokens_outstanding,
-                    ),
                 ),
+                Assert(to_send_amount.load() > Int(0)),
+                sendToken(to_withdraw_token_id, Txn.sender(), to_send_amount.load()),
+                Return(to_send_amount.load()),
             )
         ),
+        Return(Int(0)),
     )
 
 
-@Subroutine(TealType.uint64)
-def assessFee(amount: TealType.uint64, fee_bps: TealType.uint64):
+def assessFee(amount: Expr, fee_bps: Expr) -> Expr:
+    """
+    amount * (10000 - fee_bps) / 10000, computed in two parts that cannot overflow: the product of
+    amount, the fee numerator and the scaling factor is always below 2^128, so xMulYDivZ would
+    never panic here.
+    """
     fee_num = Int(10000) - fee_bps
     fee_denom = Int(10000)
-    return xMulYDivZ(amount, fee_num, fee_denom)
+    return amount / fee_denom * fee_num + amount % fee_denom * fee_num / fee_denom
 
 
 @Subroutine(TealType.uint64)
@@ -202,9 +431,9 @@ def computeOtherTokenOutputPerGivenTokenInput(
 
 
 @Subroutine(TealType.none)
-def mintAndSendPoolToken(receiver: TealType.bytes, amount: TealType.uint64) -> Expr:
+def mintAndSendPoolToken(amount: TealType.uint64) -> Expr:
     return Seq(
-        sendToken(POOL_TOKEN_KEY, receiver, amount),
+        sendToken(App.globalGet(POOL_TOKEN_KEY), Txn.sender(), amount),
         App.globalPut(
             POOL_TOKENS_OUTSTANDING_KEY,
             App.globalGet(POOL_TOKENS_OUTSTANDING_KEY) + amount,
@@ -0,0 +1,138 @@
+"""Decoding of the records the approval program logs.
+
+Each supply, withdraw and swap call logs one 41 byte record: an event byte,
+then five 8 byte big-endian integers. The first three depend on the event,
+the last two are the reserves of tokens A and B after the call:
+
+    supply:   amount of A kept, amount of B kept, pool tokens minted
+    withdraw: amount of A sent, amount of B sent, pool tokens burned
+    swap:     ID of the token in, amount in, amount of the other token out
+
+Reading the record from the confirmed transaction replaces reading the
+balances of the pool and the sender before and after the call.
+"""
+from typing import List, Union
+import struct
+
+from .util import PendingTxnResponse
+
+# These mirror amm/contracts/config.py. They are duplicated here so that the
+# records can be decoded without importing pyteal.
+SUPPLY_EVENT = 0x01
+WITHDRAW_EVENT = 0x02
+SWAP_EVENT = 0x03
+
+RECORD_FORMAT = ">B5Q"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+
+class SupplyResult:
+    """The outcome of a supply, as logged by the approval program.
+
+    amountA and amountB are the quantities kept by the pool; the rest of the
+    supplied amounts was sent back to the supplier.
+    """
+
+    def __init__(
+        self, amountA: int, amountB: int, poolTokens: int, reserveA: int, reserveB: int
+    ) -> None:
+        self.amountA = amountA
+        self.amountB = amountB
+        self.poolTokens = poolTokens
+        self.reserveA = reserveA
+        self.reserveB = reserveB
+
+    def __repr__(self) -> str:
+        return "SupplyResult(A={}, B={}, poolTokens={}, reserves={}/{})".format(
+            self.amountA, self.amountB, self.poolTokens, self.reserveA, self.reserveB
+        )
+
+
+class WithdrawResult:
+    """The outcome of a withdrawal, as logged by the approval program"""
+
+    def __init__(
+        self, poolTokens: int, amountA: int, amountB: int, reserveA: int, reserveB: int
+    ) -> None:
+        self.poolTokens = poolTokens
+        self.amountA = amountA
+        self.amountB = amountB
+        self.reserveA = reserveA
+        self.reserveB = reserveB
+
+    def __repr__(self) -> str:
+        return "WithdrawResult(poolTokens={} -> A={}, B={}, reserves={}/{})".format(
+            self.poolTokens, self.amountA, self.amountB, self.reserveA, self.reserveB
+        )
+
+
+class SwapResult:
+    """The outcome of a swap, as logged by the approval program"""
+
+    def __init__(
+        self, tokenIn: int, amountIn: int, amountOut: int, reserveA: int, reserveB: int
+    ) -> None:
+        self.tokenIn = tokenIn
+        self.amountIn = amountIn
+        self.amountOut = amountOut
+        self.reserveA = reserveA
+        self.reserveB = reserveB
+
+    def __repr__(self) -> str:
+        return "SwapResult({} of {} -> {}, reserves={}/{})".format(
+            self.amountIn, self.tokenIn, self.amountOut, self.reserveA, self.reserveB
+        )
+
+
+Result = Union[SupplyResult, WithdrawResult, SwapResult]
+
+
+def decodeRecord(log: bytes) -> Result:
+    """Decode a record logged by the approval program.
+
+    Raises:
+        ValueError: if log is not a record.
+    """
+    if len(log) != RECORD_SIZE:
+        raise ValueError("Not an amm record: {!r}".format(log))
+    event, x, y, z, reserveA, reserveB = struct.unpack(RECORD_FORMAT, log)
+    if event == SUPPLY_EVENT:
+        return SupplyResult(x, y, z, reserveA, reserveB)
+    if event == WITHDRAW_EVENT:
+        return WithdrawResult(z, x, y, reserveA, reserveB)
+    if event == SWAP_EVENT:
+        return SwapResult(x, y, z, reserveA, reserveB)
+    raise ValueError("Unknown amm event: {}".format(event))
+
+
+def decodeLogs(logs: List[bytes]) -> List[Result]:
+    """Decode the records in the logs of a transaction, skipping other logs."""
+    results = []
+    for log in logs:
+        try:
+            results.append(decodeRecord(log))
+        except ValueError:
+            continue
+    return results
+
+
+def getResult(response: PendingTxnResponse, resultType: type) -> Result:
+    """Get the result of a confirmed app call from its logs.
+
+    Args:
+        response: The confirmed app call.
+        resultType: SupplyResult, WithdrawResult or SwapResult.
+
+    Returns:
+        The last record of that type the call logged.
+
+    Raises:
+        ValueError: if the call did not log a record of that type, as with
+            an app created before the approval program logged records.
+    """
+    for result in reversed(decodeLogs(response.logs)):
+        if isinstance(result, resultType):
+            return result
+    raise ValueError(
+        "Transaction did not log a {}: {!r}".format(resultType.__name__, response.logs)
+    )
@@ -0,0 +1,254 @@
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import Future
+import os
+
+from algosdk.v2client.algod import AlgodClient
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from .account import Account
+from .confirmation import ConfirmationTracker, GroupSubmitter
+from .operations import buildCreateAmmAppTxn, buildSetupAmmAppTxns, getContracts
+from .programs import TEAL_VERSION
+from .util import MAX_APPS_PER_ACCOUNT, MAX_GROUP_SIZE, PendingTxnResponse
+
+# (tokenA, tokenB, feeBps, minIncrement), the arguments of createAmmApp
+PoolSpec = Tuple[int, int, int, int]
+
+# each setup is a funding payment and an app call
+POOLS_PER_GROUP = MAX_GROUP_SIZE // 2
+
+
+class DeployedPool:
+    """A pool deployed and set up by deployPools"""
+
+    def __init__(
+        self,
+        appID: int,
+        creator: str,
+        poolToken: int,
+        tokenA: int,
+        tokenB: int,
+        feeBps: int,
+        minIncrement: int,
+    ) -> None:
+        self.appID = appID
+        self.address = get_application_address(appID)
+        self.creator = creator
+        self.poolToken = poolToken
+        self.tokenA = tokenA
+        self.tokenB = tokenB
+        self.feeBps = feeBps
+        self.minIncrement = minIncrement
+
+    def __repr__(self) -> str:
+        return (
+            "DeployedPool(app={}, address={}, poolToken={}, {}/{}, fee={}bps)".format(
+                self.appID,
+                self.address,
+                self.poolToken,
+                self.tokenA,
+                self.tokenB,
+                self.feeBps,
+            )
+        )
+
+
+class DeployError(Exception):
+    """Some of the pools of a deployPools call could not be deployed.
+
+    Raised once every pool has been tried, so the pools that were deployed
+    are not lost.
+
+    Attributes:
+        pools: The DeployedPool of each spec, or None where it failed.
+        errors: The error of each failed pool, by its index in specs.
+    """
+
+    def __init__(
+        self, pools: List[Optional[DeployedPool]], errors: Dict[int, Exception]
+    ) -> None:
+        index, first = min(errors.items())
+        super().__init__(
+            "{} of {} pools failed, the first (spec {}) with: {}".format(
+                len(errors), len(pools), index, first
+            )
+        )
+        self.pools = pools
+        self.errors = errors
+
+
+def _poolToken(appID: int, response: PendingTxnResponse) -> int:
+    # the setup call's first inner transaction creates the pool token
+    for inner in response.innerTxns:
+        if inner.get("asset-index"):
+            return inner["asset-index"]
+    raise ValueError("Setup of app {} did not create a pool token".format(appID))
+
+
+def assignCreators(
+    client: AlgodClient, creators: List[Account], count: int
+) -> List[Account]:
+    """Spread count new apps over creators, within MAX_APPS_PER_ACCOUNT each.
+
+    The apps each creator already has are read with one account_info call per
+    creator.
+
+    Returns:
+        The creator of each app, taking the creators in turn.
+
+    Raises:
+        ValueError: if the creators cannot create count more apps.
+    """
+    capacity = [
+        MAX_APPS_PER_ACCOUNT
+        - len(client.account_info(c.getAddress()).get("created-apps", []))
+        for c in creators
+    ]
+    if sum(capacity) < count:
+        raise ValueError(
+            "{} creators can only create {} more apps, {} needed".format(
+                len(creators), sum(capacity), count
+            )
+        )
+
+    assigned: List[Account] = []
+    while len(assigned) < count:
+        for i, creator in enumerate(creators):
+            if capacity[i] > 0 and len(assigned) < count:
+                capacity[i] -= 1
+                assigned.append(creator)
+    return assigned
+
+
+def deployPools(
+    client: AlgodClient,
+    creators: List[Account],
+    specs: List[PoolSpec],
+    version: int = TEAL_VERSION,
+    tracker: Optional[ConfirmationTracker] = None,
+    maxInFlight: int = 64,
+) -> List[DeployedPool]:
+    """Create and set up many amms.
+
+    An account can create at most MAX_APPS_PER_ACCOUNT apps, so the amms are
+    spread over several creators, see assignCreators. Every app is created
+    from the cached programs of getContracts, and the create transactions are
+    all sent before waiting for any of them. The setups of POOLS_PER_GROUP
+    pools are then packed into each atomic group of 16 transactions, so the
+    pools are ready after a few rounds however many there are. The pool
+    tokens are read from the setup confirmations.
+
+    A packed group fails as a whole if any one of its setups fails, so the
+    pools of a failed group are set up again one group each, and only the
+    pools whose own setup fails are reported.
+
+    Args:
+        client: An algod client.
+        creators: The accounts that create and fund the amms.
+        specs: The (tokenA, tokenB, feeBps, minIncrement) of each amm.
+        version (optional): The TEAL version of the amm programs.
+        tracker (optional): A confirmation tracker to wait with. If not
+            given, one is created for the call.
+        maxInFlight (optional): The maximum number of unconfirmed groups.
+
+    Returns:
+        The deployed pools, in the order of specs.
+
+    Raises:
+        ValueError: if the creators cannot create that many apps.
+        DeployError: if some of the pools could not be created or set up.
+    """
+    approval, clear = getContracts(client, version=version)
+    appCreators = assignCreators(client, creators, len(specs))
+
+    with GroupSubmitter(client, maxInFlight, tracker) as submitter:
+        sp = client.suggested_params()
+        createFutures = []
+        for creator, (tokenA, tokenB, feeBps, minIncrement) in zip(appCreators, specs):
+            txn = buildCreateAmmAppTxn(
+                creator.getAddress(),
+                approval,
+                clear,
+                tokenA,
+                tokenB,
+                feeBps,
+                minIncrement,
+                sp,
+            )
+            # pools with the same spec would otherwise have the same txID
+            txn.note = os.urandom(8)
+            (future,) = submitter.submit([txn.sign(creator.getPrivateKey())])
+            createFutures.append(future)
+
+        errors: Dict[int, Exception] = {}
+        appIDs: Dict[int, int] = {}
+        for i, future in enumerate(createFutures):
+            try:
+                appIDs[i] = future.result().applicationIndex
+            except Exception as e:
+                errors[i] = e
+
+        sp = client.suggested_params()
+        setups = {
+            i: buildSetupAmmAppTxns(
+                appCreators[i].getAddress(), appID, specs[i][0], specs[i][1], sp
+            )
+            for i, appID in appIDs.items()
+        }
+
+        def submitSetups(indexes: List[int]) -> List[Future]:
+            txns = [txn for i in indexes for txn in setups[i]]
+            # regrouped with the setups of the other pools
+            for txn in txns:
+                txn.group = None
+            transaction.assign_group_id(txns)
+            futures = submitter.submit(
+                [
+                    txn.sign(appCreators[i].getPrivateKey())
+                    for i in indexes
+                    for txn in setups[i]
+                ],
+                trackAll=True,
+            )
+            # each pool's app call follows its funding payment
+            return futures[1::2]
+
+        created = sorted(setups)
+        batches = [
+            created[i : i + POOLS_PER_GROUP]
+            for i in range(0, len(created), POOLS_PER_GROUP)
+        ]
+        batchFutures = [submitSetups(batch) for batch in batches]
+
+        setupFutures: Dict[int, Future] = {}
+        for batch, futures in zip(batches, batchFutures):
+            if len(batch) > 1 and futures[0].exception() is not None:
+                futures = [submitSetups([i])[0] for i in batch]
+            setupFutures.update(zip(batch, futures))
+
+        pools: List[Optional[DeployedPool]] = [None] * len(specs)
+        for i, future in setupFutures.items():
+            try:
+                pools[i] = DeployedPool(
+                    appIDs[i],
+                    appCreators[i].getAddress(),
+                    _poolToken(appIDs[i], future.result()),
+                    *specs[i],
+                )
+            except Exception as e:
+                errors[i] = e
+
+        if errors:
+            raise DeployError(pools, errors)
+        return pools
+
+
+def formatPools(pools: List[DeployedPool]) -> str:
+    """Format deployed pools as a table of app ID, app address and pool token."""
+    lines = ["{:>12}  {:58}  {:>12}".format("app", "address", "pool token")]
+    for pool in pools:
+        lines.append(
+            "{:>12}  {:58}  {:>12}".format(pool.appID, pool.address, pool.poolToken)
+        )
+    return "\n".join(lines)
@@ -1,15 +1,20 @@
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple, Union
+from copy import copy
 
 from algosdk.v2client.algod import AlgodClient
 from algosdk.future import transaction
 from algosdk.logic import get_application_address
-from algosdk import encoding
+from algosdk import encoding, constants
 
 from .account import Account
-from amm.contracts.contracts import approval_program, clear_state_program
+from .cache import PoolStateCache
+from .confirmation import ConfirmationTracker
+from .events import SupplyResult, SwapResult, WithdrawResult, getResult
+from .programs import TEAL_VERSION, ProgramCache, compileContracts
+from .simulator import PoolSimulator
 from .util import (
+    PendingTxnResponse,
     waitForTransaction,
-    fullyCompileContract,
     getAppGlobalState,
     getBalances,
 )
@@ -24,12 +29,53 @@ MIN_BALANCE_REQUIREMENT = (
     + 100_000 * 3
 )
 
+# The contract sets the fee of its inner transactions to 0, and the app call
+# that triggers them pays for them through fee pooling. These are the most
+# inner transactions each call submits.
+INNER_TXNS = {
+    # create the pool token and opt into tokens A and B
+    "setup": 3,
+    # refund one token and send pool tokens
+    "supply": 2,
+    # send tokens A and B
+    "withdraw": 2,
+    # send the other token
+    "swap": 1,
+}
+
+
+def poolInnerFees(
+    txn: transaction.Transaction, sp: transaction.SuggestedParams, innerTxns: int
+) -> None:
+    """Raise the fee of an app call to also pay for its inner transactions.
+
+    With a flat fee, each inner transaction costs the same as the app call;
+    otherwise each costs the minimum fee.
+    """
+    if sp.flat_fee:
+        innerFee = sp.fee
+    else:
+        innerFee = max(constants.min_txn_fee, sp.min_fee or 0)
+    txn.fee += innerTxns * innerFee
 
-def getContracts(client: AlgodClient) -> Tuple[bytes, bytes]:
+
+def getContracts(
+    client: AlgodClient,
+    programCache: Optional[ProgramCache] = None,
+    version: int = TEAL_VERSION,
+) -> Tuple[bytes, bytes]:
     """Get the compiled TEAL contracts for the amm.
 
-    Args:q
+    Programs are loaded from the on-disk program cache when the contract
+    sources have not changed, so most processes never run pyteal or call algod
+    to compile them.
+
+    Args:
         client: An algod client that has the ability to compile TEAL programs.
+        programCache (optional): The program cache to use. See
+            amm.programs.compileContracts.
+        version (optional): The TEAL version of the programs, one of
+            amm.programs.TEAL_VERSIONS.
 
     Returns:
         A tuple of 2 byte strings. The first is the approval program, and the
@@ -38,13 +84,82 @@ def getContracts(client: AlgodClient) -> Tuple[bytes, bytes]:
     global APPROVAL_PROGRAM
     global CLEAR_STATE_PROGRAM
 
+    if version != TEAL_VERSION:
+        return compileContracts(client, programCache, version)
+
     if len(APPROVAL_PROGRAM) == 0:
-        APPROVAL_PROGRAM = fullyCompileContract(client, approval_program())
-        CLEAR_STATE_PROGRAM = fullyCompileContract(client, clear_state_program())
+        APPROVAL_PROGRAM, CLEAR_STATE_PROGRAM = compileContracts(client, programCache)
 
     return APPROVAL_PROGRAM, CLEAR_STATE_PROGRAM
 
 
+def buildCreateAmmAppTxn(
+    creator: str,
+    approval: bytes,
+    clear: bytes,
+    tokenA: int,
+    tokenB: int,
+    feeBps: int,
+    minIncrement: int,
+    sp: transaction.SuggestedParams,
+) -> transaction.ApplicationCreateTxn:
+    """Build the unsigned transaction that creates a new amm. See createAmmApp."""
+    # tokenA, tokenB, poolToken, fee, minIncrement, poolTokensOutstanding,
+    # reserveA, reserveB, lastUpdateRound, the high and low words of the two
+    # price accumulators and their timestamp
+    globalSchema = transaction.StateSchema(num_uints=14, num_byte_slices=1)
+    localSchema = transaction.StateSchema(num_uints=0, num_byte_slices=0)
+
+    app_args = [
+        encoding.decode_address(creator),
+        tokenA.to_bytes(8, "big"),
+        tokenB.to_bytes(8, "big"),
+        feeBps.to_bytes(8, "big"),
+        minIncrement.to_bytes(8, "big"),
+    ]
+
+    return transaction.ApplicationCreateTxn(
+        sender=creator,
+        on_complete=transaction.OnComplete.NoOpOC,
+        approval_program=approval,
+        clear_program=clear,
+        global_schema=globalSchema,
+        local_schema=localSchema,
+        app_args=app_args,
+        sp=sp,
+    )
+
+
+def buildSetupAmmAppTxns(
+    funder: str,
+    appID: int,
+    tokenA: int,
+    tokenB: int,
+    sp: transaction.SuggestedParams,
+) -> List[transaction.Transaction]:
+    """Build the unsigned, grouped transactions that set up an amm. See setupAmmApp."""
+    appAddr = get_application_address(appID)
+
+    fundAppTxn = transaction.PaymentTxn(
+        sender=funder,
+        receiver=appAddr,
+        amt=MIN_BALANCE_REQUIREMENT,
+        sp=sp,
+    )
+
+    setupTxn = transaction.ApplicationCallTxn(
+        sender=funder,
+        index=appID,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"setup"],
+        foreign_assets=[tokenA, tokenB],
+        sp=sp,
+    )
+    poolInnerFees(setupTxn, sp, INNER_TXNS["setup"])
+
+    return transaction.assign_group_id([fundAppTxn, setupTxn])
+
+
 def createAmmApp(
     client: AlgodClient,
     creator: Account,
@@ -52,6 +167,7 @@ def createAmmApp(
     tokenB: int,
     feeBps: int,
     minIncrement: int,
+    version: int = TEAL_VERSION,
 ) -> int:
     """Create a new amm.
 
@@ -61,33 +177,24 @@ def createAmmApp(
         tokenA: The id of token A in the liquidity pool,
         tokenB: The id of token B in the liquidity pool,
         feeBps: The basis point fee to be charged per swap
+        version (optional): The TEAL version of the amm programs. From
+            version 6, supply and withdraw send their inner transactions as
+            one inner group, which costs less.
 
     Returns:
         The ID of the newly created amm app.
     """
-    approval, clear = getContracts(client)
-
-    # tokenA, tokenB, poolToken, fee
-    globalSchema = transaction.StateSchema(num_uints=7, num_byte_slices=1)
-    localSchema = transaction.StateSchema(num_uints=0, num_byte_slices=0)
-
-    app_args = [
-        encoding.decode_address(creator.getAddress()),
-        tokenA.to_bytes(8, "big"),
-        tokenB.to_bytes(8, "big"),
-        feeBps.to_bytes(8, "big"),
-        minIncrement.to_bytes(8, "big"),
-    ]
-
-    txn = transaction.ApplicationCreateTxn(
-        sender=creator.getAddress(),
-        on_complete=transaction.OnComplete.NoOpOC,
-        approval_program=approval,
-        clear_program=clear,
-        global_schema=globalSchema,
-        local_schema=localSchema,
-        app_args=app_args,
-        sp=client.suggested_params(),
+    approval, clear = getContracts(client, version=version)
+
+    txn = buildCreateAmmAppTxn(
+        creator.getAddress(),
+        approval,
+        clear,
+        tokenA,
+        tokenB,
+        feeBps,
+        minIncrement,
+        client.suggested_params(),
     )
 
     signedTxn = txn.sign(creator.getPrivateKey())
@@ -119,34 +226,10 @@ def setupAmmApp(
         tokenB: Token B id.
     Return: pool token id
     """
-    appAddr = get_application_address(appID)
-
-    suggestedParams = client.suggested_params()
-
-    fundingAmount = (
-        MIN_BALANCE_REQUIREMENT
-        # additional balance to create pool token and opt into tokens A and B
-        + 1_000 * 3
+    fundAppTxn, setupTxn = buildSetupAmmAppTxns(
+        funder.getAddress(), appID, tokenA, tokenB, client.suggested_params()
     )
 
-    fundAppTxn = transaction.PaymentTxn(
-        sender=funder.getAddress(),
-        receiver=appAddr,
-        amt=fundingAmount,
-        sp=suggestedParams,
-    )
-
-    setupTxn = transaction.ApplicationCallTxn(
-        sender=funder.getAddress(),
-        index=appID,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"setup"],
-        foreign_assets=[tokenA, tokenB],
-        sp=suggestedParams,
-    )
-
-    transaction.assign_group_id([fundAppTxn, setupTxn])
-
     signedFundAppTxn = fundAppTxn.sign(funder.getPrivateKey())
     signedSetupTxn = setupTxn.sign(funder.getPrivateKey())
 
@@ -160,10 +243,13 @@ def setupAmmApp(
     return poolToken
 
 
-def optInToPoolToken(client: AlgodClient, appID: int, account: Account):
-    assertSetup(client, appID)
-    appGlobalState = getAppGlobalState(client, appID)
-    suggestedParams = client.suggested_params()
+def optInToPoolToken(
+    client: AlgodClient,
+    appID: int,
+    account: Account,
+    cache: Optional[PoolStateCache] = None,
+):
+    appGlobalState, suggestedParams = getPoolState(client, appID, cache)
     poolToken = getPoolTokenId(appGlobalState)
 
     optInTxn = transaction.AssetOptInTxn(
@@ -177,8 +263,13 @@ def optInToPoolToken(client: AlgodClient, appID: int, account: Account):
 
 
 def supply(
-    client: AlgodClient, appID: int, qA: int, qB: int, supplier: Account
-) -> None:
+    client: AlgodClient,
+    appID: int,
+    qA: int,
+    qB: int,
+    supplier: Account,
+    cache: Optional[PoolStateCache] = None,
+) -> SupplyResult:
     """Supply liquidity to the pool.
     Let rA, rB denote the existing pool reserves of token A and token B respectively
 
@@ -195,63 +286,24 @@ def supply(
         qA: amount of token A to supply the pool
         qB: amount of token B to supply to the pool
         supplier: supplier account
-    """
-    assertSetup(client, appID)
-    appAddr = get_application_address(appID)
-    appGlobalState = getAppGlobalState(client, appID)
-    suggestedParams = client.suggested_params()
-
-    tokenA = appGlobalState[b"token_a_key"]
-    tokenB = appGlobalState[b"token_b_key"]
-    poolToken = getPoolTokenId(appGlobalState)
-
-    # pay for the fee incurred by AMM for sending back the pool token
-    feeTxn = transaction.PaymentTxn(
-        sender=supplier.getAddress(),
-        receiver=appAddr,
-        amt=2_000,
-        sp=suggestedParams,
-    )
+        cache (optional): a round-scoped cache to read pool state from
 
-    tokenATxn = transaction.AssetTransferTxn(
-        sender=supplier.getAddress(),
-        receiver=appAddr,
-        index=tokenA,
-        amt=qA,
-        sp=suggestedParams,
-    )
-    tokenBTxn = transaction.AssetTransferTxn(
-        sender=supplier.getAddress(),
-        receiver=appAddr,
-        index=tokenB,
-        amt=qB,
-        sp=suggestedParams,
-    )
-
-    appCallTxn = transaction.ApplicationCallTxn(
-        sender=supplier.getAddress(),
-        index=appID,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"supply"],
-        foreign_assets=[tokenA, tokenB, poolToken],
-        sp=suggestedParams,
-    )
-
-    transaction.assign_group_id([feeTxn, tokenATxn, tokenBTxn, appCallTxn])
-    signedFeeTxn = feeTxn.sign(supplier.getPrivateKey())
-    signedTokenATxn = tokenATxn.sign(supplier.getPrivateKey())
-    signedTokenBTxn = tokenBTxn.sign(supplier.getPrivateKey())
-    signedAppCallTxn = appCallTxn.sign(supplier.getPrivateKey())
-
-    client.send_transactions(
-        [signedFeeTxn, signedTokenATxn, signedTokenBTxn, signedAppCallTxn]
-    )
-    waitForTransaction(client, signedAppCallTxn.get_txid())
+    Returns:
+        The amounts the pool kept, the pool tokens minted and the new reserves,
+        as logged by the app.
+    """
+    appGlobalState, suggestedParams = getPoolState(client, appID, cache)
+    pool = AmmPool(client, appID, appGlobalState=appGlobalState)
+    return pool.supply(supplier, qA, qB, suggestedParams)
 
 
 def withdraw(
-    client: AlgodClient, appID: int, poolTokenAmount: int, withdrawAccount: Account
-) -> None:
+    client: AlgodClient,
+    appID: int,
+    poolTokenAmount: int,
+    withdrawAccount: Account,
+    cache: Optional[PoolStateCache] = None,
+) -> WithdrawResult:
     """Withdraw liquidity  + rewards from the pool back to supplier.
     Supplier should receive tokenA, tokenB + fees proportional to the liquidity share in the pool they choose to withdraw.
 
@@ -260,94 +312,35 @@ def withdraw(
         appID: amm app id,
         poolTokenAmount: pool token quantity,
         withdrawAccount: supplier account,
-    """
-    assertSetup(client, appID)
-    appAddr = get_application_address(appID)
-    appGlobalState = getAppGlobalState(client, appID)
-    suggestedParams = client.suggested_params()
-
-    # pay for the fee incurred by AMM for sending back tokens A and B
-    feeTxn = transaction.PaymentTxn(
-        sender=withdrawAccount.getAddress(),
-        receiver=appAddr,
-        amt=2_000,
-        sp=suggestedParams,
-    )
-
-    tokenA = appGlobalState[b"token_a_key"]
-    tokenB = appGlobalState[b"token_b_key"]
-    poolToken = getPoolTokenId(appGlobalState)
+        cache (optional): a round-scoped cache to read pool state from
 
-    poolTokenTxn = transaction.AssetTransferTxn(
-        sender=withdrawAccount.getAddress(),
-        receiver=appAddr,
-        index=poolToken,
-        amt=poolTokenAmount,
-        sp=suggestedParams,
-    )
-
-    appCallTxn = transaction.ApplicationCallTxn(
-        sender=withdrawAccount.getAddress(),
-        index=appID,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"withdraw"],
-        foreign_assets=[tokenA, tokenB, poolToken],
-        sp=suggestedParams,
-    )
-
-    transaction.assign_group_id([feeTxn, poolTokenTxn, appCallTxn])
-    signedFeeTxn = feeTxn.sign(withdrawAccount.getPrivateKey())
-    signedPoolTokenTxn = poolTokenTxn.sign(withdrawAccount.getPrivateKey())
-    signedAppCallTxn = appCallTxn.sign(withdrawAccount.getPrivateKey())
-
-    client.send_transactions([signedFeeTxn, signedPoolTokenTxn, signedAppCallTxn])
-    waitForTransaction(client, signedAppCallTxn.get_txid())
+    Returns:
+        The amounts sent to the supplier and the new reserves, as logged by the
+        app.
+    """
+    appGlobalState, suggestedParams = getPoolState(client, appID, cache)
+    pool = AmmPool(client, appID, appGlobalState=appGlobalState)
+    return pool.withdraw(withdrawAccount, poolTokenAmount, suggestedParams)
 
 
-def swap(client: AlgodClient, appID: int, tokenId: int, amount: int, trader: Account):
+def swap(
+    client: AlgodClient,
+    appID: int,
+    tokenId: int,
+    amount: int,
+    trader: Account,
+    cache: Optional[PoolStateCache] = None,
+) -> SwapResult:
     """Swap tokenId token for the other token in the pool
     This action can only happen if there is liquidity in the pool
     A fee (in bps, configured on app creation) is taken out of the input amount before calculating the output amount
-    """
-    assertSetup(client, appID)
-    appAddr = get_application_address(appID)
-    appGlobalState = getAppGlobalState(client, appID)
-    suggestedParams = client.suggested_params()
-
-    feeTxn = transaction.PaymentTxn(
-        sender=trader.getAddress(),
-        receiver=appAddr,
-        amt=1000,
-        sp=suggestedParams,
-    )
 
-    tokenA = appGlobalState[b"token_a_key"]
-    tokenB = appGlobalState[b"token_b_key"]
-
-    tradeTxn = transaction.AssetTransferTxn(
-        sender=trader.getAddress(),
-        receiver=appAddr,
-        index=tokenId,
-        amt=amount,
-        sp=suggestedParams,
-    )
-
-    appCallTxn = transaction.ApplicationCallTxn(
-        sender=trader.getAddress(),
-        index=appID,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"swap"],
-        foreign_assets=[tokenA, tokenB],
-        sp=suggestedParams,
-    )
-
-    transaction.assign_group_id([feeTxn, tradeTxn, appCallTxn])
-    signedFeeTxn = feeTxn.sign(trader.getPrivateKey())
-    signedTradeTxn = tradeTxn.sign(trader.getPrivateKey())
-    signedAppCallTxn = appCallTxn.sign(trader.getPrivateKey())
-
-    client.send_transactions([signedFeeTxn, signedTradeTxn, signedAppCallTxn])
-    waitForTransaction(client, signedAppCallTxn.get_txid())
+    If a round-scoped cache is given, pool state is read from it.
+    The amount received and the new reserves, as logged by the app, are returned.
+    """
+    appGlobalState, suggestedParams = getPoolState(client, appID, cache)
+    pool = AmmPool(client, appID, appGlobalState=appGlobalState)
+    return pool.swap(trader, tokenId, amount, suggestedParams)
 
 
 def closeAmm(client: AlgodClient, appID: int, closer: Account):
@@ -382,8 +375,386 @@ def getPoolTokenId(appGlobalState):
         )
 
 
-def assertSetup(client: AlgodClient, appID: int) -> None:
-    balances = getBalances(client, get_application_address(appID))
+class PoolState:
+    """A pool as seen from its global state.
+
+    The contract mirrors its reserves of tokens A and B in global state on
+    every setup, supply, withdraw and swap, so the whole pool is read with a
+    single application_info call. Tokens sent to the app account outside of
+    those calls are not counted until the next one.
+    """
+
+    def __init__(
+        self,
+        appID: int,
+        tokenA: int,
+        tokenB: int,
+        feeBps: int,
+        minIncrement: int,
+        poolToken: Optional[int] = None,
+        poolTokensOutstanding: int = 0,
+        reserveA: int = 0,
+        reserveB: int = 0,
+        lastUpdateRound: Optional[int] = None,
+    ) -> None:
+        self.appID = appID
+        self.tokenA = tokenA
+        self.tokenB = tokenB
+        self.feeBps = feeBps
+        self.minIncrement = minIncrement
+        self.poolToken = poolToken
+        self.poolTokensOutstanding = poolTokensOutstanding
+        self.reserveA = reserveA
+        self.reserveB = reserveB
+        self.lastUpdateRound = lastUpdateRound
+
+    @classmethod
+    def fromGlobalState(
+        cls, appID: int, appGlobalState: Dict[bytes, Union[int, bytes]]
+    ) -> "PoolState":
+        """Decode the global state of an amm.
+
+        Raises:
+            ValueError: if the amm is set up but does not mirror its reserves,
+                i.e. it was created from an older version of the contract.
+        """
+        poolToken = appGlobalState.get(b"pool_token_key")
+        if poolToken is not None and b"reserve_a_key" not in appGlobalState:
+            raise ValueError(
+                "App {} does not keep its reserves in global state".format(appID)
+            )
+        return cls(
+            appID=appID,
+            tokenA=appGlobalState[b"token_a_key"],
+            tokenB=appGlobalState[b"token_b_key"],
+            feeBps=appGlobalState[b"fee_bps_key"],
+            minIncrement=appGlobalState[b"min_increment_key"],
+            poolToken=poolToken,
+            poolTokensOutstanding=appGlobalState.get(b"pool_tokens_outstanding_key", 0),
+            reserveA=appGlobalState.get(b"reserve_a_key", 0),
+            reserveB=appGlobalState.get(b"reserve_b_key", 0),
+            lastUpdateRound=appGlobalState.get(b"last_update_round_key"),
+        )
+
+    @property
+    def isSetUp(self) -> bool:
+        return self.poolToken is not None
+
+    def simulator(self) -> PoolSimulator:
+        """Get a simulator of the pool in this state."""
+        return PoolSimulator(
+            tokenA=self.tokenA,
+            tokenB=self.tokenB,
+            feeBps=self.feeBps,
+            minIncrement=self.minIncrement,
+            poolToken=self.poolToken,
+            reserveA=self.reserveA,
+            reserveB=self.reserveB,
+            poolTokensOutstanding=self.poolTokensOutstanding,
+        )
+
+    def __repr__(self) -> str:
+        return "PoolState(appID={}, A={} of {}, B={} of {}, round={})".format(
+            self.appID,
+            self.reserveA,
+            self.tokenA,
+            self.reserveB,
+            self.tokenB,
+            self.lastUpdateRound,
+        )
+
+
+def readPoolState(
+    client: AlgodClient, appID: int, cache: Optional[PoolStateCache] = None
+) -> PoolState:
+    """Read the state and reserves of an amm with one application_info call.
+
+    Args:
+        client: An algod client.
+        appID: The app ID of the amm.
+        cache (optional): A round-scoped cache to read the global state from.
+
+    Returns:
+        The state of the pool. See PoolState.
+    """
+    if cache is None:
+        appGlobalState = getAppGlobalState(client, appID)
+    else:
+        cache.refresh()
+        appGlobalState = cache.getAppGlobalState(appID)
+    return PoolState.fromGlobalState(appID, appGlobalState)
+
+
+def getPoolState(
+    client: AlgodClient, appID: int, cache: Optional[PoolStateCache] = None
+) -> Tuple[Dict[bytes, Union[int, bytes]], transaction.SuggestedParams]:
+    """Check that the amm is set up and read what is needed to build a group.
+
+    Without a cache this costs three RPCs. With a cache, it costs one status()
+    call when the values for the current round are already cached.
+
+    Returns:
+        A tuple of the app global state and the suggested params.
+    """
+    if cache is None:
+        assertSetup(client, appID)
+        return getAppGlobalState(client, appID), client.suggested_params()
+
+    cache.refresh()
+    assertSetup(client, appID, cache)
+    return cache.getAppGlobalState(appID), cache.suggestedParams()
+
+
+def assertSetup(
+    client: AlgodClient, appID: int, cache: Optional[PoolStateCache] = None
+) -> None:
+    if cache is None:
+        balances = getBalances(client, get_application_address(appID))
+    else:
+        balances = cache.getAppBalances(appID)
     assert (
         balances[0] >= MIN_BALANCE_REQUIREMENT
     ), "AMM must be set up and funded first. AMM balances: " + str(balances)
+
+
+class PoolTxnBuilder:
+    """Builds the transaction groups of a set up amm, without a client.
+
+    Transactions for each sender are copied from templates built on first use,
+    so only amounts and suggested params are filled in per group. The build*
+    methods return unsigned groups with a group ID assigned.
+    """
+
+    def __init__(
+        self, appID: int, appGlobalState: Dict[bytes, Union[int, bytes]]
+    ) -> None:
+        """Create a builder for an amm.
+
+        Args:
+            appID: The app ID of the amm.
+            appGlobalState: The app global state of the set up amm.
+        """
+        self.appID = appID
+        self.appAddr = get_application_address(appID)
+        self.tokenA = appGlobalState[b"token_a_key"]
+        self.tokenB = appGlobalState[b"token_b_key"]
+        self.poolToken = getPoolTokenId(appGlobalState)
+        self.feeBps = appGlobalState[b"fee_bps_key"]
+        self.minIncrement = appGlobalState[b"min_increment_key"]
+
+        self._templates: Dict[Tuple[str, str, int], List[transaction.Transaction]] = {}
+
+    def _template(self, sender: str, method: str, tokenId: int = 0):
+        key = (sender, method, tokenId)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._buildTemplate(sender, method, tokenId)
+            self._templates[key] = template
+        return template
+
+    def _buildTemplate(
+        self, sender: str, method: str, tokenId: int
+    ) -> List[transaction.Transaction]:
+        # placeholder params; real params are filled in by _fill
+        sp = transaction.SuggestedParams(0, 1, 2, "", flat_fee=True)
+
+        if method == "swap":
+            transfers = [tokenId]
+            foreignAssets = [self.tokenA, self.tokenB]
+        elif method == "supply":
+            transfers = [self.tokenA, self.tokenB]
+            foreignAssets = [self.tokenA, self.tokenB, self.poolToken]
+        elif method == "withdraw":
+            transfers = [self.poolToken]
+            foreignAssets = [self.tokenA, self.tokenB, self.poolToken]
+        else:
+            raise ValueError("Unknown method: {}".format(method))
+
+        transferTxns = [
+            transaction.AssetTransferTxn(
+                sender=sender, receiver=self.appAddr, index=token, amt=0, sp=sp
+            )
+            for token in transfers
+        ]
+        appCallTxn = transaction.ApplicationCallTxn(
+            sender=sender,
+            index=self.appID,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[method.encode()],
+            foreign_assets=foreignAssets,
+            sp=sp,
+        )
+
+        return transferTxns + [appCallTxn]
+
+    @staticmethod
+    def _fill(
+        template: transaction.Transaction, sp: transaction.SuggestedParams
+    ) -> transaction.Transaction:
+        txn = copy(template)
+        txn.first_valid_round = sp.first
+        txn.last_valid_round = sp.last
+        txn.genesis_id = sp.gen
+        txn.genesis_hash = sp.gh
+        txn.group = None
+
+        # same fee as the transaction constructors compute
+        txn.fee = sp.fee
+        if not sp.flat_fee:
+            if sp.fee == 0:
+                txn.fee = constants.min_txn_fee
+            else:
+                txn.fee = max(txn.estimate_size() * sp.fee, constants.min_txn_fee)
+
+        return txn
+
+    def _build(
+        self,
+        sender: str,
+        method: str,
+        amounts: List[int],
+        sp: transaction.SuggestedParams,
+        tokenId: int = 0,
+    ) -> List[transaction.Transaction]:
+        template = self._template(sender, method, tokenId)
+        txns: List[transaction.Transaction] = [None] * len(template)  # type: ignore
+
+        # amounts go on the asset transfers, which come before the app call
+        for i, amount in enumerate(amounts):
+            if not isinstance(amount, int) or amount < 0:
+                raise ValueError("Amount must be a non-negative int: {}".format(amount))
+            txn = copy(template[i])
+            txn.amount = amount
+            txns[i] = self._fill(txn, sp)
+
+        txns[-1] = self._fill(template[-1], sp)
+        poolInnerFees(txns[-1], sp, INNER_TXNS[method])
+
+        transaction.assign_group_id(txns)
+        return txns
+
+    def buildSupply(
+        self, supplier: str, qA: int, qB: int, sp: transaction.SuggestedParams
+    ) -> List[transaction.Transaction]:
+        return self._build(supplier, "supply", [qA, qB], sp)
+
+    def buildWithdraw(
+        self, withdrawer: str, poolTokenAmount: int, sp: transaction.SuggestedParams
+    ) -> List[transaction.Transaction]:
+        return self._build(withdrawer, "withdraw", [poolTokenAmount], sp)
+
+    def buildSwap(
+        self,
+        trader: str,
+        tokenId: int,
+        amount: int,
+        sp: transaction.SuggestedParams,
+    ) -> List[transaction.Transaction]:
+        return self._build(trader, "swap", [amount], sp, tokenId)
+
+
+class AmmPool(PoolTxnBuilder):
+    """A handle to a set up amm.
+
+    The pool verifies that the amm is set up once, and builds its groups with
+    PoolTxnBuilder. The supply, withdraw and swap methods also sign and submit
+    the group and wait for it to be confirmed.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        appID: int,
+        cache: Optional[PoolStateCache] = None,
+        appGlobalState: Optional[Dict[bytes, Union[int, bytes]]] = None,
+        tracker: Optional[ConfirmationTracker] = None,
+    ) -> None:
+        """Create a pool handle.
+
+        Args:
+            client: An algod client.
+            appID: The app ID of the amm.
+            cache (optional): A round-scoped cache used to read pool state and
+                suggested params.
+            appGlobalState (optional): The app global state, if the caller has
+                already checked that the amm is set up.
+            tracker (optional): A confirmation tracker used to wait for submitted
+                groups, so that groups sent from many threads share one polling
+                loop.
+        """
+        if appGlobalState is None:
+            if cache is None:
+                assertSetup(client, appID)
+                appGlobalState = getAppGlobalState(client, appID)
+            else:
+                assertSetup(client, appID, cache)
+                appGlobalState = cache.getAppGlobalState(appID)
+
+        super().__init__(appID, appGlobalState)
+        self.client = client
+        self.cache = cache
+        self.tracker = tracker
+
+    def state(self) -> PoolState:
+        """Read the current state and reserves of the pool. See readPoolState."""
+        return readPoolState(self.client, self.appID, self.cache)
+
+    def suggestedParams(self) -> transaction.SuggestedParams:
+        if self.cache is None:
+            return self.client.suggested_params()
+        self.cache.refresh()
+        return self.cache.suggestedParams()
+
+    def send(self, txns: List[transaction.Transaction], signer: Account) -> str:
+        """Sign and submit a group built by this pool.
+
+        Returns:
+            The ID of the app call transaction, which is the last in the group.
+        """
+        signedTxns = [txn.sign(signer.getPrivateKey()) for txn in txns]
+        self.client.send_transactions(signedTxns)
+        return signedTxns[-1].get_txid()
+
+    def wait(self, txID: str) -> PendingTxnResponse:
+        """Wait for a transaction sent by this pool to be confirmed."""
+        if self.tracker is None:
+            return waitForTransaction(self.client, txID)
+        return self.tracker.track(txID).result()
+
+    def supply(
+        self,
+        supplier: Account,
+        qA: int,
+        qB: int,
+        sp: Optional[transaction.SuggestedParams] = None,
+    ) -> SupplyResult:
+        """Supply liquidity to the pool. See supply for details."""
+        txns = self.buildSupply(
+            supplier.getAddress(), qA, qB, sp or self.suggestedParams()
+        )
+        return getResult(self.wait(self.send(txns, supplier)), SupplyResult)
+
+    def withdraw(
+        self,
+        withdrawAccount: Account,
+        poolTokenAmount: int,
+        sp: Optional[transaction.SuggestedParams] = None,
+    ) -> WithdrawResult:
+        """Withdraw liquidity from the pool. See withdraw for details."""
+        txns = self.buildWithdraw(
+            withdrawAccount.getAddress(), poolTokenAmount, sp or self.suggestedParams()
+        )
+        return getResult(self.wait(self.send(txns, withdrawAccount)), WithdrawResult)
+
+    def swap(
+        self,
+        trader: Account,
+        tokenId: int,
+        amount: int,
+        sp: Optional[transaction.SuggestedParams] = None,
+    ) -> SwapResult:
+        """Swap tokenId token for the other token in the pool. See swap for details."""
+        txns = self.buildSwap(
+            trader.getAddress(), tokenId, amount, sp or self.suggestedParams()
+        )
+        return getResult(self.wait(self.send(txns, trader)), SwapResult)
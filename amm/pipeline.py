@@ -0,0 +1,158 @@
+from typing import Any, List, Optional
+from concurrent.futures import Future
+from threading import Lock
+
+from algosdk.future import transaction
+
+from .account import Account
+from .confirmation import ConfirmationTracker, GroupSubmitter
+from .events import SupplyResult, SwapResult, WithdrawResult, getResult
+from .operations import AmmPool
+
+
+def _mapResult(future: Future, resultType: type) -> Future:
+    """Get a future for the record of resultType logged by a confirmed call."""
+    mapped: Future = Future()
+
+    def done(future: Future) -> None:
+        if future.cancelled():
+            mapped.cancel()
+            return
+        try:
+            mapped.set_result(getResult(future.result(), resultType))
+        except BaseException as e:
+            mapped.set_exception(e)
+
+    future.add_done_callback(done)
+    return mapped
+
+
+class Pipeline:
+    """Submits groups to an amm without waiting for each to be confirmed.
+
+    Each operation signs and submits its group and returns a future right
+    away. The future resolves to the same result the AmmPool method returns,
+    decoded from the logs of the app call. At most maxInFlight groups are
+    unconfirmed at once: once the window is full, the next operation blocks
+    until an earlier group is confirmed or fails. Groups from independent
+    accounts can then share a block instead of going in one per round.
+
+    Suggested params are fetched at most once per round. Groups are sent by a
+    GroupSubmitter, so submitting a group that is already in flight raises
+    ValueError.
+    """
+
+    def __init__(
+        self,
+        pool: AmmPool,
+        maxInFlight: int = 64,
+        tracker: Optional[ConfirmationTracker] = None,
+    ) -> None:
+        """Create a pipeline.
+
+        Args:
+            pool: The amm to submit groups to.
+            maxInFlight (optional): The maximum number of unconfirmed groups.
+            tracker (optional): A confirmation tracker to share with other
+                pipelines. If not given, the pipeline creates one and closes it
+                in close().
+        """
+        self.pool = pool
+        self.maxInFlight = maxInFlight
+        self.submitter = GroupSubmitter(pool.client, maxInFlight, tracker)
+        self.tracker = self.submitter.tracker
+
+        self._lock = Lock()
+        self._futures: List[Future] = []
+        self._suggestedParams: Optional[transaction.SuggestedParams] = None
+
+    def __enter__(self) -> "Pipeline":
+        return self
+
+    def __exit__(self, *args) -> None:
+        try:
+            self.drain()
+        finally:
+            self.close()
+
+    def suggestedParams(self) -> transaction.SuggestedParams:
+        sp = self._suggestedParams
+        lastRound = self.tracker.lastRound
+        if sp is None or (lastRound is not None and lastRound > sp.first):
+            sp = self.pool.suggestedParams()
+            self._suggestedParams = sp
+        return sp
+
+    def submit(
+        self,
+        txns: List[transaction.Transaction],
+        signer: Account,
+        resultType: Optional[type] = None,
+    ) -> Future:
+        """Sign and submit a group built by the pool.
+
+        Blocks while maxInFlight groups are unconfirmed.
+
+        Args:
+            txns: The group.
+            signer: The sender of the group.
+            resultType (optional): SupplyResult, WithdrawResult or SwapResult.
+
+        Returns:
+            A future for the record of resultType logged by the last
+            transaction in the group, see amm.events.getResult, or for its
+            PendingTxnResponse if resultType is not given.
+        """
+        signedTxns = [txn.sign(signer.getPrivateKey()) for txn in txns]
+        (future,) = self.submitter.submit(signedTxns)
+        if resultType is not None:
+            future = _mapResult(future, resultType)
+
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def supply(self, supplier: Account, qA: int, qB: int) -> Future:
+        """Submit a supply group. See AmmPool.supply."""
+        txns = self.pool.buildSupply(
+            supplier.getAddress(), qA, qB, self.suggestedParams()
+        )
+        return self.submit(txns, supplier, SupplyResult)
+
+    def withdraw(self, withdrawAccount: Account, poolTokenAmount: int) -> Future:
+        """Submit a withdraw group. See AmmPool.withdraw."""
+        txns = self.pool.buildWithdraw(
+            withdrawAccount.getAddress(), poolTokenAmount, self.suggestedParams()
+        )
+        return self.submit(txns, withdrawAccount, WithdrawResult)
+
+    def swap(self, trader: Account, tokenId: int, amount: int) -> Future:
+        """Submit a swap group. See AmmPool.swap."""
+        txns = self.pool.buildSwap(
+            trader.getAddress(), tokenId, amount, self.suggestedParams()
+        )
+        return self.submit(txns, trader, SwapResult)
+
+    def inFlight(self) -> int:
+        """Get the number of submitted groups that have not been resolved."""
+        return self.submitter.inFlight()
+
+    def drain(self) -> List[Any]:
+        """Wait for every group submitted so far and collect the results.
+
+        Results are in submission order. Raises the error of the first group
+        that failed, after all groups have been resolved.
+        """
+        with self._lock:
+            futures = self._futures
+            self._futures = []
+
+        errors = [future.exception() for future in futures]
+        for e in errors:
+            if e is not None:
+                raise e
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Close the tracker if the pipeline created it."""
+        self.submitter.close()
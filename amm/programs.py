@@ -0,0 +1,241 @@
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+from base64 import b64decode
+from functools import lru_cache
+import hashlib
+import json
+import os
+
+from algosdk.v2client.algod import AlgodClient
+
+from .teal import assemble, TealAssemblyError
+from .util import writeAtomic
+
+if TYPE_CHECKING:
+    from pyteal import Expr
+
+TEAL_VERSION = 5
+# the versions the contracts can be built for. From version 6, the inner
+# transactions of supply and withdraw are sent as one inner group.
+TEAL_VERSIONS = (5, 6)
+
+CONTRACTS_DIR = os.path.join(os.path.dirname(__file__), "contracts")
+
+# prebuilt programs shipped with the package, in the same layout as a cache
+SHIPPED_DIR = os.path.join(CONTRACTS_DIR, "artifacts")
+
+
+def defaultCacheDir() -> str:
+    """Get the directory compiled programs are cached in.
+
+    This is $AMM_CACHE_DIR if set, otherwise amm under $XDG_CACHE_HOME or
+    ~/.cache.
+    """
+    directory = os.environ.get("AMM_CACHE_DIR")
+    if directory:
+        return directory
+    cacheHome = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cacheHome, "amm")
+
+
+def tealHash(teal: str, version: int = TEAL_VERSION) -> str:
+    """Get the key a TEAL program's bytecode is cached under."""
+    return hashlib.sha256("{}\n{}".format(version, teal).encode("utf-8")).hexdigest()
+
+
+def sourceHash(version: int = TEAL_VERSION) -> str:
+    """Get a hash of everything the generated TEAL depends on: the contract
+    sources, the pyteal version and the TEAL version.
+
+    It is used to find the cached programs without running pyteal.
+    """
+    # importlib.metadata is slow to import and only needed on a cache lookup
+    from importlib import metadata
+
+    h = hashlib.sha256()
+    h.update("{}\n{}\n".format(version, metadata.version("pyteal")).encode("utf-8"))
+    for name in sorted(os.listdir(CONTRACTS_DIR)):
+        if name.endswith(".py"):
+            with open(os.path.join(CONTRACTS_DIR, name), "rb") as f:
+                h.update(name.encode("utf-8") + b"\n" + f.read())
+    return h.hexdigest()
+
+
+def contractTeal(contract: "Expr", version: int = TEAL_VERSION) -> str:
+    """Compile a pyteal expression to the TEAL source of an application program.
+
+    pyteal 0.9 compiles TEAL 5 at most. Later versions keep every TEAL 5
+    opcode, so they are compiled as TEAL 5 and the version pragma is raised;
+    newer opcodes come from amm.contracts.helpers, e.g. InnerTxnNext.
+    """
+    from pyteal import compileTeal, Mode, MAX_TEAL_VERSION
+
+    teal = compileTeal(
+        contract, mode=Mode.Application, version=min(version, MAX_TEAL_VERSION)
+    )
+    if version > MAX_TEAL_VERSION:
+        pragma, rest = teal.split("\n", 1)
+        teal = "#pragma version {}\n{}".format(version, rest)
+    return teal
+
+
+@lru_cache(maxsize=None)
+def _generateAllTeal() -> Dict[int, Tuple[str, str]]:
+    from .contracts.contracts import approval_program, clear_state_program
+
+    return {
+        version: (
+            contractTeal(approval_program(version), version),
+            contractTeal(clear_state_program(), version),
+        )
+        for version in TEAL_VERSIONS
+    }
+
+
+def generateTeal(version: int = TEAL_VERSION) -> Tuple[str, str]:
+    """Generate the TEAL source of the approval and clear state programs.
+
+    The result is memoized: pyteal numbers scratch slots by creation order and
+    keeps subroutine bodies after their first compile, so generating the
+    programs again in the same process gives different slot numbers. For the
+    same reason every version is generated at once, in the same order, so
+    the TEAL of a version does not depend on which version was asked for
+    first.
+    """
+    if version not in TEAL_VERSIONS:
+        raise ValueError(
+            "Unsupported TEAL version {}, expected one of {}".format(
+                version, TEAL_VERSIONS
+            )
+        )
+    return _generateAllTeal()[version]
+
+
+class ProgramCache:
+    """A content-addressed cache of compiled programs on disk.
+
+    Bytecode is stored under the hash of its TEAL source and TEAL version, and
+    a second table maps the hash of the contract sources to the TEAL hashes of
+    the approval and clear state programs, so a process can load the programs
+    without running pyteal or calling algod.
+
+    Entries are written to a temporary file and renamed into place, so readers
+    in other processes never see a partial entry, and concurrent writers of the
+    same key write the same content. Lookups fall back to the artifacts shipped
+    with the package. A cache directory that cannot be written to is ignored.
+    """
+
+    def __init__(
+        self, directory: Optional[str] = None, shippedDirectory: str = SHIPPED_DIR
+    ) -> None:
+        self.directory = directory or defaultCacheDir()
+        self.shippedDirectory = shippedDirectory
+
+    def _read(self, *path: str) -> Optional[bytes]:
+        for directory in (self.directory, self.shippedDirectory):
+            try:
+                with open(os.path.join(directory, *path), "rb") as f:
+                    return f.read()
+            except OSError:
+                continue
+        return None
+
+    def _write(self, data: bytes, *path: str) -> None:
+        try:
+            writeAtomic(os.path.join(self.directory, *path), data)
+        except OSError:
+            pass
+
+    def getProgram(self, key: str) -> Optional[bytes]:
+        return self._read("programs", key + ".bin")
+
+    def putProgram(self, key: str, program: bytes) -> None:
+        self._write(program, "programs", key + ".bin")
+
+    def getContractKeys(self, key: str) -> Optional[Dict[str, str]]:
+        data = self._read("sources", key + ".json")
+        if data is None:
+            return None
+        return json.loads(data)
+
+    def putContractKeys(self, key: str, approval: str, clear: str) -> None:
+        data = json.dumps({"approval": approval, "clear": clear}, sort_keys=True)
+        self._write(data.encode("utf-8"), "sources", key + ".json")
+
+    def loadContracts(
+        self, version: int = TEAL_VERSION
+    ) -> Optional[Tuple[bytes, bytes]]:
+        """Load the programs compiled from the current contract sources.
+
+        Args:
+            version (optional): The TEAL version of the programs.
+
+        Returns:
+            The approval and clear state programs, or None if they have not
+            been cached.
+        """
+        keys = self.getContractKeys(sourceHash(version))
+        if keys is None:
+            return None
+        approval = self.getProgram(keys["approval"])
+        clear = self.getProgram(keys["clear"])
+        if approval is None or clear is None:
+            return None
+        return approval, clear
+
+
+def compileContracts(
+    client: Optional[AlgodClient] = None,
+    programCache: Optional[ProgramCache] = None,
+    version: int = TEAL_VERSION,
+    compile: Optional[Callable[[str], bytes]] = None,
+) -> Tuple[bytes, bytes]:
+    """Get the compiled approval and clear state programs.
+
+    Cached programs are used if the contract sources have not changed. If they
+    have, the TEAL is regenerated and programs whose TEAL changed are assembled
+    locally. algod is only asked to compile a program that uses opcodes the
+    local assembler does not support. New programs are added to the cache.
+
+    Args:
+        client (optional): An algod client that has the ability to compile
+            TEAL programs.
+        programCache (optional): The cache to use. Defaults to a cache in
+            defaultCacheDir().
+        version (optional): The TEAL version to build the programs for, one
+            of TEAL_VERSIONS.
+        compile (optional): Compiles the TEAL of a program the local
+            assembler does not support to bytecode. Defaults to algod's
+            compile endpoint, through client.
+
+    Returns:
+        A tuple of the approval program and the clear state program.
+    """
+    if programCache is None:
+        programCache = ProgramCache()
+    if compile is None and client is not None:
+        compile = lambda teal: b64decode(client.compile(teal)["result"])
+
+    programs = programCache.loadContracts(version)
+    if programs is not None:
+        return programs
+
+    keys = []
+    compiled = []
+    for teal in generateTeal(version):
+        key = tealHash(teal, version)
+        program = programCache.getProgram(key)
+        if program is None:
+            try:
+                program = assemble(teal)
+            except TealAssemblyError:
+                if compile is None:
+                    raise
+                program = compile(teal)
+            programCache.putProgram(key, program)
+        keys.append(key)
+        compiled.append(program)
+
+    programCache.putContractKeys(sourceHash(version), keys[0], keys[1])
+    return compiled[0], compiled[1]
@@ -0,0 +1,265 @@
+"""Vectorized quotes over NumPy arrays.
+
+These functions price many candidate amounts against a single pool at once.
+They reproduce the approval program's integer math exactly (see
+amm/simulator.py for the scalar reference): uint64 arithmetic is used
+wherever the intermediate products fit, and elements whose products would
+overflow uint64 are recomputed with Python integers.
+
+Amounts that the approval program would reject are quoted as 0 and flagged
+as not ok.
+"""
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from .simulator import (
+    FEE_DENOMINATOR,
+    POOL_TOKEN_DEFAULT_AMOUNT,
+    SCALING_FACTOR,
+    UINT64_MAX,
+    UINT128_MAX,
+)
+
+ArrayLike = Union[np.ndarray, list]
+
+_U64_MAX = np.uint64(UINT64_MAX)
+
+
+def _asUint64Array(values: ArrayLike) -> np.ndarray:
+    if not isinstance(values, np.ndarray):
+        try:
+            return np.array(values, dtype=np.uint64)
+        except OverflowError:
+            raise ValueError("Amounts must be uint64 values")
+
+    array = values
+    if array.dtype == object or array.dtype.kind not in "iu":
+        raise TypeError("Amounts must be an array of integers")
+    if array.dtype.kind == "i" and (array < 0).any():
+        raise ValueError("Amounts must be non-negative")
+    return array.astype(np.uint64)
+
+
+def _addFits(a: int, b: np.ndarray) -> np.ndarray:
+    """Elementwise check that a + b does not overflow uint64."""
+    return b <= np.uint64(UINT64_MAX - a)
+
+
+def _xMulYDivZ(x: np.ndarray, y: int, z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized xMulYDivZ for an array x and scalar y and z.
+
+    Returns the quotients and a mask that is False where the subroutine
+    would panic.
+    """
+    result = np.zeros(x.shape, dtype=np.uint64)
+    if z == 0:
+        return result, np.zeros(x.shape, dtype=bool)
+
+    ok = np.ones(x.shape, dtype=bool)
+    if y == 0:
+        return result, ok
+
+    # x * y fits in uint64, so x * y * SCALING_FACTOR < 2 ** 128 and the
+    # quotient is at most x * y
+    fast = x <= np.uint64(UINT64_MAX // y)
+    result[fast] = (x[fast] * np.uint64(y)) // np.uint64(z)
+
+    slow = np.flatnonzero(~fast)
+    if slow.size:
+        for i in slow:
+            product = int(x[i]) * y
+            quotient = product // z
+            if product * SCALING_FACTOR > UINT128_MAX or quotient > UINT64_MAX:
+                ok[i] = False
+            else:
+                result[i] = quotient
+
+    return result, ok
+
+
+def _assessFee(amounts: np.ndarray, feeBps: int) -> np.ndarray:
+    feeNum = FEE_DENOMINATOR - feeBps
+    # amount * feeNum can overflow uint64, so split amount into multiples of
+    # the denominator and a remainder: both partial products fit
+    quotient, remainder = np.divmod(amounts, np.uint64(FEE_DENOMINATOR))
+    return quotient * np.uint64(feeNum) + (
+        remainder * np.uint64(feeNum) // np.uint64(FEE_DENOMINATOR)
+    )
+
+
+def _isqrt(values: np.ndarray) -> np.ndarray:
+    roots = np.floor(np.sqrt(values.astype(np.float64)))
+    roots = np.minimum(roots, 2 ** 32 - 1).astype(np.uint64)
+    # correct the float estimate, which can be off by one in either direction
+    for _ in range(2):
+        roots = np.where(roots * roots > values, roots - np.uint64(1), roots)
+        following = roots + np.uint64(1)
+        roots = np.where(
+            (following < np.uint64(2 ** 32)) & (following * following <= values),
+            following,
+            roots,
+        )
+    return roots
+
+
+def quote_swaps(
+    amounts: ArrayLike, reserve_in: int, reserve_out: int, fee_bps: int
+) -> np.ndarray:
+    """Quote swaps of each amount into a pool.
+
+    Reproduces computeOtherTokenOutputPerGivenTokenInput and assessFee.
+
+    Args:
+        amounts: Input amounts of the given token.
+        reserve_in: Pool reserve of the given token before the swap.
+        reserve_out: Pool reserve of the other token before the swap.
+        fee_bps: The pool fee in basis points.
+
+    Returns:
+        A uint64 array of output amounts. Amounts the approval program would
+        reject are quoted as 0, which the contract never sends.
+    """
+    amounts = _asUint64Array(amounts)
+    zeros = np.zeros(amounts.shape, dtype=np.uint64)
+
+    if fee_bps > FEE_DENOMINATOR or reserve_in * reserve_out > UINT64_MAX:
+        return zeros
+
+    k = np.uint64(reserve_in * reserve_out)
+    amountsSubFee = _assessFee(amounts, fee_bps)
+    ok = (
+        (amounts > 0)
+        # the incoming transfer must fit in the app's holding
+        & _addFits(reserve_in, amounts)
+    )
+    denominators = np.where(ok, np.uint64(reserve_in) + amountsSubFee, np.uint64(1))
+    ok &= denominators > 0
+
+    toSend = np.uint64(reserve_out) - k // np.where(ok, denominators, np.uint64(1))
+    ok &= (toSend > 0) & (toSend < np.uint64(reserve_out))
+
+    return np.where(ok, toSend, zeros)
+
+
+def quote_supplies(
+    amounts_a: ArrayLike,
+    amounts_b: ArrayLike,
+    reserve_a: int,
+    reserve_b: int,
+    pool_tokens_outstanding: int,
+    min_increment: int,
+    pool_token_reserve: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Quote supplying pairs of amounts to a pool.
+
+    Reproduces get_supply_program and takeAdjustedAmounts.
+
+    Args:
+        amounts_a: Supplied amounts of token A.
+        amounts_b: Supplied amounts of token B, matched by index with amounts_a.
+        reserve_a: Pool reserve of token A before the supply.
+        reserve_b: Pool reserve of token B before the supply.
+        pool_tokens_outstanding: Pool tokens held by suppliers.
+        min_increment: The minimum amount of each token that can be supplied.
+        pool_token_reserve: Pool tokens held by the app account, if it differs
+            from the default supply minus the outstanding tokens.
+
+    Returns:
+        A tuple of uint64 arrays (taken A, taken B, pool tokens minted) and a
+        boolean array that is False where the group would fail.
+    """
+    amountsA = _asUint64Array(amounts_a)
+    amountsB = _asUint64Array(amounts_b)
+    if amountsA.shape != amountsB.shape:
+        raise ValueError("amounts_a and amounts_b must have the same shape")
+
+    if pool_token_reserve is None:
+        pool_token_reserve = POOL_TOKEN_DEFAULT_AMOUNT - pool_tokens_outstanding
+
+    ok = (
+        (pool_token_reserve > 0)
+        & (amountsA >= max(min_increment, 1))
+        & (amountsB >= max(min_increment, 1))
+        & _addFits(reserve_a, amountsA)
+        & _addFits(reserve_b, amountsB)
+    )
+
+    takenA = amountsA.copy()
+    takenB = amountsB.copy()
+
+    if reserve_a == 0 or reserve_b == 0:
+        # no liquidity yet, take everything
+        productFits = (amountsB == 0) | (
+            amountsA <= _U64_MAX // np.maximum(amountsB, np.uint64(1))
+        )
+        ok &= productFits
+        poolTokens = _isqrt(np.where(productFits, amountsA * amountsB, np.uint64(0)))
+    else:
+        otherB, okB = _xMulYDivZ(amountsA, reserve_b, reserve_a)
+        takeB = okB & (otherB > 0) & (amountsB >= otherB)
+        mintedB, okMintedB = _xMulYDivZ(amountsA, pool_tokens_outstanding, reserve_a)
+
+        otherA, okA = _xMulYDivZ(amountsB, reserve_a, reserve_b)
+        takeA = ~takeB & okA & (otherA > 0) & (amountsA >= otherA)
+        mintedA, okMintedA = _xMulYDivZ(amountsB, pool_tokens_outstanding, reserve_b)
+
+        # a panic in the first attempt fails the group even if the second
+        # attempt would have succeeded
+        ok &= okB & (takeB | okA) & (takeB | takeA)
+        ok &= np.where(takeB, okMintedB, okMintedA)
+
+        takenB = np.where(takeB, otherB, takenB)
+        takenA = np.where(takeA, otherA, takenA)
+        poolTokens = np.where(takeB, mintedB, mintedA)
+
+    ok &= poolTokens <= np.uint64(pool_token_reserve)
+    ok &= _addFits(pool_tokens_outstanding, poolTokens)
+
+    zeros = np.zeros(amountsA.shape, dtype=np.uint64)
+    return (
+        np.where(ok, takenA, zeros),
+        np.where(ok, takenB, zeros),
+        np.where(ok, poolTokens, zeros),
+        ok,
+    )
+
+
+def quote_withdrawals(
+    pool_token_amounts: ArrayLike,
+    reserve_a: int,
+    reserve_b: int,
+    pool_tokens_outstanding: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Quote withdrawing each pool token amount from a pool.
+
+    Reproduces get_withdraw_program and withdrawGivenPoolToken.
+
+    Args:
+        pool_token_amounts: Pool token amounts returned to the pool.
+        reserve_a: Pool reserve of token A.
+        reserve_b: Pool reserve of token B.
+        pool_tokens_outstanding: Pool tokens held by suppliers.
+
+    Returns:
+        A tuple of uint64 arrays (token A out, token B out) and a boolean
+        array that is False where the group would fail.
+    """
+    amounts = _asUint64Array(pool_token_amounts)
+    zeros = np.zeros(amounts.shape, dtype=np.uint64)
+
+    if reserve_a == 0 or reserve_b == 0 or pool_tokens_outstanding == 0:
+        return zeros, zeros, np.zeros(amounts.shape, dtype=bool)
+
+    outA, okA = _xMulYDivZ(amounts, reserve_a, pool_tokens_outstanding)
+    outB, okB = _xMulYDivZ(amounts, reserve_b, pool_tokens_outstanding)
+    ok = (
+        (amounts > 0)
+        & (amounts <= np.uint64(pool_tokens_outstanding))
+        & okA
+        & okB
+        & (outA > 0)
+        & (outB > 0)
+    )
+
+    return np.where(ok, outA, zeros), np.where(ok, outB, zeros), ok
@@ -0,0 +1,250 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from base64 import b64decode
+from threading import Lock
+
+from algosdk.error import AlgodHTTPError
+from algosdk.v2client.algod import AlgodClient
+from algosdk.logic import get_application_address
+
+from .operations import AmmPool, getContracts
+from .programs import TEAL_VERSIONS
+from .simulator import PoolSimulator
+from .util import decodeState
+
+GlobalState = Dict[bytes, Union[int, bytes]]
+
+
+def pairKey(tokenA: int, tokenB: int) -> Tuple[int, int]:
+    """The index key of a token pair, independent of the order of the tokens."""
+    return (tokenA, tokenB) if tokenA <= tokenB else (tokenB, tokenA)
+
+
+class RegisteredPool:
+    """A pool known to a PoolRegistry, with its state as of the last refresh."""
+
+    def __init__(self, appID: int, creator: Optional[str], globalState: GlobalState):
+        self.appID = appID
+        self.appAddr = get_application_address(appID)
+        self.creator = creator
+        self.globalState = globalState
+
+    @property
+    def tokenA(self) -> int:
+        return self.globalState[b"token_a_key"]
+
+    @property
+    def tokenB(self) -> int:
+        return self.globalState[b"token_b_key"]
+
+    @property
+    def feeBps(self) -> int:
+        return self.globalState[b"fee_bps_key"]
+
+    @property
+    def isSetUp(self) -> bool:
+        return b"pool_token_key" in self.globalState
+
+    def simulator(self) -> PoolSimulator:
+        """Get a simulator of the pool as of the last refresh."""
+        return PoolSimulator.fromState(self.globalState)
+
+    def __repr__(self) -> str:
+        return "RegisteredPool(appID={}, A={}, B={}, feeBps={})".format(
+            self.appID, self.tokenA, self.tokenB, self.feeBps
+        )
+
+
+class PoolRegistry:
+    """An index of the amm pools deployed by a set of creators.
+
+    Pools are discovered from the apps created by each creator account whose
+    approval program is one of the amm's, and indexed by token pair and by
+    token, so finding the pools that trade a pair is a dictionary lookup
+    rather than a getAppGlobalState call per app.
+
+    refresh() reloads every pool in bulk: one account_info call per creator
+    returns the global state of all of its apps, including the reserves the
+    contract mirrors there. Pools that are not set up yet are kept but not
+    indexed until a refresh finds their pool token.
+
+    The registry is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        approvalPrograms: Optional[Iterable[bytes]] = None,
+    ) -> None:
+        """Create an empty registry.
+
+        Args:
+            client: An algod client.
+            approvalPrograms (optional): The approval programs that identify a
+                pool. Defaults to the amm's program for every version in
+                TEAL_VERSIONS, see getContracts.
+        """
+        if approvalPrograms is None:
+            approvalPrograms = [
+                getContracts(client, version=version)[0] for version in TEAL_VERSIONS
+            ]
+
+        self.client = client
+        self.approvalPrograms: Set[bytes] = set(approvalPrograms)
+        self.round: Optional[int] = None
+
+        self._lock = Lock()
+        self._creators: Set[str] = set()
+        self._pools: Dict[int, RegisteredPool] = {}
+        self._byPair: Dict[Tuple[int, int], Dict[int, RegisteredPool]] = {}
+        self._byToken: Dict[int, Dict[int, RegisteredPool]] = {}
+
+    def _update(self, appID: int, creator: Optional[str], state: GlobalState) -> None:
+        pool = self._pools.get(appID)
+        if pool is None:
+            pool = RegisteredPool(appID, creator, state)
+            self._pools[appID] = pool
+        else:
+            pool.globalState = state
+
+        # token IDs are fixed at creation, so a pool is indexed once
+        if pool.isSetUp and appID not in self._byToken.get(pool.tokenA, {}):
+            self._byPair.setdefault(pairKey(pool.tokenA, pool.tokenB), {})[appID] = pool
+            self._byToken.setdefault(pool.tokenA, {})[appID] = pool
+            self._byToken.setdefault(pool.tokenB, {})[appID] = pool
+
+    def _scanCreator(self, creator: str) -> List[int]:
+        accountInfo = self.client.account_info(creator)
+        found = []
+        with self._lock:
+            for app in accountInfo.get("created-apps", []):
+                params = app["params"]
+                if b64decode(params["approval-program"]) not in self.approvalPrograms:
+                    continue
+                self._update(
+                    app["id"], creator, decodeState(params.get("global-state", []))
+                )
+                found.append(app["id"])
+        return found
+
+    def discover(self, creators: Iterable[str]) -> List[int]:
+        """Find the pools created by each creator and add them to the registry.
+
+        The creators are remembered, so later refreshes also pick up pools
+        they create after this call.
+
+        Returns:
+            The app IDs of the pools that were not in the registry before.
+        """
+        with self._lock:
+            known = set(self._pools)
+
+        found = []
+        for creator in creators:
+            with self._lock:
+                self._creators.add(creator)
+            found += self._scanCreator(creator)
+
+        return [appID for appID in found if appID not in known]
+
+    def add(self, appID: int) -> RegisteredPool:
+        """Add a single pool by app ID.
+
+        Raises:
+            ValueError: if the app does not run the amm's approval program.
+        """
+        params = self.client.application_info(appID)["params"]
+        if b64decode(params["approval-program"]) not in self.approvalPrograms:
+            raise ValueError("App {} is not an amm pool".format(appID))
+
+        with self._lock:
+            self._update(
+                appID, params.get("creator"), decodeState(params["global-state"])
+            )
+            return self._pools[appID]
+
+    def remove(self, appID: int) -> None:
+        with self._lock:
+            pool = self._pools.pop(appID)
+            if pool.isSetUp:
+                self._byPair[pairKey(pool.tokenA, pool.tokenB)].pop(appID)
+                self._byToken[pool.tokenA].pop(appID)
+                self._byToken[pool.tokenB].pop(appID)
+
+    def refresh(self) -> int:
+        """Reload the state, including the reserves, of every pool.
+
+        Pools added by add() rather than discovered from a creator have their
+        global state read with one application_info call each. Pools that
+        have been deleted are removed from the registry.
+
+        Returns:
+            The round the node reported before the reads.
+        """
+        lastRound = self.client.status()["last-round"]
+
+        with self._lock:
+            creators = set(self._creators)
+
+        seen: Set[int] = set()
+        for creator in sorted(creators):
+            seen.update(self._scanCreator(creator))
+
+        with self._lock:
+            deleted = [
+                appID
+                for appID, pool in self._pools.items()
+                if pool.creator in creators and appID not in seen
+            ]
+            others = [
+                appID
+                for appID, pool in self._pools.items()
+                if pool.creator not in creators
+            ]
+        for appID in others:
+            try:
+                params = self.client.application_info(appID)["params"]
+            except AlgodHTTPError as e:
+                if e.code != 404:
+                    raise
+                deleted.append(appID)
+                continue
+            with self._lock:
+                self._update(appID, None, decodeState(params["global-state"]))
+        for appID in deleted:
+            self.remove(appID)
+
+        self.round = lastRound
+        return lastRound
+
+    def get(self, appID: int) -> RegisteredPool:
+        return self._pools[appID]
+
+    def poolsForPair(self, tokenA: int, tokenB: int) -> List[RegisteredPool]:
+        """Get the set up pools that trade tokenA for tokenB, in either order."""
+        return list(self._byPair.get(pairKey(tokenA, tokenB), {}).values())
+
+    def poolsForToken(self, token: int) -> List[RegisteredPool]:
+        """Get the set up pools that have token as token A or token B."""
+        return list(self._byToken.get(token, {}).values())
+
+    def pairs(self) -> List[Tuple[int, int]]:
+        """Get every token pair with at least one set up pool."""
+        return [pair for pair, pools in self._byPair.items() if pools]
+
+    def ammPool(self, appID: int, **kwargs) -> AmmPool:
+        """Get an AmmPool handle for a pool without reading its state again.
+
+        Keyword arguments are passed to AmmPool.
+        """
+        return AmmPool(
+            self.client, appID, appGlobalState=self._pools[appID].globalState, **kwargs
+        )
+
+    def __contains__(self, appID: int) -> bool:
+        return appID in self._pools
+
+    def __iter__(self) -> Iterator[RegisteredPool]:
+        return iter(list(self._pools.values()))
+
+    def __len__(self) -> int:
+        return len(self._pools)
@@ -0,0 +1,334 @@
+from typing import Dict, List, Optional
+
+from algosdk.future import transaction
+
+from .account import Account
+from .confirmation import ConfirmationTracker
+from .events import SwapResult, getResult
+from .operations import AmmPool
+from .registry import PoolRegistry, RegisteredPool
+from .simulator import LogicError, PoolSimulator
+from .util import MAX_GROUP_SIZE, PendingTxnResponse, waitForTransaction
+
+# asset transfer and app call
+TXNS_PER_SWAP = 2
+MAX_HOPS = MAX_GROUP_SIZE // TXNS_PER_SWAP
+
+
+class Hop:
+    """One swap in a route, as quoted by the pool's simulator"""
+
+    def __init__(
+        self,
+        pool: RegisteredPool,
+        tokenIn: int,
+        amountIn: int,
+        tokenOut: int,
+        amountOut: int,
+    ) -> None:
+        self.pool = pool
+        self.tokenIn = tokenIn
+        self.amountIn = amountIn
+        self.tokenOut = tokenOut
+        self.amountOut = amountOut
+
+    def __repr__(self) -> str:
+        return "Hop(app {}: {} of {} -> {} of {})".format(
+            self.pool.appID, self.amountIn, self.tokenIn, self.amountOut, self.tokenOut
+        )
+
+
+class Route:
+    """A sequence of swaps where each hop spends the output of the previous one"""
+
+    def __init__(self, hops: List[Hop]) -> None:
+        if not hops:
+            raise ValueError("A route needs at least one hop")
+        self.hops = hops
+
+    @property
+    def tokenIn(self) -> int:
+        return self.hops[0].tokenIn
+
+    @property
+    def amountIn(self) -> int:
+        return self.hops[0].amountIn
+
+    @property
+    def tokenOut(self) -> int:
+        return self.hops[-1].tokenOut
+
+    @property
+    def amountOut(self) -> int:
+        return self.hops[-1].amountOut
+
+    @property
+    def groupSize(self) -> int:
+        return len(self.hops) * TXNS_PER_SWAP
+
+    def appIDs(self) -> List[int]:
+        return [hop.pool.appID for hop in self.hops]
+
+    def __len__(self) -> int:
+        return len(self.hops)
+
+    def __repr__(self) -> str:
+        return "Route({} of {} -> {} of {} via {})".format(
+            self.amountIn, self.tokenIn, self.amountOut, self.tokenOut, self.appIDs()
+        )
+
+
+class SlippageError(ValueError):
+    """A route was executed but returned less than the minimum output.
+
+    The group is already confirmed when this is raised; results holds the
+    swaps it executed.
+    """
+
+    def __init__(self, results: List[SwapResult], minAmountOut: int) -> None:
+        super().__init__(
+            "Route returned {}, less than {}".format(
+                results[-1].amountOut, minAmountOut
+            )
+        )
+        self.results = results
+        self.minAmountOut = minAmountOut
+
+
+def findBestRoute(
+    registry: PoolRegistry,
+    tokenIn: int,
+    tokenOut: int,
+    amount: int,
+    maxHops: int = MAX_HOPS,
+) -> Optional[Route]:
+    """Find the route that gives the most tokenOut for amount of tokenIn.
+
+    Routes are extended one hop at a time from every token reached so far, and
+    a partial route is only extended if it reaches its token with more output
+    than any shorter route did. A pool is used at most once per route. Each hop
+    is quoted with the approval program's own swap math, using the reserves as
+    of the registry's last refresh.
+
+    Args:
+        registry: The pools to route through.
+        tokenIn: The token to sell.
+        tokenOut: The token to buy.
+        amount: The amount of tokenIn to sell.
+        maxHops (optional): The maximum number of swaps in the route. At most
+            MAX_HOPS swaps fit in one group.
+
+    Returns:
+        The best route, or None if tokenOut cannot be reached.
+    """
+    if not 1 <= maxHops <= MAX_HOPS:
+        raise ValueError("maxHops must be between 1 and {}".format(MAX_HOPS))
+    if tokenIn == tokenOut:
+        raise ValueError("tokenIn and tokenOut must differ")
+
+    simulators: Dict[int, PoolSimulator] = {}
+    best: Optional[Route] = None
+    # the most output of each token reached by a shorter route
+    bestAmounts: Dict[int, int] = {tokenIn: amount}
+    frontier: Dict[int, List[Hop]] = {tokenIn: []}
+
+    for _ in range(maxHops):
+        nextFrontier: Dict[int, List[Hop]] = {}
+        for token, hops in frontier.items():
+            amountIn = hops[-1].amountOut if hops else amount
+            used = {hop.pool.appID for hop in hops}
+
+            for pool in registry.poolsForToken(token):
+                if pool.appID in used:
+                    continue
+
+                simulator = simulators.get(pool.appID)
+                if simulator is None:
+                    simulator = pool.simulator()
+                    simulators[pool.appID] = simulator
+                try:
+                    quote = simulator.quoteSwap(token, amountIn)
+                except LogicError:
+                    continue
+
+                if quote.amountOut <= bestAmounts.get(quote.tokenOut, 0):
+                    continue
+                bestAmounts[quote.tokenOut] = quote.amountOut
+
+                route = hops + [
+                    Hop(pool, token, amountIn, quote.tokenOut, quote.amountOut)
+                ]
+                if quote.tokenOut == tokenOut:
+                    best = Route(route)
+                else:
+                    nextFrontier[quote.tokenOut] = route
+
+        frontier = nextFrontier
+
+    return best
+
+
+class Router:
+    """Swaps through the pools of a registry along the best route.
+
+    The whole route is submitted as one atomic group, so either every hop
+    executes or none does. Each hop transfers the amount the previous hop is
+    quoted to send, see buildSwaps. The trader must be opted into every token
+    on the route.
+    """
+
+    def __init__(
+        self,
+        registry: PoolRegistry,
+        maxHops: int = MAX_HOPS,
+        tracker: Optional[ConfirmationTracker] = None,
+    ) -> None:
+        if not 1 <= maxHops <= MAX_HOPS:
+            raise ValueError("maxHops must be between 1 and {}".format(MAX_HOPS))
+
+        self.registry = registry
+        self.client = registry.client
+        self.maxHops = maxHops
+        self.tracker = tracker
+
+        self._pools: Dict[int, AmmPool] = {}
+
+    def _pool(self, appID: int) -> AmmPool:
+        pool = self._pools.get(appID)
+        if pool is None:
+            pool = self.registry.ammPool(appID)
+            self._pools[appID] = pool
+        return pool
+
+    def quote(self, tokenIn: int, tokenOut: int, amount: int) -> Route:
+        """Find the best route for a swap.
+
+        Raises:
+            ValueError: if no route reaches tokenOut.
+        """
+        route = findBestRoute(self.registry, tokenIn, tokenOut, amount, self.maxHops)
+        if route is None:
+            raise ValueError(
+                "No route from {} to {} for {}".format(tokenIn, tokenOut, amount)
+            )
+        return route
+
+    def buildSwaps(
+        self, trader: str, hops: List[Hop], sp: transaction.SuggestedParams
+    ) -> List[transaction.Transaction]:
+        """Build one unsigned group of swaps.
+
+        Each hop transfers hop.amountIn, the amount it was quoted with, not
+        the output the previous hop actually returns: the calls of a group
+        cannot pass amounts to each other. If the pools have moved since the
+        quote and a hop returns less than the next hop spends, the trader's
+        own balance of that token makes up the difference, or the group
+        fails. If it returns more, the surplus stays with the trader.
+
+        Returns:
+            The swap groups of every hop, in order, with one group ID assigned.
+        """
+        if len(hops) * TXNS_PER_SWAP > MAX_GROUP_SIZE:
+            raise ValueError("{} swaps do not fit in one group".format(len(hops)))
+
+        txns: List[transaction.Transaction] = []
+        for hop in hops:
+            txns += self._pool(hop.pool.appID).buildSwap(
+                trader, hop.tokenIn, hop.amountIn, sp
+            )
+
+        # each hop was grouped on its own, and the group ID is part of what
+        # the group ID is computed from
+        for txn in txns:
+            txn.group = None
+        transaction.assign_group_id(txns)
+        return txns
+
+    def buildRoute(
+        self, trader: str, route: Route, sp: transaction.SuggestedParams
+    ) -> List[transaction.Transaction]:
+        """Build the unsigned group that swaps along a route."""
+        return self.buildSwaps(trader, route.hops, sp)
+
+    def send(self, txns: List[transaction.Transaction], signer: Account) -> str:
+        """Sign and submit a group built by buildSwaps.
+
+        Returns:
+            The ID of the last transaction in the group.
+        """
+        signedTxns = [txn.sign(signer.getPrivateKey()) for txn in txns]
+        self.client.send_transactions(signedTxns)
+        return signedTxns[-1].get_txid()
+
+    def wait(self, txID: str) -> PendingTxnResponse:
+        if self.tracker is None:
+            return waitForTransaction(self.client, txID)
+        return self.tracker.track(txID).result()
+
+    def results(self, txns: List[transaction.Transaction]) -> List[SwapResult]:
+        """Get the swaps a confirmed group built by buildSwaps executed.
+
+        Each hop's app call is looked up with pending_transaction_info, so
+        this must be called shortly after the group is confirmed.
+
+        Returns:
+            The result each hop logged, in order.
+        """
+        calls = txns[TXNS_PER_SWAP - 1 :: TXNS_PER_SWAP]
+        return [
+            getResult(
+                PendingTxnResponse(
+                    self.client.pending_transaction_info(call.get_txid())
+                ),
+                SwapResult,
+            )
+            for call in calls
+        ]
+
+    def swap(
+        self,
+        trader: Account,
+        tokenIn: int,
+        tokenOut: int,
+        amount: int,
+        minAmountOut: int = 0,
+        sp: Optional[transaction.SuggestedParams] = None,
+    ) -> List[SwapResult]:
+        """Swap amount of tokenIn for tokenOut along the best route.
+
+        Args:
+            trader: The account that sends tokenIn and receives tokenOut.
+            tokenIn: The token to sell.
+            tokenOut: The token to buy.
+            amount: The amount of tokenIn to sell.
+            minAmountOut (optional): The minimum amount of tokenOut. The group
+                is not submitted if the route is quoted to return less.
+            sp (optional): The suggested params of the group.
+
+        Returns:
+            The result of each hop, as logged by the pools. The amountOut of
+            the last one is the tokenOut received.
+
+        Raises:
+            ValueError: if there is no route, or its quote is below
+                minAmountOut.
+            SlippageError: if the pools moved before the group was confirmed
+                and the route returned less than minAmountOut.
+        """
+        route = self.quote(tokenIn, tokenOut, amount)
+        if route.amountOut < minAmountOut:
+            raise ValueError(
+                "Best route returns {}, less than {}".format(
+                    route.amountOut, minAmountOut
+                )
+            )
+
+        txns = self.buildRoute(
+            trader.getAddress(), route, sp or self.client.suggested_params()
+        )
+        self.wait(self.send(txns, trader))
+
+        results = self.results(txns)
+        if results[-1].amountOut < minAmountOut:
+            raise SlippageError(results, minAmountOut)
+        return results
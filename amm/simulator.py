@@ -0,0 +1,404 @@
+from typing import Dict, List, Optional, Union
+from math import isqrt
+
+# These mirror amm/contracts/config.py. They are duplicated here so that the
+# simulator can be used without importing pyteal.
+SCALING_FACTOR = 10 ** 13
+POOL_TOKEN_DEFAULT_AMOUNT = 10 ** 13
+FEE_DENOMINATOR = 10_000
+
+UINT64_MAX = 2 ** 64 - 1
+UINT128_MAX = 2 ** 128 - 1
+
+
+class LogicError(Exception):
+    """Raised when the approval program would reject or panic on a group."""
+
+
+def _add(a: int, b: int) -> int:
+    result = a + b
+    if result > UINT64_MAX:
+        raise LogicError("+ overflowed")
+    return result
+
+
+def _sub(a: int, b: int) -> int:
+    if b > a:
+        raise LogicError("- would result negative")
+    return a - b
+
+
+def _mul(a: int, b: int) -> int:
+    result = a * b
+    if result > UINT64_MAX:
+        raise LogicError("* overflowed")
+    return result
+
+
+def _div(a: int, b: int) -> int:
+    if b == 0:
+        raise LogicError("/ 0")
+    return a // b
+
+
+def _assert(condition: bool, message: str = "assert failed") -> None:
+    if not condition:
+        raise LogicError(message)
+
+
+def wideRatio(numeratorFactors: List[int], denominatorFactors: List[int]) -> int:
+    """Compute the pyteal WideRatio of uint64 factors.
+
+    The products of both factor lists are computed as 128-bit values with
+    mulw, divided with divmodw, and the quotient must fit in 64 bits.
+    """
+    numerator = 1
+    for factor in numeratorFactors:
+        numerator *= factor
+        if numerator > UINT128_MAX:
+            raise LogicError("* overflowed")
+
+    denominator = 1
+    for factor in denominatorFactors:
+        denominator *= factor
+        if denominator > UINT128_MAX:
+            raise LogicError("* overflowed")
+
+    if denominator == 0:
+        raise LogicError("divmodw 0")
+
+    quotient = numerator // denominator
+    # WideRatio asserts the high word of the 128-bit quotient is zero
+    _assert(quotient <= UINT64_MAX)
+    return quotient
+
+
+def xMulYDivZ(x: int, y: int, z: int) -> int:
+    return wideRatio([x, y, SCALING_FACTOR], [z, SCALING_FACTOR])
+
+
+def assessFee(amount: int, feeBps: int) -> int:
+    feeNum = _sub(FEE_DENOMINATOR, feeBps)
+    return xMulYDivZ(amount, feeNum, FEE_DENOMINATOR)
+
+
+def computeOtherTokenOutputPerGivenTokenInput(
+    inputAmount: int,
+    previousGivenTokenAmount: int,
+    previousOtherTokenAmount: int,
+    feeBps: int,
+) -> int:
+    k = _mul(previousGivenTokenAmount, previousOtherTokenAmount)
+    amountSubFee = assessFee(inputAmount, feeBps)
+    return _sub(
+        previousOtherTokenAmount,
+        _div(k, _add(previousGivenTokenAmount, amountSubFee)),
+    )
+
+
+def _checkAmount(amount: int) -> None:
+    if not isinstance(amount, int) or amount < 0 or amount > UINT64_MAX:
+        raise ValueError("Amount must be a uint64: {}".format(amount))
+
+
+class SwapQuote:
+    """The outcome of a swap as computed by the approval program"""
+
+    def __init__(
+        self, tokenIn: int, amountIn: int, tokenOut: int, amountOut: int
+    ) -> None:
+        self.tokenIn = tokenIn
+        self.amountIn = amountIn
+        self.tokenOut = tokenOut
+        self.amountOut = amountOut
+
+    def __repr__(self) -> str:
+        return "SwapQuote({} of {} -> {} of {})".format(
+            self.amountIn, self.tokenIn, self.amountOut, self.tokenOut
+        )
+
+
+class SupplyQuote:
+    """The outcome of a supply as computed by the approval program.
+
+    amountA and amountB are the quantities kept by the pool, refundA and
+    refundB the quantities sent back to the supplier.
+    """
+
+    def __init__(
+        self, amountA: int, amountB: int, refundA: int, refundB: int, poolTokens: int
+    ) -> None:
+        self.amountA = amountA
+        self.amountB = amountB
+        self.refundA = refundA
+        self.refundB = refundB
+        self.poolTokens = poolTokens
+
+    def __repr__(self) -> str:
+        return "SupplyQuote(A={}, B={}, refundA={}, refundB={}, poolTokens={})".format(
+            self.amountA, self.amountB, self.refundA, self.refundB, self.poolTokens
+        )
+
+
+class WithdrawQuote:
+    """The outcome of a withdrawal as computed by the approval program"""
+
+    def __init__(self, poolTokens: int, amountA: int, amountB: int) -> None:
+        self.poolTokens = poolTokens
+        self.amountA = amountA
+        self.amountB = amountB
+
+    def __repr__(self) -> str:
+        return "WithdrawQuote(poolTokens={} -> A={}, B={})".format(
+            self.poolTokens, self.amountA, self.amountB
+        )
+
+
+class PoolSimulator:
+    """Off-chain model of a single amm pool.
+
+    The simulator reproduces the integer math of the approval program exactly,
+    including uint64 overflow panics and rejections, so groups can be quoted
+    and pre-checked without a round trip to algod. Reserves are the balances
+    held by the app account before the group is evaluated.
+
+    Only the approval program is modelled; ledger level failures such as an
+    underfunded sender or an app call fee too low to pay for the inner
+    transactions are not.
+    """
+
+    def __init__(
+        self,
+        tokenA: int,
+        tokenB: int,
+        feeBps: int,
+        minIncrement: int,
+        poolToken: Optional[int] = None,
+        reserveA: int = 0,
+        reserveB: int = 0,
+        poolTokensOutstanding: int = 0,
+        poolTokenReserve: Optional[int] = None,
+    ) -> None:
+        self.tokenA = tokenA
+        self.tokenB = tokenB
+        self.feeBps = feeBps
+        self.minIncrement = minIncrement
+        self.poolToken = poolToken
+        self.reserveA = reserveA
+        self.reserveB = reserveB
+        self.poolTokensOutstanding = poolTokensOutstanding
+        if poolTokenReserve is None and poolToken is not None:
+            poolTokenReserve = POOL_TOKEN_DEFAULT_AMOUNT - poolTokensOutstanding
+        self.poolTokenReserve = poolTokenReserve
+
+    @classmethod
+    def fromState(
+        cls,
+        appGlobalState: Dict[bytes, Union[int, bytes]],
+        appBalances: Optional[Dict[int, int]] = None,
+    ) -> "PoolSimulator":
+        """Build a simulator from chain state.
+
+        Args:
+            appGlobalState: The app global state, as returned by getAppGlobalState.
+            appBalances (optional): The balances of the app account, as returned
+                by getBalances. Defaults to the reserves the contract mirrors in
+                its global state.
+        """
+        tokenA = appGlobalState[b"token_a_key"]
+        tokenB = appGlobalState[b"token_b_key"]
+        poolToken = appGlobalState.get(b"pool_token_key")
+        if appBalances is None:
+            # the pool token reserve follows from the amount outstanding
+            appBalances = {
+                tokenA: appGlobalState.get(b"reserve_a_key", 0),
+                tokenB: appGlobalState.get(b"reserve_b_key", 0),
+            }
+        return cls(
+            tokenA=tokenA,
+            tokenB=tokenB,
+            feeBps=appGlobalState[b"fee_bps_key"],
+            minIncrement=appGlobalState[b"min_increment_key"],
+            poolToken=poolToken,
+            reserveA=appBalances.get(tokenA, 0),
+            reserveB=appBalances.get(tokenB, 0),
+            poolTokensOutstanding=appGlobalState.get(b"pool_tokens_outstanding_key", 0),
+            poolTokenReserve=None if poolToken is None else appBalances.get(poolToken),
+        )
+
+    def copy(self) -> "PoolSimulator":
+        return PoolSimulator(
+            tokenA=self.tokenA,
+            tokenB=self.tokenB,
+            feeBps=self.feeBps,
+            minIncrement=self.minIncrement,
+            poolToken=self.poolToken,
+            reserveA=self.reserveA,
+            reserveB=self.reserveB,
+            poolTokensOutstanding=self.poolTokensOutstanding,
+            poolTokenReserve=self.poolTokenReserve,
+        )
+
+    def _assertSetUp(self) -> None:
+        _assert(self.poolToken is not None, "pool token id doesn't exist")
+
+    def quoteSwap(self, tokenId: int, amount: int) -> SwapQuote:
+        """Compute the result of swapping amount of tokenId, as get_swap_program does.
+
+        Raises:
+            LogicError: if the approval program would fail the group.
+        """
+        _checkAmount(amount)
+        _assert(self.poolTokensOutstanding > 0)
+        _assert(tokenId in (self.tokenA, self.tokenB) and amount > 0)
+
+        if tokenId == self.tokenA:
+            # the asset transfer lands before the app call is evaluated
+            _add(self.reserveA, amount)
+            givenBefore, otherBefore = self.reserveA, self.reserveB
+            tokenOut = self.tokenB
+        else:
+            _add(self.reserveB, amount)
+            givenBefore, otherBefore = self.reserveB, self.reserveA
+            tokenOut = self.tokenA
+
+        toSend = computeOtherTokenOutputPerGivenTokenInput(
+            amount, givenBefore, otherBefore, self.feeBps
+        )
+        _assert(toSend > 0 and toSend < otherBefore)
+
+        return SwapQuote(tokenId, amount, tokenOut, toSend)
+
+    def swap(self, tokenId: int, amount: int) -> SwapQuote:
+        """Like quoteSwap, but also applies the swap to the simulated reserves."""
+        quote = self.quoteSwap(tokenId, amount)
+        if tokenId == self.tokenA:
+            self.reserveA += amount
+            self.reserveB -= quote.amountOut
+        else:
+            self.reserveB += amount
+            self.reserveA -= quote.amountOut
+        return quote
+
+    def _tryTakeAdjustedAmounts(
+        self,
+        toKeepTxnAmt: int,
+        toKeepBeforeTxnAmt: int,
+        otherTxnAmt: int,
+        otherBeforeTxnAmt: int,
+    ) -> Optional[List[int]]:
+        """Mirror one attempt of get_supply_program to keep all of a token.
+
+        Returns [remainder, poolTokens] when the adjusted amounts are taken, or
+        None when the attempt fails.
+        """
+        otherCorrespondingAmount = xMulYDivZ(
+            toKeepTxnAmt, otherBeforeTxnAmt, toKeepBeforeTxnAmt
+        )
+        if not (
+            otherCorrespondingAmount > 0 and otherTxnAmt >= otherCorrespondingAmount
+        ):
+            return None
+
+        remainder = _sub(otherTxnAmt, otherCorrespondingAmount)
+        poolTokens = xMulYDivZ(
+            self.poolTokensOutstanding, toKeepTxnAmt, toKeepBeforeTxnAmt
+        )
+        return [remainder, poolTokens]
+
+    def quoteSupply(self, qA: int, qB: int) -> SupplyQuote:
+        """Compute the result of supplying qA of token A and qB of token B.
+
+        Raises:
+            LogicError: if the approval program would fail the group.
+        """
+        _checkAmount(qA)
+        _checkAmount(qB)
+        self._assertSetUp()
+        _assert(
+            self.poolTokenReserve is not None
+            and self.poolTokenReserve > 0
+            and qA > 0
+            and qB > 0
+            and qA >= self.minIncrement
+            and qB >= self.minIncrement
+        )
+        _add(self.reserveA, qA)
+        _add(self.reserveB, qB)
+
+        refundA = refundB = 0
+        if self.reserveA == 0 or self.reserveB == 0:
+            # no liquidity yet, take everything
+            poolTokens = isqrt(_mul(qA, qB))
+        else:
+            adjusted = self._tryTakeAdjustedAmounts(
+                qA, self.reserveA, qB, self.reserveB
+            )
+            if adjusted is not None:
+                refundB, poolTokens = adjusted
+            else:
+                adjusted = self._tryTakeAdjustedAmounts(
+                    qB, self.reserveB, qA, self.reserveA
+                )
+                if adjusted is None:
+                    raise LogicError("rejected")
+                refundA, poolTokens = adjusted
+
+        # mintAndSendPoolToken transfers from the app's pool token holding
+        _sub(self.poolTokenReserve, poolTokens)
+        _add(self.poolTokensOutstanding, poolTokens)
+
+        return SupplyQuote(qA - refundA, qB - refundB, refundA, refundB, poolTokens)
+
+    def supply(self, qA: int, qB: int) -> SupplyQuote:
+        """Like quoteSupply, but also applies the supply to the simulated pool."""
+        quote = self.quoteSupply(qA, qB)
+        self.reserveA += quote.amountA
+        self.reserveB += quote.amountB
+        self.poolTokensOutstanding += quote.poolTokens
+        self.poolTokenReserve -= quote.poolTokens
+        return quote
+
+    def _withdrawGivenPoolToken(self, holding: int, poolTokenAmount: int) -> int:
+        if not (self.poolTokensOutstanding > 0 and poolTokenAmount > 0 and holding > 0):
+            return 0
+        toSend = xMulYDivZ(holding, poolTokenAmount, self.poolTokensOutstanding)
+        _assert(toSend > 0)
+        # the inner transfer cannot send more than the app holds
+        _sub(holding, toSend)
+        return toSend
+
+    def quoteWithdraw(self, poolTokenAmount: int) -> WithdrawQuote:
+        """Compute the tokens returned for poolTokenAmount pool tokens.
+
+        Raises:
+            LogicError: if the approval program would fail the group.
+        """
+        _checkAmount(poolTokenAmount)
+        self._assertSetUp()
+        _assert(self.reserveA > 0 and self.reserveB > 0 and poolTokenAmount > 0)
+
+        amountA = self._withdrawGivenPoolToken(self.reserveA, poolTokenAmount)
+        amountB = self._withdrawGivenPoolToken(self.reserveB, poolTokenAmount)
+        _sub(self.poolTokensOutstanding, poolTokenAmount)
+
+        return WithdrawQuote(poolTokenAmount, amountA, amountB)
+
+    def withdraw(self, poolTokenAmount: int) -> WithdrawQuote:
+        """Like quoteWithdraw, but also applies the withdrawal to the simulated pool."""
+        quote = self.quoteWithdraw(poolTokenAmount)
+        self.reserveA -= quote.amountA
+        self.reserveB -= quote.amountB
+        self.poolTokensOutstanding -= poolTokenAmount
+        self.poolTokenReserve += poolTokenAmount
+        return quote
+
+    def __repr__(self) -> str:
+        return "PoolSimulator(A={}:{}, B={}:{}, outstanding={}, feeBps={})".format(
+            self.tokenA,
+            self.reserveA,
+            self.tokenB,
+            self.reserveB,
+            self.poolTokensOutstanding,
+            self.feeBps,
+        )
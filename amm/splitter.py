@@ -0,0 +1,316 @@
+from typing import List, Optional, Tuple
+from math import sqrt
+
+from algosdk.future import transaction
+
+from .account import Account
+from .confirmation import ConfirmationTracker
+from .registry import PoolRegistry, RegisteredPool
+from .router import MAX_HOPS, Hop, Router
+from .simulator import FEE_DENOMINATOR, LogicError, PoolSimulator
+
+# at most this many swaps fit in one group
+MAX_LEGS = MAX_HOPS
+
+
+class Split:
+    """An order split into parallel swaps of the same pair"""
+
+    def __init__(self, legs: List[Hop]) -> None:
+        if not legs:
+            raise ValueError("A split needs at least one leg")
+        self.legs = legs
+
+    @property
+    def tokenIn(self) -> int:
+        return self.legs[0].tokenIn
+
+    @property
+    def tokenOut(self) -> int:
+        return self.legs[0].tokenOut
+
+    @property
+    def amountIn(self) -> int:
+        return sum(leg.amountIn for leg in self.legs)
+
+    @property
+    def amountOut(self) -> int:
+        return sum(leg.amountOut for leg in self.legs)
+
+    def appIDs(self) -> List[int]:
+        return [leg.pool.appID for leg in self.legs]
+
+    def __len__(self) -> int:
+        return len(self.legs)
+
+    def __repr__(self) -> str:
+        return "Split({} of {} -> {} of {} via {})".format(
+            self.amountIn,
+            self.tokenIn,
+            self.amountOut,
+            self.tokenOut,
+            [(leg.pool.appID, leg.amountIn) for leg in self.legs],
+        )
+
+
+def _quote(simulator: PoolSimulator, tokenIn: int, amount: int) -> int:
+    if amount == 0:
+        return 0
+    try:
+        return simulator.quoteSwap(tokenIn, amount).amountOut
+    except LogicError:
+        # a leg the contract would reject is worth nothing
+        return -1
+
+
+def _reserves(simulator: PoolSimulator, tokenIn: int) -> Tuple[int, int]:
+    if tokenIn == simulator.tokenA:
+        return simulator.reserveA, simulator.reserveB
+    return simulator.reserveB, simulator.reserveA
+
+
+def optimalAllocation(
+    simulators: List[PoolSimulator], tokenIn: int, amount: int
+) -> List[float]:
+    """Compute the output-maximizing split of amount across constant-product pools.
+
+    A pool with reserves (x, y) and fee multiplier g returns
+    y * g * a / (x + g * a) for an input a. At the optimum every pool that is
+    used has the same marginal output, which gives each a closed form:
+    a = (sqrt(x * y * g / m) - x) / g for the common marginal output m. Pools
+    are added in order of their marginal output at 0 until the next one would
+    not be used.
+
+    Returns:
+        The real-valued input of each pool, in the order of simulators.
+    """
+    params = []
+    for i, simulator in enumerate(simulators):
+        reserveIn, reserveOut = _reserves(simulator, tokenIn)
+        g = (FEE_DENOMINATOR - simulator.feeBps) / FEE_DENOMINATOR
+        if reserveIn > 0 and reserveOut > 0 and g > 0:
+            params.append((reserveOut * g / reserveIn, i, reserveIn, reserveOut, g))
+    params.sort(reverse=True)
+
+    allocation = [0.0] * len(simulators)
+    if not params:
+        return allocation
+
+    # inverse square root of the common marginal output for the first k pools
+    scale = 0.0
+    for k in range(1, len(params) + 1):
+        active = params[:k]
+        total = amount + sum(x / g for _, _, x, _, g in active)
+        candidate = total / sum(sqrt(x * y * g) / g for _, _, x, y, g in active)
+        _, _, x, y, g = active[-1]
+        if k > 1 and sqrt(x * y * g) * candidate <= x:
+            break
+        scale = candidate
+        used = active
+
+    for _, i, x, y, g in used:
+        allocation[i] = max(0.0, (sqrt(x * y * g) * scale - x) / g)
+    return allocation
+
+
+def _integerAllocation(allocation: List[float], amount: int) -> List[int]:
+    amounts = [int(a) for a in allocation]
+    # hand out what flooring lost to the largest fractional parts
+    remainder = amount - sum(amounts)
+    byFraction = sorted(
+        range(len(allocation)), key=lambda i: allocation[i] - amounts[i], reverse=True
+    )
+    for i in byFraction[: max(remainder, 0)]:
+        amounts[i] += 1
+    # float error can leave the total off by a few units
+    largest = max(range(len(amounts)), key=lambda i: amounts[i])
+    amounts[largest] += amount - sum(amounts)
+    return amounts
+
+
+def _refine(
+    simulators: List[PoolSimulator], tokenIn: int, amounts: List[int]
+) -> List[int]:
+    """Move input between pools while that increases the exact total output.
+
+    The closed form ignores integer rounding in the contract, so the exact
+    outputs are improved by moving decreasing steps from one leg to another.
+    """
+    amounts = list(amounts)
+    outputs = [_quote(s, tokenIn, a) for s, a in zip(simulators, amounts)]
+    n = len(simulators)
+
+    # rounding makes the exact output uneven at small scales, so the step
+    # schedule is repeated until a whole pass finds nothing to move
+    improvedPass = True
+    while improvedPass:
+        improvedPass = False
+        step = max(amounts) // 8
+        while step >= 1:
+            improved = True
+            while improved:
+                improved = False
+                for i in range(n):
+                    if amounts[i] < step:
+                        continue
+                    for j in range(n):
+                        if i == j:
+                            continue
+                        outI = _quote(simulators[i], tokenIn, amounts[i] - step)
+                        outJ = _quote(simulators[j], tokenIn, amounts[j] + step)
+                        if outI < 0 or outJ < 0:
+                            continue
+                        if outI + outJ > outputs[i] + outputs[j]:
+                            amounts[i] -= step
+                            amounts[j] += step
+                            outputs[i], outputs[j] = outI, outJ
+                            improved = improvedPass = True
+                            break
+            step //= 2
+
+    return amounts
+
+
+def splitOrder(
+    pools: List[RegisteredPool], tokenIn: int, amount: int, maxLegs: int = MAX_LEGS
+) -> Optional[Split]:
+    """Split a swap across pools of the same pair to get the most output.
+
+    The split starts from the closed-form optimum for constant-product pools,
+    keeps the maxLegs largest legs, and is then improved with the approval
+    program's exact integer math. It is never worse than the best single pool,
+    which is what a single swap would get.
+
+    Args:
+        pools: Pools that all trade tokenIn for the same other token.
+        tokenIn: The token to sell.
+        amount: The amount of tokenIn to sell.
+        maxLegs (optional): The maximum number of pools to use.
+
+    Returns:
+        The split, or None if no pool can take the order.
+    """
+    if not 1 <= maxLegs <= MAX_LEGS:
+        raise ValueError("maxLegs must be between 1 and {}".format(MAX_LEGS))
+    if amount <= 0:
+        raise ValueError("amount must be positive")
+
+    simulators = [pool.simulator() for pool in pools]
+    pairs = {frozenset((s.tokenA, s.tokenB)) for s in simulators}
+    if len(pairs) > 1 or any(tokenIn not in pair for pair in pairs):
+        raise ValueError("Pools must all trade the same pair, including tokenIn")
+
+    allocation = optimalAllocation(simulators, tokenIn, amount)
+    legs = sorted(range(len(pools)), key=lambda i: allocation[i], reverse=True)
+    legs = [i for i in legs[:maxLegs] if allocation[i] > 0]
+
+    # every single pool is a candidate too, so that a split is never worse
+    candidates = [
+        [amount if j == i else 0 for j in range(len(pools))] for i in range(len(pools))
+    ]
+    if len(legs) > 1:
+        # the pools left out get nothing, so split the whole amount again
+        legSimulators = [simulators[i] for i in legs]
+        legAllocation = optimalAllocation(legSimulators, tokenIn, amount)
+        legAmounts = _refine(
+            legSimulators, tokenIn, _integerAllocation(legAllocation, amount)
+        )
+        amounts = [0] * len(pools)
+        for i, legAmount in zip(legs, legAmounts):
+            amounts[i] = legAmount
+        candidates.append(amounts)
+
+    best, bestOutput = None, 0
+    for amounts in candidates:
+        outputs = [_quote(s, tokenIn, a) for s, a in zip(simulators, amounts)]
+        if min(outputs) >= 0 and sum(outputs) > bestOutput:
+            best, bestOutput = (amounts, outputs), sum(outputs)
+
+    if best is None:
+        return None
+
+    (tokenOut,) = next(iter(pairs)).difference({tokenIn})
+    return Split(
+        [
+            Hop(pool, tokenIn, amountIn, tokenOut, amountOut)
+            for pool, amountIn, amountOut in zip(pools, *best)
+            if amountIn > 0
+        ]
+    )
+
+
+class Splitter:
+    """Swaps across every pool of a pair at once, in one atomic group.
+
+    Each leg uses the same swap transactions as AmmPool.buildSwap.
+    """
+
+    def __init__(
+        self,
+        registry: PoolRegistry,
+        maxLegs: int = MAX_LEGS,
+        tracker: Optional[ConfirmationTracker] = None,
+    ) -> None:
+        if not 1 <= maxLegs <= MAX_LEGS:
+            raise ValueError("maxLegs must be between 1 and {}".format(MAX_LEGS))
+
+        self.registry = registry
+        self.maxLegs = maxLegs
+        self.router = Router(registry, tracker=tracker)
+
+    def quote(self, tokenIn: int, tokenOut: int, amount: int) -> Split:
+        """Find the best split of a swap across the pools of a pair.
+
+        Raises:
+            ValueError: if no pool of the pair can take the order.
+        """
+        pools = self.registry.poolsForPair(tokenIn, tokenOut)
+        split = splitOrder(pools, tokenIn, amount, self.maxLegs) if pools else None
+        if split is None:
+            raise ValueError(
+                "No pool swaps {} of {} for {}".format(amount, tokenIn, tokenOut)
+            )
+        return split
+
+    def buildSplit(
+        self, trader: str, split: Split, sp: transaction.SuggestedParams
+    ) -> List[transaction.Transaction]:
+        """Build the unsigned group that swaps every leg of a split."""
+        return self.router.buildSwaps(trader, split.legs, sp)
+
+    def swap(
+        self,
+        trader: Account,
+        tokenIn: int,
+        tokenOut: int,
+        amount: int,
+        minAmountOut: int = 0,
+        sp: Optional[transaction.SuggestedParams] = None,
+    ) -> Split:
+        """Swap amount of tokenIn for tokenOut across the pools of the pair.
+
+        Args:
+            trader: The account that sends tokenIn and receives tokenOut.
+            tokenIn: The token to sell.
+            tokenOut: The token to buy.
+            amount: The amount of tokenIn to sell.
+            minAmountOut (optional): Do not submit the group if the split is
+                quoted to return less tokenOut than this.
+            sp (optional): The suggested params of the group.
+
+        Returns:
+            The split that was executed.
+        """
+        split = self.quote(tokenIn, tokenOut, amount)
+        if split.amountOut < minAmountOut:
+            raise ValueError(
+                "Best split returns {}, less than {}".format(
+                    split.amountOut, minAmountOut
+                )
+            )
+
+        txns = self.buildSplit(
+            trader.getAddress(), split, sp or self.router.client.suggested_params()
+        )
+        self.router.wait(self.router.send(txns, trader))
+        return split
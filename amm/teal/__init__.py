@@ -0,0 +1,3 @@
+"""Offline tools for the TEAL programs of the amm."""
+
+from .assembler import assemble, TealAssemblyError
@@ -0,0 +1,476 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+import base64
+
+from algosdk import encoding
+
+from .opcodes import ARRAY_FORMS, FIELDS, NAMED_INTS, OPS, SHORT_FORMS, OpSpec
+
+DEFAULT_VERSION = 1
+
+# from this version on, constants used once are pushed with pushint/pushbytes
+# and the constant blocks are sorted by how often each constant is used
+OPTIMIZE_CONSTANTS_VERSION = 4
+
+
+class TealAssemblyError(Exception):
+    """Raised when a program cannot be assembled."""
+
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__("{}: {}".format(line, message))
+        self.line = line
+
+
+class _Instruction(NamedTuple):
+    line: int
+    op: str
+    args: List[str]
+
+
+def encodeVaruint(value: int) -> bytes:
+    """Encode an unsigned integer as a little-endian base 128 varint."""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _tokenize(line: str) -> List[str]:
+    """Split a line into whitespace separated fields, keeping quoted strings
+    whole and dropping comments."""
+    fields = []
+    i = 0
+    n = len(line)
+    while i < n:
+        c = line[i]
+        if c.isspace():
+            i += 1
+            continue
+        if line.startswith("//", i):
+            break
+        start = i
+        inString = False
+        while i < n:
+            c = line[i]
+            if inString:
+                if c == "\\":
+                    i += 1
+                elif c == '"':
+                    inString = False
+            elif c == '"':
+                inString = True
+            elif c.isspace():
+                break
+            i += 1
+        fields.append(line[start:i])
+    return fields
+
+
+def _parseInt(line: int, token: str) -> int:
+    if token in NAMED_INTS:
+        return NAMED_INTS[token]
+    try:
+        if len(token) > 1 and token[0] == "0" and token[1].isdigit():
+            # Go style octal literal
+            value = int(token, 8)
+        else:
+            value = int(token, 0)
+    except ValueError:
+        raise TealAssemblyError(line, "unable to parse {!r} as integer".format(token))
+    if not 0 <= value < 2 ** 64:
+        raise TealAssemblyError(line, "integer {} out of range".format(token))
+    return value
+
+
+def _parseString(line: int, token: str) -> bytes:
+    if len(token) < 2 or token[-1] != '"':
+        raise TealAssemblyError(line, "unterminated string {}".format(token))
+    body = token[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(body):
+        c = body[i]
+        if c != "\\":
+            out += c.encode("utf-8")
+            i += 1
+            continue
+        if i + 1 >= len(body):
+            raise TealAssemblyError(line, "invalid escape in {}".format(token))
+        e = body[i + 1]
+        if e == "n":
+            out.append(0x0A)
+        elif e == "r":
+            out.append(0x0D)
+        elif e == "t":
+            out.append(0x09)
+        elif e == "\\":
+            out.append(0x5C)
+        elif e == '"':
+            out.append(0x22)
+        elif e == "x" and i + 3 < len(body):
+            out.append(int(body[i + 2 : i + 4], 16))
+            i += 2
+        else:
+            raise TealAssemblyError(line, "invalid escape in {}".format(token))
+        i += 2
+    return bytes(out)
+
+
+def _parseBytes(line: int, args: List[str]) -> Tuple[bytes, int]:
+    """Parse a byte string argument.
+
+    Returns:
+        The bytes and the number of fields it used.
+    """
+    if len(args) == 0:
+        raise TealAssemblyError(line, "missing byte string")
+    arg = args[0]
+
+    for prefix, decode in (
+        ("base64", base64.b64decode),
+        ("b64", base64.b64decode),
+        ("base32", lambda s: base64.b32decode(s + "=" * (-len(s) % 8))),
+        ("b32", lambda s: base64.b32decode(s + "=" * (-len(s) % 8))),
+    ):
+        try:
+            if arg == prefix:
+                if len(args) < 2:
+                    raise TealAssemblyError(line, "{} needs a value".format(prefix))
+                return decode(args[1]), 2
+            if arg.startswith(prefix + "(") and arg.endswith(")"):
+                return decode(arg[len(prefix) + 1 : -1]), 1
+        except ValueError:
+            raise TealAssemblyError(line, "invalid {} value".format(prefix))
+
+    if arg.startswith("0x"):
+        try:
+            return bytes.fromhex(arg[2:]), 1
+        except ValueError:
+            raise TealAssemblyError(line, "invalid hex value {}".format(arg))
+
+    if arg.startswith('"'):
+        return _parseString(line, arg), 1
+
+    raise TealAssemblyError(line, "unable to parse byte string {}".format(arg))
+
+
+class _Constants:
+    """The int or byte constants referenced by a program, and how each
+    reference is encoded."""
+
+    def __init__(self, kind: str, explicit: Optional[List[Any]]) -> None:
+        self.kind = kind
+        self.explicit = explicit
+        self.values: List[Any] = []
+        self.counts: List[int] = []
+        self.block: List[Any] = []
+
+    def reference(self, value: Any) -> None:
+        for i, existing in enumerate(self.values):
+            if existing == value:
+                self.counts[i] += 1
+                return
+        self.values.append(value)
+        self.counts.append(1)
+
+    def layout(self, version: int, line: int) -> None:
+        if self.explicit is not None and version >= OPTIMIZE_CONSTANTS_VERSION:
+            # pseudo-ops are pushed rather than looked up in a block from the
+            # source
+            self.block = []
+        elif self.explicit is not None:
+            self.block = self.explicit
+            for value in self.values:
+                if value not in self.block:
+                    raise TealAssemblyError(
+                        line,
+                        "{} constant {!r} is not in the {}cblock".format(
+                            self.kind, value, self.kind
+                        ),
+                    )
+        elif version >= OPTIMIZE_CONSTANTS_VERSION:
+            # stable sort, so ties keep the order of first use
+            order = sorted(range(len(self.values)), key=lambda i: -self.counts[i])
+            self.block = [self.values[i] for i in order if self.counts[i] > 1]
+        else:
+            self.block = list(self.values)
+
+    def encode(self, value: Any) -> bytes:
+        if value not in self.block:
+            if self.kind == "int":
+                return bytes([OPS["pushint"].opcode]) + encodeVaruint(value)
+            return bytes([OPS["pushbytes"].opcode]) + encodeVaruint(len(value)) + value
+
+        index = self.block.index(value)
+        if index < 4:
+            return bytes([OPS["{}c_{}".format(self.kind, index)].opcode])
+        return bytes([OPS["{}c".format(self.kind)].opcode, index])
+
+    def _encodeValues(self, values: List[Any]) -> bytes:
+        out = bytearray(encodeVaruint(len(values)))
+        for value in values:
+            if self.kind == "int":
+                out += encodeVaruint(value)
+            else:
+                out += encodeVaruint(len(value)) + value
+        return bytes(out)
+
+    def encodeBlock(self) -> bytes:
+        """Encode the block that is prepended to the program, if any."""
+        if self.explicit is not None or len(self.block) == 0:
+            return b""
+        opcode = OPS["{}cblock".format(self.kind)].opcode
+        return bytes([opcode]) + self._encodeValues(self.block)
+
+    def encodeExplicitBlock(self) -> bytes:
+        """Encode the immediates of an intcblock or bytecblock in the source."""
+        assert self.explicit is not None
+        return self._encodeValues(self.explicit)
+
+
+def _parse(source: str) -> Tuple[int, List[_Instruction], Dict[str, int]]:
+    version: Optional[int] = None
+    instructions: List[_Instruction] = []
+    # label name -> index of the instruction that follows it
+    labels: Dict[str, int] = {}
+
+    for lineNumber, text in enumerate(source.splitlines(), start=1):
+        stripped = text.strip()
+        if stripped.startswith("#pragma"):
+            fields = stripped.split()
+            if len(fields) != 3 or fields[1] != "version":
+                raise TealAssemblyError(lineNumber, "unknown pragma")
+            if version is not None or len(instructions) > 0:
+                raise TealAssemblyError(lineNumber, "#pragma version must come first")
+            version = _parseInt(lineNumber, fields[2])
+            continue
+
+        fields = _tokenize(text)
+        while len(fields) > 0 and fields[0].endswith(":"):
+            label = fields.pop(0)[:-1]
+            if label in labels:
+                raise TealAssemblyError(lineNumber, "duplicate label " + label)
+            labels[label] = len(instructions)
+        if len(fields) == 0:
+            continue
+
+        op, args = fields[0], fields[1:]
+        if op in ARRAY_FORMS and len(args) == len(OPS[op].immediates) + 1:
+            op = ARRAY_FORMS[op]
+        instructions.append(_Instruction(lineNumber, op, args))
+
+    return version or DEFAULT_VERSION, instructions, labels
+
+
+def _field(line: int, kind: str, name: str, version: int) -> int:
+    field = FIELDS[kind].get(name)
+    if field is None:
+        raise TealAssemblyError(line, "unknown {} field {}".format(kind, name))
+    if field.version > version:
+        raise TealAssemblyError(
+            line, "{} field {} needs version {}".format(kind, name, field.version)
+        )
+    return field.index
+
+
+def _uint8(line: int, token: str) -> int:
+    value = _parseInt(line, token)
+    if value > 255:
+        raise TealAssemblyError(line, "immediate {} is not a byte".format(token))
+    return value
+
+
+def _spec(ins: _Instruction, version: int) -> OpSpec:
+    spec = OPS.get(ins.op)
+    if spec is None:
+        raise TealAssemblyError(ins.line, "unknown opcode " + ins.op)
+    if spec.version > version:
+        raise TealAssemblyError(
+            ins.line, "{} needs version {}".format(ins.op, spec.version)
+        )
+    return spec
+
+
+class AssembledProgram(NamedTuple):
+    version: int
+    instructions: List[_Instruction]
+    # label name -> index of the instruction that follows it
+    labels: Dict[str, int]
+    # the version and constant blocks
+    header: bytes
+    # the bytecode of each instruction
+    pieces: List[bytes]
+
+    def bytecode(self) -> bytes:
+        return self.header + b"".join(self.pieces)
+
+
+def assembleProgram(source: str) -> AssembledProgram:
+    """Assemble a TEAL program, keeping the bytecode of each instruction.
+
+    See assemble.
+    """
+    version, instructions, labels = _parse(source)
+
+    explicitInts: Optional[List[int]] = None
+    explicitBytes: Optional[List[bytes]] = None
+    for ins in instructions:
+        if ins.op == "intcblock":
+            explicitInts = [_parseInt(ins.line, arg) for arg in ins.args]
+        elif ins.op == "bytecblock":
+            explicitBytes = []
+            args = ins.args
+            while len(args) > 0:
+                value, used = _parseBytes(ins.line, args)
+                explicitBytes.append(value)
+                args = args[used:]
+
+    ints = _Constants("int", explicitInts)
+    byteses = _Constants("byte", explicitBytes)
+
+    # resolve the constants of each pseudo-op
+    constants: List[Optional[Union[int, bytes]]] = []
+    for ins in instructions:
+        value: Optional[Union[int, bytes]] = None
+        if ins.op == "int":
+            if len(ins.args) != 1:
+                raise TealAssemblyError(ins.line, "int needs one argument")
+            value = _parseInt(ins.line, ins.args[0])
+            ints.reference(value)
+        elif ins.op == "byte":
+            value, used = _parseBytes(ins.line, ins.args)
+            if used != len(ins.args):
+                raise TealAssemblyError(ins.line, "byte needs one argument")
+            byteses.reference(value)
+        elif ins.op == "addr":
+            if len(ins.args) != 1:
+                raise TealAssemblyError(ins.line, "addr needs one argument")
+            try:
+                value = encoding.decode_address(ins.args[0])
+            except Exception:
+                raise TealAssemblyError(ins.line, "invalid address " + ins.args[0])
+            byteses.reference(value)
+        constants.append(value)
+
+    lastLine = instructions[-1].line if instructions else 0
+    ints.layout(version, lastLine)
+    byteses.layout(version, lastLine)
+
+    # every instruction's size is known once constants are laid out, so
+    # branches can be resolved in a second pass
+    pieces: List[bytes] = []
+    branches: List[Tuple[int, int, str]] = []
+    for ins, value in zip(instructions, constants):
+        if ins.op == "int":
+            pieces.append(ints.encode(value))
+            continue
+        if ins.op in ("byte", "addr"):
+            pieces.append(byteses.encode(value))
+            continue
+
+        spec = _spec(ins, version)
+
+        # "intc 1" assembles as "intc_1", and likewise for bytec and arg
+        if ins.op in SHORT_FORMS and len(ins.args) == 1:
+            index = _uint8(ins.line, ins.args[0])
+            if ins.op != "arg":
+                block = ints if ins.op == "intc" else byteses
+                if index >= len(block.explicit or block.block):
+                    raise TealAssemblyError(
+                        ins.line, "{} {} is not defined".format(ins.op, index)
+                    )
+            if index < 4:
+                pieces.append(bytes([OPS["{}_{}".format(ins.op, index)].opcode]))
+                continue
+
+        out = bytearray([spec.opcode])
+
+        immediates = spec.immediates
+        if immediates in (("varuints",), ("byteses",)):
+            if ins.op == "intcblock":
+                out += ints.encodeExplicitBlock()
+            else:
+                out += byteses.encodeExplicitBlock()
+            pieces.append(bytes(out))
+            continue
+
+        args = list(ins.args)
+        for kind in immediates:
+            if len(args) == 0:
+                raise TealAssemblyError(
+                    ins.line, "{} expects {} immediates".format(ins.op, len(immediates))
+                )
+            if kind == "bytes":
+                data, used = _parseBytes(ins.line, args)
+                out += encodeVaruint(len(data)) + data
+                args = args[used:]
+                continue
+
+            arg = args.pop(0)
+            if kind == "uint8":
+                out.append(_uint8(ins.line, arg))
+            elif kind == "varuint":
+                out += encodeVaruint(_parseInt(ins.line, arg))
+            elif kind == "label":
+                if arg not in labels:
+                    raise TealAssemblyError(
+                        ins.line, "reference to undefined label " + arg
+                    )
+                branches.append((len(pieces), labels[arg], arg))
+                out += b"\x00\x00"
+            else:
+                out.append(_field(ins.line, kind, arg, version))
+        if len(args) > 0:
+            raise TealAssemblyError(
+                ins.line, "{} expects {} immediates".format(ins.op, len(immediates))
+            )
+
+        pieces.append(bytes(out))
+
+    # pc of each instruction, and of the end of the program
+    offsets = [0]
+    for piece in pieces:
+        offsets.append(offsets[-1] + len(piece))
+
+    for index, target, label in branches:
+        # offsets are relative to the end of the branch instruction
+        offset = offsets[target] - offsets[index + 1]
+        if offset < 0 and version < 4:
+            raise TealAssemblyError(
+                instructions[index].line, "backward branch to {}".format(label)
+            )
+        if not -(2 ** 15) <= offset < 2 ** 15:
+            raise TealAssemblyError(
+                instructions[index].line, "branch to {} is too far".format(label)
+            )
+        piece = pieces[index]
+        pieces[index] = piece[:-2] + (offset & 0xFFFF).to_bytes(2, "big")
+
+    header = encodeVaruint(version) + ints.encodeBlock() + byteses.encodeBlock()
+    return AssembledProgram(version, instructions, labels, header, pieces)
+
+
+def assemble(source: str) -> bytes:
+    """Assemble a TEAL program into bytecode.
+
+    The output is the same as algod's compile endpoint for the opcodes in
+    amm.teal.opcodes.OPS. The int and byte pseudo-ops are laid out the way
+    algod does: from version 4, constants used more than once go in an
+    intcblock or bytecblock ordered by use count, and constants used once are
+    pushed.
+
+    Args:
+        source: The TEAL source.
+
+    Returns:
+        The program bytecode.
+
+    Raises:
+        TealAssemblyError: The program uses an unsupported opcode or is
+            malformed.
+    """
+    return assembleProgram(source).bytecode()
@@ -0,0 +1,1383 @@
+"""Evaluate TEAL application programs against an in-memory ledger.
+
+The evaluator runs the instructions of an assembled program the way algod's
+AVM does for the opcodes an application like the amm uses, including inner
+transactions, and counts the opcode budget used. It is meant for testing and
+benchmarking programs offline: resource availability (the foreign arrays) is
+not checked, local state is not supported, and the only inner transactions
+that can be submitted are payments, asset transfers and asset creations.
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from copy import deepcopy
+from math import isqrt
+import hashlib
+
+from algosdk import encoding
+from algosdk.logic import get_application_address
+
+from .assembler import AssembledProgram, assembleProgram, _parseBytes, _parseInt
+from .opcodes import NAMED_INTS
+from .profile import opcodeCost
+
+UINT64_MAX = 2 ** 64 - 1
+# the opcode budget of each app call in a group
+APP_BUDGET = 700
+MIN_TXN_FEE = 1000
+MIN_BALANCE = 100_000
+MAX_INNER_TXNS = 16
+ZERO_ADDRESS = bytes(32)
+
+Value = Union[int, bytes]
+
+# transaction fields with byte string values; the others are uints
+BYTES_FIELDS = {
+    "Sender",
+    "Note",
+    "Lease",
+    "Receiver",
+    "CloseRemainderTo",
+    "VotePK",
+    "SelectionPK",
+    "Type",
+    "AssetSender",
+    "AssetReceiver",
+    "AssetCloseTo",
+    "TxID",
+    "ApplicationArgs",
+    "Accounts",
+    "ApprovalProgram",
+    "ClearStateProgram",
+    "RekeyTo",
+    "ConfigAssetUnitName",
+    "ConfigAssetName",
+    "ConfigAssetURL",
+    "ConfigAssetMetadataHash",
+    "ConfigAssetManager",
+    "ConfigAssetReserve",
+    "ConfigAssetFreeze",
+    "ConfigAssetClawback",
+    "FreezeAssetAccount",
+    "Logs",
+}
+ADDRESS_FIELDS = {
+    "Sender",
+    "Receiver",
+    "CloseRemainderTo",
+    "AssetSender",
+    "AssetReceiver",
+    "AssetCloseTo",
+    "RekeyTo",
+    "ConfigAssetManager",
+    "ConfigAssetReserve",
+    "ConfigAssetFreeze",
+    "ConfigAssetClawback",
+    "FreezeAssetAccount",
+}
+ARRAY_FIELDS = {"ApplicationArgs", "Accounts", "Assets", "Applications", "Logs"}
+
+TYPE_NAMES = {
+    1: b"pay",
+    2: b"keyreg",
+    3: b"acfg",
+    4: b"axfer",
+    5: b"afrz",
+    6: b"appl",
+}
+
+
+class TealEvalError(Exception):
+    """Raised when a program fails: it panics, or the ledger rejects one of its
+    inner transactions."""
+
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__("{}: {}".format(line, message))
+        self.line = line
+        self.message = message
+
+
+class LedgerError(Exception):
+    """Raised when a transaction cannot be applied to a Ledger."""
+
+
+def appAddress(appID: int) -> bytes:
+    """The address of an application account, as 32 bytes."""
+    return encoding.decode_address(get_application_address(appID))
+
+
+class App:
+    def __init__(
+        self,
+        creator: bytes,
+        globalState: Optional[Dict[bytes, Value]] = None,
+        approvalProgram: bytes = b"",
+        clearStateProgram: bytes = b"",
+    ) -> None:
+        self.creator = creator
+        self.globalState = globalState or {}
+        self.approvalProgram = approvalProgram
+        self.clearStateProgram = clearStateProgram
+
+
+class Ledger:
+    """Accounts, assets and apps, keyed by 32 byte addresses and integer IDs.
+
+    An account holds an asset, i.e. is opted into it, if it has an entry in
+    holdings, even if the amount is 0.
+    """
+
+    def __init__(self) -> None:
+        self.algos: Dict[bytes, int] = {}
+        self.holdings: Dict[Tuple[bytes, int], int] = {}
+        # asset params by asset params field name, e.g. AssetTotal
+        self.assets: Dict[int, Dict[str, Value]] = {}
+        self.apps: Dict[int, App] = {}
+        self.round = 1
+        self.timestamp = 0
+        self.nextID = 1
+
+    def copy(self) -> "Ledger":
+        return deepcopy(self)
+
+    def commit(self, other: "Ledger") -> None:
+        """Replace the contents of this ledger with those of a copy."""
+        self.__dict__.update(other.__dict__)
+
+    def allocateID(self) -> int:
+        allocated = self.nextID
+        self.nextID += 1
+        return allocated
+
+    def pay(
+        self,
+        sender: bytes,
+        receiver: bytes,
+        amount: int,
+        closeTo: bytes = ZERO_ADDRESS,
+    ) -> None:
+        balance = self.algos.get(sender, 0)
+        if balance < amount:
+            raise LedgerError("overspend: balance {} < {}".format(balance, amount))
+        self.algos[sender] = balance - amount
+        self.algos[receiver] = self.algos.get(receiver, 0) + amount
+        if closeTo != ZERO_ADDRESS:
+            self.algos[closeTo] = self.algos.get(closeTo, 0) + self.algos.pop(sender)
+
+    def chargeFee(self, sender: bytes, fee: int) -> None:
+        balance = self.algos.get(sender, 0)
+        if balance < fee:
+            raise LedgerError("overspend: balance {} < fee {}".format(balance, fee))
+        self.algos[sender] = balance - fee
+
+    def transferAsset(
+        self,
+        sender: bytes,
+        receiver: bytes,
+        assetID: int,
+        amount: int,
+        closeTo: bytes = ZERO_ADDRESS,
+    ) -> None:
+        if assetID not in self.assets:
+            raise LedgerError("asset {} does not exist".format(assetID))
+
+        if (
+            sender == receiver
+            and amount == 0
+            and (sender, assetID) not in self.holdings
+        ):
+            # opt in
+            self.holdings[(sender, assetID)] = 0
+            return
+
+        if (sender, assetID) not in self.holdings:
+            raise LedgerError("sender is not opted in to asset {}".format(assetID))
+        if (receiver, assetID) not in self.holdings:
+            raise LedgerError("receiver is not opted in to asset {}".format(assetID))
+        balance = self.holdings[(sender, assetID)]
+        if balance < amount:
+            raise LedgerError(
+                "underflow on asset {}: {} < {}".format(assetID, balance, amount)
+            )
+        self.holdings[(sender, assetID)] = balance - amount
+        self.holdings[(receiver, assetID)] += amount
+
+        if closeTo != ZERO_ADDRESS:
+            if (closeTo, assetID) not in self.holdings:
+                raise LedgerError(
+                    "close to is not opted in to asset {}".format(assetID)
+                )
+            self.holdings[(closeTo, assetID)] += self.holdings.pop((sender, assetID))
+
+    def createAsset(self, creator: bytes, params: Dict[str, Value]) -> int:
+        assetID = self.allocateID()
+        params = dict(params)
+        params["AssetCreator"] = creator
+        self.assets[assetID] = params
+        self.holdings[(creator, assetID)] = params.get("AssetTotal", 0)
+        return assetID
+
+    def minBalance(self, address: bytes) -> int:
+        assets = sum(1 for holder, _ in self.holdings if holder == address)
+        return MIN_BALANCE * (1 + assets)
+
+
+def defaultField(name: str) -> Any:
+    if name in ARRAY_FIELDS:
+        return []
+    if name in ADDRESS_FIELDS:
+        return ZERO_ADDRESS
+    if name in BYTES_FIELDS:
+        return b""
+    return 0
+
+
+class EvalResult(NamedTuple):
+    approved: bool
+    # why the program failed, or None if it approved or returned 0
+    error: Optional[str]
+    cost: int
+    opcodes: int
+    # the fields of each submitted inner transaction
+    innerTxns: List[Dict[str, Any]]
+    logs: List[bytes]
+
+
+class _Instruction(NamedTuple):
+    line: int
+    op: str
+    immediates: List[Any]
+
+
+def _prepare(program: AssembledProgram) -> List[_Instruction]:
+    prepared = []
+    for ins in program.instructions:
+        args = ins.args
+        immediates: List[Any]
+        if ins.op in ("int", "pushint"):
+            immediates = [_parseInt(ins.line, args[0])]
+        elif ins.op in ("byte", "pushbytes"):
+            immediates = [_parseBytes(ins.line, args)[0]]
+        elif ins.op == "addr":
+            immediates = [encoding.decode_address(args[0])]
+        elif ins.op == "intcblock":
+            immediates = [[_parseInt(ins.line, arg) for arg in args]]
+        elif ins.op == "bytecblock":
+            values = []
+            while args:
+                value, used = _parseBytes(ins.line, args)
+                values.append(value)
+                args = args[used:]
+            immediates = [values]
+        elif ins.op in ("b", "bz", "bnz", "callsub"):
+            immediates = [program.labels[args[0]]]
+        else:
+            immediates = [
+                int(arg) if arg.isdigit() else NAMED_INTS.get(arg, arg) for arg in args
+            ]
+        prepared.append(_Instruction(ins.line, ins.op, immediates))
+    return prepared
+
+
+class _Panic(Exception):
+    pass
+
+
+class _Evaluation:
+    def __init__(
+        self,
+        program: AssembledProgram,
+        ledger: Ledger,
+        group: List[Dict[str, Any]],
+        groupIndex: int,
+        appID: int,
+        budget: int,
+        feeCredit: int,
+    ) -> None:
+        self.program = program
+        self.ledger = ledger
+        self.group = group
+        self.groupIndex = groupIndex
+        self.txn = group[groupIndex]
+        self.appID = appID
+        self.appAddr = appAddress(appID)
+        self.budget = budget
+        self.feeCredit = feeCredit
+
+        self.stack: List[Value] = []
+        self.scratch: List[Value] = [0] * 256
+        self.callStack: List[int] = []
+        self.intc: List[int] = []
+        self.bytec: List[bytes] = []
+        self.pc = 0
+        self.cost = 0
+        self.opcodes = 0
+
+        self.pendingInner: Optional[Dict[str, Any]] = None
+        # earlier transactions of the inner group being built, from itxn_next
+        self.pendingGroup: List[Dict[str, Any]] = []
+        # the last inner group submitted
+        self.lastGroup: List[Dict[str, Any]] = []
+        self.innerTxns: List[Dict[str, Any]] = []
+        self.logs: List[bytes] = []
+
+    # stack helpers
+
+    def pop(self) -> Value:
+        if not self.stack:
+            raise _Panic("stack underflow")
+        return self.stack.pop()
+
+    def popUint(self) -> int:
+        value = self.pop()
+        if not isinstance(value, int):
+            raise _Panic("expected uint64 but got []byte")
+        return value
+
+    def popBytes(self) -> bytes:
+        value = self.pop()
+        if not isinstance(value, bytes):
+            raise _Panic("expected []byte but got uint64")
+        return value
+
+    def push(self, value: Value) -> None:
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, int) and not 0 <= value <= UINT64_MAX:
+            raise _Panic("uint64 overflow" if value > 0 else "- would result negative")
+        if isinstance(value, bytes) and len(value) > 4096:
+            raise _Panic("byte string too long")
+        if len(self.stack) >= 1000:
+            raise _Panic("stack overflow")
+        self.stack.append(value)
+
+    # references
+
+    def account(self, value: Value) -> bytes:
+        if isinstance(value, bytes):
+            if len(value) != 32:
+                raise _Panic("invalid address")
+            return value
+        if value == 0:
+            return self.txn["Sender"]
+        accounts = self.txn.get("Accounts", [])
+        if value > len(accounts):
+            raise _Panic("invalid Accounts index {}".format(value))
+        return accounts[value - 1]
+
+    def asset(self, value: int) -> int:
+        assets = self.txn.get("Assets", [])
+        # IDs in the foreign assets take precedence over offsets into them
+        if value not in assets and value < len(assets):
+            return assets[value]
+        return value
+
+    def app(self, value: int) -> int:
+        if value == 0:
+            return self.appID
+        applications = self.txn.get("Applications", [])
+        if value not in applications and value <= len(applications):
+            return applications[value - 1]
+        return value
+
+    def field(self, txn: Dict[str, Any], name: str, index: Optional[int] = None):
+        if name == "NumAppArgs":
+            return len(txn.get("ApplicationArgs", []))
+        if name == "NumAccounts":
+            return len(txn.get("Accounts", []))
+        if name == "NumAssets":
+            return len(txn.get("Assets", []))
+        if name == "NumApplications":
+            return len(txn.get("Applications", []))
+        if name == "NumLogs":
+            return len(txn.get("Logs", []))
+        if name == "Type" and "Type" not in txn:
+            return TYPE_NAMES.get(txn.get("TypeEnum", 0), b"")
+
+        value = txn.get(name, defaultField(name))
+        if name in ARRAY_FIELDS:
+            if index is None:
+                raise _Panic("{} is an array field".format(name))
+            if name == "Accounts":
+                # Accounts 0 is the sender
+                value = [txn.get("Sender", ZERO_ADDRESS)] + list(value)
+            if index >= len(value):
+                raise _Panic("invalid {} index {}".format(name, index))
+            return value[index]
+        if index is not None:
+            raise _Panic("{} is not an array field".format(name))
+        return value
+
+    def groupTxn(self, index: int) -> Dict[str, Any]:
+        if index >= len(self.group):
+            raise _Panic("gtxn lookup {} beyond group size".format(index))
+        txn = dict(self.group[index])
+        txn.setdefault("GroupIndex", index)
+        return txn
+
+    def globalField(self, name: str) -> Value:
+        if name == "MinTxnFee":
+            return MIN_TXN_FEE
+        if name == "MinBalance":
+            return MIN_BALANCE
+        if name == "MaxTxnLife":
+            return 1000
+        if name == "ZeroAddress":
+            return ZERO_ADDRESS
+        if name == "GroupSize":
+            return len(self.group)
+        if name == "LogicSigVersion":
+            return self.program.version
+        if name == "Round":
+            return self.ledger.round
+        if name == "LatestTimestamp":
+            return self.ledger.timestamp
+        if name == "CurrentApplicationID":
+            return self.appID
+        if name == "CreatorAddress":
+            return self.ledger.apps[self.appID].creator
+        if name == "CurrentApplicationAddress":
+            return self.appAddr
+        if name == "GroupID":
+            return self.txn.get("Group", bytes(32))
+        if name == "OpcodeBudget":
+            return self.budget - self.cost
+        raise _Panic("unsupported global field " + name)
+
+    # inner transactions
+
+    def nextInner(self) -> None:
+        if self.pendingInner is None:
+            raise _Panic("itxn_next without itxn_begin")
+        self.pendingGroup.append(self.pendingInner)
+        self.pendingInner = {"Sender": self.appAddr, "Fee": MIN_TXN_FEE}
+
+    def submitInner(self) -> None:
+        if self.pendingInner is None:
+            raise _Panic("itxn_submit without itxn_begin")
+        group = self.pendingGroup + [self.pendingInner]
+        if len(self.innerTxns) + len(group) > MAX_INNER_TXNS:
+            raise _Panic("too many inner transactions")
+        self.pendingInner = None
+        self.pendingGroup = []
+
+        # fees below the minimum are paid by the surplus of the outer group
+        # and of the rest of the inner group
+        credit = self.feeCredit + sum(txn["Fee"] - MIN_TXN_FEE for txn in group)
+        if credit < 0:
+            raise _Panic("fee too small")
+        self.feeCredit = credit
+
+        # the group is atomic because any failure fails the whole program
+        for txn in group:
+            self.executeInner(txn)
+        self.lastGroup = group
+
+    def executeInner(self, txn: Dict[str, Any]) -> None:
+        typeEnum = txn.get("TypeEnum", 0)
+        if "Type" in txn:
+            names = {name: enum for enum, name in TYPE_NAMES.items()}
+            typeEnum = names.get(txn["Type"], 0)
+        txn["TypeEnum"] = typeEnum
+        txn["Type"] = TYPE_NAMES.get(typeEnum, b"")
+
+        sender = txn["Sender"]
+        if sender != self.appAddr:
+            raise _Panic("unauthorized inner transaction sender")
+
+        ledger = self.ledger
+        try:
+            ledger.chargeFee(sender, txn["Fee"])
+            if typeEnum == 1:
+                ledger.pay(
+                    sender,
+                    txn.get("Receiver", ZERO_ADDRESS),
+                    txn.get("Amount", 0),
+                    txn.get("CloseRemainderTo", ZERO_ADDRESS),
+                )
+            elif typeEnum == 4:
+                if txn.get("AssetSender", ZERO_ADDRESS) != ZERO_ADDRESS:
+                    raise _Panic("clawback transfers are not supported")
+                ledger.transferAsset(
+                    sender,
+                    txn.get("AssetReceiver", ZERO_ADDRESS),
+                    txn.get("XferAsset", 0),
+                    txn.get("AssetAmount", 0),
+                    txn.get("AssetCloseTo", ZERO_ADDRESS),
+                )
+            elif typeEnum == 3 and txn.get("ConfigAsset", 0) == 0:
+                params = {
+                    "Asset" + name[len("ConfigAsset") :]: value
+                    for name, value in txn.items()
+                    if name.startswith("ConfigAsset")
+                }
+                txn["CreatedAssetID"] = ledger.createAsset(sender, params)
+            else:
+                raise _Panic("unsupported inner transaction type {}".format(typeEnum))
+            if ledger.algos.get(sender, 0) < ledger.minBalance(sender):
+                raise LedgerError("balance below min balance")
+        except LedgerError as e:
+            raise _Panic(str(e))
+
+        self.innerTxns.append(txn)
+
+    # evaluation
+
+    def run(self, instructions: List[_Instruction]) -> bool:
+        while self.pc < len(instructions):
+            ins = instructions[self.pc]
+            self.cost += opcodeCost(ins.op, self.program.version)
+            self.opcodes += 1
+            if self.cost > self.budget:
+                raise _Panic("dynamic cost budget exceeded")
+
+            self.pc += 1
+            handler = _HANDLERS.get(ins.op)
+            if handler is None:
+                raise _Panic("unsupported opcode " + ins.op)
+            result = handler(self, ins.immediates)
+            if result is not None:
+                return result
+
+        # falling off the end returns the top of the stack
+        return self.finish()
+
+    def finish(self) -> bool:
+        if len(self.stack) != 1:
+            raise _Panic("stack len is {} instead of 1".format(len(self.stack)))
+        value = self.stack[0]
+        if not isinstance(value, int):
+            raise _Panic("stack finished with bytes not int")
+        return value != 0
+
+
+def _binary(operation: Callable[[int, int], int]) -> Callable:
+    def handler(ev: _Evaluation, immediates: List[Any]) -> None:
+        b = ev.popUint()
+        a = ev.popUint()
+        ev.push(operation(a, b))
+
+    return handler
+
+
+def _div(a: int, b: int) -> int:
+    if b == 0:
+        raise _Panic("/ 0")
+    return a // b
+
+
+def _mod(a: int, b: int) -> int:
+    if b == 0:
+        raise _Panic("% 0")
+    return a % b
+
+
+def _eq(ev: _Evaluation, immediates: List[Any]) -> None:
+    b = ev.pop()
+    a = ev.pop()
+    if type(a) != type(b):
+        raise _Panic("cannot compare uint64 to []byte")
+    ev.push(a == b)
+
+
+def _neq(ev: _Evaluation, immediates: List[Any]) -> None:
+    _eq(ev, immediates)
+    ev.push(1 - ev.popUint())
+
+
+def _mulw(ev: _Evaluation, immediates: List[Any]) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    product = a * b
+    ev.push(product >> 64)
+    ev.push(product & UINT64_MAX)
+
+
+def _addw(ev: _Evaluation, immediates: List[Any]) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    total = a + b
+    ev.push(total >> 64)
+    ev.push(total & UINT64_MAX)
+
+
+def _divmodw(ev: _Evaluation, immediates: List[Any]) -> None:
+    divisorLow = ev.popUint()
+    divisorHigh = ev.popUint()
+    dividendLow = ev.popUint()
+    dividendHigh = ev.popUint()
+    divisor = (divisorHigh << 64) | divisorLow
+    if divisor == 0:
+        raise _Panic("/ 0")
+    quotient, remainder = divmod((dividendHigh << 64) | dividendLow, divisor)
+    ev.push(quotient >> 64)
+    ev.push(quotient & UINT64_MAX)
+    ev.push(remainder >> 64)
+    ev.push(remainder & UINT64_MAX)
+
+
+def _expw(ev: _Evaluation, immediates: List[Any]) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    if a == 0 and b == 0:
+        raise _Panic("0^0 is undefined")
+    result = a ** b
+    if result > 2 ** 128 - 1:
+        raise _Panic("expw overflow")
+    ev.push(result >> 64)
+    ev.push(result & UINT64_MAX)
+
+
+def _exp(a: int, b: int) -> int:
+    if a == 0 and b == 0:
+        raise _Panic("0^0 is undefined")
+    return a ** b
+
+
+def _shl(a: int, b: int) -> int:
+    if b > 63:
+        raise _Panic("shl arg too big")
+    return (a << b) & UINT64_MAX
+
+
+def _shr(a: int, b: int) -> int:
+    if b > 63:
+        raise _Panic("shr arg too big")
+    return a >> b
+
+
+def _unary(operation: Callable[[Value], Value], kind: str = "uint") -> Callable:
+    def handler(ev: _Evaluation, immediates: List[Any]) -> None:
+        value = ev.popUint() if kind == "uint" else ev.popBytes()
+        ev.push(operation(value))
+
+    return handler
+
+
+def _btoi(value: bytes) -> int:
+    if len(value) > 8:
+        raise _Panic("btoi arg too long")
+    return int.from_bytes(value, "big")
+
+
+def _bitlen(ev: _Evaluation, immediates: List[Any]) -> None:
+    value = ev.pop()
+    if isinstance(value, bytes):
+        value = int.from_bytes(value, "big")
+    ev.push(value.bit_length())
+
+
+def _byteMath(operation: Callable[[int, int], int]) -> Callable:
+    def handler(ev: _Evaluation, immediates: List[Any]) -> None:
+        b = ev.popBytes()
+        a = ev.popBytes()
+        if len(a) > 64 or len(b) > 64:
+            raise _Panic("math attempted on large byte-array")
+        ev.push(operation(int.from_bytes(a, "big"), int.from_bytes(b, "big")))
+
+    return handler
+
+
+def _byteArith(operation: Callable[[int, int], int]) -> Callable:
+    def handler(ev: _Evaluation, immediates: List[Any]) -> None:
+        b = ev.popBytes()
+        a = ev.popBytes()
+        if len(a) > 64 or len(b) > 64:
+            raise _Panic("math attempted on large byte-array")
+        result = operation(int.from_bytes(a, "big"), int.from_bytes(b, "big"))
+        if result < 0:
+            raise _Panic("byte math would have negative result")
+        ev.push(result.to_bytes((result.bit_length() + 7) // 8, "big"))
+
+    return handler
+
+
+def _byteBitwise(operation: Callable[[int, int], int]) -> Callable:
+    def handler(ev: _Evaluation, immediates: List[Any]) -> None:
+        b = ev.popBytes()
+        a = ev.popBytes()
+        size = max(len(a), len(b))
+        result = operation(int.from_bytes(a, "big"), int.from_bytes(b, "big"))
+        ev.push(result.to_bytes(size, "big"))
+
+    return handler
+
+
+def _bnot(ev: _Evaluation, immediates: List[Any]) -> None:
+    value = ev.popBytes()
+    ev.push(bytes(~b & 0xFF for b in value))
+
+
+def _bdiv(a: int, b: int) -> int:
+    if b == 0:
+        raise _Panic("division by zero")
+    return a // b
+
+
+def _bmod(a: int, b: int) -> int:
+    if b == 0:
+        raise _Panic("modulo by zero")
+    return a % b
+
+
+def _hash(name: str) -> Callable:
+    def handler(ev: _Evaluation, immediates: List[Any]) -> None:
+        value = ev.popBytes()
+        if name == "keccak256":
+            from Cryptodome.Hash import keccak
+
+            ev.push(keccak.new(data=value, digest_bits=256).digest())
+        else:
+            ev.push(hashlib.new(name, value).digest())
+
+    return handler
+
+
+def _constant(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(immediates[0])
+
+
+def _intcblock(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.intc = immediates[0]
+
+
+def _bytecblock(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.bytec = immediates[0]
+
+
+def _intc(index: Optional[int] = None) -> Callable:
+    def handler(ev: _Evaluation, immediates: List[Any]) -> None:
+        i = immediates[0] if index is None else index
+        if i >= len(ev.intc):
+            raise _Panic("intc {} beyond {} constants".format(i, len(ev.intc)))
+        ev.push(ev.intc[i])
+
+    return handler
+
+
+def _bytec(index: Optional[int] = None) -> Callable:
+    def handler(ev: _Evaluation, immediates: List[Any]) -> None:
+        i = immediates[0] if index is None else index
+        if i >= len(ev.bytec):
+            raise _Panic("bytec {} beyond {} constants".format(i, len(ev.bytec)))
+        ev.push(ev.bytec[i])
+
+    return handler
+
+
+def _err(ev: _Evaluation, immediates: List[Any]) -> None:
+    raise _Panic("err opcode executed")
+
+
+def _return(ev: _Evaluation, immediates: List[Any]) -> bool:
+    value = ev.popUint()
+    ev.stack = [value]
+    return value != 0
+
+
+def _assert(ev: _Evaluation, immediates: List[Any]) -> None:
+    if ev.popUint() == 0:
+        raise _Panic("assert failed")
+
+
+def _bnz(ev: _Evaluation, immediates: List[Any]) -> None:
+    if ev.popUint() != 0:
+        ev.pc = immediates[0]
+
+
+def _bz(ev: _Evaluation, immediates: List[Any]) -> None:
+    if ev.popUint() == 0:
+        ev.pc = immediates[0]
+
+
+def _b(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.pc = immediates[0]
+
+
+def _callsub(ev: _Evaluation, immediates: List[Any]) -> None:
+    if len(ev.callStack) >= 1024:
+        raise _Panic("call stack overflow")
+    ev.callStack.append(ev.pc)
+    ev.pc = immediates[0]
+
+
+def _retsub(ev: _Evaluation, immediates: List[Any]) -> None:
+    if not ev.callStack:
+        raise _Panic("retsub with empty callstack")
+    ev.pc = ev.callStack.pop()
+
+
+def _pop(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.pop()
+
+
+def _dup(ev: _Evaluation, immediates: List[Any]) -> None:
+    value = ev.pop()
+    ev.push(value)
+    ev.push(value)
+
+
+def _dup2(ev: _Evaluation, immediates: List[Any]) -> None:
+    b = ev.pop()
+    a = ev.pop()
+    for value in (a, b, a, b):
+        ev.push(value)
+
+
+def _dig(ev: _Evaluation, immediates: List[Any]) -> None:
+    depth = immediates[0]
+    if depth >= len(ev.stack):
+        raise _Panic("dig {} with stack size {}".format(depth, len(ev.stack)))
+    ev.push(ev.stack[-1 - depth])
+
+
+def _swap(ev: _Evaluation, immediates: List[Any]) -> None:
+    b = ev.pop()
+    a = ev.pop()
+    ev.push(b)
+    ev.push(a)
+
+
+def _select(ev: _Evaluation, immediates: List[Any]) -> None:
+    condition = ev.popUint()
+    b = ev.pop()
+    a = ev.pop()
+    ev.push(b if condition != 0 else a)
+
+
+def _cover(ev: _Evaluation, immediates: List[Any]) -> None:
+    depth = immediates[0]
+    if depth >= len(ev.stack):
+        raise _Panic("cover {} with stack size {}".format(depth, len(ev.stack)))
+    value = ev.stack.pop()
+    ev.stack.insert(len(ev.stack) - depth, value)
+
+
+def _uncover(ev: _Evaluation, immediates: List[Any]) -> None:
+    depth = immediates[0]
+    if depth >= len(ev.stack):
+        raise _Panic("uncover {} with stack size {}".format(depth, len(ev.stack)))
+    ev.stack.append(ev.stack.pop(-1 - depth))
+
+
+def _load(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(ev.scratch[immediates[0]])
+
+
+def _store(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.scratch[immediates[0]] = ev.pop()
+
+
+def _loads(ev: _Evaluation, immediates: List[Any]) -> None:
+    slot = ev.popUint()
+    if slot > 255:
+        raise _Panic("invalid scratch space slot")
+    ev.push(ev.scratch[slot])
+
+
+def _stores(ev: _Evaluation, immediates: List[Any]) -> None:
+    value = ev.pop()
+    slot = ev.popUint()
+    if slot > 255:
+        raise _Panic("invalid scratch space slot")
+    ev.scratch[slot] = value
+
+
+def _len(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(len(ev.popBytes()))
+
+
+def _itob(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(ev.popUint().to_bytes(8, "big"))
+
+
+def _concat(ev: _Evaluation, immediates: List[Any]) -> None:
+    b = ev.popBytes()
+    a = ev.popBytes()
+    ev.push(a + b)
+
+
+def _slice(value: bytes, start: int, end: int) -> bytes:
+    if end < start or end > len(value):
+        raise _Panic("substring range beyond length of string")
+    return value[start:end]
+
+
+def _substring(ev: _Evaluation, immediates: List[Any]) -> None:
+    value = ev.popBytes()
+    ev.push(_slice(value, immediates[0], immediates[1]))
+
+
+def _substring3(ev: _Evaluation, immediates: List[Any]) -> None:
+    end = ev.popUint()
+    start = ev.popUint()
+    value = ev.popBytes()
+    ev.push(_slice(value, start, end))
+
+
+def _extract(ev: _Evaluation, immediates: List[Any]) -> None:
+    value = ev.popBytes()
+    start, length = immediates
+    if length == 0:
+        length = len(value) - start
+    ev.push(_slice(value, start, start + length))
+
+
+def _extract3(ev: _Evaluation, immediates: List[Any]) -> None:
+    length = ev.popUint()
+    start = ev.popUint()
+    value = ev.popBytes()
+    ev.push(_slice(value, start, start + length))
+
+
+def _extractUint(size: int) -> Callable:
+    def handler(ev: _Evaluation, immediates: List[Any]) -> None:
+        start = ev.popUint()
+        value = ev.popBytes()
+        ev.push(int.from_bytes(_slice(value, start, start + size), "big"))
+
+    return handler
+
+
+def _getbyte(ev: _Evaluation, immediates: List[Any]) -> None:
+    index = ev.popUint()
+    value = ev.popBytes()
+    if index >= len(value):
+        raise _Panic("getbyte index beyond array length")
+    ev.push(value[index])
+
+
+def _setbyte(ev: _Evaluation, immediates: List[Any]) -> None:
+    byte = ev.popUint()
+    index = ev.popUint()
+    value = ev.popBytes()
+    if index >= len(value):
+        raise _Panic("setbyte index beyond array length")
+    if byte > 255:
+        raise _Panic("setbyte value > 255")
+    ev.push(value[:index] + bytes([byte]) + value[index + 1 :])
+
+
+def _getbit(ev: _Evaluation, immediates: List[Any]) -> None:
+    index = ev.popUint()
+    value = ev.pop()
+    if isinstance(value, int):
+        if index > 63:
+            raise _Panic("getbit index > 63 with uint")
+        ev.push((value >> index) & 1)
+    else:
+        if index >= len(value) * 8:
+            raise _Panic("getbit index beyond byteslice")
+        ev.push((value[index // 8] >> (7 - index % 8)) & 1)
+
+
+def _setbit(ev: _Evaluation, immediates: List[Any]) -> None:
+    bit = ev.popUint()
+    index = ev.popUint()
+    value = ev.pop()
+    if bit > 1:
+        raise _Panic("setbit value > 1")
+    if isinstance(value, int):
+        if index > 63:
+            raise _Panic("setbit index > 63 with uint")
+        ev.push((value & ~(1 << index)) | (bit << index))
+    else:
+        if index >= len(value) * 8:
+            raise _Panic("setbit index beyond byteslice")
+        data = bytearray(value)
+        mask = 1 << (7 - index % 8)
+        data[index // 8] = (data[index // 8] & ~mask) | (mask if bit else 0)
+        ev.push(bytes(data))
+
+
+def _bzero(ev: _Evaluation, immediates: List[Any]) -> None:
+    length = ev.popUint()
+    if length > 4096:
+        raise _Panic("bzero attempted to create a too large string")
+    ev.push(bytes(length))
+
+
+def _txn(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(ev.field(ev.groupTxn(ev.groupIndex), *immediates))
+
+
+def _txnas(ev: _Evaluation, immediates: List[Any]) -> None:
+    index = ev.popUint()
+    ev.push(ev.field(ev.groupTxn(ev.groupIndex), immediates[0], index))
+
+
+def _gtxn(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(ev.field(ev.groupTxn(immediates[0]), *immediates[1:]))
+
+
+def _gtxnas(ev: _Evaluation, immediates: List[Any]) -> None:
+    index = ev.popUint()
+    ev.push(ev.field(ev.groupTxn(immediates[0]), immediates[1], index))
+
+
+def _gtxns(ev: _Evaluation, immediates: List[Any]) -> None:
+    groupIndex = ev.popUint()
+    ev.push(ev.field(ev.groupTxn(groupIndex), *immediates))
+
+
+def _gtxnsas(ev: _Evaluation, immediates: List[Any]) -> None:
+    index = ev.popUint()
+    groupIndex = ev.popUint()
+    ev.push(ev.field(ev.groupTxn(groupIndex), immediates[0], index))
+
+
+def _global(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(ev.globalField(immediates[0]))
+
+
+def _balance(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(ev.ledger.algos.get(ev.account(ev.pop()), 0))
+
+
+def _minBalance(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(ev.ledger.minBalance(ev.account(ev.pop())))
+
+
+def _appGlobalGet(ev: _Evaluation, immediates: List[Any]) -> None:
+    key = ev.popBytes()
+    ev.push(ev.ledger.apps[ev.appID].globalState.get(key, 0))
+
+
+def _appGlobalGetEx(ev: _Evaluation, immediates: List[Any]) -> None:
+    key = ev.popBytes()
+    app = ev.ledger.apps.get(ev.app(ev.popUint()))
+    value = None if app is None else app.globalState.get(key)
+    ev.push(0 if value is None else value)
+    ev.push(0 if value is None else 1)
+
+
+def _appGlobalPut(ev: _Evaluation, immediates: List[Any]) -> None:
+    value = ev.pop()
+    key = ev.popBytes()
+    if len(key) > 64:
+        raise _Panic("key too long")
+    ev.ledger.apps[ev.appID].globalState[key] = value
+
+
+def _appGlobalDel(ev: _Evaluation, immediates: List[Any]) -> None:
+    key = ev.popBytes()
+    ev.ledger.apps[ev.appID].globalState.pop(key, None)
+
+
+def _assetHoldingGet(ev: _Evaluation, immediates: List[Any]) -> None:
+    assetID = ev.asset(ev.popUint())
+    account = ev.account(ev.pop())
+    amount = ev.ledger.holdings.get((account, assetID))
+    if amount is None:
+        value: Value = 0
+    elif immediates[0] == "AssetBalance":
+        value = amount
+    elif immediates[0] == "AssetFrozen":
+        value = 0
+    else:
+        raise _Panic("unsupported asset holding field " + immediates[0])
+    ev.push(value)
+    ev.push(0 if amount is None else 1)
+
+
+def _assetParamsGet(ev: _Evaluation, immediates: List[Any]) -> None:
+    assetID = ev.asset(ev.popUint())
+    params = ev.ledger.assets.get(assetID)
+    name = immediates[0]
+    if params is None:
+        ev.push(0)
+        ev.push(0)
+        return
+    value = params.get(name)
+    if value is None:
+        value = defaultField("Config" + name)
+    ev.push(value)
+    ev.push(1)
+
+
+def _log(ev: _Evaluation, immediates: List[Any]) -> None:
+    value = ev.popBytes()
+    if len(ev.logs) >= 32 or sum(map(len, ev.logs)) + len(value) > 1024:
+        raise _Panic("too many log calls or log data too long")
+    ev.logs.append(value)
+
+
+def _itxnBegin(ev: _Evaluation, immediates: List[Any]) -> None:
+    if ev.pendingInner is not None:
+        raise _Panic("itxn_begin without itxn_submit")
+    ev.pendingInner = {"Sender": ev.appAddr, "Fee": MIN_TXN_FEE}
+
+
+def _itxnField(ev: _Evaluation, immediates: List[Any]) -> None:
+    if ev.pendingInner is None:
+        raise _Panic("itxn_field without itxn_begin")
+    name = immediates[0]
+    value = ev.pop()
+    expectsBytes = name in BYTES_FIELDS
+    if isinstance(value, bytes) != expectsBytes:
+        raise _Panic("{} has the wrong type".format(name))
+    if name in ADDRESS_FIELDS and len(value) != 32:
+        raise _Panic("{} must be an address".format(name))
+    if name in ARRAY_FIELDS:
+        ev.pendingInner.setdefault(name, []).append(value)
+    else:
+        ev.pendingInner[name] = value
+
+
+def _itxnNext(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.nextInner()
+
+
+def _itxnSubmit(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.submitInner()
+
+
+def _innerTxn(ev: _Evaluation, index: int) -> Dict[str, Any]:
+    if index >= len(ev.lastGroup):
+        raise _Panic("no inner transaction {} available".format(index))
+    return ev.lastGroup[index]
+
+
+def _itxn(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(ev.field(_innerTxn(ev, len(ev.lastGroup) - 1), *immediates))
+
+
+def _itxnas(ev: _Evaluation, immediates: List[Any]) -> None:
+    index = ev.popUint()
+    ev.push(ev.field(_innerTxn(ev, len(ev.lastGroup) - 1), immediates[0], index))
+
+
+def _gitxn(ev: _Evaluation, immediates: List[Any]) -> None:
+    ev.push(ev.field(_innerTxn(ev, immediates[0]), *immediates[1:]))
+
+
+def _gitxnas(ev: _Evaluation, immediates: List[Any]) -> None:
+    index = ev.popUint()
+    ev.push(ev.field(_innerTxn(ev, immediates[0]), immediates[1], index))
+
+
+def _divw(ev: _Evaluation, immediates: List[Any]) -> None:
+    divisor = ev.popUint()
+    low = ev.popUint()
+    high = ev.popUint()
+    if divisor == 0:
+        raise _Panic("/ 0")
+    ev.push((high << 64 | low) // divisor)
+
+
+def _bsqrt(ev: _Evaluation, immediates: List[Any]) -> None:
+    value = ev.popBytes()
+    if len(value) > 64:
+        raise _Panic("math attempted on large byte-array")
+    root = isqrt(int.from_bytes(value, "big"))
+    ev.push(root.to_bytes((root.bit_length() + 7) // 8, "big"))
+
+
+def _sqrt(value: int) -> int:
+    return isqrt(value)
+
+
+_HANDLERS: Dict[str, Callable[[_Evaluation, List[Any]], Optional[bool]]] = {
+    "err": _err,
+    "sha256": _hash("sha256"),
+    "keccak256": _hash("keccak256"),
+    "sha512_256": _hash("sha512_256"),
+    "+": _binary(lambda a, b: a + b),
+    "-": _binary(lambda a, b: a - b),
+    "/": _binary(_div),
+    "*": _binary(lambda a, b: a * b),
+    "<": _binary(lambda a, b: a < b),
+    ">": _binary(lambda a, b: a > b),
+    "<=": _binary(lambda a, b: a <= b),
+    ">=": _binary(lambda a, b: a >= b),
+    "&&": _binary(lambda a, b: a != 0 and b != 0),
+    "||": _binary(lambda a, b: a != 0 or b != 0),
+    "==": _eq,
+    "!=": _neq,
+    "!": _unary(lambda a: a == 0),
+    "len": _len,
+    "itob": _itob,
+    "btoi": _unary(_btoi, "bytes"),
+    "%": _binary(_mod),
+    "|": _binary(lambda a, b: a | b),
+    "&": _binary(lambda a, b: a & b),
+    "^": _binary(lambda a, b: a ^ b),
+    "~": _unary(lambda a: a ^ UINT64_MAX),
+    "mulw": _mulw,
+    "addw": _addw,
+    "divmodw": _divmodw,
+    "intcblock": _intcblock,
+    "intc": _intc(),
+    "intc_0": _intc(0),
+    "intc_1": _intc(1),
+    "intc_2": _intc(2),
+    "intc_3": _intc(3),
+    "bytecblock": _bytecblock,
+    "bytec": _bytec(),
+    "bytec_0": _bytec(0),
+    "bytec_1": _bytec(1),
+    "bytec_2": _bytec(2),
+    "bytec_3": _bytec(3),
+    "int": _constant,
+    "byte": _constant,
+    "addr": _constant,
+    "pushint": _constant,
+    "pushbytes": _constant,
+    "txn": _txn,
+    "txna": _txn,
+    "txnas": _txnas,
+    "gtxn": _gtxn,
+    "gtxna": _gtxn,
+    "gtxnas": _gtxnas,
+    "gtxns": _gtxns,
+    "gtxnsa": _gtxns,
+    "gtxnsas": _gtxnsas,
+    "global": _global,
+    "load": _load,
+    "store": _store,
+    "loads": _loads,
+    "stores": _stores,
+    "bnz": _bnz,
+    "bz": _bz,
+    "b": _b,
+    "return": _return,
+    "assert": _assert,
+    "pop": _pop,
+    "dup": _dup,
+    "dup2": _dup2,
+    "dig": _dig,
+    "swap": _swap,
+    "select": _select,
+    "cover": _cover,
+    "uncover": _uncover,
+    "concat": _concat,
+    "substring": _substring,
+    "substring3": _substring3,
+    "getbit": _getbit,
+    "setbit": _setbit,
+    "getbyte": _getbyte,
+    "setbyte": _setbyte,
+    "extract": _extract,
+    "extract3": _extract3,
+    "extract_uint16": _extractUint(2),
+    "extract_uint32": _extractUint(4),
+    "extract_uint64": _extractUint(8),
+    "balance": _balance,
+    "min_balance": _minBalance,
+    "app_global_get": _appGlobalGet,
+    "app_global_get_ex": _appGlobalGetEx,
+    "app_global_put": _appGlobalPut,
+    "app_global_del": _appGlobalDel,
+    "asset_holding_get": _assetHoldingGet,
+    "asset_params_get": _assetParamsGet,
+    "callsub": _callsub,
+    "retsub": _retsub,
+    "shl": _binary(_shl),
+    "shr": _binary(_shr),
+    "sqrt": _unary(_sqrt),
+    "bitlen": _bitlen,
+    "exp": _binary(_exp),
+    "expw": _expw,
+    "b+": _byteArith(lambda a, b: a + b),
+    "b-": _byteArith(lambda a, b: a - b),
+    "b/": _byteArith(_bdiv),
+    "b*": _byteArith(lambda a, b: a * b),
+    "b<": _byteMath(lambda a, b: a < b),
+    "b>": _byteMath(lambda a, b: a > b),
+    "b<=": _byteMath(lambda a, b: a <= b),
+    "b>=": _byteMath(lambda a, b: a >= b),
+    "b==": _byteMath(lambda a, b: a == b),
+    "b!=": _byteMath(lambda a, b: a != b),
+    "b%": _byteArith(_bmod),
+    "b|": _byteBitwise(lambda a, b: a | b),
+    "b&": _byteBitwise(lambda a, b: a & b),
+    "b^": _byteBitwise(lambda a, b: a ^ b),
+    "b~": _bnot,
+    "bzero": _bzero,
+    "log": _log,
+    "itxn_begin": _itxnBegin,
+    "itxn_field": _itxnField,
+    "itxn_submit": _itxnSubmit,
+    "itxn_next": _itxnNext,
+    "itxn": _itxn,
+    "itxna": _itxn,
+    "itxnas": _itxnas,
+    "gitxn": _gitxn,
+    "gitxna": _gitxn,
+    "gitxnas": _gitxnas,
+    "divw": _divw,
+    "bsqrt": _bsqrt,
+}
+
+
+_PREPARED: Dict[int, Tuple[AssembledProgram, List[_Instruction]]] = {}
+
+
+def evaluate(
+    program: Union[str, AssembledProgram],
+    ledger: Ledger,
+    group: List[Dict[str, Any]],
+    groupIndex: int,
+    appID: Optional[int] = None,
+    budget: Optional[int] = None,
+    feeCredit: int = 0,
+) -> EvalResult:
+    """Run an application program for one transaction of a group.
+
+    Transactions are dictionaries of their TEAL field values, e.g.
+    {"Sender": address, "TypeEnum": 4, "XferAsset": 5, "AssetAmount": 10},
+    with addresses as 32 bytes. Fields that are not given have their zero
+    value. The ledger is only changed if the program approves.
+
+    Args:
+        program: The TEAL source or assembled program.
+        ledger: The ledger to read and, if the program approves, update. The
+            app must exist in the ledger.
+        group: The transactions of the group.
+        groupIndex: The index of the app call to evaluate.
+        appID (optional): The ID of the app, if the app call creates it.
+            Defaults to the ApplicationID of the app call.
+        budget (optional): The opcode budget. Defaults to APP_BUDGET for each
+            app call in the group.
+        feeCredit (optional): The fees paid by the group beyond the minimum,
+            which pay for inner transactions with a fee below the minimum.
+
+    Returns:
+        The outcome of the program.
+    """
+    if isinstance(program, str):
+        program = assembleProgram(program)
+    cached = _PREPARED.get(id(program))
+    if cached is not None and cached[0] is program:
+        instructions = cached[1]
+    else:
+        instructions = _prepare(program)
+        if len(_PREPARED) > 64:
+            _PREPARED.clear()
+        # the program is kept so that its id is not reused
+        _PREPARED[id(program)] = (program, instructions)
+
+    if appID is None:
+        appID = group[groupIndex].get("ApplicationID", 0)
+    if budget is None:
+        budget = APP_BUDGET * sum(1 for txn in group if txn.get("TypeEnum") == 6)
+
+    work = ledger.copy()
+    evaluation = _Evaluation(program, work, group, groupIndex, appID, budget, feeCredit)
+    try:
+        approved = evaluation.run(instructions)
+        error = None
+    except _Panic as e:
+        line = instructions[evaluation.pc - 1].line if evaluation.pc else 0
+        approved = False
+        error = str(TealEvalError(line, str(e)))
+
+    if approved:
+        ledger.commit(work)
+    return EvalResult(
+        approved,
+        error,
+        evaluation.cost,
+        evaluation.opcodes,
+        evaluation.innerTxns if approved else [],
+        evaluation.logs if approved else [],
+    )
@@ -0,0 +1,424 @@
+from typing import Dict, NamedTuple, Tuple
+
+
+class OpSpec(NamedTuple):
+    """An opcode and the immediate arguments that follow it.
+
+    Immediates are given by kind:
+        uint8: a byte-sized integer
+        label: a branch target, encoded as a 2 byte offset
+        txn, itxnField, global, holding, assetParams, appParams, acctParams: a
+            field name of that group, encoded as a byte
+        varuint, bytes: a pushint or pushbytes value
+        varuints, byteses: the contents of an intcblock or bytecblock
+    """
+
+    opcode: int
+    version: int
+    immediates: Tuple[str, ...] = ()
+
+
+OPS: Dict[str, OpSpec] = {
+    "err": OpSpec(0x00, 1),
+    "sha256": OpSpec(0x01, 1),
+    "keccak256": OpSpec(0x02, 1),
+    "sha512_256": OpSpec(0x03, 1),
+    "ed25519verify": OpSpec(0x04, 1),
+    "+": OpSpec(0x08, 1),
+    "-": OpSpec(0x09, 1),
+    "/": OpSpec(0x0A, 1),
+    "*": OpSpec(0x0B, 1),
+    "<": OpSpec(0x0C, 1),
+    ">": OpSpec(0x0D, 1),
+    "<=": OpSpec(0x0E, 1),
+    ">=": OpSpec(0x0F, 1),
+    "&&": OpSpec(0x10, 1),
+    "||": OpSpec(0x11, 1),
+    "==": OpSpec(0x12, 1),
+    "!=": OpSpec(0x13, 1),
+    "!": OpSpec(0x14, 1),
+    "len": OpSpec(0x15, 1),
+    "itob": OpSpec(0x16, 1),
+    "btoi": OpSpec(0x17, 1),
+    "%": OpSpec(0x18, 1),
+    "|": OpSpec(0x19, 1),
+    "&": OpSpec(0x1A, 1),
+    "^": OpSpec(0x1B, 1),
+    "~": OpSpec(0x1C, 1),
+    "mulw": OpSpec(0x1D, 1),
+    "addw": OpSpec(0x1E, 2),
+    "divmodw": OpSpec(0x1F, 4),
+    "intcblock": OpSpec(0x20, 1, ("varuints",)),
+    "intc": OpSpec(0x21, 1, ("uint8",)),
+    "intc_0": OpSpec(0x22, 1),
+    "intc_1": OpSpec(0x23, 1),
+    "intc_2": OpSpec(0x24, 1),
+    "intc_3": OpSpec(0x25, 1),
+    "bytecblock": OpSpec(0x26, 1, ("byteses",)),
+    "bytec": OpSpec(0x27, 1, ("uint8",)),
+    "bytec_0": OpSpec(0x28, 1),
+    "bytec_1": OpSpec(0x29, 1),
+    "bytec_2": OpSpec(0x2A, 1),
+    "bytec_3": OpSpec(0x2B, 1),
+    "arg": OpSpec(0x2C, 1, ("uint8",)),
+    "arg_0": OpSpec(0x2D, 1),
+    "arg_1": OpSpec(0x2E, 1),
+    "arg_2": OpSpec(0x2F, 1),
+    "arg_3": OpSpec(0x30, 1),
+    "txn": OpSpec(0x31, 1, ("txn",)),
+    "global": OpSpec(0x32, 1, ("global",)),
+    "gtxn": OpSpec(0x33, 1, ("uint8", "txn")),
+    "load": OpSpec(0x34, 1, ("uint8",)),
+    "store": OpSpec(0x35, 1, ("uint8",)),
+    "txna": OpSpec(0x36, 2, ("txn", "uint8")),
+    "gtxna": OpSpec(0x37, 2, ("uint8", "txn", "uint8")),
+    "gtxns": OpSpec(0x38, 3, ("txn",)),
+    "gtxnsa": OpSpec(0x39, 3, ("txn", "uint8")),
+    "gload": OpSpec(0x3A, 4, ("uint8", "uint8")),
+    "gloads": OpSpec(0x3B, 4, ("uint8",)),
+    "gaid": OpSpec(0x3C, 4, ("uint8",)),
+    "gaids": OpSpec(0x3D, 4),
+    "loads": OpSpec(0x3E, 5),
+    "stores": OpSpec(0x3F, 5),
+    "bnz": OpSpec(0x40, 1, ("label",)),
+    "bz": OpSpec(0x41, 2, ("label",)),
+    "b": OpSpec(0x42, 2, ("label",)),
+    "return": OpSpec(0x43, 2),
+    "assert": OpSpec(0x44, 3),
+    "pop": OpSpec(0x48, 1),
+    "dup": OpSpec(0x49, 1),
+    "dup2": OpSpec(0x4A, 2),
+    "dig": OpSpec(0x4B, 3, ("uint8",)),
+    "swap": OpSpec(0x4C, 3),
+    "select": OpSpec(0x4D, 3),
+    "cover": OpSpec(0x4E, 5, ("uint8",)),
+    "uncover": OpSpec(0x4F, 5, ("uint8",)),
+    "concat": OpSpec(0x50, 2),
+    "substring": OpSpec(0x51, 2, ("uint8", "uint8")),
+    "substring3": OpSpec(0x52, 2),
+    "getbit": OpSpec(0x53, 3),
+    "setbit": OpSpec(0x54, 3),
+    "getbyte": OpSpec(0x55, 3),
+    "setbyte": OpSpec(0x56, 3),
+    "extract": OpSpec(0x57, 5, ("uint8", "uint8")),
+    "extract3": OpSpec(0x58, 5),
+    "extract_uint16": OpSpec(0x59, 5),
+    "extract_uint32": OpSpec(0x5A, 5),
+    "extract_uint64": OpSpec(0x5B, 5),
+    "balance": OpSpec(0x60, 2),
+    "app_opted_in": OpSpec(0x61, 2),
+    "app_local_get": OpSpec(0x62, 2),
+    "app_local_get_ex": OpSpec(0x63, 2),
+    "app_global_get": OpSpec(0x64, 2),
+    "app_global_get_ex": OpSpec(0x65, 2),
+    "app_local_put": OpSpec(0x66, 2),
+    "app_global_put": OpSpec(0x67, 2),
+    "app_local_del": OpSpec(0x68, 2),
+    "app_global_del": OpSpec(0x69, 2),
+    "asset_holding_get": OpSpec(0x70, 2, ("holding",)),
+    "asset_params_get": OpSpec(0x71, 2, ("assetParams",)),
+    "app_params_get": OpSpec(0x72, 5, ("appParams",)),
+    "acct_params_get": OpSpec(0x73, 6, ("acctParams",)),
+    "min_balance": OpSpec(0x78, 3),
+    "pushbytes": OpSpec(0x80, 3, ("bytes",)),
+    "pushint": OpSpec(0x81, 3, ("varuint",)),
+    "callsub": OpSpec(0x88, 4, ("label",)),
+    "retsub": OpSpec(0x89, 4),
+    "shl": OpSpec(0x90, 4),
+    "shr": OpSpec(0x91, 4),
+    "sqrt": OpSpec(0x92, 4),
+    "bitlen": OpSpec(0x93, 4),
+    "exp": OpSpec(0x94, 4),
+    "expw": OpSpec(0x95, 4),
+    "bsqrt": OpSpec(0x96, 6),
+    "divw": OpSpec(0x97, 6),
+    "b+": OpSpec(0xA0, 4),
+    "b-": OpSpec(0xA1, 4),
+    "b/": OpSpec(0xA2, 4),
+    "b*": OpSpec(0xA3, 4),
+    "b<": OpSpec(0xA4, 4),
+    "b>": OpSpec(0xA5, 4),
+    "b<=": OpSpec(0xA6, 4),
+    "b>=": OpSpec(0xA7, 4),
+    "b==": OpSpec(0xA8, 4),
+    "b!=": OpSpec(0xA9, 4),
+    "b%": OpSpec(0xAA, 4),
+    "b|": OpSpec(0xAB, 4),
+    "b&": OpSpec(0xAC, 4),
+    "b^": OpSpec(0xAD, 4),
+    "b~": OpSpec(0xAE, 4),
+    "bzero": OpSpec(0xAF, 4),
+    "log": OpSpec(0xB0, 5),
+    "itxn_begin": OpSpec(0xB1, 5),
+    "itxn_field": OpSpec(0xB2, 5, ("itxnField",)),
+    "itxn_submit": OpSpec(0xB3, 5),
+    "itxn": OpSpec(0xB4, 5, ("txn",)),
+    "itxna": OpSpec(0xB5, 5, ("txn", "uint8")),
+    "itxn_next": OpSpec(0xB6, 6),
+    "gitxn": OpSpec(0xB7, 6, ("uint8", "txn")),
+    "gitxna": OpSpec(0xB8, 6, ("uint8", "txn", "uint8")),
+    "txnas": OpSpec(0xC0, 5, ("txn",)),
+    "gtxnas": OpSpec(0xC1, 5, ("uint8", "txn")),
+    "gtxnsas": OpSpec(0xC2, 5, ("txn",)),
+    "args": OpSpec(0xC3, 5),
+    "itxnas": OpSpec(0xC5, 6, ("txn",)),
+    "gitxnas": OpSpec(0xC6, 6, ("uint8", "txn")),
+}
+
+# Ops that accept an extra array index as a shorthand for their "a" form,
+# e.g. "txn ApplicationArgs 0" assembles as "txna ApplicationArgs 0".
+ARRAY_FORMS = {
+    "txn": "txna",
+    "gtxn": "gtxna",
+    "gtxns": "gtxnsa",
+    "itxn": "itxna",
+    "gitxn": "gitxna",
+}
+
+# Ops with one byte encodings for their first four indices, e.g. intc_1
+SHORT_FORMS = ("intc", "bytec", "arg")
+
+# Opcode budget cost of the ops that cost more than 1
+COSTS: Dict[str, int] = {
+    "sha256": 35,
+    "keccak256": 130,
+    "sha512_256": 45,
+    "ed25519verify": 1900,
+    "divmodw": 20,
+    "sqrt": 4,
+    "expw": 10,
+    "bsqrt": 40,
+    "b+": 10,
+    "b-": 10,
+    "b/": 20,
+    "b*": 20,
+    "b%": 20,
+    "b|": 6,
+    "b&": 6,
+    "b^": 6,
+    "b~": 4,
+}
+
+# The hashes were cheaper in version 1
+V1_COSTS: Dict[str, int] = {
+    "sha256": 7,
+    "keccak256": 26,
+    "sha512_256": 9,
+}
+
+
+class Field(NamedTuple):
+    index: int
+    version: int
+    array: bool = False
+
+
+def _fields(*names: Tuple[str, int]) -> Dict[str, Field]:
+    return {name: Field(i, version) for i, (name, version) in enumerate(names)}
+
+
+TXN_FIELDS = _fields(
+    ("Sender", 1),
+    ("Fee", 1),
+    ("FirstValid", 1),
+    # rejected by the assembler until it was implemented in version 7
+    ("FirstValidTime", 7),
+    ("LastValid", 1),
+    ("Note", 1),
+    ("Lease", 1),
+    ("Receiver", 1),
+    ("Amount", 1),
+    ("CloseRemainderTo", 1),
+    ("VotePK", 1),
+    ("SelectionPK", 1),
+    ("VoteFirst", 1),
+    ("VoteLast", 1),
+    ("VoteKeyDilution", 1),
+    ("Type", 1),
+    ("TypeEnum", 1),
+    ("XferAsset", 1),
+    ("AssetAmount", 1),
+    ("AssetSender", 1),
+    ("AssetReceiver", 1),
+    ("AssetCloseTo", 1),
+    ("GroupIndex", 1),
+    ("TxID", 1),
+    ("ApplicationID", 2),
+    ("OnCompletion", 2),
+    ("ApplicationArgs", 2),
+    ("NumAppArgs", 2),
+    ("Accounts", 2),
+    ("NumAccounts", 2),
+    ("ApprovalProgram", 2),
+    ("ClearStateProgram", 2),
+    ("RekeyTo", 2),
+    ("ConfigAsset", 2),
+    ("ConfigAssetTotal", 2),
+    ("ConfigAssetDecimals", 2),
+    ("ConfigAssetDefaultFrozen", 2),
+    ("ConfigAssetUnitName", 2),
+    ("ConfigAssetName", 2),
+    ("ConfigAssetURL", 2),
+    ("ConfigAssetMetadataHash", 2),
+    ("ConfigAssetManager", 2),
+    ("ConfigAssetReserve", 2),
+    ("ConfigAssetFreeze", 2),
+    ("ConfigAssetClawback", 2),
+    ("FreezeAsset", 2),
+    ("FreezeAssetAccount", 2),
+    ("FreezeAssetFrozen", 2),
+    ("Assets", 3),
+    ("NumAssets", 3),
+    ("Applications", 3),
+    ("NumApplications", 3),
+    ("GlobalNumUint", 3),
+    ("GlobalNumByteSlice", 3),
+    ("LocalNumUint", 3),
+    ("LocalNumByteSlice", 3),
+    ("ExtraProgramPages", 4),
+    ("Nonparticipation", 5),
+    ("Logs", 5),
+    ("NumLogs", 5),
+    ("CreatedAssetID", 5),
+    ("CreatedApplicationID", 5),
+    ("LastLog", 6),
+    ("StateProofPK", 6),
+)
+for _name in ("ApplicationArgs", "Accounts", "Assets", "Applications", "Logs"):
+    TXN_FIELDS[_name] = TXN_FIELDS[_name]._replace(array=True)
+
+# the transaction fields that itxn_field can set, and the version from which
+# each can be set
+ITXN_FIELDS = {
+    name: TXN_FIELDS[name]._replace(version=version)
+    for names, version in (
+        (
+            [
+                "Sender",
+                "Fee",
+                "Receiver",
+                "Amount",
+                "CloseRemainderTo",
+                "Type",
+                "TypeEnum",
+                "XferAsset",
+                "AssetAmount",
+                "AssetSender",
+                "AssetReceiver",
+                "AssetCloseTo",
+            ]
+            + [name for name in TXN_FIELDS if name.startswith("ConfigAsset")]
+            + [name for name in TXN_FIELDS if name.startswith("FreezeAsset")],
+            5,
+        ),
+        (
+            [
+                "Note",
+                "VotePK",
+                "SelectionPK",
+                "VoteFirst",
+                "VoteLast",
+                "VoteKeyDilution",
+                "ApplicationID",
+                "OnCompletion",
+                "ApplicationArgs",
+                "Accounts",
+                "ApprovalProgram",
+                "ClearStateProgram",
+                "RekeyTo",
+                "Assets",
+                "Applications",
+                "GlobalNumUint",
+                "GlobalNumByteSlice",
+                "LocalNumUint",
+                "LocalNumByteSlice",
+                "ExtraProgramPages",
+                "Nonparticipation",
+            ],
+            6,
+        ),
+    )
+    for name in names
+}
+
+GLOBAL_FIELDS = _fields(
+    ("MinTxnFee", 1),
+    ("MinBalance", 1),
+    ("MaxTxnLife", 1),
+    ("ZeroAddress", 1),
+    ("GroupSize", 1),
+    ("LogicSigVersion", 2),
+    ("Round", 2),
+    ("LatestTimestamp", 2),
+    ("CurrentApplicationID", 2),
+    ("CreatorAddress", 3),
+    ("CurrentApplicationAddress", 5),
+    ("GroupID", 5),
+    ("OpcodeBudget", 6),
+    ("CallerApplicationID", 6),
+    ("CallerApplicationAddress", 6),
+)
+
+ASSET_HOLDING_FIELDS = _fields(("AssetBalance", 2), ("AssetFrozen", 2))
+
+ASSET_PARAMS_FIELDS = _fields(
+    ("AssetTotal", 2),
+    ("AssetDecimals", 2),
+    ("AssetDefaultFrozen", 2),
+    ("AssetUnitName", 2),
+    ("AssetName", 2),
+    ("AssetURL", 2),
+    ("AssetMetadataHash", 2),
+    ("AssetManager", 2),
+    ("AssetReserve", 2),
+    ("AssetFreeze", 2),
+    ("AssetClawback", 2),
+    ("AssetCreator", 5),
+)
+
+APP_PARAMS_FIELDS = _fields(
+    ("AppApprovalProgram", 5),
+    ("AppClearStateProgram", 5),
+    ("AppGlobalNumUint", 5),
+    ("AppGlobalNumByteSlice", 5),
+    ("AppLocalNumUint", 5),
+    ("AppLocalNumByteSlice", 5),
+    ("AppExtraProgramPages", 5),
+    ("AppCreator", 5),
+    ("AppAddress", 5),
+)
+
+ACCT_PARAMS_FIELDS = _fields(
+    ("AcctBalance", 6),
+    ("AcctMinBalance", 6),
+    ("AcctAuthAddr", 6),
+)
+
+FIELDS = {
+    "txn": TXN_FIELDS,
+    "itxnField": ITXN_FIELDS,
+    "global": GLOBAL_FIELDS,
+    "holding": ASSET_HOLDING_FIELDS,
+    "assetParams": ASSET_PARAMS_FIELDS,
+    "appParams": APP_PARAMS_FIELDS,
+    "acctParams": ACCT_PARAMS_FIELDS,
+}
+
+# names that may be used in place of an integer by the int pseudo-op
+NAMED_INTS = {
+    # OnCompletion
+    "NoOp": 0,
+    "OptIn": 1,
+    "CloseOut": 2,
+    "ClearState": 3,
+    "UpdateApplication": 4,
+    "DeleteApplication": 5,
+    # TypeEnum
+    "unknown": 0,
+    "pay": 1,
+    "keyreg": 2,
+    "acfg": 3,
+    "axfer": 4,
+    "afrz": 5,
+    "appl": 6,
+}
@@ -0,0 +1,353 @@
+"""Static opcode cost profile of a TEAL program.
+
+The profile gives the worst-case opcode budget of each branch of an
+application's dispatch: the most expensive path from the start of the program
+through the branch that handles a method (an ApplicationArgs 0 value), app
+creation, or an OnCompletion action, to the end of the program. Costs are
+computed from the assembled program without running it, so a branch's cost
+is an upper bound on what any call taking that branch can use.
+
+Usage:
+    python -m amm.teal.profile [program.teal ...]
+
+Without arguments, the amm approval program is profiled.
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import re
+import sys
+
+from .assembler import AssembledProgram, assembleProgram, _parseBytes
+from .opcodes import COSTS, V1_COSTS
+
+# OnCompletion actions reported as branches, and their names
+ON_COMPLETION_BRANCHES = {
+    "OptIn": "optin",
+    "CloseOut": "closeout",
+    "UpdateApplication": "update",
+    "DeleteApplication": "delete",
+}
+
+
+class Cost(NamedTuple):
+    cost: int
+    opcodes: int
+
+
+class BranchProfile(NamedTuple):
+    name: str
+    # worst-case opcode budget used by a call that takes the branch
+    cost: int
+    # opcodes executed on that path
+    opcodes: int
+    # instructions reachable from the branch, including subroutines
+    instructions: int
+    # bytes of bytecode of those instructions
+    size: int
+
+
+def opcodeCost(op: str, version: int) -> int:
+    if version == 1 and op in V1_COSTS:
+        return V1_COSTS[op]
+    return COSTS.get(op, 1)
+
+
+def _add(a: Optional[Cost], b: Optional[Cost]) -> Optional[Cost]:
+    if a is None or b is None:
+        return None
+    return Cost(a.cost + b.cost, a.opcodes + b.opcodes)
+
+
+def _max(*costs: Optional[Cost]) -> Optional[Cost]:
+    present = [cost for cost in costs if cost is not None]
+    return max(present) if present else None
+
+
+class _Graph:
+    def __init__(self, program: AssembledProgram) -> None:
+        self.program = program
+        self.size = len(program.instructions)
+        self.costs = [
+            Cost(opcodeCost(ins.op, program.version), 1) for ins in program.instructions
+        ]
+
+    def target(self, index: int) -> int:
+        return self.program.labels[self.program.instructions[index].args[0]]
+
+    def successors(self, index: int) -> List[int]:
+        """The instructions that can run after index in the same subroutine.
+
+        The end of the program is the index one past the last instruction.
+        """
+        op = self.program.instructions[index].op
+        if op in ("err", "return", "retsub"):
+            return []
+        if op == "b":
+            return [self.target(index)]
+        if op in ("bz", "bnz"):
+            return [index + 1, self.target(index)]
+        return [index + 1]
+
+    def order(self, dependencies: Callable[[int], List[int]]) -> List[int]:
+        """Order the instructions so that each comes after its dependencies.
+
+        Raises:
+            ValueError: if the program loops.
+        """
+        state = [0] * (self.size + 1)
+        order = []
+        for root in range(self.size + 1):
+            stack = [root]
+            while stack:
+                index = stack[-1]
+                if state[index] == 2:
+                    stack.pop()
+                elif state[index] == 1:
+                    state[index] = 2
+                    order.append(index)
+                    stack.pop()
+                else:
+                    state[index] = 1
+                    for dependency in dependencies(index):
+                        if state[dependency] == 1:
+                            line = self.program.instructions[index].line
+                            raise ValueError(
+                                "line {}: the program loops, so its cost is "
+                                "unbounded".format(line)
+                            )
+                        if state[dependency] == 0:
+                            stack.append(dependency)
+        return order
+
+    def longestPaths(self) -> List[Tuple[Optional[Cost], Optional[Cost]]]:
+        """Get the most expensive path from each instruction.
+
+        Returns:
+            For each instruction, the costs of the most expensive path to a
+            retsub of the subroutine it is in, and to the end of the program,
+            or None where there is no such path.
+        """
+        paths: List[Tuple[Optional[Cost], Optional[Cost]]] = [(None, None)] * (
+            self.size + 1
+        )
+
+        def dependencies(index: int) -> List[int]:
+            if index == self.size:
+                return []
+            if self.program.instructions[index].op == "callsub":
+                return [self.target(index), index + 1]
+            return self.successors(index)
+
+        for index in self.order(dependencies):
+            if index == self.size:
+                paths[index] = (None, Cost(0, 0))
+                continue
+
+            cost = self.costs[index]
+            op = self.program.instructions[index].op
+            if op in ("err", "return"):
+                paths[index] = (None, cost)
+            elif op == "retsub":
+                paths[index] = (cost, None)
+            elif op == "callsub":
+                subroutineReturn, subroutineExit = paths[self.target(index)]
+                afterReturn, afterExit = paths[index + 1]
+                paths[index] = (
+                    _add(_add(cost, subroutineReturn), afterReturn),
+                    _max(
+                        _add(cost, subroutineExit),
+                        _add(_add(cost, subroutineReturn), afterExit),
+                    ),
+                )
+            else:
+                successors = [paths[s] for s in self.successors(index)]
+                paths[index] = (
+                    _add(cost, _max(*[s[0] for s in successors])),
+                    _add(cost, _max(*[s[1] for s in successors])),
+                )
+        return paths
+
+    def longestPrefixes(
+        self, paths: List[Tuple[Optional[Cost], Optional[Cost]]]
+    ) -> List[Optional[Cost]]:
+        """Get the most expensive path from the start of the program to each
+        instruction, not counting the instruction itself.
+
+        Subroutine calls are followed to their return.
+        """
+        predecessors: List[List[Tuple[int, Cost]]] = [[] for _ in range(self.size + 1)]
+        for index in range(self.size):
+            cost = self.costs[index]
+            if self.program.instructions[index].op == "callsub":
+                subroutineReturn = paths[self.target(index)][0]
+                if subroutineReturn is not None:
+                    predecessors[index + 1].append(
+                        (index, _add(cost, subroutineReturn))
+                    )
+                continue
+            for successor in self.successors(index):
+                predecessors[successor].append((index, cost))
+
+        prefixes: List[Optional[Cost]] = [None] * (self.size + 1)
+        for index in self.order(lambda i: [p for p, _ in predecessors[i]]):
+            if index == 0:
+                prefixes[index] = Cost(0, 0)
+                continue
+            prefixes[index] = _max(
+                *[_add(prefixes[p], cost) for p, cost in predecessors[index]]
+            )
+        return prefixes
+
+    def reachable(self, start: int) -> List[int]:
+        """Get the instructions reachable from start, including subroutines."""
+        seen = {start}
+        stack = [start]
+        while stack:
+            index = stack.pop()
+            if index == self.size:
+                continue
+            following = self.successors(index)
+            if self.program.instructions[index].op == "callsub":
+                following = following + [self.target(index)]
+            for successor in following:
+                if successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        return sorted(index for index in seen if index < self.size)
+
+
+def findBranches(program: AssembledProgram) -> Dict[str, int]:
+    """Find the branches of an application's dispatch.
+
+    A branch is a bnz taken when ApplicationArgs 0 equals a constant, when
+    the ApplicationID is 0 ("create"), or when the OnCompletion is one of
+    ON_COMPLETION_BRANCHES, as pyteal compiles a Cond over those conditions.
+
+    Returns:
+        The index of the bnz instruction of each branch, by branch name.
+    """
+    branches: Dict[str, int] = {}
+    instructions = program.instructions
+    for index in range(3, len(instructions)):
+        if instructions[index].op != "bnz" or instructions[index - 1].op != "==":
+            continue
+
+        # the two values compared, by op
+        operands = {ins.op: ins for ins in instructions[index - 3 : index - 1]}
+        field = operands.get("txna", operands.get("txn"))
+        constant = operands.get("byte", operands.get("int"))
+        if field is None or constant is None:
+            continue
+
+        name = None
+        if field.args == ["ApplicationArgs", "0"] and constant.op == "byte":
+            value, _ = _parseBytes(constant.line, constant.args)
+            name = value.decode(errors="replace")
+        elif field.args == ["ApplicationID"] and constant.args == ["0"]:
+            name = "create"
+        elif field.args == ["OnCompletion"] and constant.op == "int":
+            name = ON_COMPLETION_BRANCHES.get(constant.args[0])
+
+        if name is not None and name not in branches:
+            branches[name] = index
+    return branches
+
+
+def profileProgram(source: str) -> Dict[str, BranchProfile]:
+    """Profile the worst-case cost of each branch of a TEAL program.
+
+    Args:
+        source: The TEAL source.
+
+    Returns:
+        A profile of each branch found by findBranches, and of the whole
+        program under the name "program".
+
+    Raises:
+        ValueError: if the program loops.
+    """
+    program = assembleProgram(source)
+    graph = _Graph(program)
+    paths = graph.longestPaths()
+    prefixes = graph.longestPrefixes(paths)
+
+    profiles = {}
+    whole = paths[0][1] or Cost(0, 0)
+    profiles["program"] = BranchProfile(
+        "program", whole.cost, whole.opcodes, graph.size, len(program.bytecode())
+    )
+
+    for name, index in findBranches(program).items():
+        target = graph.target(index)
+        worst = _add(_add(prefixes[index], graph.costs[index]), paths[target][1])
+        if worst is None:
+            # the branch cannot be reached or never finishes
+            continue
+        reachable = graph.reachable(target)
+        profiles[name] = BranchProfile(
+            name,
+            worst.cost,
+            worst.opcodes,
+            len(reachable),
+            sum(len(program.pieces[i]) for i in reachable),
+        )
+    return profiles
+
+
+def subroutineCost(source: str, name: str) -> Cost:
+    """Get the worst-case cost of a subroutine, from its label to a retsub.
+
+    Args:
+        source: The TEAL source.
+        name: The label of the subroutine, or the name pyteal gives it in a
+            comment after the label, as in "sub0: // updateReserves".
+
+    Raises:
+        ValueError: if the program has no such subroutine, it never returns,
+            or the program loops.
+    """
+    match = re.search(
+        r"^\s*(\S+):\s*//\s*{}\s*$".format(re.escape(name)), source, re.MULTILINE
+    )
+    label = match.group(1) if match else name
+
+    program = assembleProgram(source)
+    if label not in program.labels:
+        raise ValueError("No subroutine {}".format(name))
+    graph = _Graph(program)
+    cost = graph.longestPaths()[program.labels[label]][0]
+    if cost is None:
+        raise ValueError("Subroutine {} never returns".format(name))
+    return cost
+
+
+def formatProfile(profiles: Dict[str, BranchProfile]) -> str:
+    lines = ["{:<12} {:>8} {:>8} {:>13} {:>6}".format(*BranchProfile._fields)]
+    for profile in profiles.values():
+        lines.append("{:<12} {:>8} {:>8} {:>13} {:>6}".format(*profile))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    paths = sys.argv[1:] if argv is None else argv
+    if paths:
+        sources = []
+        for path in paths:
+            with open(path) as f:
+                sources.append((path, f.read()))
+    else:
+        from amm.programs import TEAL_VERSIONS, generateTeal
+
+        sources = [
+            ("approval program (TEAL {})".format(version), generateTeal(version)[0])
+            for version in TEAL_VERSIONS
+        ]
+
+    for name, source in sources:
+        print(name)
+        print(formatProfile(profileProgram(source)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
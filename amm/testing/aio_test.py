@@ -0,0 +1,300 @@
+from typing import Any, Dict, List
+import asyncio
+import base64
+import io
+import hashlib
+import struct
+
+import msgpack
+import pytest
+
+from algosdk import account, encoding, error
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from amm.account import Account
+from amm import aio
+from amm.events import RECORD_FORMAT, SUPPLY_EVENT, SWAP_EVENT, WITHDRAW_EVENT
+from amm.testing.fakealgod import FakeAlgodServer
+from amm.testing.setup import ALGOD_TOKEN
+
+GENESIS_HASH = "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI="
+
+
+def encodeState(state: Dict[bytes, Any]) -> List[Dict[str, Any]]:
+    encoded = []
+    for key, value in state.items():
+        if isinstance(value, int):
+            encodedValue = {"type": 2, "uint": value}
+        else:
+            encodedValue = {"type": 1, "bytes": base64.b64encode(value).decode()}
+        encoded.append({"key": base64.b64encode(key).decode(), "value": encodedValue})
+    return encoded
+
+
+class BlockClockBackend:
+    """An algod backend that confirms every transaction in the next block.
+
+    Only the effects of app creation and setup are modelled. Supply, withdraw
+    and swap calls log a record of the amounts sent to the app, with no
+    reserves.
+    """
+
+    def __init__(self, blockTime: float = 0.02) -> None:
+        self.blockTime = blockTime
+        self.lastRound = 1
+        self.nextID = 1000
+        self.apps: Dict[int, Dict[bytes, Any]] = {}
+        self.groups: List[List[transaction.SignedTransaction]] = []
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.confirmed: Dict[str, Dict[str, Any]] = {}
+        self.waiting = 0
+        self.maxWaiting = 0
+        self._newBlock = asyncio.Condition()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.blockTime)
+            async with self._newBlock:
+                self.lastRound += 1
+                for txID, info in self.pending.items():
+                    info["confirmed-round"] = self.lastRound
+                    self.confirmed[txID] = info
+                self.pending = {}
+                self._newBlock.notify_all()
+
+    def status(self):
+        return {"last-round": self.lastRound}
+
+    async def status_after_block(self, round: int):
+        self.waiting += 1
+        self.maxWaiting = max(self.maxWaiting, self.waiting)
+        try:
+            async with self._newBlock:
+                await self._newBlock.wait_for(lambda: self.lastRound > round)
+        finally:
+            self.waiting -= 1
+        return self.status()
+
+    def suggested_params(self):
+        return transaction.SuggestedParams(
+            0,
+            self.lastRound,
+            self.lastRound + 1000,
+            GENESIS_HASH,
+            "sandnet-v1",
+            False,
+            "future",
+            1000,
+        )
+
+    def compile(self, source: str):
+        digest = hashlib.sha256(source.encode()).digest()
+        return {"hash": "", "result": base64.b64encode(b"\x05" + digest).decode()}
+
+    def application_info(self, appID: int):
+        if appID not in self.apps:
+            raise error.AlgodHTTPError("application does not exist", 404)
+        return {"id": appID, "params": {"global-state": encodeState(self.apps[appID])}}
+
+    def account_info(self, address: str):
+        for appID, state in self.apps.items():
+            if get_application_address(appID) == address and b"pool_token_key" in state:
+                return {"amount": 403_000, "assets": []}
+        return {"amount": 0, "assets": []}
+
+    def pending_transaction_info(self, txID: str):
+        info = self.pending.get(txID) or self.confirmed.get(txID)
+        if info is None:
+            raise error.AlgodHTTPError("txn does not exist", 404)
+        return info
+
+    def send_raw_transaction(self, txn: str) -> str:
+        unpacker = msgpack.Unpacker(io.BytesIO(base64.b64decode(txn)), raw=False)
+        group = [encoding.future_msgpack_decode(obj) for obj in unpacker]
+        self.groups.append(group)
+
+        for stxn in group:
+            info: Dict[str, Any] = {"pool-error": "", "txn": {}}
+            txn = stxn.transaction
+            if txn.type == "appl" and txn.index == 0:
+                appID = self.nextID
+                self.nextID += 1
+                args = txn.app_args
+                self.apps[appID] = {
+                    b"creator_key": args[0],
+                    b"token_a_key": int.from_bytes(args[1], "big"),
+                    b"token_b_key": int.from_bytes(args[2], "big"),
+                    b"fee_bps_key": int.from_bytes(args[3], "big"),
+                    b"min_increment_key": int.from_bytes(args[4], "big"),
+                }
+                info["application-index"] = appID
+            elif txn.type == "appl" and txn.app_args == [b"setup"]:
+                self.apps[txn.index][b"pool_token_key"] = self.nextID
+                self.apps[txn.index][b"pool_tokens_outstanding_key"] = 0
+                self.nextID += 1
+            elif txn.type == "appl" and txn.app_args:
+                record = self.record(txn.app_args[0], group)
+                info["logs"] = [base64.b64encode(record).decode()]
+            self.pending[stxn.get_txid()] = info
+
+        return group[0].get_txid()
+
+    def record(self, method: bytes, group: List[transaction.SignedTransaction]):
+        amounts = [stxn.transaction.amount for stxn in group[:-1]]
+        if method == b"supply":
+            values = (SUPPLY_EVENT, amounts[0], amounts[1], 0)
+        elif method == b"withdraw":
+            values = (WITHDRAW_EVENT, 0, 0, amounts[0])
+        else:
+            values = (SWAP_EVENT, group[0].transaction.index, amounts[0], 0)
+        return struct.pack(RECORD_FORMAT, *values, 0, 0)
+
+
+async def withFakeAlgod(test):
+    backend = BlockClockBackend()
+    ticker = asyncio.ensure_future(backend.run())
+    server = FakeAlgodServer(backend)
+    try:
+        address = await server.start()
+        async with aio.AsyncAlgodClient(ALGOD_TOKEN, address) as client:
+            await test(client, backend, server)
+    finally:
+        ticker.cancel()
+        await server.close()
+
+
+def newAccount() -> Account:
+    return Account(account.generate_account()[0])
+
+
+def test_create_and_setup():
+    async def test(client, backend, server):
+        creator = newAccount()
+
+        with pytest.raises(OverflowError):
+            await aio.createAmmApp(client, creator, 1, 2, -30, 1000)
+
+        appID = await aio.createAmmApp(client, creator, 1, 2, 30, 1000)
+        poolToken = await aio.setupAmmApp(client, appID, creator, 1, 2)
+
+        actual = await aio.getAppGlobalState(client, appID)
+        expected = {
+            b"creator_key": encoding.decode_address(creator.getAddress()),
+            b"token_a_key": 1,
+            b"token_b_key": 2,
+            b"pool_token_key": poolToken,
+            b"fee_bps_key": 30,
+            b"min_increment_key": 1000,
+            b"pool_tokens_outstanding_key": 0,
+        }
+        assert actual == expected
+
+        with pytest.raises(error.AlgodHTTPError):
+            await aio.getAppGlobalState(client, appID + 100)
+
+    asyncio.run(withFakeAlgod(test))
+
+
+def test_not_setup():
+    async def test(client, backend, server):
+        creator = newAccount()
+        appID = await aio.createAmmApp(client, creator, 1, 2, 30, 1000)
+
+        with pytest.raises(AssertionError):
+            await aio.swap(client, appID, 1, 10, creator)
+
+    asyncio.run(withFakeAlgod(test))
+
+
+def test_concurrent_traders():
+    async def test(client, backend, server):
+        creator = newAccount()
+        appID = await aio.createAmmApp(client, creator, 1, 2, 30, 1000)
+        await aio.setupAmmApp(client, appID, creator, 1, 2)
+
+        traders = [newAccount() for _ in range(200)]
+        startRound = backend.lastRound
+
+        supplied, withdrawn, *swapped = await asyncio.gather(
+            aio.supply(client, appID, 1000, 2000, traders[0]),
+            aio.withdraw(client, appID, 10, traders[1]),
+            *[
+                aio.swap(client, appID, 1 + i % 2, 10 + i, trader)
+                for i, trader in enumerate(traders)
+            ],
+        )
+
+        # one group per operation, all in flight at once rather than one per block
+        assert len(backend.groups) == 2 + 2 + 200
+        assert backend.lastRound - startRound < 20
+        # and all of them wait on the one block follower of the client
+        assert backend.maxWaiting == 1
+
+        swaps = [
+            group
+            for group in backend.groups
+            if group[-1].transaction.type == "appl"
+            and group[-1].transaction.app_args == [b"swap"]
+        ]
+        amounts = sorted(group[0].transaction.amount for group in swaps)
+        assert amounts == list(range(10, 210))
+
+        # each operation returns the record its own call logged
+        assert (supplied.amountA, supplied.amountB) == (1000, 2000)
+        assert withdrawn.poolTokens == 10
+        assert [(s.tokenIn, s.amountIn) for s in swapped] == [
+            (1 + i % 2, 10 + i) for i in range(200)
+        ]
+
+    asyncio.run(withFakeAlgod(test))
+
+
+def test_tracker_errors():
+    async def test(client, backend, server):
+        tracker = client.tracker
+        assert client.tracker is tracker
+
+        # never submitted, so it times out
+        with pytest.raises(Exception, match="not confirmed after 2 rounds"):
+            await aio.waitForTransaction(client, "UNKNOWN", timeout=2)
+        assert tracker.pending() == []
+
+        # a cancelled waiter is dropped at the next block
+        waiting = asyncio.ensure_future(aio.waitForTransaction(client, "OTHER"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert tracker.pending() == []
+
+        # rejected by the pool, so it never makes it into a block
+        backend.confirmed["FAILED"] = {"pool-error": "overspend", "txn": {}}
+        with pytest.raises(Exception, match="Pool error: overspend"):
+            await aio.waitForTransaction(client, "FAILED")
+
+    asyncio.run(withFakeAlgod(test))
+
+
+def test_cancelled_request():
+    async def test(client, backend, server):
+        await client.status()
+        ((_, writer),) = client._pool._idle
+
+        # cancelled while waiting for the response, so the connection has an
+        # unread response and must not be reused
+        waiting = asyncio.ensure_future(
+            client.status_after_block(backend.lastRound + 1000)
+        )
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert writer.is_closing()
+        assert len(client._pool._idle) == 0
+
+        status = await client.status()
+        assert status["last-round"] == backend.lastRound
+        assert len(client._pool._idle) == 1
+
+    asyncio.run(withFakeAlgod(test))
@@ -0,0 +1,137 @@
+from base64 import b64encode
+from collections import Counter
+
+import pytest
+
+from algosdk.future import transaction
+
+from amm.cache import PoolStateCache
+from amm.operations import getPoolState, readPoolState, MIN_BALANCE_REQUIREMENT
+
+
+class CountingClient:
+    """Serves a fixed pool for any app ID and counts the requests it receives"""
+
+    def __init__(self) -> None:
+        self.lastRound = 10
+        self.calls = Counter()
+
+    def status(self):
+        self.calls["status"] += 1
+        return {"last-round": self.lastRound}
+
+    def suggested_params(self):
+        self.calls["suggested_params"] += 1
+        return transaction.SuggestedParams(
+            0, self.lastRound, self.lastRound + 1000, "", flat_fee=False
+        )
+
+    def application_info(self, appID):
+        self.calls["application_info"] += 1
+        state = {
+            b"token_a_key": appID + 1,
+            b"token_b_key": appID + 2,
+            b"pool_token_key": appID + 3,
+            b"fee_bps_key": 30,
+            b"min_increment_key": 1000,
+            b"pool_tokens_outstanding_key": 500,
+            b"reserve_a_key": 1000,
+            b"reserve_b_key": 250,
+            b"last_update_round_key": self.lastRound - 1,
+        }
+        return {
+            "params": {
+                "global-state": [
+                    {
+                        "key": b64encode(key).decode(),
+                        "value": {"type": 2, "uint": value},
+                    }
+                    for key, value in state.items()
+                ]
+            }
+        }
+
+    def account_info(self, address):
+        self.calls["account_info"] += 1
+        return {"amount": MIN_BALANCE_REQUIREMENT, "assets": []}
+
+
+def test_getPoolState_same_round():
+    client = CountingClient()
+    cache = PoolStateCache(client)
+
+    for _ in range(3):
+        state, params = getPoolState(client, 1, cache)
+        assert state[b"token_a_key"] == 2
+        assert params.first == 10
+
+    assert client.calls == Counter(
+        status=3, application_info=1, account_info=1, suggested_params=1
+    )
+
+
+def test_getPoolState_new_round():
+    client = CountingClient()
+    cache = PoolStateCache(client)
+
+    getPoolState(client, 1, cache)
+    client.lastRound += 1
+    state, params = getPoolState(client, 1, cache)
+
+    assert params.first == 11
+    assert cache.round == 11
+    assert client.calls["application_info"] == 2
+    assert client.calls["suggested_params"] == 2
+
+
+def test_readPoolState():
+    client = CountingClient()
+
+    state = readPoolState(client, 1)
+    assert (state.tokenA, state.tokenB, state.poolToken) == (2, 3, 4)
+    assert (state.reserveA, state.reserveB) == (1000, 250)
+    assert state.lastUpdateRound == 9
+    assert state.simulator().quoteWithdraw(50).amountA == 100
+    assert client.calls == Counter(application_info=1)
+
+    cache = PoolStateCache(client)
+    for _ in range(3):
+        readPoolState(client, 1, cache)
+    assert client.calls == Counter(status=3, application_info=2)
+
+
+def test_advance():
+    client = CountingClient()
+    cache = PoolStateCache(client)
+    cache.refresh()
+    cache.getAppGlobalState(1)
+
+    # an older round does not invalidate the cache
+    cache.advance(9)
+    cache.getAppGlobalState(1)
+    assert client.calls["application_info"] == 1
+
+    cache.advance(12)
+    cache.getAppGlobalState(1)
+    assert client.calls["application_info"] == 2
+
+
+def test_lru():
+    client = CountingClient()
+    cache = PoolStateCache(client, maxPools=2)
+    cache.refresh()
+
+    cache.getAppGlobalState(1)
+    cache.getAppGlobalState(2)
+    # touch pool 1 so that pool 2 is the least recently used
+    cache.getAppGlobalState(1)
+    cache.getAppGlobalState(3)
+    assert client.calls["application_info"] == 3
+
+    cache.getAppGlobalState(1)
+    assert client.calls["application_info"] == 3
+    cache.getAppGlobalState(2)
+    assert client.calls["application_info"] == 4
+
+    with pytest.raises(ValueError):
+        PoolStateCache(client, maxPools=0)
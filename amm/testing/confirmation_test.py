@@ -0,0 +1,155 @@
+from collections import Counter
+from threading import Condition
+import base64
+import time
+
+import msgpack
+import pytest
+
+from algosdk import account, encoding, error
+from algosdk.future import transaction
+
+from amm.confirmation import ConfirmationTracker
+
+GENESIS_HASH = "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI="
+
+
+class BlockClient:
+    """Confirms pooled transactions when asked to wait for the next block.
+
+    Transactions with the note b"reject" report a pool error and transactions
+    with the note b"stuck" never leave the pool.
+    """
+
+    def __init__(self, blockTime: float = 0.005) -> None:
+        self.blockTime = blockTime
+        self.lastRound = 10
+        self.pool = {}
+        self.info = {}
+        self.calls = Counter()
+        self._condition = Condition()
+
+    def send_transaction(self, signedTxn) -> str:
+        txID = signedTxn.get_txid()
+        with self._condition:
+            if signedTxn.transaction.note == b"reject":
+                self.info[txID] = {"pool-error": "overspend", "txn": {}}
+            else:
+                self.pool[txID] = signedTxn
+                self.info[txID] = {"pool-error": "", "txn": {}}
+        return txID
+
+    def status(self):
+        self.calls["status"] += 1
+        return {"last-round": self.lastRound}
+
+    def status_after_block(self, round):
+        self.calls["status_after_block"] += 1
+        time.sleep(self.blockTime)
+        with self._condition:
+            if self.lastRound <= round:
+                self.lastRound = round + 1
+                for txID, stxn in list(self.pool.items()):
+                    if stxn.transaction.note == b"stuck":
+                        continue
+                    self.info[txID]["confirmed-round"] = self.lastRound
+                    del self.pool[txID]
+            return {"last-round": self.lastRound}
+
+    def pending_transactions(self, response_format="json"):
+        self.calls["pending_transactions"] += 1
+        assert response_format == "msgpack"
+        with self._condition:
+            top = [
+                msgpack.unpackb(
+                    base64.b64decode(encoding.msgpack_encode(stxn)), raw=False
+                )
+                for stxn in self.pool.values()
+            ]
+        return msgpack.packb(
+            {"top-transactions": top, "total-transactions": len(top)},
+            use_bin_type=True,
+        )
+
+    def pending_transaction_info(self, txID):
+        self.calls["pending_transaction_info"] += 1
+        with self._condition:
+            if txID not in self.info:
+                raise error.AlgodHTTPError("txn does not exist", 404)
+            return dict(self.info[txID])
+
+
+def signedPayment(key, amount, note=None):
+    sender = account.address_from_private_key(key)
+    sp = transaction.SuggestedParams(1000, 10, 1010, GENESIS_HASH, flat_fee=True)
+    txn = transaction.PaymentTxn(sender, sp, sender, amount, note=note)
+    return txn.sign(key)
+
+
+def test_many_transactions_one_loop():
+    client = BlockClient()
+    key = account.generate_account()[0]
+
+    with ConfirmationTracker(client) as tracker:
+        txIDs = [client.send_transaction(signedPayment(key, i)) for i in range(100)]
+
+        confirmed = []
+        futures = [
+            tracker.track(txID, callback=lambda f: confirmed.append(f.result()))
+            for txID in txIDs
+        ]
+        responses = [future.result(timeout=5) for future in futures]
+
+        assert len(confirmed) == 100
+        assert all(r.confirmedRound == 11 for r in responses)
+
+        rounds, seconds = tracker.latency(txIDs[0])
+        assert rounds == 1
+        assert seconds >= 0
+        assert tracker.pending() == set()
+
+    # one lookup per transaction, not one per transaction per round
+    assert client.calls["pending_transaction_info"] == 100
+    assert client.calls["status_after_block"] <= 2
+
+
+def test_pool_error_and_timeout():
+    client = BlockClient()
+    key = account.generate_account()[0]
+
+    with ConfirmationTracker(client, timeout=3) as tracker:
+        okID = client.send_transaction(signedPayment(key, 1))
+        rejectedID = client.send_transaction(signedPayment(key, 2, b"reject"))
+        stuckID = client.send_transaction(signedPayment(key, 3, b"stuck"))
+
+        ok = tracker.track(okID)
+        rejected = tracker.track(rejectedID)
+        stuck = tracker.track(stuckID)
+
+        with pytest.raises(Exception, match="Pool error: overspend"):
+            rejected.result(timeout=5)
+        with pytest.raises(Exception, match="not confirmed after 3 rounds"):
+            stuck.result(timeout=5)
+        assert ok.result(timeout=5).confirmedRound == 11
+
+        assert tracker.latency(stuckID) is None
+        assert client.lastRound <= 10 + 3 + 1
+
+
+def test_wait_and_unsubmitted():
+    client = BlockClient()
+    key = account.generate_account()[0]
+    stxns = [signedPayment(key, i) for i in range(3)]
+
+    with ConfirmationTracker(client) as tracker:
+        # tracked before it reaches the node
+        future = tracker.track(stxns[0].get_txid())
+        client.send_transaction(stxns[0])
+        assert future.result(timeout=5).confirmedRound > 10
+
+        txIDs = [client.send_transaction(stxn) for stxn in stxns[1:]]
+        responses = tracker.wait(txIDs)
+        assert [r.poolError for r in responses] == ["", ""]
+
+    with pytest.raises(RuntimeError):
+        tracker.track(txIDs[0])
@@ -0,0 +1,534 @@
+import os
+import random
+
+import pytest
+
+from algosdk import account, encoding
+
+from amm.events import SupplyResult, SwapResult, WithdrawResult, decodeRecord
+from amm.operations import INNER_TXNS, MIN_BALANCE_REQUIREMENT, PoolState
+from amm.programs import generateTeal
+from amm.simulator import LogicError, PoolSimulator
+from amm.teal.assembler import assembleProgram
+from amm.teal.evaluator import (
+    MIN_TXN_FEE,
+    App,
+    Ledger,
+    LedgerError,
+    appAddress,
+    evaluate,
+)
+from amm.teal.profile import profileProgram, subroutineCost
+from amm.util import computeTwap, getPriceSnapshot
+
+# The approval program before the opcode budget optimizations. The current
+# program must behave exactly like it.
+with open(os.path.join(os.path.dirname(__file__), "approval_baseline.teal")) as f:
+    BASELINE_SOURCE = f.read()
+BASELINE = assembleProgram(BASELINE_SOURCE)
+
+TOKEN_A = 1
+TOKEN_B = 2
+FEE_BPS = 30
+MIN_INCREMENT = 1000
+
+
+def newAddress() -> bytes:
+    return encoding.decode_address(account.generate_account()[1])
+
+
+CREATOR = newAddress()
+TRADER = newAddress()
+OTHER = newAddress()
+
+
+def appCall(appID, sender, method, assets=(), innerTxns=0, **fields):
+    txn = {
+        "TypeEnum": 6,
+        "Sender": sender,
+        "ApplicationID": appID,
+        "ApplicationArgs": [method],
+        "Assets": list(assets),
+        "Fee": MIN_TXN_FEE * (1 + innerTxns),
+    }
+    txn.update(fields)
+    return txn
+
+
+def transfer(sender, receiver, assetID, amount):
+    return {
+        "TypeEnum": 4,
+        "Sender": sender,
+        "AssetReceiver": receiver,
+        "XferAsset": assetID,
+        "AssetAmount": amount,
+        "Fee": MIN_TXN_FEE,
+    }
+
+
+def runGroup(program, ledger, group):
+    """Apply the outer transactions of a group and evaluate its app call, the
+    last transaction. The ledger is only changed if the group succeeds."""
+    work = ledger.copy()
+    try:
+        for txn in group:
+            work.chargeFee(txn["Sender"], txn["Fee"])
+            if txn["TypeEnum"] == 1:
+                work.pay(txn["Sender"], txn["Receiver"], txn["Amount"])
+            elif txn["TypeEnum"] == 4:
+                work.transferAsset(
+                    txn["Sender"],
+                    txn["AssetReceiver"],
+                    txn["XferAsset"],
+                    txn["AssetAmount"],
+                )
+    except LedgerError:
+        return None
+
+    feeCredit = sum(txn["Fee"] for txn in group) - MIN_TXN_FEE * len(group)
+    result = evaluate(program, work, group, len(group) - 1, feeCredit=feeCredit)
+    if result.approved:
+        ledger.commit(work)
+    return result
+
+
+def newPool(program, feeBps=FEE_BPS, minIncrement=MIN_INCREMENT, tokenB=TOKEN_B):
+    ledger = Ledger()
+    for assetID in (TOKEN_A, TOKEN_B):
+        ledger.assets[assetID] = {"AssetTotal": 2 ** 64 - 1}
+        for holder in (TRADER, OTHER):
+            ledger.holdings[(holder, assetID)] = 2 ** 62
+    ledger.nextID = 3
+    for holder in (CREATOR, TRADER, OTHER):
+        ledger.algos[holder] = 10 ** 12
+
+    appID = ledger.allocateID()
+    ledger.apps[appID] = App(CREATOR)
+    args = [CREATOR]
+    args += [value.to_bytes(8, "big") for value in (TOKEN_A, tokenB)]
+    args += [value.to_bytes(8, "big") for value in (feeBps, minIncrement)]
+    create = appCall(0, CREATOR, CREATOR, ApplicationArgs=args)
+    assert evaluate(program, ledger, [create], 0, appID=appID).approved
+
+    fund = {
+        "TypeEnum": 1,
+        "Sender": CREATOR,
+        "Receiver": appAddress(appID),
+        "Amount": MIN_BALANCE_REQUIREMENT,
+        "Fee": MIN_TXN_FEE,
+    }
+    setup = appCall(appID, CREATOR, b"setup", [TOKEN_A, tokenB], INNER_TXNS["setup"])
+    assert runGroup(program, ledger, [fund, setup]).approved
+    return ledger, appID
+
+
+def optInPoolToken(ledger, appID):
+    poolToken = ledger.apps[appID].globalState[b"pool_token_key"]
+    for holder in (TRADER, OTHER):
+        ledger.holdings[(holder, poolToken)] = 0
+    return poolToken
+
+
+def supplyGroup(appID, sender, amountA, amountB, tokenA=TOKEN_A, tokenB=TOKEN_B):
+    return [
+        transfer(sender, appAddress(appID), tokenA, amountA),
+        transfer(sender, appAddress(appID), tokenB, amountB),
+        appCall(appID, sender, b"supply", [tokenA, tokenB], INNER_TXNS["supply"]),
+    ]
+
+
+def withdrawGroup(appID, sender, poolToken, amount):
+    return [
+        transfer(sender, appAddress(appID), poolToken, amount),
+        appCall(appID, sender, b"withdraw", [TOKEN_A, TOKEN_B], INNER_TXNS["withdraw"]),
+    ]
+
+
+def swapGroup(appID, sender, tokenIn, amount):
+    return [
+        transfer(sender, appAddress(appID), tokenIn, amount),
+        appCall(appID, sender, b"swap", [TOKEN_A, TOKEN_B], INNER_TXNS["swap"]),
+    ]
+
+
+def current(version=5):
+    return assembleProgram(generateTeal(version)[0])
+
+
+# global state the baseline program does not keep, and the subroutine that
+# updates it and logs the call
+MIRRORED_KEYS = (
+    b"reserve_a_key",
+    b"reserve_b_key",
+    b"last_update_round_key",
+    b"price_a_cumulative_hi_key",
+    b"price_a_cumulative_lo_key",
+    b"price_b_cumulative_hi_key",
+    b"price_b_cumulative_lo_key",
+    b"price_timestamp_key",
+)
+MIRROR_SUBROUTINE = "recordUpdate"
+
+
+def mirrorCost(version=5):
+    """The most the subroutine that updates MIRRORED_KEYS can cost."""
+    return subroutineCost(generateTeal(version)[0], MIRROR_SUBROUTINE).cost
+
+
+def outcome(result, ledger, appID):
+    """The observable effects of a group: whether it was approved, the inner
+    transactions it sent, and the resulting state."""
+    if result is None:
+        return None
+    globalState = {
+        key: value
+        for key, value in ledger.apps[appID].globalState.items()
+        if key not in MIRRORED_KEYS
+    }
+    return (
+        result.approved,
+        result.innerTxns,
+        globalState,
+        ledger.holdings,
+        ledger.algos,
+    )
+
+
+def assertReservesMirrored(ledger, appID):
+    state = ledger.apps[appID].globalState
+    appAddr = appAddress(appID)
+    assert state[b"reserve_a_key"] == ledger.holdings[(appAddr, TOKEN_A)]
+    assert state[b"reserve_b_key"] == ledger.holdings[(appAddr, state[b"token_b_key"])]
+    assert state[b"last_update_round_key"] == ledger.round
+
+
+def randomGroup(rng, appID, poolToken, ledger):
+    sender = rng.choice([TRADER, OTHER])
+    kind = rng.choice(["supply", "withdraw", "swap", "swap"])
+    scale = 10 ** rng.randint(0, 18)
+    amount = lambda: rng.randint(0, scale)
+    if kind == "supply":
+        group = supplyGroup(appID, sender, amount(), amount())
+        if rng.random() < 0.1:
+            group[0]["XferAsset"], group[1]["XferAsset"] = TOKEN_B, TOKEN_A
+    elif kind == "withdraw":
+        held = ledger.holdings.get((sender, poolToken), 0)
+        group = withdrawGroup(appID, sender, poolToken, rng.randint(0, held + 1))
+    else:
+        group = swapGroup(appID, sender, rng.choice([TOKEN_A, TOKEN_B]), amount())
+
+    mutation = rng.random()
+    if mutation < 0.05:
+        group[0]["AssetReceiver"] = OTHER
+    elif mutation < 0.1:
+        group[0]["Sender"] = OTHER if sender == TRADER else TRADER
+    elif mutation < 0.12:
+        group = group[1:]
+    return group
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_matches_baseline(seed):
+    program = current()
+    rng = random.Random(seed)
+    feeBps = rng.choice([0, 1, 30, 100, 9999, 10000])
+    old, appID = newPool(BASELINE, feeBps)
+    new, _ = newPool(program, feeBps)
+    poolToken = optInPoolToken(old, appID)
+    optInPoolToken(new, appID)
+
+    allowance = mirrorCost()
+    approved = 0
+    for _ in range(150):
+        group = randomGroup(rng, appID, poolToken, old)
+        oldResult = runGroup(BASELINE, old, group)
+        newResult = runGroup(program, new, group)
+        assert outcome(newResult, new, appID) == outcome(oldResult, old, appID), (
+            group,
+            oldResult,
+            newResult,
+        )
+        if oldResult is not None and oldResult.approved:
+            approved += 1
+            assert newResult.cost <= oldResult.cost + allowance
+    assert approved > 20
+
+
+def test_overflow_boundaries():
+    # amounts around the uint64 and 128-bit limits of the contract math
+    program = current()
+    for amounts in [
+        (2 ** 32, 2 ** 32),
+        (2 ** 40, 2 ** 20),
+        (2 ** 62, 2 ** 62),
+        (2 ** 62, 1),
+        (1, 2 ** 62),
+    ]:
+        old, appID = newPool(BASELINE)
+        new, _ = newPool(program)
+        poolToken = optInPoolToken(old, appID)
+        optInPoolToken(new, appID)
+
+        groups = [
+            supplyGroup(appID, TRADER, *amounts),
+            supplyGroup(appID, OTHER, amounts[0] // 3, amounts[1]),
+            supplyGroup(appID, OTHER, amounts[0], amounts[1] // 3),
+            swapGroup(appID, OTHER, TOKEN_A, 2 ** 61),
+            swapGroup(appID, OTHER, TOKEN_B, 2 ** 40),
+            withdrawGroup(appID, TRADER, poolToken, 10 ** 12),
+            withdrawGroup(appID, OTHER, poolToken, 1),
+        ]
+        for group in groups:
+            oldResult = runGroup(BASELINE, old, group)
+            newResult = runGroup(program, new, group)
+            assert outcome(newResult, new, appID) == outcome(oldResult, old, appID)
+
+
+def test_same_token_pool():
+    # a pool of a token with itself is degenerate, but must behave the same
+    program = current()
+    old, appID = newPool(BASELINE, tokenB=TOKEN_A)
+    new, _ = newPool(program, tokenB=TOKEN_A)
+    poolToken = optInPoolToken(old, appID)
+    optInPoolToken(new, appID)
+
+    groups = [
+        supplyGroup(appID, TRADER, 10 ** 6, 10 ** 6, TOKEN_A, TOKEN_A),
+        supplyGroup(appID, OTHER, 10 ** 6, 3 * 10 ** 6, TOKEN_A, TOKEN_A),
+        swapGroup(appID, OTHER, TOKEN_A, 10 ** 5),
+        withdrawGroup(appID, TRADER, poolToken, 10 ** 5),
+        withdrawGroup(appID, OTHER, poolToken, 10 ** 6),
+    ]
+    for group in groups:
+        oldResult = runGroup(BASELINE, old, group)
+        newResult = runGroup(program, new, group)
+        assert outcome(newResult, new, appID) == outcome(oldResult, old, appID)
+
+
+def test_matches_simulator():
+    program = current()
+    ledger, appID = newPool(program)
+    poolToken = optInPoolToken(ledger, appID)
+    simulator = PoolSimulator(TOKEN_A, TOKEN_B, FEE_BPS, MIN_INCREMENT, poolToken)
+
+    rng = random.Random(1)
+    for _ in range(100):
+        group = randomGroup(rng, appID, poolToken, ledger)
+        if len(group) < 2 or group[0]["AssetReceiver"] != appAddress(appID):
+            continue
+        if group[0]["Sender"] != group[-1]["Sender"]:
+            continue
+        amount = group[0]["AssetAmount"]
+        method = group[-1]["ApplicationArgs"][0]
+        try:
+            if method == b"supply":
+                if group[0]["XferAsset"] != TOKEN_A:
+                    continue
+                simulator.supply(amount, group[1]["AssetAmount"])
+            elif method == b"withdraw":
+                simulator.withdraw(amount)
+            else:
+                simulator.swap(group[0]["XferAsset"], amount)
+            expected = True
+        except LogicError:
+            expected = False
+
+        result = runGroup(program, ledger, group)
+        if result is None:
+            # the sender could not pay, which the simulator does not model
+            continue
+        assert result.approved == expected, (group, result)
+
+    appAddr = appAddress(appID)
+    assert simulator.reserveA == ledger.holdings[(appAddr, TOKEN_A)]
+    assert simulator.reserveB == ledger.holdings[(appAddr, TOKEN_B)]
+    assert (
+        simulator.poolTokensOutstanding
+        == ledger.apps[appID].globalState[b"pool_tokens_outstanding_key"]
+    )
+
+
+@pytest.mark.parametrize("version", [5, 6])
+def test_reserves_mirrored(version):
+    program = current(version)
+    ledger, appID = newPool(program)
+    poolToken = optInPoolToken(ledger, appID)
+    assertReservesMirrored(ledger, appID)
+
+    rng = random.Random(version)
+    for _ in range(100):
+        ledger.round += 1
+        ledger.timestamp += rng.choice([0, 1, 4, 3600])
+        # the accumulators are brought up to date at the price the reserves
+        # gave since the last update
+        expected = getPriceSnapshot(ledger.apps[appID].globalState, ledger.timestamp)
+        group = randomGroup(rng, appID, poolToken, ledger)
+        result = runGroup(program, ledger, group)
+        if result is not None and result.approved:
+            assertReservesMirrored(ledger, appID)
+            state = ledger.apps[appID].globalState
+            actual = getPriceSnapshot(state, ledger.timestamp)
+            assert (actual.priceACumulative, actual.priceBCumulative) == (
+                expected.priceACumulative,
+                expected.priceBCumulative,
+            )
+
+    # the global state alone is enough to quote
+    state = PoolState.fromGlobalState(appID, ledger.apps[appID].globalState)
+    simulator = state.simulator()
+    appAddr = appAddress(appID)
+    assert simulator.reserveA == ledger.holdings[(appAddr, TOKEN_A)]
+    assert simulator.reserveB == ledger.holdings[(appAddr, TOKEN_B)]
+    assert simulator.poolTokenReserve == ledger.holdings[(appAddr, poolToken)]
+    for amount in (10 ** 3, 10 ** 6, 10 ** 9):
+        try:
+            expected = [simulator.quoteSwap(TOKEN_A, amount).amountOut]
+        except LogicError:
+            expected = None
+        result = runGroup(
+            program, ledger.copy(), swapGroup(appID, TRADER, TOKEN_A, amount)
+        )
+        if expected is None:
+            assert not result.approved
+        else:
+            assert [txn["AssetAmount"] for txn in result.innerTxns] == expected
+
+
+@pytest.mark.parametrize("version", [5, 6])
+def test_logged_records(version):
+    program = current(version)
+    ledger, appID = newPool(program)
+    poolToken = optInPoolToken(ledger, appID)
+    appAddr = appAddress(appID)
+
+    rng = random.Random(version)
+    logged = 0
+    for _ in range(100):
+        outstanding = ledger.apps[appID].globalState[b"pool_tokens_outstanding_key"]
+        group = randomGroup(rng, appID, poolToken, ledger)
+        result = runGroup(program, ledger, group)
+        if result is None or not result.approved:
+            continue
+
+        assert len(result.logs) == 1
+        record = decodeRecord(result.logs[0])
+        logged += 1
+        assert record.reserveA == ledger.holdings[(appAddr, TOKEN_A)]
+        assert record.reserveB == ledger.holdings[(appAddr, TOKEN_B)]
+        sent = {txn["XferAsset"]: txn["AssetAmount"] for txn in result.innerTxns}
+        state = ledger.apps[appID].globalState
+        if isinstance(record, SupplyResult):
+            assert record.amountA == group[0]["AssetAmount"] - sent.get(TOKEN_A, 0)
+            assert record.amountB == group[1]["AssetAmount"] - sent.get(TOKEN_B, 0)
+            assert record.poolTokens == sent[poolToken]
+            assert record.poolTokens == (
+                state[b"pool_tokens_outstanding_key"] - outstanding
+            )
+        elif isinstance(record, WithdrawResult):
+            assert record.poolTokens == group[0]["AssetAmount"]
+            assert (record.amountA, record.amountB) == (
+                sent.get(TOKEN_A, 0),
+                sent.get(TOKEN_B, 0),
+            )
+        else:
+            assert isinstance(record, SwapResult)
+            assert (record.tokenIn, record.amountIn) == (
+                group[0]["XferAsset"],
+                group[0]["AssetAmount"],
+            )
+            assert [record.amountOut] == list(sent.values())
+    assert logged > 10
+
+
+def test_twap():
+    program = current()
+    ledger, appID = newPool(program)
+    optInPoolToken(ledger, appID)
+    ledger.timestamp = 1000
+    assert runGroup(program, ledger, supplyGroup(appID, TRADER, 10 ** 6, 4 * 10 ** 6))
+    start = getPriceSnapshot(ledger.apps[appID].globalState, 1000)
+
+    # A is worth 4 B for 100 seconds, then about 1 B for 300 seconds
+    ledger.timestamp = 1100
+    swap = swapGroup(appID, OTHER, TOKEN_A, 10 ** 6)
+    assert runGroup(program, ledger, swap).approved
+    state = ledger.apps[appID].globalState
+    price = state[b"reserve_b_key"] / state[b"reserve_a_key"]
+    end = getPriceSnapshot(state, 1400)
+
+    priceA, priceB = computeTwap(start, end)
+    assert priceA == pytest.approx((4 * 100 + price * 300) / 400)
+    assert priceB == pytest.approx((100 / 4 + 300 / price) / 400)
+
+    with pytest.raises(ValueError):
+        computeTwap(end, start)
+    with pytest.raises(ValueError):
+        getPriceSnapshot(state, 1099)
+
+
+def test_accumulators_wrap_around():
+    program = current()
+    ledger, appID = newPool(program)
+    optInPoolToken(ledger, appID)
+    ledger.timestamp = 10
+    assert runGroup(program, ledger, supplyGroup(appID, TRADER, 10 ** 6, 10 ** 6))
+
+    # the accumulator of the price of A is about to wrap around
+    state = ledger.apps[appID].globalState
+    state[b"price_a_cumulative_hi_key"] = 2 ** 64 - 1
+    state[b"price_a_cumulative_lo_key"] = 2 ** 64 - 1
+    start = getPriceSnapshot(state, 10)
+
+    ledger.timestamp = 20
+    expected = getPriceSnapshot(state, 20)
+    assert runGroup(program, ledger, swapGroup(appID, OTHER, TOKEN_B, 1000)).approved
+    end = getPriceSnapshot(ledger.apps[appID].globalState, 20)
+    assert end.priceACumulative == expected.priceACumulative < start.priceACumulative
+    assert computeTwap(start, end) == (1.0, 1.0)
+
+
+def test_cheaper_than_baseline():
+    # apart from the reserves and prices it keeps in global state
+    before = profileProgram(BASELINE_SOURCE)
+    after = profileProgram(generateTeal()[0])
+    for method in ("supply", "withdraw", "swap"):
+        assert after[method].cost - mirrorCost() < before[method].cost, method
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_v6_matches_v5(seed):
+    # TEAL v6 sends the inner transactions of supply and withdraw as one
+    # inner group, with the same effects as the separate v5 submits
+    v5 = current(5)
+    v6 = current(6)
+    rng = random.Random(seed)
+    old, appID = newPool(v5)
+    new, _ = newPool(v6)
+    poolToken = optInPoolToken(old, appID)
+    optInPoolToken(new, appID)
+
+    approved = set()
+    for _ in range(150):
+        group = randomGroup(rng, appID, poolToken, old)
+        oldResult = runGroup(v5, old, group)
+        newResult = runGroup(v6, new, group)
+        assert outcome(newResult, new, appID) == outcome(oldResult, old, appID), (
+            group,
+            oldResult,
+            newResult,
+        )
+        if oldResult is not None and oldResult.approved:
+            method = group[-1]["ApplicationArgs"][0]
+            approved.add(method)
+            assert newResult.cost <= oldResult.cost
+            if method == b"withdraw" or len(oldResult.innerTxns) == 2:
+                assert newResult.cost < oldResult.cost
+    assert approved == {b"supply", b"withdraw", b"swap"}
+
+
+def test_v6_cheaper():
+    v5 = profileProgram(generateTeal(5)[0])
+    v6 = profileProgram(generateTeal(6)[0])
+    for method in ("supply", "withdraw"):
+        assert v6[method].cost < v5[method].cost, method
+    assert v6["swap"].cost <= v5["swap"].cost
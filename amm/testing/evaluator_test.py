@@ -0,0 +1,145 @@
+from amm.teal.evaluator import App, Ledger, appAddress, evaluate
+
+CREATOR = bytes(range(32))
+
+
+def ledgerWithApp(appID=1):
+    ledger = Ledger()
+    ledger.apps[appID] = App(CREATOR)
+    return ledger
+
+
+def call(appID=1, **fields):
+    txn = {"TypeEnum": 6, "Sender": CREATOR, "ApplicationID": appID, "Fee": 1000}
+    txn.update(fields)
+    return txn
+
+
+def test_wide_math():
+    source = """#pragma version 5
+int 18446744073709551615
+int 3
+mulw
+int 0
+int 2
+divmodw
+pop
+pop
+swap
+int 1
+==
+assert
+int 9223372036854775806
+==
+"""
+    result = evaluate(source, ledgerWithApp(), [call()], 0)
+    assert result.approved, result.error
+    assert result.cost == 33
+    assert result.opcodes == 14
+
+
+def test_panics():
+    for source, message in [
+        ("int 1\nint 0\n/", "/ 0"),
+        ("int 0\nint 1\n-", "would result negative"),
+        ("int 18446744073709551615\nint 2\n*", "overflow"),
+        ("int 1\nint 1", "stack len is 2"),
+        ("int 0\nassert\nint 1", "assert failed"),
+    ]:
+        result = evaluate("#pragma version 5\n" + source, ledgerWithApp(), [call()], 0)
+        assert not result.approved
+        assert message in result.error
+
+
+def test_budget():
+    source = "#pragma version 5\n" + "byte 0x00\nsha256\npop\n" * 20 + "int 1"
+    result = evaluate(source, ledgerWithApp(), [call()], 0)
+    assert not result.approved
+    assert "budget" in result.error
+
+    # each app call in the group adds to the budget
+    result = evaluate(source, ledgerWithApp(), [call(), call()], 1)
+    assert result.approved, result.error
+
+
+def test_state_changes_only_on_approval():
+    source = """#pragma version 5
+byte "counter"
+int 1
+app_global_put
+itxn_begin
+int pay
+itxn_field TypeEnum
+txn Sender
+itxn_field Receiver
+int 5000
+itxn_field Amount
+itxn_submit
+txna ApplicationArgs 0
+btoi
+"""
+    ledger = ledgerWithApp()
+    ledger.algos[appAddress(1)] = 200_000
+    ledger.algos[CREATOR] = 0
+
+    result = evaluate(source, ledger, [call(ApplicationArgs=[b"\x00"])], 0)
+    assert not result.approved
+    assert ledger.apps[1].globalState == {}
+    assert ledger.algos[CREATOR] == 0
+
+    result = evaluate(source, ledger, [call(ApplicationArgs=[b"\x01"])], 0)
+    assert result.approved, result.error
+    assert ledger.apps[1].globalState == {b"counter": 1}
+    assert ledger.algos[CREATOR] == 5000
+    assert ledger.algos[appAddress(1)] == 200_000 - 5000 - 1000
+    assert [txn["Amount"] for txn in result.innerTxns] == [5000]
+
+    # the app account cannot go below its min balance
+    ledger.algos[appAddress(1)] = 100_000
+    result = evaluate(source, ledger, [call(ApplicationArgs=[b"\x01"])], 0)
+    assert not result.approved
+    assert "min balance" in result.error
+
+
+def test_inner_group():
+    source = """#pragma version 6
+itxn_begin
+int pay
+itxn_field TypeEnum
+txn Sender
+itxn_field Receiver
+int 1000
+itxn_field Amount
+int 0
+itxn_field Fee
+itxn_next
+int pay
+itxn_field TypeEnum
+txn Sender
+itxn_field Receiver
+int 2000
+itxn_field Amount
+int 0
+itxn_field Fee
+itxn_submit
+gitxn 0 Amount
+int 1000
+==
+assert
+itxn Amount
+int 2000
+==
+"""
+    ledger = ledgerWithApp()
+    ledger.algos[appAddress(1)] = 200_000
+    ledger.algos[CREATOR] = 0
+
+    # the inner fees are paid by the outer transaction
+    result = evaluate(source, ledger, [call()], 0)
+    assert not result.approved
+    assert "fee too small" in result.error
+
+    result = evaluate(source, ledger, [call(Fee=3000)], 0, feeCredit=2000)
+    assert result.approved, result.error
+    assert ledger.algos[CREATOR] == 3000
+    assert [txn["Amount"] for txn in result.innerTxns] == [1000, 2000]
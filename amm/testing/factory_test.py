@@ -0,0 +1,102 @@
+import pytest
+
+from algosdk import error
+
+from amm.account import Account
+from amm.factory import DeployError, deployPools, formatPools
+from amm.operations import createAmmApp, readPoolState
+from amm.util import MAX_APPS_PER_ACCOUNT, getBalances
+from amm.testing.fakeledger import FakeAlgodClient, LedgerBackend
+from amm.testing.resources import createDummyAssets
+
+
+@pytest.fixture
+def client():
+    return FakeAlgodClient(LedgerBackend())
+
+
+def genesisAccounts(client):
+    return [Account(sk) for sk in client.backend.genesisKeys]
+
+
+def test_deploy_pools(client):
+    creators = genesisAccounts(client)[:2]
+    tokens = createDummyAssets(client, 10 ** 12, 6, creators[0])
+    specs = [(tokens[i], tokens[i + 3], 30 + i, 1000) for i in range(3)] * 4
+    sent = []
+    sendTransactions = client.send_transactions
+
+    def recordGroup(group, **kwargs):
+        sent.append(len(group))
+        return sendTransactions(group, **kwargs)
+
+    client.send_transactions = recordGroup
+    pools = deployPools(client, creators, specs)
+
+    # one create per pool, then the setups of 8 pools per group
+    assert sent == [1] * len(specs) + [16, 8]
+    assert len({pool.appID for pool in pools}) == len(specs)
+    assert len({pool.poolToken for pool in pools}) == len(specs)
+    for pool, (tokenA, tokenB, feeBps, minIncrement) in zip(pools, specs):
+        state = readPoolState(client, pool.appID)
+        assert state.isSetUp
+        assert (state.tokenA, state.tokenB, state.poolToken) == (
+            tokenA,
+            tokenB,
+            pool.poolToken,
+        )
+        assert (pool.feeBps, pool.minIncrement) == (feeBps, minIncrement)
+        assert pool.creator == creators[pools.index(pool) % 2].getAddress()
+        assert getBalances(client, pool.address)[pool.poolToken] > 0
+
+    table = formatPools(pools).splitlines()
+    assert len(table) == len(specs) + 1
+    assert table[1].split() == [
+        str(pools[0].appID),
+        pools[0].address,
+        str(pools[0].poolToken),
+    ]
+
+
+def test_apps_per_creator(client):
+    creator, other, _ = genesisAccounts(client)
+    tokenA, tokenB = createDummyAssets(client, 10 ** 12, 2, creator)
+    createAmmApp(client, creator, tokenA, tokenB, 30, 1000)
+
+    # the creator has room for 9 more apps, the node rejects the 11th
+    specs = [(tokenA, tokenB, 30, 1000)] * MAX_APPS_PER_ACCOUNT
+    with pytest.raises(ValueError, match="only create 9 more apps"):
+        deployPools(client, [creator], specs)
+    deployPools(client, [creator], specs[1:])
+    with pytest.raises(error.AlgodHTTPError, match="more than 10 apps"):
+        createAmmApp(client, creator, tokenA, tokenB, 30, 1000)
+
+    # the first creator is full, so the other one creates every app
+    pools = deployPools(client, [creator, other], specs[:3])
+    assert {pool.creator for pool in pools} == {other.getAddress()}
+
+
+def test_failed_setup(client):
+    creators = genesisAccounts(client)[:2]
+    tokens = createDummyAssets(client, 10 ** 12, 4, creators[0])
+    specs = [(tokens[i % 2], tokens[2 + i % 2], 30, 1000) for i in range(10)]
+    # the app is created, but its setup cannot opt into a missing asset
+    specs[3] = (tokens[0], 10 ** 9, 30, 1000)
+    sent = []
+    sendTransactions = client.send_transactions
+
+    def recordGroup(group, **kwargs):
+        sent.append(len(group))
+        return sendTransactions(group, **kwargs)
+
+    client.send_transactions = recordGroup
+    with pytest.raises(DeployError, match="1 of 10 pools failed") as e:
+        deployPools(client, creators, specs)
+
+    # the failed group of 8 setups is retried one pool at a time
+    assert sent == [1] * len(specs) + [16, 4] + [2] * 8
+    assert list(e.value.errors) == [3]
+    assert e.value.pools[3] is None
+    for i, pool in enumerate(e.value.pools):
+        if i != 3:
+            assert readPoolState(client, pool.appID).poolToken == pool.poolToken
@@ -0,0 +1,154 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import base64
+import inspect
+import json
+import re
+from urllib import parse
+
+from algosdk import error
+
+# (method, path pattern, backend call)
+Route = Tuple[str, "re.Pattern[str]", Callable[..., Any]]
+
+
+def _suggestedParamsJSON(sp: Any) -> Dict[str, Any]:
+    return {
+        "fee": sp.fee,
+        "last-round": sp.first,
+        "genesis-hash": sp.gh,
+        "genesis-id": sp.gen,
+        "consensus-version": sp.consensus_version,
+        "min-fee": sp.min_fee,
+    }
+
+
+class FakeAlgodServer:
+    """A local HTTP server that speaks the algod REST API used by the amm.
+
+    Requests are answered by a backend object with the same methods as
+    algosdk's AlgodClient (status, status_after_block, suggested_params,
+    account_info, application_info, pending_transaction_info,
+    send_raw_transaction, compile). Backend methods may be coroutines, and may
+    raise algosdk.error.AlgodHTTPError to return an error response.
+    """
+
+    def __init__(self, backend: Any) -> None:
+        self.backend = backend
+        self.requestCount = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+        b = backend
+        self._routes: List[Route] = [
+            ("GET", re.compile(r"/health"), lambda: None),
+            ("GET", re.compile(r"/v2/status"), lambda: b.status()),
+            (
+                "GET",
+                re.compile(r"/v2/status/wait-for-block-after/(\d+)"),
+                lambda r: b.status_after_block(int(r)),
+            ),
+            (
+                "GET",
+                re.compile(r"/v2/transactions/params"),
+                lambda: self._suggestedParams(),
+            ),
+            ("GET", re.compile(r"/v2/accounts/(\w+)"), lambda a: b.account_info(a)),
+            (
+                "GET",
+                re.compile(r"/v2/applications/(\d+)"),
+                lambda i: b.application_info(int(i)),
+            ),
+            (
+                "GET",
+                re.compile(r"/v2/transactions/pending/(\w+)"),
+                lambda t: b.pending_transaction_info(t),
+            ),
+        ]
+
+    async def _suggestedParams(self) -> Dict[str, Any]:
+        sp = self.backend.suggested_params()
+        if inspect.isawaitable(sp):
+            sp = await sp
+        return _suggestedParamsJSON(sp)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the address to pass to an algod client."""
+        self._server = await asyncio.start_server(self._serve, host, port)
+        port = self._server.sockets[0].getsockname()[1]
+        return "http://{}:{}".format(host, port)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeAlgodServer":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    requestLine = await reader.readuntil(b"\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+
+                method, target, _ = requestLine.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = dict()
+                while True:
+                    line = await reader.readuntil(b"\r\n")
+                    if line == b"\r\n":
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, response = await self._dispatch(method, target, body)
+                payload = json.dumps(response).encode()
+                writer.write(
+                    "HTTP/1.1 {} OK\r\nContent-Type: application/json\r\n"
+                    "Content-Length: {}\r\n\r\n".format(status, len(payload)).encode()
+                    + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        self.requestCount += 1
+        path = parse.urlsplit(target).path
+
+        try:
+            if method == "POST" and path == "/v2/transactions":
+                result = self.backend.send_raw_transaction(
+                    base64.b64encode(body).decode()
+                )
+                if inspect.isawaitable(result):
+                    result = await result
+                return 200, {"txId": result}
+
+            if method == "POST" and path == "/v2/teal/compile":
+                result = self.backend.compile(body.decode("utf-8"))
+                if inspect.isawaitable(result):
+                    result = await result
+                return 200, result
+
+            for routeMethod, pattern, call in self._routes:
+                match = pattern.fullmatch(path)
+                if routeMethod == method and match:
+                    result = call(*match.groups())
+                    if inspect.isawaitable(result):
+                        result = await result
+                    return 200, result
+        except error.AlgodHTTPError as e:
+            return e.code or 400, {"message": str(e)}
+
+        return 404, {"message": "Not found: {} {}".format(method, path)}
@@ -0,0 +1,737 @@
+"""An in-process algod and KMD that keep a ledger model instead of a network.
+
+LedgerBackend applies signed transaction groups to an amm.teal.evaluator
+Ledger: payments, asset creation, opt-ins and transfers are applied directly,
+and app calls run the approval program in the TEAL evaluator, so the amm's
+contracts behave as they do on a node. Blocks are made on demand: each call
+to status_after_block finishes the blocks it waits for at once, advancing the
+block timestamp by blockTime seconds per round, so waitForTransaction returns
+after two lookups instead of two block intervals.
+
+FakeAlgodClient and FakeKMDClient are algosdk clients answered by a backend,
+and the backend can also be served over HTTP with FakeAlgodServer for the
+asyncio client. Set AMM_LEDGER=fake to have amm.testing.setup return them.
+
+The model is limited to what the amm uses: groups are applied when they are
+sent, so reads see their effects before they are confirmed; app local state,
+rekeying, logic signatures and multisig are not supported; and an app can
+only be called if its approval program was compiled with compile(), passed
+to registerProgram(), or is one of the amm's own programs.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from copy import copy
+from threading import RLock
+import base64
+import hashlib
+import io
+import re
+import time
+
+import msgpack
+from nacl.exceptions import BadSignatureError
+from nacl.signing import VerifyKey
+from algosdk import constants, encoding, error
+from algosdk.future import transaction
+from algosdk.kmd import KMDClient
+from algosdk.v2client.algod import AlgodClient
+
+from ..teal.assembler import AssembledProgram, assembleProgram
+from ..teal.evaluator import (
+    MIN_TXN_FEE,
+    ZERO_ADDRESS,
+    App,
+    Ledger,
+    LedgerError,
+    Value,
+    appAddress,
+    evaluate,
+)
+from ..util import MAX_APPS_PER_ACCOUNT
+from .fakealgod import _suggestedParamsJSON
+from .setup import deriveKeys
+
+GENESIS_ID = "fakeledger-v1"
+GENESIS_HASH = base64.b64encode(hashlib.sha256(GENESIS_ID.encode()).digest()).decode()
+
+# the wallet KMD keeps the genesis accounts in, as in the sandbox
+WALLET_NAME = "unencrypted-default-wallet"
+WALLET_ID = "fakeledger-wallet"
+GENESIS_ACCOUNTS = 3
+GENESIS_BALANCE = 10 ** 15
+
+TYPE_ENUMS = {"pay": 1, "keyreg": 2, "acfg": 3, "axfer": 4, "afrz": 5, "appl": 6}
+
+# algod's names of the inner transaction fields the amm's contracts set
+INNER_FIELD_NAMES = {
+    "Type": "type",
+    "Sender": "snd",
+    "Fee": "fee",
+    "Receiver": "rcv",
+    "Amount": "amt",
+    "XferAsset": "xaid",
+    "AssetReceiver": "arcv",
+    "AssetAmount": "aamt",
+    "ConfigAssetTotal": "t",
+    "ConfigAssetReserve": "r",
+}
+
+
+def _address(value: Optional[str]) -> bytes:
+    if not value:
+        return ZERO_ADDRESS
+    return encoding.decode_address(value)
+
+
+def _jsonable(value: Any) -> Any:
+    """Encode bytes as base64, as algod's JSON responses do."""
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    return value
+
+
+def txnFields(txn: transaction.Transaction) -> Dict[str, Any]:
+    """Get the TEAL field values of a transaction, as the evaluator takes them."""
+    fields: Dict[str, Any] = {
+        "Sender": _address(txn.sender),
+        "Fee": txn.fee,
+        "FirstValid": txn.first_valid_round,
+        "LastValid": txn.last_valid_round,
+        "Note": txn.note or b"",
+        "Lease": txn.lease or b"",
+        "Type": txn.type.encode(),
+        "TypeEnum": TYPE_ENUMS.get(txn.type, 0),
+        "Group": txn.group or ZERO_ADDRESS,
+        "TxID": txn.get_txid(),
+    }
+    if txn.type == "pay":
+        fields["Receiver"] = _address(txn.receiver)
+        fields["Amount"] = txn.amt
+        fields["CloseRemainderTo"] = _address(txn.close_remainder_to)
+    elif txn.type == "axfer":
+        fields["XferAsset"] = txn.index
+        fields["AssetAmount"] = txn.amount
+        fields["AssetReceiver"] = _address(txn.receiver)
+        fields["AssetCloseTo"] = _address(txn.close_assets_to)
+        fields["AssetSender"] = _address(txn.revocation_target)
+    elif txn.type == "acfg":
+        fields["ConfigAsset"] = txn.index or 0
+        fields["ConfigAssetTotal"] = txn.total or 0
+        fields["ConfigAssetDecimals"] = txn.decimals or 0
+        fields["ConfigAssetDefaultFrozen"] = int(bool(txn.default_frozen))
+        fields["ConfigAssetUnitName"] = (txn.unit_name or "").encode()
+        fields["ConfigAssetName"] = (txn.asset_name or "").encode()
+        fields["ConfigAssetURL"] = (txn.url or "").encode()
+        fields["ConfigAssetMetadataHash"] = txn.metadata_hash or b""
+        fields["ConfigAssetManager"] = _address(txn.manager)
+        fields["ConfigAssetReserve"] = _address(txn.reserve)
+        fields["ConfigAssetFreeze"] = _address(txn.freeze)
+        fields["ConfigAssetClawback"] = _address(txn.clawback)
+    elif txn.type == "appl":
+        fields["ApplicationID"] = txn.index or 0
+        # a decoded NoOp call has no on_complete
+        onCompletion = txn.on_complete or 0
+        fields["OnCompletion"] = int(getattr(onCompletion, "value", onCompletion))
+        fields["ApplicationArgs"] = list(txn.app_args or [])
+        fields["Accounts"] = [_address(a) for a in txn.accounts or []]
+        fields["Assets"] = list(txn.foreign_assets or [])
+        fields["Applications"] = list(txn.foreign_apps or [])
+        fields["ApprovalProgram"] = txn.approval_program or b""
+        fields["ClearStateProgram"] = txn.clear_program or b""
+    return fields
+
+
+def _innerTxnJSON(fields: Dict[str, Any]) -> Dict[str, Any]:
+    txn = {}
+    for name, key in INNER_FIELD_NAMES.items():
+        value = fields.get(name)
+        if name in ("Sender", "Receiver", "AssetReceiver", "ConfigAssetReserve"):
+            value = encoding.encode_address(value) if value else None
+        elif name == "Type":
+            value = value.decode()
+        if value:
+            txn[key] = value
+    info: Dict[str, Any] = {"pool-error": "", "txn": {"txn": txn}}
+    if "CreatedAssetID" in fields:
+        info["asset-index"] = fields["CreatedAssetID"]
+    return info
+
+
+def _rejected(txID: str, message: str) -> error.AlgodHTTPError:
+    return error.AlgodHTTPError(
+        "TransactionPool.Remember: transaction {}: {}".format(txID, message), 400
+    )
+
+
+def deriveGenesisKeys(
+    count: int = GENESIS_ACCOUNTS, seed: bytes = GENESIS_ID.encode()
+) -> List[str]:
+    """Derive the private keys of the genesis accounts from a seed.
+
+    With AMM_GENESIS_SEED set to GENESIS_ID, getGenesisAccounts derives the
+    same keys when KMD is unavailable.
+    """
+    return deriveKeys(seed, count)
+
+
+class LedgerBackend:
+    """The ledger and block clock behind FakeAlgodClient and FakeKMDClient.
+
+    Its methods are those FakeAlgodServer expects of a backend. It is safe to
+    use from several threads.
+    """
+
+    def __init__(
+        self,
+        genesisKeys: Optional[List[str]] = None,
+        genesisBalance: int = GENESIS_BALANCE,
+        blockTime: int = 4,
+        timestamp: Optional[int] = None,
+    ) -> None:
+        """Create a ledger whose genesis accounts hold genesisBalance each.
+
+        Args:
+            genesisKeys (optional): The private keys of the genesis accounts.
+                Defaults to GENESIS_ACCOUNTS keys from deriveGenesisKeys().
+            genesisBalance (optional): The microalgos of each genesis account.
+            blockTime (optional): The seconds between the timestamps of
+                consecutive blocks.
+            timestamp (optional): The timestamp of the first block. Defaults
+                to the current time.
+        """
+        self.genesisKeys = (
+            deriveGenesisKeys() if genesisKeys is None else list(genesisKeys)
+        )
+        self.blockTime = blockTime
+        self.genesisTimestamp = int(time.time()) if timestamp is None else timestamp
+
+        self.ledger = Ledger()
+        self.ledger.round = 1
+        self.ledger.timestamp = self.genesisTimestamp
+        for sk in self.genesisKeys:
+            address = _address(encoding.encode_address(base64.b64decode(sk)[32:]))
+            self.ledger.algos[address] = genesisBalance
+
+        # approval and clear state programs by bytecode
+        self.programs: Dict[bytes, AssembledProgram] = {}
+        self._ammProgramsLoaded = False
+        # transactions by ID, and the IDs of those not yet in a block
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+        self.pending: List[str] = []
+        self._lock = RLock()
+
+    # block clock
+
+    @property
+    def lastRound(self) -> int:
+        return self.ledger.round
+
+    def blockTimestamp(self, round: int) -> int:
+        return self.genesisTimestamp + (round - 1) * self.blockTime
+
+    def makeBlock(self) -> None:
+        """Finish the current round, confirming the pending transactions."""
+        with self._lock:
+            self.ledger.round += 1
+            self.ledger.timestamp = self.blockTimestamp(self.ledger.round)
+            for txID in self.pending:
+                self.transactions[txID]["info"]["confirmed-round"] = self.ledger.round
+            self.pending = []
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "last-round": self.lastRound,
+            "time-since-last-round": 0,
+            "catchup-time": 0,
+            "last-version": "future",
+        }
+
+    def status_after_block(self, round: int) -> Dict[str, Any]:
+        with self._lock:
+            while self.lastRound <= round:
+                self.makeBlock()
+            return self.status()
+
+    def block_info(self, round: int) -> Dict[str, Any]:
+        if round > self.lastRound:
+            raise error.AlgodHTTPError("ledger does not have entry", 404)
+        return {
+            "block": {
+                "rnd": round,
+                "ts": self.blockTimestamp(round),
+                "gen": GENESIS_ID,
+                "gh": GENESIS_HASH,
+            }
+        }
+
+    def suggested_params(self) -> transaction.SuggestedParams:
+        return transaction.SuggestedParams(
+            0,
+            self.lastRound,
+            self.lastRound + 1000,
+            GENESIS_HASH,
+            GENESIS_ID,
+            False,
+            "future",
+            MIN_TXN_FEE,
+        )
+
+    # programs
+
+    def registerProgram(self, source: str) -> bytes:
+        """Make a program callable by apps, and get its bytecode."""
+        program = assembleProgram(source)
+        bytecode = program.bytecode()
+        with self._lock:
+            self.programs[bytecode] = program
+        return bytecode
+
+    def compile(self, source: str) -> Dict[str, str]:
+        try:
+            bytecode = self.registerProgram(source)
+        except ValueError as e:
+            raise error.AlgodHTTPError(str(e), 400)
+        return {
+            "hash": encoding.encode_address(encoding.checksum(b"Program" + bytecode)),
+            "result": base64.b64encode(bytecode).decode(),
+        }
+
+    def program(self, bytecode: bytes) -> Optional[AssembledProgram]:
+        if bytecode not in self.programs and not self._ammProgramsLoaded:
+            # pyteal is only needed once an app is created
+            from ..programs import TEAL_VERSIONS, generateTeal
+
+            for version in TEAL_VERSIONS:
+                for source in generateTeal(version):
+                    self.registerProgram(source)
+            self._ammProgramsLoaded = True
+        return self.programs.get(bytecode)
+
+    # reads
+
+    def account_info(self, address: str) -> Dict[str, Any]:
+        if not encoding.is_valid_address(address):
+            raise error.AlgodHTTPError("failed to parse the address", 400)
+        addr = _address(address)
+        with self._lock:
+            ledger = self.ledger
+            assets = [
+                {"asset-id": assetID, "amount": amount, "is-frozen": False}
+                for (holder, assetID), amount in sorted(ledger.holdings.items())
+                if holder == addr
+            ]
+            createdApps = [
+                appID
+                for appID, app in sorted(ledger.apps.items())
+                if app.creator == addr
+            ]
+            return {
+                "address": address,
+                "amount": ledger.algos.get(addr, 0),
+                "min-balance": ledger.minBalance(addr),
+                "assets": assets,
+                "created-apps": [{"id": appID} for appID in createdApps],
+                "round": self.lastRound,
+                "status": "Offline",
+            }
+
+    def application_info(self, appID: int) -> Dict[str, Any]:
+        with self._lock:
+            app = self.ledger.apps.get(appID)
+            if app is None:
+                raise error.AlgodHTTPError("application does not exist", 404)
+            globalState = []
+            for key, value in sorted(app.globalState.items()):
+                if isinstance(value, int):
+                    encodedValue = {"type": 2, "uint": value}
+                else:
+                    encodedValue = {"type": 1, "bytes": _jsonable(value)}
+                globalState.append({"key": _jsonable(key), "value": encodedValue})
+            return {
+                "id": appID,
+                "params": {
+                    "creator": encoding.encode_address(app.creator),
+                    "approval-program": _jsonable(app.approvalProgram),
+                    "clear-state-program": _jsonable(app.clearStateProgram),
+                    "global-state": globalState,
+                },
+            }
+
+    def asset_info(self, assetID: int) -> Dict[str, Any]:
+        with self._lock:
+            params = self.ledger.assets.get(assetID)
+            if params is None:
+                raise error.AlgodHTTPError("asset does not exist", 404)
+
+            def address(name: str) -> Optional[str]:
+                value = params.get(name, ZERO_ADDRESS)
+                if value == ZERO_ADDRESS:
+                    return None
+                return encoding.encode_address(value)
+
+            return {
+                "index": assetID,
+                "params": {
+                    "creator": address("AssetCreator"),
+                    "total": params.get("AssetTotal", 0),
+                    "decimals": params.get("AssetDecimals", 0),
+                    "default-frozen": bool(params.get("AssetDefaultFrozen", 0)),
+                    "unit-name": params.get("AssetUnitName", b"").decode(),
+                    "name": params.get("AssetName", b"").decode(),
+                    "url": params.get("AssetURL", b"").decode(),
+                    "manager": address("AssetManager"),
+                    "reserve": address("AssetReserve"),
+                    "freeze": address("AssetFreeze"),
+                    "clawback": address("AssetClawback"),
+                },
+            }
+
+    def pending_transaction_info(self, txID: str) -> Dict[str, Any]:
+        with self._lock:
+            entry = self.transactions.get(txID)
+            if entry is None:
+                raise error.AlgodHTTPError("txn does not exist", 404)
+            return dict(entry["info"])
+
+    def pending_transactions(self, maxTxns: int = 0) -> Dict[str, Any]:
+        """List the pool, with transactions as msgpack-decoded dictionaries."""
+        with self._lock:
+            txIDs = self.pending[:maxTxns] if maxTxns else list(self.pending)
+            return {
+                "top-transactions": [self.transactions[t]["raw"] for t in txIDs],
+                "total-transactions": len(self.pending),
+            }
+
+    # writes
+
+    def send_raw_transaction(self, txn: str) -> str:
+        """Apply a group of signed transactions, encoded as by algosdk.
+
+        Returns:
+            The ID of the first transaction.
+
+        Raises:
+            AlgodHTTPError: if the group is invalid or fails, in which case
+                the ledger is not changed.
+        """
+        unpacker = msgpack.Unpacker(io.BytesIO(base64.b64decode(txn)), raw=False)
+        raws = list(unpacker)
+        try:
+            group = [encoding.future_msgpack_decode(raw) for raw in raws]
+        except Exception as e:
+            raise error.AlgodHTTPError(
+                "failed to decode transactions: {}".format(e), 400
+            )
+        if not group:
+            raise error.AlgodHTTPError("empty group", 400)
+
+        with self._lock:
+            infos = self._applyGroup(group)
+            for raw, stxn, info in zip(raws, group, infos):
+                txID = stxn.get_txid()
+                self.transactions[txID] = {"raw": raw, "info": info}
+                self.pending.append(txID)
+        return group[0].get_txid()
+
+    def _checkGroup(self, group: List[Any]) -> None:
+        nextRound = self.lastRound + 1
+        for stxn in group:
+            if not isinstance(stxn, transaction.SignedTransaction):
+                raise error.AlgodHTTPError(
+                    "only single signature transactions are supported", 400
+                )
+            txn = stxn.transaction
+            txID = txn.get_txid()
+            if txID in self.transactions:
+                raise _rejected(txID, "transaction already in ledger")
+            if txn.genesis_hash != GENESIS_HASH:
+                raise _rejected(txID, "genesis hash mismatch")
+            if not txn.first_valid_round <= nextRound <= txn.last_valid_round:
+                raise _rejected(
+                    txID,
+                    "txn dead: round {} outside of {}--{}".format(
+                        nextRound, txn.first_valid_round, txn.last_valid_round
+                    ),
+                )
+            # accounts cannot be rekeyed, so each is authorized by its own key
+            signer = stxn.authorizing_address or txn.sender
+            if signer != txn.sender:
+                raise _rejected(
+                    txID,
+                    "should have been authorized by {} but was actually "
+                    "authorized by {}".format(txn.sender, signer),
+                )
+            message = constants.txid_prefix + base64.b64decode(
+                encoding.msgpack_encode(txn)
+            )
+            try:
+                VerifyKey(_address(signer)).verify(
+                    message, base64.b64decode(stxn.signature or "")
+                )
+            except (BadSignatureError, ValueError):
+                raise _rejected(txID, "invalid signature")
+
+        if len(group) > 1:
+            # the group ID is a hash of the transactions without it
+            ungrouped = [copy(stxn.transaction) for stxn in group]
+            for txn in ungrouped:
+                txn.group = None
+            groupID = transaction.calculate_group_id(ungrouped)
+            if any(stxn.transaction.group != groupID for stxn in group):
+                raise _rejected(group[0].get_txid(), "incomplete group")
+        elif group[0].transaction.group not in (None, b""):
+            raise _rejected(group[0].get_txid(), "incomplete group")
+
+        fees = sum(stxn.transaction.fee for stxn in group)
+        if fees < MIN_TXN_FEE * len(group):
+            raise _rejected(group[0].get_txid(), "fee too small")
+
+    def _applyGroup(self, group: List[Any]) -> List[Dict[str, Any]]:
+        self._checkGroup(group)
+
+        work = self.ledger.copy()
+        # app calls see the round being made and the last block's timestamp
+        work.round = self.lastRound + 1
+        fields = [txnFields(stxn.transaction) for stxn in group]
+        feeCredit = sum(txn["Fee"] for txn in fields) - MIN_TXN_FEE * len(fields)
+        infos = []
+        touched = set()
+        for index, txn in enumerate(fields):
+            info: Dict[str, Any] = {
+                "pool-error": "",
+                "txn": _jsonable(
+                    {
+                        "sig": group[index].signature,
+                        "txn": group[index].transaction.dictify(),
+                    }
+                ),
+            }
+            try:
+                self._applyTxn(work, fields, index, feeCredit, info)
+            except LedgerError as e:
+                raise _rejected(txn["TxID"], str(e))
+            touched.add(txn["Sender"])
+            for name in ("Receiver", "AssetReceiver", "CloseRemainderTo"):
+                touched.add(txn.get(name, ZERO_ADDRESS))
+            if "application-index" in info:
+                touched.add(appAddress(info["application-index"]))
+            infos.append(info)
+
+        for address in touched - {ZERO_ADDRESS}:
+            balance = work.algos.get(address, 0)
+            opted = any(holder == address for holder, _ in work.holdings)
+            if (balance > 0 or opted) and balance < work.minBalance(address):
+                raise _rejected(
+                    fields[0]["TxID"],
+                    "account {} balance {} below min {}".format(
+                        encoding.encode_address(address),
+                        balance,
+                        work.minBalance(address),
+                    ),
+                )
+
+        work.round = self.ledger.round
+        self.ledger.commit(work)
+        return infos
+
+    def _applyTxn(
+        self,
+        work: Ledger,
+        group: List[Dict[str, Any]],
+        index: int,
+        feeCredit: int,
+        info: Dict[str, Any],
+    ) -> None:
+        txn = group[index]
+        sender = txn["Sender"]
+        work.chargeFee(sender, txn["Fee"])
+        typeEnum = txn["TypeEnum"]
+        if typeEnum == 1:
+            work.pay(sender, txn["Receiver"], txn["Amount"], txn["CloseRemainderTo"])
+        elif typeEnum == 4:
+            if txn["AssetSender"] != ZERO_ADDRESS:
+                raise LedgerError("clawback transfers are not supported")
+            work.transferAsset(
+                sender,
+                txn["AssetReceiver"],
+                txn["XferAsset"],
+                txn["AssetAmount"],
+                txn["AssetCloseTo"],
+            )
+        elif typeEnum == 3:
+            if txn["ConfigAsset"] != 0:
+                raise LedgerError("only asset creation is supported")
+            params: Dict[str, Value] = {
+                "Asset" + name[len("ConfigAsset") :]: value
+                for name, value in txn.items()
+                if name.startswith("ConfigAsset") and name != "ConfigAsset"
+            }
+            info["asset-index"] = work.createAsset(sender, params)
+        elif typeEnum == 6:
+            self._applyAppCall(work, group, index, feeCredit, info)
+        else:
+            raise LedgerError("unsupported transaction type {}".format(txn["Type"]))
+
+    def _applyAppCall(
+        self,
+        work: Ledger,
+        group: List[Dict[str, Any]],
+        index: int,
+        feeCredit: int,
+        info: Dict[str, Any],
+    ) -> None:
+        txn = group[index]
+        appID = txn["ApplicationID"]
+        onCompletion = txn["OnCompletion"]
+        if appID == 0:
+            created = sum(
+                1 for app in work.apps.values() if app.creator == txn["Sender"]
+            )
+            if created >= MAX_APPS_PER_ACCOUNT:
+                raise LedgerError(
+                    "cannot create more than {} apps".format(MAX_APPS_PER_ACCOUNT)
+                )
+            appID = work.allocateID()
+            work.apps[appID] = App(
+                txn["Sender"],
+                approvalProgram=txn["ApprovalProgram"],
+                clearStateProgram=txn["ClearStateProgram"],
+            )
+            info["application-index"] = appID
+        elif appID not in work.apps:
+            raise LedgerError("application {} does not exist".format(appID))
+
+        if onCompletion == transaction.OnComplete.ClearStateOC.value:
+            return
+        if onCompletion == transaction.OnComplete.UpdateApplicationOC.value:
+            raise LedgerError("application updates are not supported")
+
+        bytecode = work.apps[appID].approvalProgram
+        program = self.program(bytecode)
+        if program is None:
+            raise LedgerError(
+                "unknown approval program; compile or register its source first"
+            )
+        result = evaluate(program, work, group, index, appID=appID, feeCredit=feeCredit)
+        if not result.approved:
+            raise LedgerError(
+                "logic eval error: {}".format(result.error or "rejected by program")
+            )
+
+        if onCompletion == transaction.OnComplete.DeleteApplicationOC.value:
+            del work.apps[appID]
+        info["logs"] = [_jsonable(log) for log in result.logs]
+        info["inner-txns"] = [_innerTxnJSON(inner) for inner in result.innerTxns]
+
+
+class FakeAlgodClient(AlgodClient):
+    """An AlgodClient whose requests are answered by a LedgerBackend."""
+
+    def __init__(self, backend: Optional[LedgerBackend] = None) -> None:
+        super().__init__("", "http://fakeledger")
+        self.backend = LedgerBackend() if backend is None else backend
+        b = self.backend
+        self._routes: List[Tuple[str, "re.Pattern[str]", Any]] = [
+            ("GET", re.compile(r"/health"), lambda: None),
+            ("GET", re.compile(r"/status"), lambda: b.status()),
+            (
+                "GET",
+                re.compile(r"/status/wait-for-block-after/(\d+)"),
+                lambda r: b.status_after_block(int(r)),
+            ),
+            (
+                "GET",
+                re.compile(r"/transactions/params"),
+                lambda: _suggestedParamsJSON(b.suggested_params()),
+            ),
+            ("GET", re.compile(r"/accounts/(\w+)"), lambda a: b.account_info(a)),
+            (
+                "GET",
+                re.compile(r"/applications/(\d+)"),
+                lambda i: b.application_info(int(i)),
+            ),
+            ("GET", re.compile(r"/assets/(\d+)"), lambda i: b.asset_info(int(i))),
+            ("GET", re.compile(r"/blocks/(\d+)"), lambda r: b.block_info(int(r))),
+            (
+                "GET",
+                re.compile(r"/transactions/pending/(\w+)"),
+                lambda t: b.pending_transaction_info(t),
+            ),
+        ]
+
+    def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+    ):
+        if method == "POST" and requrl == "/transactions":
+            txID = self.backend.send_raw_transaction(base64.b64encode(data).decode())
+            return {"txId": txID}
+        if method == "POST" and requrl == "/teal/compile":
+            return self.backend.compile(data.decode("utf-8"))
+        if method == "GET" and requrl == "/transactions/pending":
+            pool = self.backend.pending_transactions((params or {}).get("max", 0))
+            if response_format == "msgpack":
+                return msgpack.packb(pool, use_bin_type=True)
+            return _jsonable(pool)
+
+        for routeMethod, pattern, call in self._routes:
+            match = pattern.fullmatch(requrl)
+            if routeMethod == method and match:
+                if response_format == "msgpack":
+                    raise error.AlgodHTTPError("msgpack responses are not supported")
+                return call(*match.groups())
+        raise error.AlgodHTTPError("Not found: {} {}".format(method, requrl), 404)
+
+
+class FakeKMDClient(KMDClient):
+    """A KMDClient with one unencrypted wallet holding the genesis accounts
+    of a LedgerBackend."""
+
+    def __init__(self, backend: LedgerBackend) -> None:
+        super().__init__("", "http://fakeledger")
+        self.backend = backend
+        self._handles: Dict[str, str] = {}
+        self._nextHandle = 0
+
+    def _keys(self, handle: str) -> Dict[str, str]:
+        if handle not in self._handles:
+            raise error.KMDHTTPError("invalid wallet handle")
+        keys = {}
+        for sk in self.backend.genesisKeys:
+            keys[encoding.encode_address(base64.b64decode(sk)[32:])] = sk
+        return keys
+
+    def versions(self):
+        return ["v1"]
+
+    def list_wallets(self):
+        return [{"id": WALLET_ID, "name": WALLET_NAME, "driver_name": "sqlite"}]
+
+    def init_wallet_handle(self, id, password):
+        if id != WALLET_ID:
+            raise error.KMDHTTPError("wallet not found")
+        self._nextHandle += 1
+        handle = "handle-{}".format(self._nextHandle)
+        self._handles[handle] = id
+        return handle
+
+    def release_wallet_handle(self, handle):
+        self._handles.pop(handle, None)
+        return True
+
+    def list_keys(self, handle):
+        return list(self._keys(handle))
+
+    def export_key(self, handle, password, address):
+        keys = self._keys(handle)
+        if address not in keys:
+            raise error.KMDHTTPError("key does not exist in this wallet")
+        return keys[address]
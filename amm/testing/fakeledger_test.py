@@ -0,0 +1,173 @@
+import asyncio
+
+import pytest
+
+from algosdk import account, error
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from amm import aio
+from amm.account import Account
+from amm.confirmation import ConfirmationTracker
+from amm.operations import (
+    AmmPool,
+    createAmmApp,
+    optInToPoolToken,
+    readPoolState,
+    setupAmmApp,
+    supply,
+    swap,
+)
+from amm.util import getBalances, getLastBlockTimestamp, waitForTransaction
+from amm.testing.fakealgod import FakeAlgodServer
+from amm.testing.fakeledger import (
+    GENESIS_BALANCE,
+    FakeAlgodClient,
+    FakeKMDClient,
+    LedgerBackend,
+    deriveGenesisKeys,
+)
+from amm.testing.resources import createDummyAsset, payAccount
+from amm.testing.setup import ALGOD_TOKEN
+
+
+@pytest.fixture
+def backend():
+    return LedgerBackend(timestamp=1_000_000)
+
+
+@pytest.fixture
+def client(backend):
+    return FakeAlgodClient(backend)
+
+
+def genesisAccount(backend, index=0):
+    return Account(backend.genesisKeys[index])
+
+
+def newAccount():
+    return Account(account.generate_account()[0])
+
+
+def test_kmd_exports_genesis_keys(backend):
+    kmd = FakeKMDClient(backend)
+    (wallet,) = kmd.list_wallets()
+    handle = kmd.init_wallet_handle(wallet["id"], "")
+    keys = [kmd.export_key(handle, "", address) for address in kmd.list_keys(handle)]
+    kmd.release_wallet_handle(handle)
+
+    assert keys == deriveGenesisKeys() == backend.genesisKeys
+    with pytest.raises(error.KMDHTTPError):
+        kmd.list_keys(handle)
+
+
+def test_payment_and_blocks(client, backend):
+    funder = genesisAccount(backend)
+    receiver = newAccount()
+    startRound = client.status()["last-round"]
+
+    response = payAccount(client, funder, receiver.getAddress(), 1_000_000)
+    assert response.confirmedRound == startRound + 1
+    assert getBalances(client, receiver.getAddress()) == {0: 1_000_000}
+    assert getBalances(client, funder.getAddress()) == {
+        0: GENESIS_BALANCE - 1_000_000 - 1000
+    }
+
+    # each block is blockTime seconds after the previous one
+    lastRound = client.status()["last-round"]
+    _, timestamp = getLastBlockTimestamp(client)
+    assert timestamp == 1_000_000 + (lastRound - 1) * backend.blockTime
+
+
+def test_rejected_groups(client, backend):
+    funder = genesisAccount(backend)
+    receiver = newAccount()
+    sp = client.suggested_params()
+
+    def pay(sender, amount, signer=None):
+        txn = transaction.PaymentTxn(
+            sender.getAddress(), sp, receiver.getAddress(), amount
+        )
+        return txn.sign((signer or sender).getPrivateKey())
+
+    # below the min balance of the receiver
+    with pytest.raises(error.AlgodHTTPError, match="below min"):
+        client.send_transaction(pay(funder, 1000))
+    # signed by another key
+    with pytest.raises(error.AlgodHTTPError, match="authorized by"):
+        client.send_transaction(pay(funder, 200_000, genesisAccount(backend, 1)))
+    # overspend
+    with pytest.raises(error.AlgodHTTPError, match="overspend"):
+        client.send_transaction(pay(newAccount(), 200_000))
+
+    # groups are atomic and must be complete
+    txns = transaction.assign_group_id(
+        [
+            transaction.PaymentTxn(
+                funder.getAddress(), sp, receiver.getAddress(), 200_000
+            ),
+            transaction.PaymentTxn(
+                receiver.getAddress(), sp, funder.getAddress(), 10 ** 9
+            ),
+        ]
+    )
+    signed = [
+        txns[0].sign(funder.getPrivateKey()),
+        txns[1].sign(receiver.getPrivateKey()),
+    ]
+    with pytest.raises(error.AlgodHTTPError, match="overspend"):
+        client.send_transactions(signed)
+    with pytest.raises(error.AlgodHTTPError, match="incomplete group"):
+        client.send_transaction(signed[0])
+    assert getBalances(client, receiver.getAddress()) == {0: 0}
+
+    txID = client.send_transaction(pay(funder, 200_000))
+    waitForTransaction(client, txID)
+    with pytest.raises(error.AlgodHTTPError, match="already in ledger"):
+        client.send_transaction(pay(funder, 200_000))
+
+
+def test_amm(client, backend):
+    creator = genesisAccount(backend)
+    tokenA = createDummyAsset(client, 10 ** 12, creator)
+    tokenB = createDummyAsset(client, 10 ** 12, creator)
+
+    appID = createAmmApp(client, creator, tokenA, tokenB, 30, 1000)
+    poolToken = setupAmmApp(client, appID, creator, tokenA, tokenB)
+    optInToPoolToken(client, appID, creator)
+
+    supplied = supply(client, appID, 10 ** 6, 2 * 10 ** 6, creator)
+    assert (supplied.amountA, supplied.amountB) == (10 ** 6, 2 * 10 ** 6)
+    assert getBalances(client, creator.getAddress())[poolToken] == supplied.poolTokens
+
+    quote = readPoolState(client, appID).simulator().quoteSwap(tokenA, 10_000)
+    swapped = swap(client, appID, tokenA, 10_000, creator)
+    assert swapped.amountOut == quote.amountOut
+    state = readPoolState(client, appID)
+    assert (state.reserveA, state.reserveB) == (swapped.reserveA, swapped.reserveB)
+    assert getBalances(client, get_application_address(appID))[tokenB] == (
+        2 * 10 ** 6 - swapped.amountOut
+    )
+
+    # a failing call is rejected when it is sent
+    with pytest.raises(error.AlgodHTTPError, match="logic eval error"):
+        swap(client, appID, tokenA, 1, creator)
+
+    # pooled transactions are visible to a confirmation tracker
+    with ConfirmationTracker(client) as tracker:
+        pool = AmmPool(client, appID, tracker=tracker)
+        result = pool.swap(creator, tokenB, 10_000)
+        assert result.tokenIn == tokenB
+
+
+def test_served_over_http(backend):
+    async def run():
+        creator = genesisAccount(backend)
+        async with FakeAlgodServer(backend) as server:
+            address = await server.start()
+            async with aio.AsyncAlgodClient(ALGOD_TOKEN, address) as client:
+                appID = await aio.createAmmApp(client, creator, 1, 2, 30, 1000)
+                state = await aio.getAppGlobalState(client, appID)
+        assert state[b"token_a_key"] == 1
+
+    asyncio.run(run())
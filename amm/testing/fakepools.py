@@ -0,0 +1,167 @@
+"""Fake algod clients serving amm pools, for the registry, router and splitter tests.
+
+LedgerClient answers the reads of PoolRegistry from apps created with
+createApp, and SendingClient also records the groups it is sent and confirms
+them at once. Only the global state of the apps is modelled, so the pools do
+not run the approval program: swaps log the output the simulator quotes from
+the current reserves, but do not change them. See fakeledger.py for a client
+that runs the program.
+"""
+
+from base64 import b64encode
+from collections import Counter
+import struct
+
+from algosdk import account
+from algosdk.error import AlgodHTTPError
+from algosdk.future import transaction
+
+from amm.events import RECORD_FORMAT, SWAP_EVENT
+from amm.simulator import PoolSimulator
+
+GENESIS_HASH = "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI="
+
+# the approval program of the fake pools
+APPROVAL = b"\x05amm"
+
+CREATOR_1 = account.generate_account()[1]
+CREATOR_2 = account.generate_account()[1]
+
+
+def encodeState(state):
+    return [
+        {
+            "key": b64encode(key).decode(),
+            "value": {"type": 1, "bytes": b64encode(value).decode()}
+            if isinstance(value, bytes)
+            else {"type": 2, "uint": value},
+        }
+        for key, value in state.items()
+    ]
+
+
+def poolState(tokenA, tokenB, feeBps=30, poolToken=None, outstanding=0):
+    state = {
+        b"token_a_key": tokenA,
+        b"token_b_key": tokenB,
+        b"fee_bps_key": feeBps,
+        b"min_increment_key": 1000,
+        b"pool_tokens_outstanding_key": outstanding,
+    }
+    if poolToken is not None:
+        state[b"pool_token_key"] = poolToken
+    return state
+
+
+class LedgerClient:
+    """Serves apps grouped by creator and counts the requests it receives"""
+
+    def __init__(self) -> None:
+        self.lastRound = 10
+        self.calls = Counter()
+        # creator -> {appID: (approval program, global state)}
+        self.apps = {CREATOR_1: {}, CREATOR_2: {}}
+
+    def createApp(self, creator, appID, state, approval=APPROVAL, balances=None):
+        # the contract mirrors its reserves in global state
+        if balances is not None:
+            state = dict(state)
+            state[b"reserve_a_key"] = balances.get(state[b"token_a_key"], 0)
+            state[b"reserve_b_key"] = balances.get(state[b"token_b_key"], 0)
+        self.apps[creator][appID] = (approval, state)
+
+    def deleteApp(self, appID):
+        for apps in self.apps.values():
+            apps.pop(appID, None)
+
+    def setReserves(self, appID, reserveA, reserveB):
+        for apps in self.apps.values():
+            if appID in apps:
+                _, state = apps[appID]
+                state[b"reserve_a_key"] = reserveA
+                state[b"reserve_b_key"] = reserveB
+
+    def _params(self, creator, appID):
+        approval, state = self.apps[creator][appID]
+        return {
+            "creator": creator,
+            "approval-program": b64encode(approval).decode(),
+            "global-state": encodeState(state),
+        }
+
+    def status(self):
+        self.calls["status"] += 1
+        return {"last-round": self.lastRound}
+
+    def application_info(self, appID):
+        self.calls["application_info"] += 1
+        for creator, apps in self.apps.items():
+            if appID in apps:
+                return {"id": appID, "params": self._params(creator, appID)}
+        raise AlgodHTTPError("application does not exist", 404)
+
+    def account_info(self, address):
+        self.calls["account_info"] += 1
+        return {
+            "amount": 0,
+            "created-apps": [
+                {"id": appID, "params": self._params(address, appID)}
+                for appID in self.apps[address]
+            ],
+        }
+
+
+SP = transaction.SuggestedParams(0, 100, 1100, GENESIS_HASH, "sandnet-v1")
+
+
+class SendingClient(LedgerClient):
+    """Records the groups it is sent and confirms them immediately"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.sent = []
+        self.logs = {}
+
+    def suggested_params(self):
+        return SP
+
+    def send_transactions(self, signedTxns):
+        self.sent.append(signedTxns)
+        for transfer, call in zip(signedTxns, signedTxns[1:]):
+            call = call.transaction
+            if call.type == "appl" and call.app_args == [b"swap"]:
+                self.logs[call.get_txid()] = [
+                    b64encode(
+                        self.swapRecord(call.index, transfer.transaction)
+                    ).decode()
+                ]
+        return signedTxns[0].get_txid()
+
+    def swapRecord(self, appID, transfer):
+        (state,) = [apps[appID][1] for apps in self.apps.values() if appID in apps]
+        simulator = PoolSimulator.fromState(state)
+        quote = simulator.swap(transfer.index, transfer.amount)
+        return struct.pack(
+            RECORD_FORMAT,
+            SWAP_EVENT,
+            quote.tokenIn,
+            quote.amountIn,
+            quote.amountOut,
+            simulator.reserveA,
+            simulator.reserveB,
+        )
+
+    def pending_transaction_info(self, txID):
+        info = {"pool-error": "", "txn": {}, "confirmed-round": self.lastRound}
+        if txID in self.logs:
+            info["logs"] = self.logs[txID]
+        return info
+
+
+def addPool(client, appID, tokenA, tokenB, reserveA, reserveB, feeBps=30):
+    client.createApp(
+        CREATOR_1,
+        appID,
+        poolState(tokenA, tokenB, feeBps, 1000 + appID, 1_000_000),
+        balances={tokenA: reserveA, tokenB: reserveB},
+    )
@@ -0,0 +1,108 @@
+"""Startup benchmark for the amm package.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+reports the slowest imports, and whether the compiler stack (pyteal and the
+contracts) was loaded.
+
+Usage:
+    python -m amm.testing.importtime [--top N] [--output FILE] [module ...]
+"""
+
+from typing import List, NamedTuple, Optional
+import argparse
+import subprocess
+import sys
+
+# modules that the trading path should not need
+COMPILER_MODULES = ("pyteal", "amm.contracts.contracts")
+
+
+class ImportRecord(NamedTuple):
+    name: str
+    # microseconds spent importing the module itself
+    selfTime: int
+    # microseconds including the imports it triggered
+    cumulativeTime: int
+    depth: int
+
+
+def measureImportTime(module: str, python: str = sys.executable) -> List[ImportRecord]:
+    """Import a module in a new interpreter and record how long each import took.
+
+    Returns:
+        The imports in the order python -X importtime reports them, i.e. each
+        module after the modules it imported.
+    """
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", "import " + module],
+        stderr=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        universal_newlines=True,
+        check=True,
+    )
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        selfTime, cumulativeTime, name = line[len("import time:") :].split("|")
+        if not selfTime.strip().isdigit():
+            # the header line
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        records.append(
+            ImportRecord(name.strip(), int(selfTime), int(cumulativeTime), depth)
+        )
+    return records
+
+
+def compilerModules(records: List[ImportRecord]) -> List[str]:
+    """Get the compiler stack modules in an import record."""
+    return [
+        r.name
+        for r in records
+        if any(r.name == m or r.name.startswith(m + ".") for m in COMPILER_MODULES)
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=["amm.operations"])
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="also write the raw records to a file")
+    args = parser.parse_args(argv)
+
+    lines = []
+    for module in args.modules:
+        records = measureImportTime(module)
+        total = next(r for r in reversed(records) if r.name == module)
+        compiler = compilerModules(records)
+
+        lines.append(
+            "{}: {:.1f} ms, {} modules, compiler stack {}".format(
+                module,
+                total.cumulativeTime / 1000,
+                len(records),
+                "loaded ({} modules)".format(len(compiler))
+                if compiler
+                else "not loaded",
+            )
+        )
+        slowest = sorted(records, key=lambda r: -r.cumulativeTime)[: args.top]
+        for r in slowest:
+            lines.append(
+                "  {:>9.1f} ms {:>9.1f} ms  {}{}".format(
+                    r.cumulativeTime / 1000, r.selfTime / 1000, "  " * r.depth, r.name
+                )
+            )
+        if args.output:
+            with open(args.output, "a") as f:
+                for r in records:
+                    f.write("{}\t{}\t{}\t{}\n".format(module, *r))
+
+    print("\n".join(lines))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import pytest
+
+from amm.testing.importtime import compilerModules, main, measureImportTime
+
+
+@pytest.mark.parametrize(
+    "module", ["amm.operations", "amm.aio", "amm.pipeline", "amm.simulator"]
+)
+def test_trading_path_does_not_load_compiler(module):
+    records = measureImportTime(module)
+    assert module in [r.name for r in records]
+    assert compilerModules(records) == []
+
+
+def test_operations_does_not_load_numpy():
+    records = measureImportTime("amm.operations")
+    assert [r.name for r in records if r.name.split(".")[0] == "numpy"] == []
+
+
+def test_compiler_is_loaded_on_use():
+    records = measureImportTime("amm.programs; amm.programs.generateTeal()")
+    assert "pyteal" in compilerModules(records)
+    assert "amm.contracts.contracts" in compilerModules(records)
+
+
+def test_report(capsys, tmp_path):
+    output = tmp_path / "importtime.tsv"
+    main(["--top", "3", "--output", str(output), "amm.operations"])
+
+    report = capsys.readouterr().out.splitlines()
+    assert report[0].startswith("amm.operations: ")
+    assert report[0].endswith("compiler stack not loaded")
+    assert len(report) == 4
+    assert output.read_text().startswith("amm.operations\t")
@@ -76,6 +76,9 @@ def test_setup():
     )
 
     actualState = getAppGlobalState(client, appID)
+    # the round and time of setup
+    assert actualState.pop(b"last_update_round_key") > 0
+    assert actualState.pop(b"price_timestamp_key") > 0
     expectedState = {
         b"creator_key": encoding.decode_address(creator.getAddress()),
         b"token_a_key": tokenA,
@@ -84,6 +87,8 @@ def test_setup():
         b"fee_bps_key": feeBps,
         b"min_increment_key": minIncrement,
         b"pool_tokens_outstanding_key": 0,
+        b"reserve_a_key": 0,
+        b"reserve_b_key": 0,
     }
 
     assert actualState == expectedState
@@ -145,7 +150,7 @@ def test_supply():
     )
 
     optInToPoolToken(client, appID, creator)
-    supply(client, appID, 1000, 2000, creator)
+    result = supply(client, appID, 1000, 2000, creator)
     actualTokensOutstanding = getAppGlobalState(client, appID)[
         b"pool_tokens_outstanding_key"
     ]
@@ -153,6 +158,9 @@ def test_supply():
     firstPoolTokens = getBalances(client, creator.getAddress())[poolToken]
     assert actualTokensOutstanding == expectedTokensOutstanding
     assert firstPoolTokens == expectedTokensOutstanding
+    assert result.poolTokens == firstPoolTokens
+    assert (result.amountA, result.amountB) == (1000, 2000)
+    assert (result.reserveA, result.reserveB) == (1000, 2000)
 
     # should take 1000 : 2000 again
     supply(client, appID, 2000, 2000, creator)
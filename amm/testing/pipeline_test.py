@@ -0,0 +1,148 @@
+import base64
+import struct
+
+import pytest
+
+from algosdk import account
+from algosdk.future import transaction
+
+from amm.account import Account
+from amm.confirmation import ConfirmationTracker
+from amm.events import (
+    RECORD_FORMAT,
+    SUPPLY_EVENT,
+    SWAP_EVENT,
+    WITHDRAW_EVENT,
+    SupplyResult,
+    SwapResult,
+    WithdrawResult,
+)
+from amm.operations import AmmPool
+from amm.pipeline import Pipeline
+from amm.testing.confirmation_test import BlockClient, GENESIS_HASH
+from amm.testing.pool_test import APP_ID, GLOBAL_STATE, TOKEN_A, TOKEN_B
+
+
+class GroupClient(BlockClient):
+    """Accepts groups and records how many were unconfirmed at once.
+
+    App calls log a record of the amounts sent to the app, with no reserves.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(blockTime=0.05)
+        self.maxPooledGroups = 0
+        self.confirmedRounds = set()
+
+    def suggested_params(self):
+        self.calls["suggested_params"] += 1
+        return transaction.SuggestedParams(
+            0, self.lastRound, self.lastRound + 1000, GENESIS_HASH
+        )
+
+    def send_transactions(self, signedTxns):
+        self.calls["send_transactions"] += 1
+        for signedTxn in signedTxns:
+            self.send_transaction(signedTxn)
+        with self._condition:
+            call = signedTxns[-1]
+            self.info[call.get_txid()]["logs"] = [
+                base64.b64encode(self.record(signedTxns)).decode()
+            ]
+            self.maxPooledGroups = max(
+                self.maxPooledGroups, len(self.pool) // len(signedTxns)
+            )
+        return signedTxns[0].get_txid()
+
+    def record(self, signedTxns):
+        method = signedTxns[-1].transaction.app_args[0]
+        amounts = [stxn.transaction.amount for stxn in signedTxns[:-1]]
+        if method == b"supply":
+            values = (SUPPLY_EVENT, amounts[0], amounts[1], 0)
+        elif method == b"withdraw":
+            values = (WITHDRAW_EVENT, 0, 0, amounts[0])
+        else:
+            values = (SWAP_EVENT, signedTxns[0].transaction.index, amounts[0], 0)
+        return struct.pack(RECORD_FORMAT, *values, 0, 0)
+
+    def status_after_block(self, round):
+        status = super().status_after_block(round)
+        with self._condition:
+            self.confirmedRounds.update(
+                info["confirmed-round"]
+                for info in self.info.values()
+                if "confirmed-round" in info
+            )
+        return status
+
+
+def newAccount() -> Account:
+    return Account(account.generate_account()[0])
+
+
+def test_window():
+    client = GroupClient()
+    pool = AmmPool(client, APP_ID, appGlobalState=GLOBAL_STATE)
+    traders = [newAccount() for _ in range(40)]
+
+    with Pipeline(pool, maxInFlight=8) as pipeline:
+        futures = [
+            pipeline.swap(trader, TOKEN_A if i % 2 else TOKEN_B, 100 + i)
+            for i, trader in enumerate(traders)
+        ]
+        assert all(not future.cancelled() for future in futures)
+        results = pipeline.drain()
+
+    # results are decoded as by AmmPool.swap, in submission order
+    assert [f.result() for f in futures] == results
+    assert all(isinstance(r, SwapResult) for r in results)
+    assert [r.amountIn for r in results] == [100 + i for i in range(40)]
+    assert client.maxPooledGroups <= 8
+    assert client.calls["send_transactions"] == 40
+    # several groups go in per block
+    assert len(client.confirmedRounds) <= 40 // 8 + 2
+    # suggested params are fetched at most once per round
+    assert client.calls["suggested_params"] <= len(client.confirmedRounds) + 1
+    assert pipeline.inFlight() == 0
+
+
+def test_failures():
+    client = GroupClient()
+    pool = AmmPool(client, APP_ID, appGlobalState=GLOBAL_STATE)
+    trader = newAccount()
+
+    with ConfirmationTracker(client) as tracker:
+        pipeline = Pipeline(pool, maxInFlight=2, tracker=tracker)
+
+        supply = pipeline.supply(trader, 1000, 2000)
+        with pytest.raises(ValueError):
+            pipeline.supply(trader, 1000, 2000)
+        withdraw = pipeline.withdraw(trader, 10)
+
+        supplied = supply.result(timeout=5)
+        assert isinstance(supplied, SupplyResult)
+        assert (supplied.amountA, supplied.amountB) == (1000, 2000)
+        withdrawn = withdraw.result(timeout=5)
+        assert isinstance(withdrawn, WithdrawResult)
+        assert withdrawn.poolTokens == 10
+
+        def failingSend(signedTxns):
+            raise Exception("node is down")
+
+        client.send_transactions = failingSend
+        failed = pipeline.swap(trader, TOKEN_A, 5)
+        with pytest.raises(Exception, match="node is down"):
+            failed.result()
+        with pytest.raises(Exception, match="node is down"):
+            pipeline.drain()
+
+        # the window is not leaked by failed groups
+        assert pipeline.inFlight() == 0
+        pipeline.close()
+
+        # the shared tracker is left open
+        payment = transaction.PaymentTxn(
+            trader.getAddress(), pool.suggestedParams(), trader.getAddress(), 0
+        )
+        txID = client.send_transaction(payment.sign(trader.getPrivateKey()))
+        assert tracker.track(txID).result(timeout=5).confirmedRound > 10
@@ -0,0 +1,151 @@
+import base64
+import struct
+
+import pytest
+
+from algosdk import account, encoding
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from amm.account import Account
+from amm.events import RECORD_FORMAT, SWAP_EVENT
+from amm.operations import AmmPool, PoolTxnBuilder
+
+APP_ID = 7
+TOKEN_A = 1
+TOKEN_B = 2
+POOL_TOKEN = 3
+
+GLOBAL_STATE = {
+    b"creator_key": b"\x00" * 32,
+    b"token_a_key": TOKEN_A,
+    b"token_b_key": TOKEN_B,
+    b"pool_token_key": POOL_TOKEN,
+    b"fee_bps_key": 30,
+    b"min_increment_key": 1000,
+    b"pool_tokens_outstanding_key": 0,
+}
+
+GENESIS_HASH = "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI="
+
+PARAMS = [
+    transaction.SuggestedParams(0, 100, 1100, GENESIS_HASH, "sandnet-v1"),
+    transaction.SuggestedParams(5, 100, 1100, GENESIS_HASH, "sandnet-v1"),
+    transaction.SuggestedParams(3000, 100, 1100, GENESIS_HASH, flat_fee=True),
+]
+
+
+def expectedGroup(sender, sp, innerTxns, transfers, method, foreignAssets):
+    """Build a group with the transaction constructors"""
+    appAddr = get_application_address(APP_ID)
+    appCallTxn = transaction.ApplicationCallTxn(
+        sender=sender,
+        index=APP_ID,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[method],
+        foreign_assets=foreignAssets,
+        sp=sp,
+    )
+    # the app call pays for the inner transactions
+    appCallTxn.fee += innerTxns * (sp.fee if sp.flat_fee else 1_000)
+    txns = [
+        transaction.AssetTransferTxn(
+            sender=sender, receiver=appAddr, index=index, amt=amount, sp=sp
+        )
+        for index, amount in transfers
+    ] + [appCallTxn]
+    transaction.assign_group_id(txns)
+    return txns
+
+
+def encode(txns):
+    return [encoding.msgpack_encode(txn) for txn in txns]
+
+
+@pytest.mark.parametrize("sp", PARAMS)
+def test_templates_match_constructors(sp):
+    pool = PoolTxnBuilder(APP_ID, GLOBAL_STATE)
+    sender = account.generate_account()[1]
+
+    # build twice so that the second group is copied from cached templates
+    for qA, qB in [(1000, 2000), (12_000, 20_000)]:
+        assert encode(pool.buildSupply(sender, qA, qB, sp)) == encode(
+            expectedGroup(
+                sender,
+                sp,
+                2,
+                [(TOKEN_A, qA), (TOKEN_B, qB)],
+                b"supply",
+                [TOKEN_A, TOKEN_B, POOL_TOKEN],
+            )
+        )
+
+    for amount in [500, 2 ** 40]:
+        assert encode(pool.buildWithdraw(sender, amount, sp)) == encode(
+            expectedGroup(
+                sender,
+                sp,
+                2,
+                [(POOL_TOKEN, amount)],
+                b"withdraw",
+                [TOKEN_A, TOKEN_B, POOL_TOKEN],
+            )
+        )
+
+    for tokenId, amount in [(TOKEN_A, 10), (TOKEN_B, 2_000_000), (TOKEN_A, 7)]:
+        assert encode(pool.buildSwap(sender, tokenId, amount, sp)) == encode(
+            expectedGroup(
+                sender,
+                sp,
+                1,
+                [(tokenId, amount)],
+                b"swap",
+                [TOKEN_A, TOKEN_B],
+            )
+        )
+
+
+def test_invalid_amount():
+    pool = PoolTxnBuilder(APP_ID, GLOBAL_STATE)
+    sender = account.generate_account()[1]
+
+    with pytest.raises(ValueError):
+        pool.buildSwap(sender, TOKEN_A, -1, PARAMS[0])
+
+
+class RecordingClient:
+    def __init__(self):
+        self.sent = []
+
+    def send_transactions(self, signedTxns):
+        self.sent.append(signedTxns)
+        return signedTxns[0].get_txid()
+
+    def status(self):
+        return {"last-round": 100}
+
+    def pending_transaction_info(self, txID):
+        # the record a swap of 10 of token A for 9 of token B logs
+        record = struct.pack(RECORD_FORMAT, SWAP_EVENT, TOKEN_A, 10, 9, 1010, 991)
+        return {
+            "confirmed-round": 101,
+            "pool-error": "",
+            "txn": {},
+            "logs": [base64.b64encode(record).decode()],
+        }
+
+
+def test_swap_signs_and_submits():
+    client = RecordingClient()
+    pool = AmmPool(client, APP_ID, appGlobalState=GLOBAL_STATE)
+    trader = Account(account.generate_account()[0])
+
+    result = pool.swap(trader, TOKEN_A, 10, PARAMS[0])
+    assert (result.tokenIn, result.amountIn, result.amountOut) == (TOKEN_A, 10, 9)
+    assert (result.reserveA, result.reserveB) == (1010, 991)
+
+    assert len(client.sent) == 1
+    group = client.sent[0]
+    assert [stxn.transaction.type for stxn in group] == ["axfer", "appl"]
+    assert all(stxn.transaction.sender == trader.getAddress() for stxn in group)
+    assert group[0].transaction.amount == 10
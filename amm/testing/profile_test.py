@@ -0,0 +1,166 @@
+import pytest
+
+from amm.programs import TEAL_VERSIONS, generateTeal
+from amm.teal.evaluator import APP_BUDGET
+from amm.teal.profile import (
+    formatProfile,
+    opcodeCost,
+    profileProgram,
+    subroutineCost,
+)
+
+DISPATCH = """#pragma version 5
+txn ApplicationID
+int 0
+==
+bnz create
+txn OnCompletion
+int DeleteApplication
+==
+bnz delete
+txna ApplicationArgs 0
+byte "cheap"
+==
+bnz cheap
+txna ApplicationArgs 0
+byte "hash"
+==
+bnz hash
+err
+create:
+int 1
+return
+delete:
+int 0
+return
+cheap:
+int 1
+callsub double
+callsub double
+return
+hash:
+byte "x"
+sha256
+len
+bz fail
+int 1
+callsub double
+return
+fail:
+err
+double:
+dup
++
+retsub
+"""
+
+# the cost of the taken dispatch to each branch
+DISPATCH_COSTS = {"create": 4, "delete": 8, "cheap": 12, "hash": 16}
+
+
+def test_branches():
+    profiles = profileProgram(DISPATCH)
+    assert set(profiles) == {"program", "create", "delete", "cheap", "hash"}
+
+    assert profiles["create"].cost == DISPATCH_COSTS["create"] + 2
+    assert profiles["delete"].cost == DISPATCH_COSTS["delete"] + 2
+    # int, two calls of three opcodes each, return
+    assert profiles["cheap"].cost == DISPATCH_COSTS["cheap"] + 1 + 2 * 4 + 1
+    assert profiles["cheap"].opcodes == profiles["cheap"].cost
+    # sha256 costs 35, and the failing branch is cheaper than the other
+    assert profiles["hash"].cost == DISPATCH_COSTS["hash"] + 1 + 35 + 2 + 1 + 4 + 1
+    assert profiles["hash"].opcodes == profiles["hash"].cost - 34
+    assert profiles["program"].cost == profiles["hash"].cost
+
+    # reachable code includes the subroutine once
+    assert profiles["cheap"].instructions == 4 + 3
+    # "int 1" is an intc_ reference
+    assert profiles["create"].size == 2
+
+
+def test_subroutine_exits():
+    # a subroutine that can end the program is costed both ways
+    profiles = profileProgram(
+        """#pragma version 5
+int 1
+callsub sub
+int 1
+int 1
+int 1
+return
+sub:
+bnz quit
+retsub
+quit:
+int 1
+return
+"""
+    )
+    assert profiles["program"].cost == 2 + 2 + 4
+
+
+def test_subroutineCost():
+    # dup, + and retsub
+    assert subroutineCost(DISPATCH, "double").cost == 3
+    # found by the name pyteal comments its label with
+    named = DISPATCH.replace("double:", "double: // twice")
+    assert subroutineCost(named, "twice") == subroutineCost(DISPATCH, "double")
+
+    with pytest.raises(ValueError, match="No subroutine"):
+        subroutineCost(DISPATCH, "triple")
+    with pytest.raises(ValueError, match="never returns"):
+        subroutineCost(DISPATCH, "fail")
+
+
+def test_loop():
+    with pytest.raises(ValueError, match="loops"):
+        profileProgram("#pragma version 5\nloop:\nint 1\nbnz loop\nint 1")
+
+
+def test_version_costs():
+    assert opcodeCost("sha256", 1) == 7
+    assert opcodeCost("sha256", 5) == 35
+    assert opcodeCost("divmodw", 5) == 20
+    assert opcodeCost("+", 5) == 1
+
+
+# Worst-case costs of the approval program. Lower these when the contract
+# gets cheaper; the test fails if any branch gets more expensive.
+APPROVAL_BASELINE = {
+    "program": (569, 474, 732, 1517),
+    "create": (25, 25, 21, 34),
+    "delete": (24, 24, 14, 18),
+    "setup": (108, 108, 80, 126),
+    "supply": (569, 474, 386, 625),
+    "withdraw": (461, 385, 299, 469),
+    "swap": (345, 307, 289, 446),
+}
+
+
+def test_approval_cost_regression():
+    profiles = profileProgram(generateTeal()[0])
+    assert set(profiles) == set(APPROVAL_BASELINE), formatProfile(profiles)
+
+    regressions = []
+    for name, baseline in APPROVAL_BASELINE.items():
+        profile = profiles[name]
+        for field, current, limit in zip(profile._fields[1:], profile[1:], baseline):
+            if current > limit:
+                regressions.append("{} {}: {} > {}".format(name, field, current, limit))
+    assert regressions == [], "\n" + formatProfile(profiles)
+
+
+# Opcode budget every branch leaves unused, so that a contract change that
+# nearly exhausts the budget of a single app call fails here first.
+BUDGET_MARGIN = 100
+
+
+@pytest.mark.parametrize("version", TEAL_VERSIONS)
+def test_approval_budget(version):
+    profiles = profileProgram(generateTeal(version)[0])
+    over = [
+        "{}: {} > {}".format(name, profile.cost, APP_BUDGET - BUDGET_MARGIN)
+        for name, profile in profiles.items()
+        if profile.cost > APP_BUDGET - BUDGET_MARGIN
+    ]
+    assert over == [], "\n" + formatProfile(profiles)
@@ -0,0 +1,144 @@
+from base64 import b64encode
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+
+import pytest
+
+from amm import programs
+from amm.programs import ProgramCache, compileContracts, generateTeal, tealHash
+from amm.teal import TealAssemblyError
+
+
+class CompilingClient:
+    """Compiles TEAL to a stand-in program and counts compile calls"""
+
+    def __init__(self) -> None:
+        self.compiled = []
+
+    def compile(self, teal):
+        self.compiled.append(teal)
+        program = b"\x05" + hashlib.sha256(teal.encode()).digest()
+        return {"hash": "", "result": b64encode(program).decode()}
+
+
+def emptyCache(tmp_path, name="cache"):
+    shipped = tmp_path / "shipped"
+    shipped.mkdir(exist_ok=True)
+    return ProgramCache(str(tmp_path / name), str(shipped))
+
+
+def test_shipped_artifacts_are_current(tmp_path):
+    cache = ProgramCache(str(tmp_path))
+    loaded = cache.loadContracts()
+    assert loaded is not None, "regenerate amm/contracts/artifacts"
+
+    keys = cache.getContractKeys(programs.sourceHash())
+    assert [keys["approval"], keys["clear"]] == [tealHash(t) for t in generateTeal()]
+    # nothing is written when the shipped artifacts are used
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.fixture
+def assembled(monkeypatch):
+    """Record the programs assembled by compileContracts"""
+    teals = []
+
+    def assemble(teal):
+        teals.append(teal)
+        return b"\x05" + hashlib.sha256(teal.encode()).digest()
+
+    monkeypatch.setattr(programs, "assemble", assemble)
+    return teals
+
+
+def test_compile_once(tmp_path, assembled):
+    client = CompilingClient()
+
+    approval, clear = compileContracts(client, emptyCache(tmp_path))
+    assert len(assembled) == 2
+    # programs are assembled locally
+    assert client.compiled == []
+
+    # a new process with the same cache directory does not compile
+    assert compileContracts(None, emptyCache(tmp_path)) == (approval, clear)
+    assert len(assembled) == 2
+
+    # other cache directories are independent
+    compileContracts(None, emptyCache(tmp_path, "other"))
+    assert len(assembled) == 4
+
+    leftover = [
+        name
+        for _, _, names in os.walk(tmp_path)
+        for name in names
+        if name.startswith(".tmp-")
+    ]
+    assert leftover == []
+
+
+def test_changed_sources(tmp_path, monkeypatch, assembled):
+    compileContracts(None, emptyCache(tmp_path))
+
+    # a source change that leaves the TEAL as it was needs no compile
+    monkeypatch.setattr(programs, "sourceHash", lambda version=5: "edited")
+    assert emptyCache(tmp_path).loadContracts() is None
+    compileContracts(None, emptyCache(tmp_path))
+    assert len(assembled) == 2
+
+    # a change to one program compiles only that program
+    approval, clear = generateTeal()
+    monkeypatch.setattr(programs, "sourceHash", lambda version=5: "edited again")
+    monkeypatch.setattr(
+        programs, "generateTeal", lambda version=5: (approval + "\nint 1\npop", clear)
+    )
+    compileContracts(None, emptyCache(tmp_path))
+    assert assembled[2:] == [approval + "\nint 1\npop"]
+
+
+def test_algod_fallback(tmp_path, monkeypatch):
+    approval, clear = generateTeal()
+    unsupported = approval + "\nfrobnicate"
+    monkeypatch.setattr(
+        programs, "generateTeal", lambda version=5: (unsupported, clear)
+    )
+    monkeypatch.setattr(programs, "sourceHash", lambda version=5: "unsupported")
+
+    with pytest.raises(TealAssemblyError):
+        compileContracts(None, emptyCache(tmp_path))
+
+    client = CompilingClient()
+    compileContracts(client, emptyCache(tmp_path))
+    assert client.compiled == [unsupported]
+
+
+def test_unwritable_directory(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_bytes(b"")
+    cache = ProgramCache(str(blocker / "cache"), str(tmp_path))
+    client = CompilingClient()
+
+    assert compileContracts(client, cache) is not None
+    assert cache.loadContracts() is None
+
+
+def putAndGet(directory, program):
+    cache = ProgramCache(directory, directory)
+    cache.putProgram("key", program)
+    return cache.getProgram("key")
+
+
+def test_concurrent_writers(tmp_path):
+    program = os.urandom(4096)
+    with ProcessPoolExecutor(4) as executor:
+        results = list(executor.map(putAndGet, [str(tmp_path)] * 16, [program] * 16))
+    assert results == [program] * 16
+    assert os.listdir(tmp_path / "programs") == ["key.bin"]
+
+
+def test_default_directory(monkeypatch):
+    monkeypatch.setenv("AMM_CACHE_DIR", "/somewhere")
+    assert ProgramCache().directory == "/somewhere"
+    monkeypatch.delenv("AMM_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", "/xdg")
+    assert ProgramCache().directory == os.path.join("/xdg", "amm")
@@ -0,0 +1,99 @@
+import numpy as np
+
+from amm.quotes import quote_swaps, quote_supplies, quote_withdrawals
+from amm.simulator import PoolSimulator, LogicError, UINT64_MAX
+
+
+def randomAmounts(rng, size):
+    # mix small amounts with amounts large enough to overflow uint64 products
+    exponents = rng.integers(1, 65, size=size)
+    return [int.from_bytes(rng.bytes(8), "big") >> (64 - int(e)) for e in exponents] + [
+        0,
+        1,
+        UINT64_MAX,
+    ]
+
+
+def simulatedPool(reserveA, reserveB, outstanding, feeBps=30, minIncrement=1000):
+    return PoolSimulator(
+        tokenA=1,
+        tokenB=2,
+        feeBps=feeBps,
+        minIncrement=minIncrement,
+        poolToken=3,
+        reserveA=reserveA,
+        reserveB=reserveB,
+        poolTokensOutstanding=outstanding,
+    )
+
+
+POOLS = [
+    (100_000_000, 200_000_000, 141_421_356),
+    (1_000, 2_000, 1_414),
+    (3_000_000_000, 5, 122_474),
+    (2 ** 40, 2 ** 20, 2 ** 30),
+]
+
+
+def test_quote_swaps():
+    rng = np.random.default_rng(1)
+    amounts = randomAmounts(rng, 500)
+
+    for reserveA, reserveB, outstanding in POOLS:
+        for feeBps in [0, 30, 10_000]:
+            pool = simulatedPool(reserveA, reserveB, outstanding, feeBps)
+            quoted = quote_swaps(
+                np.array(amounts, dtype=np.uint64), reserveA, reserveB, feeBps
+            )
+
+            for amount, actual in zip(amounts, quoted):
+                try:
+                    expected = pool.quoteSwap(1, amount).amountOut
+                except LogicError:
+                    expected = 0
+                assert int(actual) == expected, (amount, reserveA, reserveB)
+
+
+def test_quote_swaps_overflowing_reserves():
+    quoted = quote_swaps([1000, 2000], 2 ** 32, 2 ** 32, 30)
+    assert quoted.tolist() == [0, 0]
+
+
+def test_quote_supplies():
+    rng = np.random.default_rng(2)
+    amountsA = randomAmounts(rng, 300)
+    amountsB = list(reversed(randomAmounts(rng, 300)))
+    amountsA += [2000, 1000, 12000]
+    amountsB += [2000, 2000, 20000]
+
+    for reserveA, reserveB, outstanding in POOLS + [(0, 0, 0)]:
+        pool = simulatedPool(reserveA, reserveB, outstanding)
+        takenA, takenB, poolTokens, ok = quote_supplies(
+            amountsA, amountsB, reserveA, reserveB, outstanding, 1000
+        )
+
+        for i, (qA, qB) in enumerate(zip(amountsA, amountsB)):
+            try:
+                quote = pool.quoteSupply(qA, qB)
+                expected = (True, quote.amountA, quote.amountB, quote.poolTokens)
+            except LogicError:
+                expected = (False, 0, 0, 0)
+            actual = (bool(ok[i]), int(takenA[i]), int(takenB[i]), int(poolTokens[i]))
+            assert actual == expected, (qA, qB, reserveA, reserveB)
+
+
+def test_quote_withdrawals():
+    rng = np.random.default_rng(3)
+    amounts = randomAmounts(rng, 300)
+
+    for reserveA, reserveB, outstanding in POOLS:
+        pool = simulatedPool(reserveA, reserveB, outstanding)
+        outA, outB, ok = quote_withdrawals(amounts, reserveA, reserveB, outstanding)
+
+        for i, amount in enumerate(amounts):
+            try:
+                quote = pool.quoteWithdraw(amount)
+                expected = (True, quote.amountA, quote.amountB)
+            except LogicError:
+                expected = (False, 0, 0)
+            assert (bool(ok[i]), int(outA[i]), int(outB[i])) == expected, amount
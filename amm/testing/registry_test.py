@@ -0,0 +1,138 @@
+from collections import Counter
+
+import pytest
+
+from amm.operations import getContracts
+from amm.programs import TEAL_VERSIONS
+from amm.registry import PoolRegistry, pairKey
+from amm.testing.fakepools import (
+    APPROVAL,
+    CREATOR_1,
+    CREATOR_2,
+    LedgerClient,
+    poolState,
+)
+
+APPROVAL_V6 = b"\x06amm"
+OTHER = b"\x05other"
+
+
+@pytest.fixture
+def client():
+    client = LedgerClient()
+    client.createApp(CREATOR_1, 10, poolState(1, 2, 30, 100), balances={1: 5, 2: 7})
+    client.createApp(CREATOR_1, 11, poolState(2, 1, 5, 101), balances={1: 9, 2: 3})
+    client.createApp(CREATOR_1, 12, poolState(2, 3, 30, 102), balances={2: 1, 3: 2})
+    client.createApp(CREATOR_1, 13, poolState(1, 2, 30, 103), approval=OTHER)
+    client.createApp(CREATOR_2, 20, poolState(3, 4, 30, 104), balances={3: 4, 4: 4})
+    # not set up yet
+    client.createApp(CREATOR_2, 21, poolState(1, 4))
+    return client
+
+
+def appIDs(pools):
+    return sorted(pool.appID for pool in pools)
+
+
+def test_pairKey():
+    assert pairKey(1, 2) == pairKey(2, 1) == (1, 2)
+
+
+def test_discover(client):
+    registry = PoolRegistry(client, [APPROVAL])
+    assert sorted(registry.discover([CREATOR_1, CREATOR_2])) == [10, 11, 12, 20, 21]
+
+    assert len(registry) == 5
+    assert 13 not in registry
+    assert appIDs(registry.poolsForPair(1, 2)) == [10, 11]
+    assert appIDs(registry.poolsForPair(2, 1)) == [10, 11]
+    assert appIDs(registry.poolsForPair(1, 4)) == []
+    assert appIDs(registry.poolsForToken(2)) == [10, 11, 12]
+    assert appIDs(registry.poolsForToken(4)) == [20]
+    assert sorted(registry.pairs()) == [(1, 2), (2, 3), (3, 4)]
+
+    # one account_info per creator
+    assert client.calls == Counter(account_info=2)
+
+    assert registry.discover([CREATOR_1]) == []
+
+
+def test_simulator(client):
+    registry = PoolRegistry(client, [APPROVAL])
+    registry.discover([CREATOR_1])
+
+    simulator = registry.get(11).simulator()
+    assert (simulator.tokenA, simulator.tokenB) == (2, 1)
+    assert (simulator.reserveA, simulator.reserveB) == (3, 9)
+    assert simulator.feeBps == 5
+
+
+def test_refresh(client):
+    registry = PoolRegistry(client, [APPROVAL])
+    registry.discover([CREATOR_1, CREATOR_2])
+
+    client.lastRound = 12
+    client.setReserves(10, 50, 70)
+    client.apps[CREATOR_2][21] = (APPROVAL, poolState(1, 4, 30, 105))
+    client.createApp(CREATOR_2, 22, poolState(4, 1, 30, 106))
+    del client.apps[CREATOR_1][12]
+    client.calls.clear()
+
+    assert registry.refresh() == 12
+    assert registry.round == 12
+
+    assert client.calls == Counter(status=1, account_info=2)
+    assert registry.get(10).simulator().reserveA == 50
+    assert appIDs(registry.poolsForPair(4, 1)) == [21, 22]
+    assert 12 not in registry
+    assert appIDs(registry.poolsForToken(3)) == [20]
+
+
+def test_versions(client):
+    # pools of every TEAL version are found
+    client.createApp(CREATOR_2, 23, poolState(1, 2, 30, 107), approval=APPROVAL_V6)
+
+    registry = PoolRegistry(client, [APPROVAL, APPROVAL_V6])
+    registry.discover([CREATOR_2])
+    assert appIDs(registry.poolsForPair(1, 2)) == [23]
+    assert registry.add(23).appID == 23
+
+    assert PoolRegistry(client).approvalPrograms == {
+        getContracts(client, version=version)[0] for version in TEAL_VERSIONS
+    }
+
+
+def test_add(client):
+    registry = PoolRegistry(client, [APPROVAL])
+    assert registry.add(20).tokenB == 4
+    assert appIDs(registry.poolsForPair(3, 4)) == [20]
+
+    with pytest.raises(ValueError):
+        registry.add(13)
+
+    client.calls.clear()
+    client.setReserves(20, 40, 40)
+    registry.refresh()
+    assert client.calls == Counter(status=1, application_info=1)
+    assert registry.get(20).simulator().reserveA == 40
+
+    registry.remove(20)
+    assert registry.poolsForToken(3) == []
+    assert len(registry) == 0
+
+    # a deleted pool is dropped by the next refresh
+    registry.add(20)
+    client.deleteApp(20)
+    registry.refresh()
+    assert 20 not in registry
+    assert registry.poolsForPair(3, 4) == []
+
+
+def test_ammPool(client):
+    registry = PoolRegistry(client, [APPROVAL])
+    registry.discover([CREATOR_1])
+    client.calls.clear()
+
+    pool = registry.ammPool(10)
+    assert pool.poolToken == 100
+    assert client.calls == Counter()
@@ -1,13 +1,32 @@
-from typing import List
-from random import choice, randint
+from typing import Dict, List, Optional, Tuple
+from random import randint
+from threading import Lock
+import hashlib
+import json
+import os
 
 from algosdk.v2client.algod import AlgodClient
 from algosdk.future import transaction
 from algosdk import account
 
 from ..account import Account
-from ..util import PendingTxnResponse, waitForTransaction
-from .setup import getGenesisAccounts
+from ..cache import PoolStateCache
+from ..confirmation import ConfirmationTracker, GroupSubmitter
+from ..operations import getPoolTokenId
+from ..programs import defaultCacheDir
+from ..util import (
+    MAX_GROUP_SIZE,
+    PendingTxnResponse,
+    getAppGlobalState,
+    getBalances,
+    waitForTransaction,
+)
+from .setup import (
+    USE_FAKE_LEDGER,
+    getGenesisAccounts,
+    readPrivateFile,
+    writePrivateFile,
+)
 
 
 def payAccount(
@@ -28,49 +47,267 @@ def payAccount(
 FUNDING_AMOUNT = 100_000_000
 
 
-def fundAccount(
-    client: AlgodClient, address: str, amount: int = FUNDING_AMOUNT
-) -> PendingTxnResponse:
-    fundingAccount = choice(getGenesisAccounts())
-    return payAccount(client, fundingAccount, address, amount)
+def signGroups(
+    txns: List[transaction.Transaction], signers: List[Account]
+) -> List[List[transaction.SignedTransaction]]:
+    """Split transactions into atomic groups of up to 16 and sign them.
 
+    Args:
+        txns: The transactions.
+        signers: The account that signs each transaction.
+    """
+    groups = []
+    for i in range(0, len(txns), MAX_GROUP_SIZE):
+        group = txns[i : i + MAX_GROUP_SIZE]
+        if len(group) > 1:
+            group = transaction.assign_group_id(group)
+        groups.append(
+            [
+                txn.sign(signer.getPrivateKey())
+                for txn, signer in zip(group, signers[i : i + MAX_GROUP_SIZE])
+            ]
+        )
+    return groups
 
-accountList: List[Account] = []
 
+def sendGroups(
+    client: AlgodClient,
+    groups: List[List[transaction.SignedTransaction]],
+    maxInFlight: int = 64,
+    tracker: Optional[ConfirmationTracker] = None,
+) -> List[PendingTxnResponse]:
+    """Send signed groups through a GroupSubmitter and wait for all of them.
 
-def getTemporaryAccount(client: AlgodClient) -> Account:
-    global accountList
+    Up to maxInFlight groups are unconfirmed at once, so groups share blocks
+    instead of taking a round or two each.
+
+    Returns:
+        The confirmation of every transaction, in the order they were given.
+    """
+    with GroupSubmitter(client, maxInFlight, tracker) as submitter:
+        futures = [
+            future
+            for group in groups
+            for future in submitter.submit(group, trackAll=True)
+        ]
+        return [future.result() for future in futures]
+
+
+def workerIndex() -> Tuple[int, int]:
+    """Get the index of this pytest-xdist worker and the number of workers.
+
+    Returns:
+        (0, 1) when the tests are not run by pytest-xdist.
+    """
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "")
+    if not worker.startswith("gw"):
+        return 0, 1
+    return int(worker[2:]), int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", "1"))
+
+
+def workerFunders(
+    accounts: List[Account], index: int, count: int
+) -> Tuple[List[Account], int]:
+    """Split the genesis accounts between count workers.
+
+    With at least as many genesis accounts as workers, each worker gets its own
+    accounts. Otherwise each worker gets one account, shared with the other
+    workers of the same index modulo the number of accounts.
+
+    Returns:
+        The accounts worker index funds accounts from, and the number of
+        workers that share each of them.
+    """
+    if count <= len(accounts):
+        return accounts[index::count], 1
+    offset = index % len(accounts)
+    return [accounts[offset]], len(range(offset, count, len(accounts)))
+
+
+class AccountPool:
+    """Funded accounts for the tests run by one pytest-xdist worker.
+
+    Accounts are paid from the worker's funders only, and at most budget
+    microAlgos are spent from them, so workers sharing a genesis account do
+    not overspend it. When the pool is empty, groupsPerBatch groups of 16
+    payments are sent together and confirmed in the same round.
+
+    If path is given, the keys of the accounts that were funded but not handed
+    out yet are saved there, readable only by the owner, and accounts that
+    still hold fundingAmount are reused by the next pool with the same path.
+
+    The pool is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        funders: List[Account],
+        budget: Optional[int] = None,
+        path: Optional[str] = None,
+        fundingAmount: int = FUNDING_AMOUNT,
+        groupsPerBatch: int = 4,
+    ) -> None:
+        """Create a pool.
 
-    if len(accountList) == 0:
-        sks = [account.generate_account()[0] for i in range(16)]
-        accountList = [Account(sk) for sk in sks]
+        Args:
+            client: An algod client.
+            funders: The accounts that fund the pool's accounts.
+            budget (optional): The most the pool may spend from the funders,
+                including fees. Unlimited if not given.
+            path (optional): The file unused accounts are saved to.
+            fundingAmount (optional): The amount each account is funded with.
+            groupsPerBatch (optional): The number of groups sent at once when
+                the pool is empty.
+        """
+        if len(funders) == 0:
+            raise ValueError("An account pool needs at least one funder")
+        if groupsPerBatch < 1:
+            raise ValueError("groupsPerBatch must be at least 1")
 
-        genesisAccounts = getGenesisAccounts()
-        suggestedParams = client.suggested_params()
+        self.client = client
+        self.funders = funders
+        self.budget = budget
+        self.path = path
+        self.fundingAmount = fundingAmount
+        self.groupsPerBatch = groupsPerBatch
+        self.spent = 0
 
-        txns: List[transaction.Transaction] = []
-        for i, a in enumerate(accountList):
-            fundingAccount = genesisAccounts[i % len(genesisAccounts)]
+        self._lock = Lock()
+        self._nextFunder = 0
+        self._accounts: List[Account] = self._load()
+
+    def _load(self) -> List[Account]:
+        saved = None if self.path is None else readPrivateFile(self.path)
+        if saved is None:
+            return []
+        privateKeys = json.loads(saved)
+        # accounts from an earlier network, or spent outside the pool, are dropped
+        return [
+            a
+            for a in (Account(sk) for sk in privateKeys)
+            if getBalances(self.client, a.getAddress()).get(0, 0) >= self.fundingAmount
+        ]
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        privateKeys = [a.getPrivateKey() for a in self._accounts]
+        writePrivateFile(self.path, json.dumps(privateKeys).encode("utf-8"))
+
+    def _spend(self, txns: List[transaction.PaymentTxn]) -> None:
+        total = sum(txn.amt + txn.fee for txn in txns)
+        if self.budget is not None and self.spent + total > self.budget:
+            raise Exception(
+                "Worker budget of {} exhausted, {} already spent".format(
+                    self.budget, self.spent
+                )
+            )
+        self.spent += total
+
+    def _payments(
+        self, receivers: List[str], amount: int, sp: transaction.SuggestedParams
+    ) -> List[List[transaction.SignedTransaction]]:
+        funders = []
+        txns = []
+        for receiver in receivers:
+            funder = self.funders[self._nextFunder % len(self.funders)]
+            self._nextFunder += 1
+            funders.append(funder)
             txns.append(
                 transaction.PaymentTxn(
-                    sender=fundingAccount.getAddress(),
-                    receiver=a.getAddress(),
-                    amt=FUNDING_AMOUNT,
-                    sp=suggestedParams,
+                    sender=funder.getAddress(), receiver=receiver, amt=amount, sp=sp
                 )
             )
+        self._spend(txns)
+        return signGroups(txns, funders)
 
-        txns = transaction.assign_group_id(txns)
-        signedTxns = [
-            txn.sign(genesisAccounts[i % len(genesisAccounts)].getPrivateKey())
-            for i, txn in enumerate(txns)
-        ]
+    def fund(self, address: str, amount: int = FUNDING_AMOUNT) -> PendingTxnResponse:
+        """Pay amount to address from one of the funders."""
+        with self._lock:
+            ((signedTxn,),) = self._payments(
+                [address], amount, self.client.suggested_params()
+            )
+        self.client.send_transaction(signedTxn)
+        return waitForTransaction(self.client, signedTxn.get_txid())
+
+    def provision(self, count: int) -> None:
+        """Fund count new accounts and add them to the pool.
+
+        The accounts are funded in groups of 16 sent with sendGroups.
+        """
+        with self._lock:
+            accounts = [Account(account.generate_account()[0]) for _ in range(count)]
+            groups = self._payments(
+                [a.getAddress() for a in accounts],
+                self.fundingAmount,
+                self.client.suggested_params(),
+            )
+
+        sendGroups(self.client, groups)
+
+        with self._lock:
+            self._accounts.extend(accounts)
+            self._save()
+
+    def get(self) -> Account:
+        """Take a funded account from the pool, funding a batch if it is empty."""
+        while True:
+            with self._lock:
+                if len(self._accounts) > 0:
+                    account = self._accounts.pop()
+                    self._save()
+                    return account
+            self.provision(self.groupsPerBatch * MAX_GROUP_SIZE)
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+
+def accountPoolPath(client: AlgodClient, index: int) -> str:
+    """Get the file the unused accounts of worker index are saved to.
 
-        client.send_transactions(signedTxns)
+    The file is kept with the compiled programs and named after the network's
+    genesis hash, so accounts are only reused on the network they were funded
+    on.
+    """
+    genesisHash = client.suggested_params().gh
+    network = hashlib.sha256(genesisHash.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(
+        defaultCacheDir(), "accounts", "{}-{}.json".format(network, index)
+    )
+
+
+accountPool: Optional[AccountPool] = None
+
+
+def getAccountPool(client: AlgodClient) -> AccountPool:
+    """Get the account pool of this pytest-xdist worker.
 
-        waitForTransaction(client, signedTxns[0].get_txid())
+    Its funders are the worker's share of the genesis accounts. On the fake
+    ledger every run starts from genesis, so unused accounts are not saved.
+    """
+    global accountPool
 
-    return accountList.pop()
+    if accountPool is None:
+        index, count = workerIndex()
+        funders, sharers = workerFunders(getGenesisAccounts(), index, count)
+        budget = None
+        if sharers > 1:
+            budget = getBalances(client, funders[0].getAddress())[0] // sharers
+        path = None if USE_FAKE_LEDGER else accountPoolPath(client, index)
+        accountPool = AccountPool(client, funders, budget=budget, path=path)
+    return accountPool
+
+
+def fundAccount(
+    client: AlgodClient, address: str, amount: int = FUNDING_AMOUNT
+) -> PendingTxnResponse:
+    return getAccountPool(client).fund(address, amount)
+
+
+def getTemporaryAccount(client: AlgodClient) -> Account:
+    return getAccountPool(client).get()
 
 
 def optInToAsset(
@@ -87,15 +324,14 @@ def optInToAsset(
     return waitForTransaction(client, signedTxn.get_txid())
 
 
-def createDummyAsset(client: AlgodClient, total: int, account: Account = None) -> int:
-    if account is None:
-        account = getTemporaryAccount(client)
-
+def dummyAssetTxn(
+    account: Account, total: int, sp: transaction.SuggestedParams
+) -> transaction.AssetCreateTxn:
     randomNumber = randint(0, 999)
     # this random note reduces the likelihood of this transaction looking like a duplicate
     randomNote = bytes(randint(0, 255) for _ in range(20))
 
-    txn = transaction.AssetCreateTxn(
+    return transaction.AssetCreateTxn(
         sender=account.getAddress(),
         total=total,
         decimals=0,
@@ -108,8 +344,15 @@ def createDummyAsset(client: AlgodClient, total: int, account: Account = None) -
         asset_name=f"Dummy {randomNumber}",
         url=f"https://dummy.asset/{randomNumber}",
         note=randomNote,
-        sp=client.suggested_params(),
+        sp=sp,
     )
+
+
+def createDummyAsset(client: AlgodClient, total: int, account: Account = None) -> int:
+    if account is None:
+        account = getTemporaryAccount(client)
+
+    txn = dummyAssetTxn(account, total, client.suggested_params())
     signedTxn = txn.sign(account.getPrivateKey())
 
     client.send_transaction(signedTxn)
@@ -117,3 +360,63 @@ def createDummyAsset(client: AlgodClient, total: int, account: Account = None) -
     response = waitForTransaction(client, signedTxn.get_txid())
     assert response.assetIndex is not None and response.assetIndex > 0
     return response.assetIndex
+
+
+def createDummyAssets(
+    client: AlgodClient, total: int, count: int, account: Account = None
+) -> List[int]:
+    """Create count dummy assets, 16 per group, sending the groups with
+    sendGroups.
+
+    Returns:
+        The IDs of the created assets.
+    """
+    if account is None:
+        account = getTemporaryAccount(client)
+
+    sp = client.suggested_params()
+    txns = [dummyAssetTxn(account, total, sp) for _ in range(count)]
+    responses = sendGroups(client, signGroups(txns, [account] * count))
+
+    assetIDs = [response.assetIndex for response in responses]
+    assert all(assetID is not None and assetID > 0 for assetID in assetIDs)
+    return assetIDs
+
+
+def optInToAssets(client: AlgodClient, optIns: List[Tuple[Account, int]]) -> None:
+    """Opt accounts into assets, 16 per group, sending the groups with
+    sendGroups.
+
+    Args:
+        client: An algod client.
+        optIns: Pairs of the account to opt in and the asset ID.
+    """
+    sp = client.suggested_params()
+    txns = [
+        transaction.AssetOptInTxn(sender=a.getAddress(), index=assetID, sp=sp)
+        for a, assetID in optIns
+    ]
+    sendGroups(client, signGroups(txns, [a for a, _ in optIns]))
+
+
+def optInToPoolTokens(
+    client: AlgodClient,
+    optIns: List[Tuple[Account, int]],
+    cache: Optional[PoolStateCache] = None,
+) -> None:
+    """Opt accounts into the pool tokens of amms, as optInToAssets does.
+
+    Args:
+        client: An algod client.
+        optIns: Pairs of the account to opt in and the app ID of the amm.
+        cache (optional): A cache for the reads of each amm's global state.
+    """
+    poolTokens: Dict[int, int] = {}
+    for _, appID in optIns:
+        if appID not in poolTokens:
+            if cache is None:
+                appGlobalState = getAppGlobalState(client, appID)
+            else:
+                appGlobalState = cache.getAppGlobalState(appID)
+            poolTokens[appID] = getPoolTokenId(appGlobalState)
+    optInToAssets(client, [(a, poolTokens[appID]) for a, appID in optIns])
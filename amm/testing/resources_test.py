@@ -0,0 +1,170 @@
+import os
+import stat
+
+import pytest
+
+from algosdk import account
+from algosdk.future import transaction
+
+from amm.account import Account
+from amm.operations import createAmmApp, setupAmmApp
+from amm.util import MAX_GROUP_SIZE, getBalances
+from amm.testing.fakeledger import FakeAlgodClient, LedgerBackend
+from amm.testing.resources import (
+    FUNDING_AMOUNT,
+    AccountPool,
+    createDummyAssets,
+    optInToAssets,
+    optInToPoolTokens,
+    sendGroups,
+    signGroups,
+    workerFunders,
+    workerIndex,
+)
+
+
+@pytest.fixture
+def backend():
+    return LedgerBackend()
+
+
+@pytest.fixture
+def client(backend):
+    return FakeAlgodClient(backend)
+
+
+def recordSentGroups(client):
+    sent = []
+    sendTransactions = client.send_transactions
+
+    def record(group, **kwargs):
+        sent.append(len(group))
+        return sendTransactions(group, **kwargs)
+
+    client.send_transactions = record
+    return sent
+
+
+def genesisAccounts(backend):
+    return [Account(sk) for sk in backend.genesisKeys]
+
+
+def test_worker_index(monkeypatch):
+    monkeypatch.delenv("PYTEST_XDIST_WORKER", raising=False)
+    assert workerIndex() == (0, 1)
+
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw3")
+    monkeypatch.setenv("PYTEST_XDIST_WORKER_COUNT", "8")
+    assert workerIndex() == (3, 8)
+
+
+def test_worker_funders():
+    accounts = [Account(account.generate_account()[0]) for _ in range(3)]
+
+    assert workerFunders(accounts, 0, 1) == (accounts, 1)
+    assert workerFunders(accounts, 0, 2) == ([accounts[0], accounts[2]], 1)
+    assert workerFunders(accounts, 1, 2) == ([accounts[1]], 1)
+
+    # with more workers than accounts, workers 0, 3 and 6 of 7 share accounts[0]
+    assert workerFunders(accounts, 3, 7) == ([accounts[0]], 3)
+    assert workerFunders(accounts, 5, 7) == ([accounts[2]], 2)
+
+
+def test_provision(client, backend):
+    pool = AccountPool(client, genesisAccounts(backend), groupsPerBatch=2)
+    sent = recordSentGroups(client)
+
+    accounts = [pool.get() for _ in range(2 * MAX_GROUP_SIZE)]
+    assert len(pool) == 0
+    assert len({a.getAddress() for a in accounts}) == 2 * MAX_GROUP_SIZE
+    for a in accounts:
+        assert getBalances(client, a.getAddress()) == {0: FUNDING_AMOUNT}
+    # one batch of two full groups
+    assert sent == [MAX_GROUP_SIZE, MAX_GROUP_SIZE]
+    assert pool.spent == 2 * MAX_GROUP_SIZE * (FUNDING_AMOUNT + 1000)
+
+
+def test_budget(client, backend):
+    pool = AccountPool(client, genesisAccounts(backend), budget=FUNDING_AMOUNT + 1000)
+    pool.fund(Account(account.generate_account()[0]).getAddress())
+
+    with pytest.raises(Exception, match="budget"):
+        pool.get()
+    assert pool.spent == FUNDING_AMOUNT + 1000
+
+
+def test_saved_accounts(client, backend, tmp_path):
+    path = str(tmp_path / "accounts" / "pool.json")
+    pool = AccountPool(client, genesisAccounts(backend), path=path, groupsPerBatch=1)
+    used = pool.get()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    # spend one of the saved accounts outside the pool
+    spent = pool._accounts[0]
+    pool2 = AccountPool(client, [spent], groupsPerBatch=1)
+    pool2.fund(used.getAddress(), 1000)
+
+    reloaded = AccountPool(client, genesisAccounts(backend), path=path)
+    assert len(reloaded) == MAX_GROUP_SIZE - 2
+    assert used.getAddress() not in {a.getAddress() for a in reloaded._accounts}
+    assert spent.getAddress() not in {a.getAddress() for a in reloaded._accounts}
+
+    startRound = client.status()["last-round"]
+    reloaded.get()
+    assert client.status()["last-round"] == startRound
+
+
+def test_send_groups(client, backend):
+    funder = genesisAccounts(backend)[0]
+    receivers = [Account(account.generate_account()[0]) for _ in range(40)]
+    sp = client.suggested_params()
+    txns = [
+        transaction.PaymentTxn(funder.getAddress(), sp, r.getAddress(), 100_000 + i)
+        for i, r in enumerate(receivers)
+    ]
+    groups = signGroups(txns, [funder] * len(txns))
+    assert [len(g) for g in groups] == [16, 16, 8]
+
+    responses = sendGroups(client, groups, maxInFlight=2)
+    assert [r.txn["txn"]["amt"] for r in responses] == [t.amt for t in txns]
+    # each group is confirmed in one round, and the third group waits for the
+    # first, so it is confirmed in a later round
+    rounds = [r.confirmedRound for r in responses]
+    assert (
+        len(set(rounds[:16])) == len(set(rounds[16:32])) == len(set(rounds[32:])) == 1
+    )
+    assert rounds[0] < rounds[32]
+
+
+def test_bulk_assets(client, backend):
+    creator = genesisAccounts(backend)[0]
+    sent = recordSentGroups(client)
+
+    assetIDs = createDummyAssets(client, 1000, 20, creator)
+    assert len(set(assetIDs)) == 20
+    assert sent == [16, 4]
+    balances = getBalances(client, creator.getAddress())
+    assert all(balances[assetID] == 1000 for assetID in assetIDs)
+
+    holders = [Account(account.generate_account()[0]) for _ in range(5)]
+    pool = AccountPool(client, [creator])
+    for holder in holders:
+        pool.fund(holder.getAddress(), 10_000_000)
+    optInToAssets(client, [(h, assetID) for h in holders for assetID in assetIDs[:4]])
+    for holder in holders:
+        assert getBalances(client, holder.getAddress()) == {
+            0: 10_000_000 - 4 * 1000,
+            **{assetID: 0 for assetID in assetIDs[:4]},
+        }
+
+    appID = createAmmApp(client, creator, assetIDs[0], assetIDs[1], 30, 1000)
+    poolToken = setupAmmApp(client, appID, creator, assetIDs[0], assetIDs[1])
+    reads = []
+    applicationInfo = client.application_info
+    client.application_info = lambda appID: reads.append(appID) or applicationInfo(
+        appID
+    )
+    optInToPoolTokens(client, [(h, appID) for h in holders])
+    # the pool token is read once per amm
+    assert reads == [appID]
+    assert all(getBalances(client, h.getAddress())[poolToken] == 0 for h in holders)
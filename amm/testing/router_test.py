@@ -0,0 +1,135 @@
+import pytest
+
+from algosdk import account
+from algosdk.future import transaction
+
+from amm.account import Account
+from amm.registry import PoolRegistry
+from amm.router import MAX_HOPS, Router, SlippageError, findBestRoute
+from amm.simulator import LogicError
+from amm.testing.fakepools import APPROVAL, CREATOR_1, SP, SendingClient, addPool
+
+
+@pytest.fixture
+def client():
+    client = SendingClient()
+    # a shallow direct pool and a deep route through token 3
+    addPool(client, 10, 1, 2, 10_000, 10_000)
+    addPool(client, 11, 1, 3, 1_000_000, 1_000_000)
+    addPool(client, 12, 3, 2, 1_000_000, 1_000_000)
+    # a route through token 4 that is worse than the one through token 3
+    addPool(client, 13, 1, 4, 1_000_000, 1_000_000, feeBps=100)
+    addPool(client, 14, 4, 2, 1_000_000, 1_000_000, feeBps=100)
+    # unrelated
+    addPool(client, 15, 5, 6, 1_000_000, 1_000_000)
+    return client
+
+
+@pytest.fixture
+def registry(client):
+    registry = PoolRegistry(client, [APPROVAL])
+    registry.discover([CREATOR_1])
+    return registry
+
+
+def simulate(registry, appIDs, tokenIn, amount, tokenOut=2):
+    for appID in appIDs:
+        quote = registry.get(appID).simulator().quoteSwap(tokenIn, amount)
+        tokenIn, amount = quote.tokenOut, quote.amountOut
+    assert tokenIn == tokenOut
+    return amount
+
+
+def test_findBestRoute(registry):
+    route = findBestRoute(registry, 1, 2, 5_000)
+    assert route.appIDs() == [11, 12]
+    assert route.tokenIn == 1 and route.tokenOut == 2
+    assert route.amountIn == 5_000
+    assert route.amountOut == simulate(registry, [11, 12], 1, 5_000)
+    assert route.amountOut > simulate(registry, [10], 1, 5_000)
+    assert route.amountOut > simulate(registry, [13, 14], 1, 5_000)
+    assert route.hops[1].amountIn == route.hops[0].amountOut
+
+    # small trades are better off paying one fee
+    assert findBestRoute(registry, 1, 2, 10).appIDs() == [10]
+    assert findBestRoute(registry, 1, 2, 5_000, maxHops=1).appIDs() == [10]
+    assert findBestRoute(registry, 2, 4, 5_000).appIDs() == [14]
+    assert findBestRoute(registry, 1, 6, 5_000) is None
+
+
+def test_findBestRoute_exhaustive(registry):
+    # compare with every path
+    best = 0
+    for first in [10, 11, 13]:
+        for second in [None, 12, 14]:
+            appIDs = [first] if second is None else [first, second]
+            try:
+                best = max(best, simulate(registry, appIDs, 1, 50_000))
+            except (AssertionError, LogicError):
+                pass
+    assert findBestRoute(registry, 1, 2, 50_000).amountOut == best
+
+
+def test_maxHops(registry):
+    with pytest.raises(ValueError):
+        findBestRoute(registry, 1, 2, 5_000, maxHops=MAX_HOPS + 1)
+    with pytest.raises(ValueError):
+        Router(registry, maxHops=0)
+
+
+def test_buildRoute(registry):
+    router = Router(registry)
+    trader = account.generate_account()[1]
+    route = router.quote(1, 2, 5_000)
+    txns = router.buildRoute(trader, route, SP)
+
+    assert len(txns) == route.groupSize == 4
+    assert len({txn.group for txn in txns}) == 1
+    ungrouped = [transaction.Transaction.undictify(txn.dictify()) for txn in txns]
+    for txn in ungrouped:
+        txn.group = None
+    assert txns[0].group == transaction.calculate_group_id(ungrouped)
+
+    assert [txn.index for txn in txns[1::2]] == [11, 12]
+    assert [(txn.index, txn.amount) for txn in txns[0::2]] == [
+        (1, 5_000),
+        (3, route.hops[0].amountOut),
+    ]
+
+
+def test_buildRoute_too_long(registry):
+    router = Router(registry)
+    route = router.quote(1, 2, 5_000)
+    route.hops = route.hops * (MAX_HOPS // 2 + 1)
+    with pytest.raises(ValueError):
+        router.buildRoute(account.generate_account()[1], route, SP)
+
+
+def test_swap(client, registry):
+    router = Router(registry)
+    trader = Account(account.generate_account()[0])
+
+    route = router.quote(1, 2, 5_000)
+    assert route.appIDs() == [11, 12]
+    results = router.swap(trader, 1, 2, 5_000)
+    assert [(r.tokenIn, r.amountIn, r.amountOut) for r in results] == [
+        (hop.tokenIn, hop.amountIn, hop.amountOut) for hop in route.hops
+    ]
+
+    (group,) = client.sent
+    assert len(group) == 4
+    assert all(txn.transaction.sender == trader.getAddress() for txn in group)
+
+    with pytest.raises(ValueError):
+        router.swap(trader, 1, 2, 5_000, minAmountOut=route.amountOut + 1)
+    with pytest.raises(ValueError):
+        router.swap(trader, 1, 6, 5_000)
+    assert len(client.sent) == 1
+
+    # the last pool moves after the registry was refreshed
+    client.setReserves(12, 1_000_000, 900_000)
+    with pytest.raises(SlippageError) as e:
+        router.swap(trader, 1, 2, 5_000, minAmountOut=route.amountOut)
+    assert len(client.sent) == 2
+    assert e.value.results[0].amountOut == route.hops[0].amountOut
+    assert e.value.results[-1].amountOut < route.amountOut
@@ -1,15 +1,49 @@
-from typing import Optional, List
-
+from typing import TYPE_CHECKING, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import hashlib
+import json
+import os
+from urllib.error import URLError
+
+from nacl.signing import SigningKey
 from algosdk.v2client.algod import AlgodClient
 from algosdk.kmd import KMDClient
+from algosdk.error import KMDHTTPError
 
 from ..account import Account
+from ..programs import defaultCacheDir
+from ..util import writeAtomic
+
+if TYPE_CHECKING:
+    from .fakeledger import LedgerBackend
 
 ALGOD_ADDRESS = "http://localhost:4001"
 ALGOD_TOKEN = "aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa"
 
+# With AMM_LEDGER=fake, the clients below are answered by an in-process ledger
+# (see fakeledger.py) instead of a sandbox, so no node is needed.
+USE_FAKE_LEDGER = os.environ.get("AMM_LEDGER") == "fake"
+
+fakeLedger: Optional["LedgerBackend"] = None
+
+
+def getFakeLedger() -> "LedgerBackend":
+    """Get the in-process ledger shared by the fake algod and KMD clients."""
+    global fakeLedger
+
+    if fakeLedger is None:
+        from .fakeledger import LedgerBackend
+
+        fakeLedger = LedgerBackend()
+    return fakeLedger
+
 
 def getAlgodClient() -> AlgodClient:
+    if USE_FAKE_LEDGER:
+        from .fakeledger import FakeAlgodClient
+
+        return FakeAlgodClient(getFakeLedger())
     return AlgodClient(ALGOD_TOKEN, ALGOD_ADDRESS)
 
 
@@ -18,12 +52,111 @@ KMD_TOKEN = "aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa"
 
 
 def getKmdClient() -> KMDClient:
+    if USE_FAKE_LEDGER:
+        from .fakeledger import FakeKMDClient
+
+        return FakeKMDClient(getFakeLedger())
     return KMDClient(KMD_TOKEN, KMD_ADDRESS)
 
 
 KMD_WALLET_NAME = "unencrypted-default-wallet"
 KMD_WALLET_PASSWORD = ""
 
+# Set AMM_GENESIS_SEED to derive the genesis accounts with deriveKeys when KMD
+# is unavailable, for networks whose genesis was made from them.
+GENESIS_SEED_VAR = "AMM_GENESIS_SEED"
+GENESIS_COUNT_VAR = "AMM_GENESIS_ACCOUNTS"
+
+
+def deriveKeys(seed: bytes, count: int) -> List[str]:
+    """Derive count private keys from a seed, the same ones on every call."""
+    keys = []
+    for i in range(count):
+        signingKey = SigningKey(hashlib.sha256(seed + i.to_bytes(8, "big")).digest())
+        keys.append(
+            base64.b64encode(bytes(signingKey) + bytes(signingKey.verify_key)).decode()
+        )
+    return keys
+
+
+def writePrivateFile(path: str, data: bytes) -> None:
+    """Atomically write a file only its owner can read, e.g. one holding keys."""
+    writeAtomic(path, data, mode=0o600)
+
+
+def genesisKeysPath(walletID: str) -> str:
+    """Get the file the keys exported from a KMD wallet are cached in.
+
+    A sandbox reset creates a new wallet, so keys are never read back for a
+    different network.
+    """
+    name = hashlib.sha256(walletID.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(defaultCacheDir(), "kmd", "{}.json".format(name))
+
+
+def readPrivateFile(path: str) -> Optional[bytes]:
+    """Read a file written by writePrivateFile.
+
+    Returns:
+        None if the file does not exist or others can read or write it.
+    """
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_mode & 0o077:
+                return None
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def exportGenesisKeys(kmd: KMDClient, walletID: str, maxWorkers: int = 8) -> List[str]:
+    """Export the private keys of every account in a KMD wallet.
+
+    The keys are exported concurrently, one request per key.
+    """
+    walletHandle = kmd.init_wallet_handle(walletID, KMD_WALLET_PASSWORD)
+
+    try:
+        addresses = kmd.list_keys(walletHandle)
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            return list(
+                executor.map(
+                    lambda addr: kmd.export_key(
+                        walletHandle, KMD_WALLET_PASSWORD, addr
+                    ),
+                    addresses,
+                )
+            )
+    finally:
+        kmd.release_wallet_handle(walletHandle)
+
+
+def loadGenesisKeys(kmd: KMDClient) -> List[str]:
+    """Get the private keys of the genesis accounts from KMD.
+
+    They are read from the file cache of the wallet if there is one, so only
+    list_wallets is called. Otherwise they are exported and cached.
+    """
+    wallets = kmd.list_wallets()
+    walletID = None
+    for wallet in wallets:
+        if wallet["name"] == KMD_WALLET_NAME:
+            walletID = wallet["id"]
+            break
+
+    if walletID is None:
+        raise Exception("Wallet not found: {}".format(KMD_WALLET_NAME))
+
+    path = genesisKeysPath(walletID)
+    cached = readPrivateFile(path)
+    if cached is not None:
+        return json.loads(cached)
+
+    privateKeys = exportGenesisKeys(kmd, walletID)
+    writePrivateFile(path, json.dumps(privateKeys).encode("utf-8"))
+    return privateKeys
+
+
 kmdAccounts: Optional[List[Account]] = None
 
 
@@ -31,28 +164,14 @@ def getGenesisAccounts() -> List[Account]:
     global kmdAccounts
 
     if kmdAccounts is None:
-        kmd = getKmdClient()
-
-        wallets = kmd.list_wallets()
-        walletID = None
-        for wallet in wallets:
-            if wallet["name"] == KMD_WALLET_NAME:
-                walletID = wallet["id"]
-                break
-
-        if walletID is None:
-            raise Exception("Wallet not found: {}".format(KMD_WALLET_NAME))
-
-        walletHandle = kmd.init_wallet_handle(walletID, KMD_WALLET_PASSWORD)
-
         try:
-            addresses = kmd.list_keys(walletHandle)
-            privateKeys = [
-                kmd.export_key(walletHandle, KMD_WALLET_PASSWORD, addr)
-                for addr in addresses
-            ]
-            kmdAccounts = [Account(sk) for sk in privateKeys]
-        finally:
-            kmd.release_wallet_handle(walletHandle)
+            privateKeys = loadGenesisKeys(getKmdClient())
+        except (KMDHTTPError, URLError):
+            seed = os.environ.get(GENESIS_SEED_VAR)
+            if not seed:
+                raise
+            count = int(os.environ.get(GENESIS_COUNT_VAR, "3"))
+            privateKeys = deriveKeys(seed.encode("utf-8"), count)
+        kmdAccounts = [Account(sk) for sk in privateKeys]
 
     return kmdAccounts
@@ -1,10 +1,30 @@
 import base64
+import os
+import stat
+from urllib.error import URLError
 
+import pytest
 from algosdk.v2client.algod import AlgodClient
 from algosdk.kmd import KMDClient
 from algosdk import encoding
 
-from .setup import getAlgodClient, getKmdClient, getGenesisAccounts
+from . import setup
+from .fakeledger import (
+    GENESIS_ID,
+    WALLET_ID,
+    FakeKMDClient,
+    LedgerBackend,
+    deriveGenesisKeys,
+)
+from .setup import (
+    GENESIS_SEED_VAR,
+    deriveKeys,
+    genesisKeysPath,
+    getAlgodClient,
+    getKmdClient,
+    getGenesisAccounts,
+    loadGenesisKeys,
+)
 
 
 def test_getAlgodClient():
@@ -32,3 +52,65 @@ def test_getGenesisAccounts():
     assert all(
         len(base64.b64decode(account.getPrivateKey())) == 64 for account in accounts
     )
+
+
+class CountingKMDClient(FakeKMDClient):
+    def __init__(self, backend):
+        super().__init__(backend)
+        self.exported = []
+
+    def export_key(self, handle, password, address):
+        self.exported.append(address)
+        return super().export_key(handle, password, address)
+
+
+def test_loadGenesisKeys(monkeypatch, tmp_path):
+    monkeypatch.setenv("AMM_CACHE_DIR", str(tmp_path))
+    backend = LedgerBackend()
+
+    kmd = CountingKMDClient(backend)
+    assert loadGenesisKeys(kmd) == backend.genesisKeys
+    assert len(kmd.exported) == len(backend.genesisKeys)
+
+    path = genesisKeysPath(WALLET_ID)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    # later loads only list the wallets
+    kmd = CountingKMDClient(backend)
+    assert loadGenesisKeys(kmd) == backend.genesisKeys
+    assert kmd.exported == []
+
+    # a cache others can read is not trusted
+    os.chmod(path, 0o644)
+    kmd = CountingKMDClient(backend)
+    assert loadGenesisKeys(kmd) == backend.genesisKeys
+    assert len(kmd.exported) == len(backend.genesisKeys)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_getGenesisAccounts_from_seed(monkeypatch, tmp_path):
+    monkeypatch.setenv("AMM_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv(GENESIS_SEED_VAR, "another seed")
+    backend = LedgerBackend()
+
+    # the seed is not used while KMD is available
+    monkeypatch.setattr(setup, "kmdAccounts", None)
+    monkeypatch.setattr(setup, "getKmdClient", lambda: FakeKMDClient(backend))
+    accounts = getGenesisAccounts()
+    assert [a.getPrivateKey() for a in accounts] == backend.genesisKeys
+
+    def unavailable():
+        raise URLError("Connection refused")
+
+    monkeypatch.setattr(setup, "kmdAccounts", None)
+    monkeypatch.setattr(setup, "getKmdClient", unavailable)
+    monkeypatch.setenv(GENESIS_SEED_VAR, GENESIS_ID)
+    accounts = getGenesisAccounts()
+    assert [a.getPrivateKey() for a in accounts] == deriveGenesisKeys()
+    assert deriveKeys(b"seed", 2) == deriveKeys(b"seed", 2) != deriveKeys(b"seed2", 2)
+
+    # without a seed, KMD errors are raised
+    monkeypatch.setattr(setup, "kmdAccounts", None)
+    monkeypatch.delenv(GENESIS_SEED_VAR)
+    with pytest.raises(URLError):
+        getGenesisAccounts()
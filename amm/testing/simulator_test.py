@@ -0,0 +1,199 @@
+from math import sqrt
+
+import pytest
+
+from amm.simulator import (
+    PoolSimulator,
+    LogicError,
+    xMulYDivZ,
+    assessFee,
+    computeOtherTokenOutputPerGivenTokenInput,
+    POOL_TOKEN_DEFAULT_AMOUNT,
+    UINT64_MAX,
+)
+
+
+def newPool(feeBps=30, minIncrement=1000):
+    return PoolSimulator(
+        tokenA=1, tokenB=2, feeBps=feeBps, minIncrement=minIncrement, poolToken=3
+    )
+
+
+def test_xMulYDivZ():
+    assert xMulYDivZ(10, 20, 3) == 66
+    assert xMulYDivZ(UINT64_MAX, 2 ** 20, 2 ** 20) == UINT64_MAX
+
+    # x * y * SCALING_FACTOR does not fit in 128 bits
+    with pytest.raises(LogicError):
+        xMulYDivZ(UINT64_MAX, 2 ** 40, 2 ** 40)
+
+    # quotient does not fit in 64 bits
+    with pytest.raises(LogicError):
+        xMulYDivZ(2 ** 40, 2 ** 40, 1)
+
+    with pytest.raises(LogicError):
+        xMulYDivZ(1, 1, 0)
+
+
+def test_assessFee():
+    assert assessFee(10_000, 30) == 9_970
+    assert assessFee(1, 30) == 0
+
+    with pytest.raises(LogicError):
+        assessFee(1, 10_001)
+
+
+def test_computeOtherTokenOutputPerGivenTokenInput():
+    m, n, x, feeBps = 100_000_000, 200_000_000, 2_000_000, 30
+    expected = n - m * n // (m + (10_000 - feeBps) * x // 10_000)
+    assert computeOtherTokenOutputPerGivenTokenInput(x, m, n, feeBps) == expected
+
+    # k = m * n is computed with a plain uint64 multiplication
+    with pytest.raises(LogicError):
+        computeOtherTokenOutputPerGivenTokenInput(1000, 2 ** 32, 2 ** 32, feeBps)
+
+
+def test_not_setup():
+    pool = PoolSimulator(tokenA=1, tokenB=2, feeBps=30, minIncrement=1000)
+
+    with pytest.raises(LogicError):
+        pool.quoteSupply(1000, 1000)
+    with pytest.raises(LogicError):
+        pool.quoteWithdraw(10)
+    with pytest.raises(LogicError):
+        pool.quoteSwap(1, 10)
+
+
+def test_supply():
+    pool = newPool()
+
+    first = pool.supply(1000, 2000)
+    assert first.poolTokens == int(sqrt(1000 * 2000))
+    assert pool.poolTokensOutstanding == first.poolTokens
+    assert pool.poolTokenReserve == POOL_TOKEN_DEFAULT_AMOUNT - first.poolTokens
+
+    # should take 1000 : 2000 again
+    second = pool.supply(2000, 2000)
+    assert (second.amountA, second.amountB) == (1000, 2000)
+    assert (second.refundA, second.refundB) == (1000, 0)
+    assert second.poolTokens == first.poolTokens
+
+    # should take 10000 : 20000
+    third = pool.supply(12000, 20000)
+    assert (third.amountA, third.amountB) == (10000, 20000)
+    assert third.poolTokens == first.poolTokens * 10
+    assert pool.poolTokensOutstanding == first.poolTokens * 12
+    assert (pool.reserveA, pool.reserveB) == (12000, 24000)
+
+
+def test_supply_rejected():
+    pool = newPool()
+
+    # below the minimum increment
+    with pytest.raises(LogicError):
+        pool.quoteSupply(999, 2000)
+
+    # sqrt(qA * qB) is computed with a plain uint64 multiplication
+    with pytest.raises(LogicError):
+        pool.quoteSupply(2 ** 32, 2 ** 32)
+
+    pool.supply(1000, 2000)
+    # neither amount covers the other at the pool's ratio: 1 : 10 ** 13
+    pool.reserveB = 10 ** 16
+    with pytest.raises(LogicError):
+        pool.quoteSupply(1000, 1000)
+
+    # a rejected quote does not alter the pool
+    assert (pool.reserveA, pool.poolTokensOutstanding) == (1000, int(sqrt(2000000)))
+
+
+def test_withdraw():
+    pool = newPool()
+    pool.supply(1000, 2000)
+    outstanding = int(sqrt(1000 * 2000))
+
+    # return one third of pool tokens to the pool, keep two thirds
+    quote = pool.withdraw(outstanding // 3)
+    assert (quote.amountA, quote.amountB) == (1000 // 3, 2000 // 3)
+    assert pool.poolTokensOutstanding == outstanding - outstanding // 3
+    assert (pool.reserveA, pool.reserveB) == (1000 - 1000 // 3, 2000 - 2000 // 3)
+
+    # more pool tokens than are outstanding
+    with pytest.raises(LogicError):
+        pool.quoteWithdraw(outstanding)
+
+    # too few pool tokens to withdraw a single unit of token A
+    with pytest.raises(LogicError):
+        pool.quoteWithdraw(1)
+
+
+def test_swap():
+    pool = newPool()
+    m, n = 100_000_000, 200_000_000
+    pool.supply(m, n)
+
+    with pytest.raises(LogicError):
+        # swap wrong token
+        pool.quoteSwap(3, 1)
+
+    with pytest.raises(LogicError):
+        # swap too little
+        pool.quoteSwap(1, 1)
+
+    x = 2_000_000
+    quote = pool.swap(1, x)
+    expectedReceivedTokenB = n - m * n // (m + (10_000 - 30) * x // 10_000)
+    assert quote.tokenOut == 2
+    assert quote.amountOut == expectedReceivedTokenB
+    assert (pool.reserveA, pool.reserveB) == (m + x, n - expectedReceivedTokenB)
+
+    mSecond, nSecond = pool.reserveA, pool.reserveB
+    y = x * 2
+    quote = pool.swap(2, y)
+    expectedReceivedTokenA = mSecond - mSecond * nSecond // (
+        nSecond + (10_000 - 30) * y // 10_000
+    )
+    assert quote.tokenOut == 1
+    assert quote.amountOut == expectedReceivedTokenA
+
+
+def test_swap_empty_pool():
+    pool = newPool()
+
+    with pytest.raises(LogicError):
+        pool.quoteSwap(1, 1000)
+
+
+def test_fromState():
+    state = {
+        b"creator_key": b"\x00" * 32,
+        b"token_a_key": 1,
+        b"token_b_key": 2,
+        b"pool_token_key": 3,
+        b"fee_bps_key": 30,
+        b"min_increment_key": 1000,
+        b"pool_tokens_outstanding_key": 1414,
+    }
+    balances = {0: 400_000, 1: 1000, 2: 2000, 3: POOL_TOKEN_DEFAULT_AMOUNT - 1414}
+
+    pool = PoolSimulator.fromState(state, balances)
+    assert (pool.reserveA, pool.reserveB) == (1000, 2000)
+    assert pool.poolTokenReserve == POOL_TOKEN_DEFAULT_AMOUNT - 1414
+    assert pool.quoteWithdraw(1414 // 2).amountA == 500
+
+
+def test_fromState_mirrored_reserves():
+    state = {
+        b"token_a_key": 1,
+        b"token_b_key": 2,
+        b"pool_token_key": 3,
+        b"fee_bps_key": 30,
+        b"min_increment_key": 1000,
+        b"pool_tokens_outstanding_key": 1414,
+        b"reserve_a_key": 1000,
+        b"reserve_b_key": 2000,
+    }
+
+    pool = PoolSimulator.fromState(state)
+    assert (pool.reserveA, pool.reserveB) == (1000, 2000)
+    assert pool.poolTokenReserve == POOL_TOKEN_DEFAULT_AMOUNT - 1414
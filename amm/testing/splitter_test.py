@@ -0,0 +1,118 @@
+import pytest
+
+from algosdk import account
+
+from amm.account import Account
+from amm.registry import PoolRegistry
+from amm.splitter import Splitter, optimalAllocation, splitOrder
+from amm.testing.fakepools import APPROVAL, CREATOR_1, SP, SendingClient, addPool
+
+
+@pytest.fixture
+def client():
+    client = SendingClient()
+    addPool(client, 10, 1, 2, 1_000_000, 2_000_000)
+    addPool(client, 11, 2, 1, 4_000_000, 2_000_000, feeBps=5)
+    addPool(client, 12, 1, 2, 300_000, 620_000, feeBps=100)
+    addPool(client, 13, 1, 2, 50_000, 100_000)
+    addPool(client, 14, 2, 3, 1_000_000, 1_000_000)
+    return client
+
+
+@pytest.fixture
+def registry(client):
+    registry = PoolRegistry(client, [APPROVAL])
+    registry.discover([CREATOR_1])
+    return registry
+
+
+def output(pools, tokenIn, amounts):
+    return sum(
+        pool.simulator().quoteSwap(tokenIn, amount).amountOut
+        for pool, amount in zip(pools, amounts)
+        if amount > 0
+    )
+
+
+@pytest.mark.parametrize("tokenIn", [1, 2])
+def test_better_than_single_pool(registry, tokenIn):
+    pools = registry.poolsForPair(1, 2)
+    amount = 400_000
+    split = splitOrder(pools, tokenIn, amount)
+
+    single = max(output([pool], tokenIn, [amount]) for pool in pools)
+    assert split.amountIn == amount
+    assert split.amountOut > single * 1.03
+    assert split.amountOut == output(
+        [leg.pool for leg in split.legs], tokenIn, [leg.amountIn for leg in split.legs]
+    )
+    assert len(set(split.appIDs())) == len(split)
+
+
+def test_near_brute_force(registry):
+    pools = [registry.get(10), registry.get(11)]
+    amount = 200_000
+    split = splitOrder(pools, 1, amount)
+
+    step = amount // 1000
+    best = max(output(pools, 1, [a, amount - a]) for a in range(step, amount, step))
+    # integer rounding in each leg makes the exact optimum a scatter of
+    # points, so the split is allowed to miss it by one unit per leg
+    assert split.amountOut >= best - len(split)
+
+
+def test_closed_form(registry):
+    # identical pools split evenly
+    simulators = [registry.get(10).simulator()] * 3
+    allocation = optimalAllocation(simulators, 1, 30_000)
+    assert allocation == pytest.approx([10_000] * 3)
+
+    # a pool that is too shallow for the marginal price gets nothing
+    simulators = [registry.get(10).simulator(), registry.get(13).simulator()]
+    simulators[1].reserveB = 50_000
+    assert optimalAllocation(simulators, 1, 1_000)[1] == 0
+
+
+def test_small_order_single_leg(registry):
+    # pool 12 has the best price for small amounts despite its fee
+    split = splitOrder(registry.poolsForPair(1, 2), 1, 100)
+    assert split.appIDs() == [12]
+
+
+def test_maxLegs(registry):
+    pools = registry.poolsForPair(1, 2)
+    assert len(splitOrder(pools, 1, 400_000)) > 2
+    assert len(splitOrder(pools, 1, 400_000, maxLegs=2)) == 2
+    assert len(splitOrder(pools, 1, 400_000, maxLegs=1)) == 1
+
+    with pytest.raises(ValueError):
+        splitOrder(pools, 1, 400_000, maxLegs=0)
+
+
+def test_mixed_pairs(registry):
+    with pytest.raises(ValueError):
+        splitOrder([registry.get(10), registry.get(14)], 2, 1_000)
+    with pytest.raises(ValueError):
+        splitOrder([registry.get(10)], 3, 1_000)
+
+
+def test_swap(client, registry):
+    splitter = Splitter(registry)
+    trader = Account(account.generate_account()[0])
+
+    quote = splitter.quote(1, 2, 400_000)
+    txns = splitter.buildSplit(trader.getAddress(), quote, SP)
+    assert len(txns) == 2 * len(quote)
+    assert len({txn.group for txn in txns}) == 1
+    assert [txn.index for txn in txns[1::2]] == quote.appIDs()
+    assert [txn.amount for txn in txns[0::2]] == [leg.amountIn for leg in quote.legs]
+
+    split = splitter.swap(trader, 1, 2, 400_000)
+    assert split.amountOut == quote.amountOut
+    (group,) = client.sent
+    assert len(group) == len(txns)
+
+    with pytest.raises(ValueError):
+        splitter.swap(trader, 1, 2, 400_000, minAmountOut=split.amountOut + 1)
+    with pytest.raises(ValueError):
+        splitter.quote(1, 3, 1_000)
@@ -0,0 +1,170 @@
+import pytest
+
+from amm.programs import (
+    TEAL_VERSIONS,
+    ProgramCache,
+    generateTeal,
+    tealHash,
+    SHIPPED_DIR,
+)
+from amm.teal import assemble, TealAssemblyError
+from amm.teal.assembler import encodeVaruint
+
+# Expected bytecode for the programs below is the output of algod's compile
+# endpoint.
+
+CONSTANTS = r"""#pragma version 5
+int 7
+int 1
+int 7
+byte "b"
+int 1
+byte "a"
+byte "b"
+int 300
+byte "a"
+byte "\x00\n\"c\\"
+addr AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAY5HFKQ
+"""
+
+BRANCHES = """#pragma version 5
+int 1
+loop:
+txn ApplicationArgs 0
+gtxn 1 Accounts 2
+int 1
+gtxns Assets 1
+itxn Logs 0
+int 0
+int 1
+-
+dup
+bnz loop  // backwards
+callsub sub
+b end
+sub:
+int 0
+int 2
+asset_holding_get AssetBalance
+retsub
+end:
+return
+"""
+
+VERSION_3 = """#pragma version 3
+int 5
+int 6
+int 5
+byte 0x01
+pushint 1000
+pushbytes 0xff
+pop
+bz end
+end:
+int 1
+"""
+
+EXPLICIT_BLOCKS = """#pragma version 5
+intcblock 5 6 7 8 9
+bytecblock 0x01 0x02
+intc 1
+intc 4
+bytec 1
+int 6
+int 9
+byte 0x02
+arg 1
+"""
+
+VERSION_6 = """#pragma version 6
+itxn_begin
+int axfer
+itxn_field TypeEnum
+itxn_next
+byte "n"
+itxn_field Note
+itxn_submit
+gitxn 0 CreatedAssetID
+gitxn 1 Logs 0
+int 0
+gitxnas 1 Accounts
+int 0
+itxnas Logs
+global OpcodeBudget
+global CallerApplicationID
+txn LastLog
+int 7
+int 9
+int 2
+divw
+byte 0x10
+bsqrt
+txn Sender
+acct_params_get AcctMinBalance
+"""
+
+GOLDEN = [
+    (
+        CONSTANTS,
+        "05200207012602016201612223222823292881ac02298005000a22635c8020" + "00" * 32,
+    ),
+    (
+        BRANCHES,
+        "052002010022361a0037011c0222393001b53a002322094940ffeb88000342000623"
+        "810270008943",
+    ),
+    (VERSION_3, "032003050601260101012223222881e8078001ff4841000024"),
+    (EXPLICIT_BLOCKS, "052005050607080926020101010223210429810681098001022e"),
+    (
+        VERSION_6,
+        "06200100b18104b210b680016eb205b3b7003cb8013a0022c6011c22c53a320c320d313e"
+        "810781098102978001109631007301",
+    ),
+]
+
+
+@pytest.mark.parametrize("source,expected", GOLDEN)
+def test_golden(source, expected):
+    assert assemble(source).hex() == expected
+
+
+@pytest.mark.parametrize("version", TEAL_VERSIONS)
+def test_contracts(version):
+    # the shipped artifacts were compiled by algod
+    shipped = ProgramCache(SHIPPED_DIR, SHIPPED_DIR)
+    for teal in generateTeal(version):
+        expected = shipped.getProgram(tealHash(teal, version))
+        assert expected is not None
+        assert assemble(teal) == expected
+
+
+def test_varuint():
+    assert encodeVaruint(0) == b"\x00"
+    assert encodeVaruint(127) == b"\x7f"
+    assert encodeVaruint(300) == b"\xac\x02"
+    assert encodeVaruint(2 ** 64 - 1) == b"\xff" * 9 + b"\x01"
+
+
+@pytest.mark.parametrize(
+    "source,message",
+    [
+        ("#pragma version 5\nfrobnicate", "unknown opcode frobnicate"),
+        ("#pragma version 3\ncallsub x\nx:", "callsub needs version 4"),
+        ("#pragma version 5\nb nowhere", "undefined label nowhere"),
+        ("#pragma version 5\ntxn Foo", "unknown txn field Foo"),
+        ("#pragma version 5\nglobal Foo", "unknown global field Foo"),
+        ("#pragma version 5\nglobal OpcodeBudget", "OpcodeBudget needs version 6"),
+        ("#pragma version 5\nitxn_next", "itxn_next needs version 6"),
+        ("#pragma version 5\nitxn_field TxID", "unknown itxnField field TxID"),
+        ("#pragma version 5\nint 18446744073709551616", "out of range"),
+        ("#pragma version 5\nbyte 0xabc", "invalid hex value"),
+        ("#pragma version 5\nload 256", "is not a byte"),
+        ("#pragma version 5\nintc 0", "intc 0 is not defined"),
+        ("#pragma version 3\nx:\nint 1\nbnz x", "backward branch to x"),
+        ("#pragma version 5\nx:\nx:", "duplicate label x"),
+        ("int 1\n#pragma version 5", "#pragma version must come first"),
+    ],
+)
+def test_errors(source, message):
+    with pytest.raises(TealAssemblyError, match=message):
+        assemble(source)
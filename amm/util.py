@@ -1,12 +1,23 @@
-from typing import List, Tuple, Dict, Any, Optional, Union
+from typing import TYPE_CHECKING, List, Tuple, Dict, Any, Optional, Union
 from base64 import b64decode
+import os
+import tempfile
 
 from algosdk.v2client.algod import AlgodClient
 from algosdk import encoding
 
-from pyteal import compileTeal, Mode, Expr
-
 from .account import Account
+from .teal import assemble, TealAssemblyError
+
+if TYPE_CHECKING:
+    # pyteal is only needed to compile contracts, so it is imported on use
+    from pyteal import Expr
+
+# the largest atomic group the protocol accepts
+MAX_GROUP_SIZE = 16
+# the most apps an account can create, as of the consensus version the
+# contracts target
+MAX_APPS_PER_ACCOUNT = 10
 
 
 class PendingTxnResponse:
@@ -53,10 +64,22 @@ def waitForTransaction(
     )
 
 
-def fullyCompileContract(client: AlgodClient, contract: Expr) -> bytes:
-    teal = compileTeal(contract, mode=Mode.Application, version=5)
-    response = client.compile(teal)
-    return b64decode(response["result"])
+def fullyCompileContract(
+    client: AlgodClient, contract: "Expr", version: int = 5
+) -> bytes:
+    """Compile a contract to bytecode.
+
+    The program is assembled locally, and only sent to algod to be compiled if
+    it uses opcodes the local assembler does not support.
+    """
+    from .programs import contractTeal
+
+    teal = contractTeal(contract, version)
+    try:
+        return assemble(teal)
+    except TealAssemblyError:
+        response = client.compile(teal)
+        return b64decode(response["result"])
 
 
 def decodeState(stateArray: List[Any]) -> Dict[bytes, Union[int, bytes]]:
@@ -113,3 +136,121 @@ def getLastBlockTimestamp(client: AlgodClient) -> Tuple[int, int]:
     timestamp = block["block"]["ts"]
 
     return block, timestamp
+
+
+# the contract's price accumulators are sums of seconds times 64.64 fixed point
+# prices, kept modulo 2^128
+PRICE_FRACTION_BITS = 64
+PRICE_ACCUMULATOR_MODULUS = 2 ** 128
+
+
+class PriceSnapshot:
+    """The price accumulators of a pool at a point in time"""
+
+    def __init__(
+        self, timestamp: int, priceACumulative: int, priceBCumulative: int
+    ) -> None:
+        self.timestamp = timestamp
+        self.priceACumulative = priceACumulative
+        self.priceBCumulative = priceBCumulative
+
+    def __repr__(self) -> str:
+        return "PriceSnapshot(timestamp={}, A={}, B={})".format(
+            self.timestamp, self.priceACumulative, self.priceBCumulative
+        )
+
+
+def getPriceSnapshot(
+    appGlobalState: Dict[bytes, Union[int, bytes]], timestamp: int
+) -> PriceSnapshot:
+    """Get the price accumulators of a pool as of a block timestamp.
+
+    The accumulators in global state are as of the pool's last supply,
+    withdraw or swap. The reserves mirrored next to them have set the price
+    since, so the time up to timestamp is added at that price, as the
+    contract would do on its next call.
+
+    Args:
+        appGlobalState: The app global state, as returned by getAppGlobalState.
+        timestamp: A block timestamp no earlier than the last update, e.g. from
+            getLastBlockTimestamp.
+
+    Raises:
+        ValueError: if timestamp is before the pool's last update.
+    """
+    lastTimestamp = appGlobalState.get(b"price_timestamp_key", 0)
+    if timestamp < lastTimestamp:
+        raise ValueError(
+            "Timestamp {} is before the last update at {}".format(
+                timestamp, lastTimestamp
+            )
+        )
+
+    cumulative = []
+    for prefix in (b"price_a_cumulative", b"price_b_cumulative"):
+        hi = appGlobalState.get(prefix + b"_hi_key", 0)
+        lo = appGlobalState.get(prefix + b"_lo_key", 0)
+        cumulative.append((hi << 64) | lo)
+
+    reserveA = appGlobalState.get(b"reserve_a_key", 0)
+    reserveB = appGlobalState.get(b"reserve_b_key", 0)
+    elapsed = timestamp - lastTimestamp
+    if elapsed > 0 and reserveA > 0 and reserveB > 0:
+        cumulative[0] += (reserveB << PRICE_FRACTION_BITS) // reserveA * elapsed
+        cumulative[1] += (reserveA << PRICE_FRACTION_BITS) // reserveB * elapsed
+
+    return PriceSnapshot(
+        timestamp,
+        cumulative[0] % PRICE_ACCUMULATOR_MODULUS,
+        cumulative[1] % PRICE_ACCUMULATOR_MODULUS,
+    )
+
+
+def computeTwap(start: PriceSnapshot, end: PriceSnapshot) -> Tuple[float, float]:
+    """Compute the time-weighted average prices of a pool between two snapshots.
+
+    Args:
+        start: The earlier snapshot.
+        end: The later snapshot.
+
+    Returns:
+        The average price of token A in token B (how much B one A was worth)
+        and of token B in token A over the window.
+
+    Raises:
+        ValueError: if end is not after start.
+    """
+    elapsed = end.timestamp - start.timestamp
+    if elapsed <= 0:
+        raise ValueError("The end snapshot must be after the start snapshot")
+
+    scale = elapsed << PRICE_FRACTION_BITS
+    priceA = (end.priceACumulative - start.priceACumulative) % PRICE_ACCUMULATOR_MODULUS
+    priceB = (end.priceBCumulative - start.priceBCumulative) % PRICE_ACCUMULATOR_MODULUS
+    return priceA / scale, priceB / scale
+
+
+def writeAtomic(path: str, data: bytes, mode: int = 0o644) -> None:
+    """Write a file through a temporary file renamed into place.
+
+    Readers never see a partial file, and of concurrent writers the last
+    rename wins. Missing parent directories are created.
+
+    Args:
+        path: The path of the file.
+        data: The contents of the file.
+        mode (optional): The permissions of the file.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmpPath = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates the file readable only by its owner
+        if mode != 0o600:
+            os.chmod(tmpPath, mode)
+        os.replace(tmpPath, path)
+    except BaseException:
+        os.unlink(tmpPath)
+        raise
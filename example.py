@@ -73,79 +73,71 @@ def simple_amm():
     optInToPoolToken(client, appID, creator)
 
     print("Supplying AMM with initial token A and token B")
-    supply(client=client, appID=appID, qA=500_000, qB=100_000_000, supplier=creator)
-    ammBalancesSupplied = getBalances(client, get_application_address(appID))
-    creatorBalancesSupplied = getBalances(client, creator.getAddress())
-    poolTokenFirstAmount = creatorBalancesSupplied[poolToken]
-    print("AMM's balances: ", ammBalancesSupplied)
-    print("Alice's balances: ", creatorBalancesSupplied)
+    result = supply(
+        client=client, appID=appID, qA=500_000, qB=100_000_000, supplier=creator
+    )
+    poolTokenFirstAmount = result.poolTokens
+    poolTokenTotalAmount = result.poolTokens
+    print("Supplied: ", result)
 
     print("Supplying AMM with same token A and token B")
-    supply(client=client, appID=appID, qA=100_000, qB=20_000_000, supplier=creator)
-    ammBalancesSupplied = getBalances(client, get_application_address(appID))
-    creatorBalancesSupplied = getBalances(client, creator.getAddress())
-
-    print("AMM's balances: ", ammBalancesSupplied)
-    print("Alice's balances: ", creatorBalancesSupplied)
+    result = supply(
+        client=client, appID=appID, qA=100_000, qB=20_000_000, supplier=creator
+    )
+    poolTokenTotalAmount += result.poolTokens
+    print("Supplied: ", result)
 
     print("Supplying AMM with too large ratio of token A and token B")
-    supply(client=client, appID=appID, qA=100_000, qB=100_000, supplier=creator)
-    ammBalancesSupplied = getBalances(client, get_application_address(appID))
-    creatorBalancesSupplied = getBalances(client, creator.getAddress())
-    print("AMM's balances: ", ammBalancesSupplied)
-    print("Alice's balances: ", creatorBalancesSupplied)
+    result = supply(
+        client=client, appID=appID, qA=100_000, qB=100_000, supplier=creator
+    )
+    poolTokenTotalAmount += result.poolTokens
+    print("Supplied: ", result)
 
     print("Supplying AMM with too small ratio of token A and token B")
-    supply(client=client, appID=appID, qA=100_000, qB=100_000_000, supplier=creator)
-    ammBalancesSupplied = getBalances(client, get_application_address(appID))
-    creatorBalancesSupplied = getBalances(client, creator.getAddress())
-
-    print("AMM's balances: ", ammBalancesSupplied)
-    print("Alice's balances: ", creatorBalancesSupplied)
-    poolTokenTotalAmount = creatorBalancesSupplied[poolToken]
+    result = supply(
+        client=client, appID=appID, qA=100_000, qB=100_000_000, supplier=creator
+    )
+    poolTokenTotalAmount += result.poolTokens
+    print("Supplied: ", result)
     print(" ")
     print("Alice is exchanging her Token A for Token B")
-    swap(client=client, appID=appID, tokenId=tokenA, amount=1_000, trader=creator)
-    ammBalancesTraded = getBalances(client, get_application_address(appID))
-    creatorBalancesTraded = getBalances(client, creator.getAddress())
-    print("AMM's balances: ", ammBalancesTraded)
-    print("Alice's balances: ", creatorBalancesTraded)
+    result = swap(
+        client=client, appID=appID, tokenId=tokenA, amount=1_000, trader=creator
+    )
+    print("Traded: ", result)
 
     print("Alice is exchanging her Token B for Token A")
-    swap(
+    result = swap(
         client=client,
         appID=appID,
         tokenId=tokenB,
         amount=int(1_000_000 * 1.003),
         trader=creator,
     )
-    ammBalancesTraded = getBalances(client, get_application_address(appID))
-    creatorBalancesTraded = getBalances(client, creator.getAddress())
-    print("AMM's balances: ", ammBalancesTraded)
-    print("Alice's balances: ", creatorBalancesTraded)
+    print("Traded: ", result)
     print(" ")
 
     print("Withdrawing first supplied liquidity from AMM")
     print("Withdrawing: ", poolTokenFirstAmount)
-    withdraw(
+    result = withdraw(
         client=client,
         appID=appID,
         poolTokenAmount=poolTokenFirstAmount,
         withdrawAccount=creator,
     )
-    ammBalancesWithdrawn = getBalances(client, get_application_address(appID))
-    print("AMM's balances: ", ammBalancesWithdrawn)
+    print("Withdrawn: ", result)
 
     print("Withdrawing remainder of the supplied liquidity from AMM")
     poolTokenTotalAmount -= poolTokenFirstAmount
-    withdraw(
+    result = withdraw(
         client=client,
         appID=appID,
         poolTokenAmount=poolTokenTotalAmount,
         withdrawAccount=creator,
     )
-    ammBalancesWithdrawn = getBalances(client, get_application_address(appID))
-    print("AMM's balances: ", ammBalancesWithdrawn)
+    print("Withdrawn: ", result)
+    print("AMM's balances: ", getBalances(client, get_application_address(appID)))
     print("Closing AMM")
     closeAmm(client=client, appID=appID, closer=creator)
 